@@ -12,6 +12,11 @@ def update_mh_data(self, context):
     LocationService.update_mh_data()
 
 
+def update_log_flush_interval(self, context):
+    from .services import LogService
+    LogService.set_flush_interval(self.mpfb_log_flush_interval)
+
+
 class MpfbPreferences(bpy.types.AddonPreferences):
     """Preferences for MPFB"""
 
@@ -57,6 +62,15 @@ class MpfbPreferences(bpy.types.AddonPreferences):
         default=False
     )
 
+    mpfb_log_flush_interval: bpy.props.FloatProperty(
+        name="Log flush interval",
+        description="How often, in seconds, queued log messages are written to the console and the log files. Set to zero to write every message immediately, which is slower but useful when debugging crashes",
+        default=0.5,
+        min=0.0,
+        max=60.0,
+        update=update_log_flush_interval
+    )
+
     mpfb_shelf_label: bpy.props.StringProperty(
         name="Shelf label",
         description="If you want to use a different name for the MPFB shelf tab, you can enter any non-empty string here",
@@ -71,6 +85,7 @@ class MpfbPreferences(bpy.types.AddonPreferences):
         layout.prop(self, 'mpfb_user_data')
         layout.prop(self, 'mpfb_second_root')
         layout.prop(self, 'mpfb_codechecks')
+        layout.prop(self, 'mpfb_log_flush_interval')
         layout.prop(self, 'mpfb_shelf_label')
         layout.prop(self, 'mh_user_data')
         layout.prop(self, 'mh_auto_user_data')
@@ -0,0 +1,290 @@
+"""Functionality for matching all clothes vertices against relevant basemesh vertices at once"""
+
+import time, numpy
+
+from ...services import MeshService
+from ...services import LogService
+
+_LOG = LogService.get_logger("entities.batchvertexmatch")
+
+STRATEGIES = ["EXACT", "RIGID_GROUP", "SIMPLE_FACE", "EXTENDED_FACE"]
+
+_EXACT = 0
+_RIGID_GROUP = 1
+_SIMPLE_FACE = 2
+_EXTENDED_FACE = 3
+_UNMATCHED = -1
+
+_EXACT_MATCH_DISTANCE = 0.001
+
+
+class BatchVertexMatch:
+    def __init__(self, focus_obj, focus_crossref, target_obj, target_crossref, scale_factor=1.0, reference_scale=None, focus_vert_indices=None):
+        """Construct a BatchVertexMatch object, which matches many focus vertices against the target at once.
+
+        The strategies and their order are the same as in VertexMatch, and the resulting mhclo lines are the same as
+        VertexMatch would produce one vertex at a time. The difference is that group lookups, vertex selection and the
+        barycentric solving are done as numpy operations on all vertices, and that KD tree lookups are batched per strategy
+        (and per group for EXTENDED_FACE).
+
+        Parameters:
+        - focus_obj: The clothes/bodypart type object to work with
+        - focus_crossref: The clothes/bodypart type object MeshCrossRef to work with
+        - target_obj: The basemesh type object to match against
+        - target_crossref: The basemesh type object MeshCrossRef to work with
+        - focus_vert_indices: The vertices to match. If not given, all vertices of the focus object are matched.
+
+        After construction, the mhclo_lines dict has focus vertex index as key and a dict with verts, weights and offsets
+        as value, and the final_strategies dict has focus vertex index as key and strategy name as value.
+        """
+        _LOG.enter()
+        self.focus_obj = focus_obj
+        self.focus_crossref = focus_crossref
+        self.target_obj = target_obj
+        self.target_crossref = target_crossref
+        self.scale_factor = scale_factor
+        self.reference_scale = reference_scale
+
+        if focus_vert_indices is None:
+            focus_vert_indices = numpy.arange(len(focus_crossref.vertex_coordinates), dtype=numpy.int64)
+        self.focus_vert_indices = numpy.asarray(focus_vert_indices, dtype=numpy.int64)
+        self.focus_vert_coords = numpy.asarray(focus_crossref.vertex_coordinates, dtype=numpy.float64)[self.focus_vert_indices]
+
+        self.mhclo_lines = dict()
+        self.final_strategies = dict()
+
+        before = time.time()
+
+        self.target_group_indices = self._find_target_groups()
+
+        number_of_verts = len(self.focus_vert_indices)
+        self._strategy = numpy.full(number_of_verts, _UNMATCHED, dtype=numpy.int8)
+        self._exact_match_index = numpy.full(number_of_verts, -1, dtype=numpy.int64)
+        self._candidates = dict()
+
+        self._attempt_exact_match()
+        self._attempt_rigid_group_match()
+        self._attempt_simple_face_match()
+        self._attempt_extended_face_match()
+
+        unmatched = numpy.flatnonzero(self._strategy == _UNMATCHED)
+        if len(unmatched) > 0:
+            raise ValueError("Could not match vertex", int(self.focus_vert_indices[unmatched[0]]))
+
+        self._bake()
+
+        after = time.time()
+        _LOG.debug("Entire batch matching procedure took %d ms" % int((after - before) * 1000.0))
+        _LOG.debug("Strategy counts", self.get_strategy_counts())
+
+    def get_strategy_counts(self):
+        """Return a dict with strategy name as key and the number of vertices matched with it as value."""
+        counts = numpy.bincount(self._strategy[self._strategy >= 0], minlength=len(STRATEGIES))
+        return {STRATEGIES[strategy]: int(counts[strategy]) for strategy in range(len(STRATEGIES))}
+
+    def _find_target_groups(self):
+        """Return the target group index for each focus vertex. As in VertexMatch, a focus vertex which is in several
+        groups is matched against the group with the highest index."""
+        _LOG.enter()
+        focus = self.focus_crossref
+        group_sizes = numpy.diff(focus.vertices_by_group_offsets)
+        group_of_entry = numpy.repeat(numpy.arange(len(group_sizes), dtype=numpy.int64), group_sizes)
+
+        focus_groups = numpy.full(len(focus.vertex_coordinates), -1, dtype=numpy.int64)
+        numpy.maximum.at(focus_groups, numpy.asarray(focus.vertices_by_group_indices, dtype=numpy.int64), group_of_entry)
+        focus_groups = focus_groups[self.focus_vert_indices]
+
+        without_group = numpy.flatnonzero(focus_groups < 0)
+        if len(without_group) > 0:
+            raise ValueError("Vertex %d is not part of any group" % int(self.focus_vert_indices[without_group[0]]))
+
+        group_map = numpy.array([self.target_crossref.group_name_to_group_index.get(name, -1) for name in focus.group_index_to_group_name] or [-1],
+                                dtype=numpy.int64)
+        target_groups = group_map[focus_groups]
+
+        missing = numpy.flatnonzero(target_groups < 0)
+        if len(missing) > 0:
+            raise ValueError("Vertex group %s does not exist on target" % focus.group_index_to_group_name[focus_groups[missing[0]]])
+
+        return target_groups
+
+    def _unmatched(self):
+        return numpy.flatnonzero(self._strategy == _UNMATCHED)
+
+    def _attempt_exact_match(self):
+        """See VertexMatch._attempt_exact_match(). As there, the focus coordinates are taken from the focus object
+        without modifiers rather than from the cross reference."""
+        _LOG.enter()
+        (indices, distances) = MeshService.closest_vertices_batched(
+            self.focus_obj, self.focus_vert_indices, self.target_obj, self.target_crossref.vertex_coordinates_kdtree)
+
+        exact = (indices >= 0) & (distances < _EXACT_MATCH_DISTANCE)
+        self._strategy[exact] = _EXACT
+        self._exact_match_index[exact] = indices[exact]
+
+    def _attempt_rigid_group_match(self):
+        """See VertexMatch._attempt_rigid_group_match()."""
+        _LOG.enter()
+        target = self.target_crossref
+        group_sizes = numpy.diff(target.vertices_by_group_offsets)
+        positions = self._unmatched()
+        positions = positions[group_sizes[self.target_group_indices[positions]] == 3]
+        if len(positions) < 1:
+            return
+        starts = target.vertices_by_group_offsets[self.target_group_indices[positions]]
+        candidates = numpy.asarray(target.vertices_by_group_indices)[starts[:, None] + numpy.arange(3)]
+        self._strategy[positions] = _RIGID_GROUP
+        self._candidates[_RIGID_GROUP] = (positions, candidates.astype(numpy.int64))
+
+    def _attempt_simple_face_match(self):
+        """See VertexMatch._attempt_simple_face_match()."""
+        _LOG.enter()
+        target = self.target_crossref
+        positions = self._unmatched()
+        if len(positions) < 1 or len(target.vertices_by_face) < 1:
+            return
+
+        (faces, _) = target.face_median_points_kdtree.nearest(self.focus_vert_coords[positions])
+        candidates = target.vertices_by_face[faces].astype(numpy.int64)
+
+        # All verts in the face must be in the target group
+        in_group = _is_in_group(target, self.target_group_indices[positions][:, None], candidates)
+        accepted = numpy.all(in_group, axis=1)
+
+        self._strategy[positions[accepted]] = _SIMPLE_FACE
+        self._candidates[_SIMPLE_FACE] = (positions[accepted], candidates[accepted])
+
+    def _attempt_extended_face_match(self):
+        """See VertexMatch._attempt_extended_face_match(). As the angle criterion is not yet implemented there, the
+        closest face in the group is always picked, so a single nearest lookup per vertex suffices."""
+        _LOG.enter()
+        target = self.target_crossref
+        positions = self._unmatched()
+        if len(positions) < 1:
+            return
+
+        faces_in_group = numpy.diff(target.faces_by_group_offsets)
+        positions = positions[faces_in_group[self.target_group_indices[positions]] > 0]
+
+        faces = numpy.zeros(len(positions), dtype=numpy.int64)
+        groups = self.target_group_indices[positions]
+        for group_idx in numpy.unique(groups).tolist():
+            in_this_group = numpy.flatnonzero(groups == group_idx)
+            kd = target.face_median_points_by_group_kdtrees[group_idx]
+            (faces[in_this_group], _) = kd.nearest(self.focus_vert_coords[positions[in_this_group]])
+
+        self._strategy[positions] = _EXTENDED_FACE
+        self._candidates[_EXTENDED_FACE] = (positions, target.vertices_by_face[faces].astype(numpy.int64))
+
+    def _bake(self):
+        _LOG.enter()
+        target_coords = numpy.asarray(self.target_crossref.vertex_coordinates, dtype=numpy.float64)
+        focus_vert_indices = self.focus_vert_indices.tolist()
+        strategy_names = [STRATEGIES[strategy] for strategy in self._strategy.tolist()]
+
+        for position in numpy.flatnonzero(self._strategy == _EXACT).tolist():
+            index = int(self._exact_match_index[position])
+            self.mhclo_lines[focus_vert_indices[position]] = {"verts": [index, index, index], "weights": [1, 0, 0], "offsets": [0, 0, 0]}
+
+        for strategy in [_RIGID_GROUP, _SIMPLE_FACE, _EXTENDED_FACE]:
+            if strategy not in self._candidates:
+                continue
+            (positions, candidates) = self._candidates[strategy]
+            if len(positions) < 1:
+                continue
+            focus_coords = self.focus_vert_coords[positions]
+            selected = select_closest_three(candidates, target_coords, focus_coords)
+            (weights, offsets) = calculate_barycentric_weights_and_offsets(
+                target_coords[selected[:, 0]], target_coords[selected[:, 1]], target_coords[selected[:, 2]], focus_coords)
+
+            invalid = numpy.flatnonzero(~numpy.all(numpy.isfinite(weights), axis=1))
+            if len(invalid) > 0:
+                raise ValueError("Degenerate triangle when matching vertex %d" % focus_vert_indices[positions[invalid[0]]])
+
+            offsets = offsets / self.scale_factor
+            for (position, verts, vert_weights, vert_offsets) in zip(positions.tolist(), selected.tolist(), weights.tolist(), offsets.tolist()):
+                self.mhclo_lines[focus_vert_indices[position]] = {
+                    "verts": verts,
+                    "weights": vert_weights,
+                    "offsets": [vert_offsets[0], vert_offsets[2], -vert_offsets[1]]
+                    }
+
+        for position, name in enumerate(strategy_names):
+            self.final_strategies[focus_vert_indices[position]] = name
+
+
+def _is_in_group(crossref, group_indices, vertex_indices):
+    """Check, element-wise, whether each vertex is a member of the corresponding group, using the sorted CSR layout of
+    vertices_by_group. The arguments are broadcast against each other."""
+    number_of_verts = len(crossref.vertex_coordinates)
+    group_sizes = numpy.diff(crossref.vertices_by_group_offsets)
+    member_keys = numpy.repeat(numpy.arange(len(group_sizes), dtype=numpy.int64), group_sizes) * number_of_verts \
+        + numpy.asarray(crossref.vertices_by_group_indices, dtype=numpy.int64)
+    keys = numpy.asarray(group_indices, dtype=numpy.int64) * number_of_verts + numpy.asarray(vertex_indices, dtype=numpy.int64)
+    if len(member_keys) < 1:
+        return numpy.zeros(keys.shape, dtype=bool)
+    found_at = numpy.minimum(numpy.searchsorted(member_keys, keys), len(member_keys) - 1)
+    return member_keys[found_at] == keys
+
+
+def select_closest_three(candidates, target_coords, focus_coords):
+    """For each row of candidate target vertices, repeatedly drop the candidate furthest away from the corresponding
+    focus coordinate until three remain. The remaining candidates keep their original order. Return an (N, 3) array."""
+    number_of_candidates = candidates.shape[1]
+    if number_of_candidates < 3:
+        raise ValueError("Not enough potential vertices to pick from")
+    if number_of_candidates == 3:
+        return candidates
+
+    distances = numpy.linalg.norm(target_coords[candidates] - focus_coords[:, None, :], axis=2)
+    rows = numpy.arange(len(candidates))
+    for _ in range(number_of_candidates - 3):
+        furthest = numpy.argmax(distances, axis=1)
+        distances[rows, furthest] = -numpy.inf
+    keep = numpy.isfinite(distances)
+    return candidates[keep].reshape((len(candidates), 3))
+
+
+def _normalized(vectors):
+    lengths = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / numpy.where(lengths > 0.0, lengths, 1.0)
+
+
+def _dot(first, second):
+    return numpy.einsum("ij,ij->i", first, second)
+
+
+def calculate_barycentric_weights_and_offsets(A, B, C, Q):
+    """Vectorized version of the legacy MC2 calculation in VertexMatch._legacy_bake(). A, B and C are (N, 3) arrays with
+    the corners of the triangles and Q is an (N, 3) array with the points to match. Return (weights, offsets) where
+    weights is (N, 3) with the weights of A, B and C, and offsets is (N, 3) with Q minus the weighted sum of the corners.
+    The offsets are in the coordinate space of the inputs, ie they are not scaled nor have their axes swapped."""
+
+    # The normal of the triangle, and the focus point projected onto the plane of the triangle
+    N = _normalized(numpy.cross(B - A, C - A))
+    R = Q - N * _dot(Q - A, N)[:, None]
+
+    # Two perpendicular directions in the plane of the triangle
+    BA = _normalized(B - A)
+    NBA = _normalized(numpy.cross(N, BA))
+
+    AC = A - C
+    BC = B - C
+    RC = R - C
+
+    a00 = _dot(AC, BA)
+    a01 = _dot(BC, BA)
+    a10 = _dot(AC, NBA)
+    a11 = _dot(BC, NBA)
+    b0 = _dot(RC, BA)
+    b1 = _dot(RC, NBA)
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        det = a00 * a11 - a01 * a10
+        wa = (a11 * b0 - a01 * b1) / det
+        wb = (-a10 * b0 + a00 * b1) / det
+    wc = 1 - wa - wb
+
+    weights = numpy.stack([wa, wb, wc], axis=1)
+    offsets = Q - (wa[:, None] * A + wb[:, None] * B + wc[:, None] * C)
+    return weights, offsets
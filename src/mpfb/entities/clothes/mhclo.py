@@ -1,6 +1,7 @@
 """This module provides and information holder for MHCLO files."""
 
-import bpy, os, sys, json
+import bpy, os, sys, json, hashlib, numpy
+from collections import OrderedDict
 from mathutils import Vector
 from ...services import ObjectService
 from ...services import LogService
@@ -10,6 +11,18 @@ _LOG = LogService.get_logger("entities.mhclo")
 
 _CONFIG_FILE = None
 
+# Process-wide cache of parsed MHCLO files, keyed on real path, modification time and size. The least
+# recently used entries are dropped when there are more than _CACHE_SIZE entries. Full parses are also
+# written as binary sidecar files in the user cache, so that they survive between sessions.
+_CACHE = OrderedDict()
+_CACHE_SIZE = 48
+_SIDECAR_DIR = LocationService.get_user_cache("mhclo")
+_SIDECAR_VERSION = "1"
+
+# Attributes which are copied to and from cache entries as they are
+_METADATA_KEYS = ["obj_file", "x_scale", "y_scale", "z_scale", "author", "license", "name", "description", "basename",
+                  "weights_file", "material", "tags", "zdepth", "first", "delete", "delete_group", "uuid", "max_pole"]
+
 class Mhclo:
     """A representation of the values of a MHCLO file."""
 
@@ -29,16 +42,113 @@ class Mhclo:
         self.tags = ""
         self.zdepth = 50
         self.first = 0
-        self.verts = {}
+        self._verts = {}
         self.delverts = []
         self.delete = False
         self.delete_group = "Delete"
         self.uuid = None
         self.max_pole = None
+        self._binding_arrays = None
+
+    @property
+    def verts(self):
+        """Dict where the key is the clothes vertex index and the value is a dict with "verts", "weights" and "offsets".
+        If the MHCLO was loaded from the cache, this dict is only built when first requested. Since the caller may
+        modify the dict, the binding arrays are rebuilt from it the next time they are requested."""
+        if self._verts is None:
+            self._verts = dict()
+            indices, weights, offsets = self._binding_arrays
+            for vert_number, (vert, weight, offset) in enumerate(zip(indices.tolist(), weights.tolist(), offsets.tolist())):
+                self._verts[vert_number] = {'verts': tuple(vert), 'weights': tuple(weight), 'offsets': Vector(offset)}
+        self._binding_arrays = None
+        return self._verts
+
+    @verts.setter
+    def verts(self, value):
+        self._verts = value
+        self._binding_arrays = None
+
+    @staticmethod
+    def clear_cache(also_remove_sidecars=False):
+        """Drop all cached MHCLO data, and optionally also the sidecar files in the user cache."""
+        _CACHE.clear()
+        if also_remove_sidecars and os.path.exists(_SIDECAR_DIR):
+            for name in os.listdir(_SIDECAR_DIR):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(_SIDECAR_DIR, name))
+
+    @staticmethod
+    def _cache_key(realpath):
+        stat = os.stat(realpath)
+        return (realpath, stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _sidecar_path(cache_key):
+        digest = hashlib.sha1((_SIDECAR_VERSION + "|" + "|".join([str(part) for part in cache_key])).encode("utf-8")).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(cache_key[0]))[0]
+        return os.path.join(_SIDECAR_DIR, name + "." + digest + ".npz")
+
+    def _to_cache_entry(self, only_metadata):
+        entry = {key: getattr(self, key) for key in _METADATA_KEYS}
+        entry["only_metadata"] = only_metadata
+        if not only_metadata:
+            indices, weights, offsets = self.get_binding_arrays()
+            for array in (indices, weights, offsets):
+                array.flags.writeable = False
+            entry["binding_arrays"] = (indices, weights, offsets)
+            entry["delverts"] = numpy.sort(numpy.array(self.delverts, dtype=numpy.int32))
+        return entry
+
+    def _from_cache_entry(self, entry, only_metadata):
+        for key in _METADATA_KEYS:
+            setattr(self, key, entry[key])
+        if not only_metadata:
+            self._verts = None
+            self._binding_arrays = entry["binding_arrays"]
+            self.delverts = entry["delverts"].tolist()
+
+    @staticmethod
+    def _read_sidecar(cache_key):
+        sidecar = Mhclo._sidecar_path(cache_key)
+        if not os.path.exists(sidecar):
+            return None
+        try:
+            with numpy.load(sidecar, allow_pickle=False) as data:
+                entry = json.loads(str(data["metadata"]))
+                for key in ["x_scale", "y_scale", "z_scale"]:
+                    if entry[key] is not None:
+                        entry[key] = tuple(entry[key])
+                entry["only_metadata"] = False
+                binding_arrays = (data["indices"], data["weights"], data["offsets"])
+                for array in binding_arrays:
+                    array.flags.writeable = False
+                entry["binding_arrays"] = binding_arrays
+                entry["delverts"] = data["delverts"]
+            return entry
+        except (OSError, ValueError, KeyError) as err:
+            _LOG.warn("Could not read MHCLO sidecar, will parse the MHCLO file instead", (sidecar, err))
+            return None
 
-    def load(self, mhclo_filename, *, only_metadata=False):
+    @staticmethod
+    def _write_sidecar(cache_key, entry):
+        sidecar = Mhclo._sidecar_path(cache_key)
+        metadata = {key: entry[key] for key in _METADATA_KEYS}
+        indices, weights, offsets = entry["binding_arrays"]
+        temp_path = sidecar + "." + str(os.getpid()) + ".tmp.npz"
+        try:
+            os.makedirs(_SIDECAR_DIR, exist_ok=True)
+            numpy.savez(temp_path, metadata=numpy.array(json.dumps(metadata)), indices=indices, weights=weights,
+                        offsets=offsets, delverts=entry["delverts"])
+            os.replace(temp_path, sidecar)
+        except OSError as err:
+            _LOG.warn("Could not write MHCLO sidecar", (sidecar, err))
+
+    def load(self, mhclo_filename, *, only_metadata=False, use_cache=True, use_sidecar=True):
         """Populate settings from contents of a MHCLO file. This will not automatically load the
-        mesh or the materials."""
+        mesh or the materials.
+
+        Parsed files are kept in a process-wide cache (and, unless use_sidecar is False, in a binary
+        sidecar file in the user cache), so loading the same unmodified file again does not parse it."""
 
         if not mhclo_filename:
             raise ValueError('Cannot load empty file name')
@@ -46,13 +156,36 @@ class Mhclo:
         if not os.path.exists(mhclo_filename):
             raise IOError(mhclo_filename + " does not exist")
 
-        _LOG.debug("Will try to parse file", mhclo_filename)
-
         #realpath = os.path.realpath(os.path.expanduser(mhclo_filename))
         realpath = os.path.realpath(mhclo_filename)
+
+        if use_cache:
+            cache_key = Mhclo._cache_key(realpath)
+            entry = _CACHE.get(cache_key)
+            if entry is None or (entry["only_metadata"] and not only_metadata):
+                entry = Mhclo._read_sidecar(cache_key) if use_sidecar else None
+                if entry is None:
+                    self._parse(mhclo_filename, realpath, only_metadata=only_metadata)
+                    entry = self._to_cache_entry(only_metadata)
+                    if use_sidecar and not only_metadata:
+                        Mhclo._write_sidecar(cache_key, entry)
+                _CACHE[cache_key] = entry
+                while len(_CACHE) > _CACHE_SIZE:
+                    _CACHE.popitem(last=False)
+            else:
+                _CACHE.move_to_end(cache_key)
+            self._from_cache_entry(entry, only_metadata)
+            return
+
+        self._parse(mhclo_filename, realpath, only_metadata=only_metadata)
+
+    def _parse(self, mhclo_filename, realpath, *, only_metadata=False):
+        _LOG.debug("Will try to parse file", mhclo_filename)
+
         folder = os.path.dirname(realpath)
 
         self.basename = os.path.splitext(realpath)[0]
+        self._binding_arrays = None
 
         try:
             fp = open(mhclo_filename, "r", encoding="utf8", errors="surrogateescape")
@@ -60,12 +193,13 @@ class Mhclo:
             _LOG.error("Error trying to open file:", sys.exc_info()[0])
             return None
 
-        vn = 0
+        vert_indices = []
+        vert_weights = []
+        vert_offsets = []
         status = ""
 
         for line in fp:
             words= line.split()
-            _LOG.debug("Line", words)
 
             l = len(words)
 
@@ -109,19 +243,16 @@ class Mhclo:
                     continue
                 if l == 1:
                     v = int(words[0])
-                    self.verts[vn] = {'verts': (v,v,v), 'weights': (1,0,0), 'offsets': Vector((0,0,0))}
+                    vert_indices.append((v,v,v))
+                    vert_weights.append((1,0,0))
+                    vert_offsets.append((0,0,0))
                 else:
-                    v0 = int(words[0])
-                    v1 = int(words[1])
-                    v2 = int(words[2])
-                    w0 = float(words[3])
-                    w1 = float(words[4])
-                    w2 = float(words[5])
+                    vert_indices.append((int(words[0]), int(words[1]), int(words[2])))
+                    vert_weights.append((float(words[3]), float(words[4]), float(words[5])))
                     d0 = float(words[6])
                     d1 = float(words[7])
                     d2 = float(words[8])
-                    self.verts[vn] = {'verts': (v0,v1,v2), 'weights': (w0,w1,w2), 'offsets': Vector((d0,-d2,d1))}
-                vn += 1
+                    vert_offsets.append((d0,-d2,d1))
                 continue
             elif status == 'd':
                 if words[0].isnumeric() is False:
@@ -176,6 +307,35 @@ class Mhclo:
 
         fp.close()
 
+        if not only_metadata:
+            # The verts dict is built lazily from these arrays when it is requested
+            self._verts = None
+            self._binding_arrays = (numpy.array(vert_indices, dtype=numpy.int32).reshape((-1, 3)),
+                                    numpy.array(vert_weights, dtype=numpy.float32).reshape((-1, 3)),
+                                    numpy.array(vert_offsets, dtype=numpy.float32).reshape((-1, 3)))
+
+    def get_binding_arrays(self):
+        """Return the vertex bindings as a tuple of three (N, 3) numpy arrays: basemesh vertex indices (int32),
+        weights (float32) and offsets (float32), where row N corresponds to clothes vertex N. The arrays are
+        built from the verts dict on first use and then reused until the verts dict is requested again."""
+        if self._binding_arrays is not None:
+            return self._binding_arrays
+
+        count = len(self._verts)
+
+        indices = numpy.zeros((count, 3), dtype=numpy.int32)
+        weights = numpy.zeros((count, 3), dtype=numpy.float32)
+        offsets = numpy.zeros((count, 3), dtype=numpy.float32)
+
+        for vert_number in range(count):
+            vert = self._verts[vert_number]
+            indices[vert_number] = vert["verts"]
+            weights[vert_number] = vert["weights"]
+            offsets[vert_number] = tuple(vert["offsets"])
+
+        self._binding_arrays = (indices, weights, offsets)
+        return self._binding_arrays
+
     def load_mesh(self, context):
 
         if self.obj_file == "" or not self.obj_file:
@@ -306,20 +466,20 @@ class Mhclo:
                 mhclo_file.write("# The following are the vertices on the base mesh which should be hidden:\ndelete_verts\n")
 
                 current_range = None
+                trace = _LOG.is_enabled(LogService.TRACE)
                 for index in self.delverts:
-
-                    if index == 4396:
-                        _LOG.debug("\n\n XXXXXXXXXXXXXXX \n\n")
                     if not current_range:
-                        _LOG.debug("START: Index, range", (index, current_range))
+                        if trace:
+                            _LOG.trace("START: Index, range", (index, current_range))
                         current_range = [index, index]
                     else:
-                        last_end = current_range[1]
                         if index == current_range[1] + 1:
-                            _LOG.debug("EXTENDING", (index, current_range))
+                            if trace:
+                                _LOG.trace("EXTENDING", (index, current_range))
                             current_range[1] = index
                         else:
-                            _LOG.debug("BREAKING", (index, current_range))
+                            if trace:
+                                _LOG.trace("BREAKING", (index, current_range))
                             mhclo_file.write(" {} - {}".format(current_range[0], current_range[1]))
                             current_range = [index, index]
                 mhclo_file.write(" {} - {}".format(current_range[0], current_range[1]))
@@ -1,12 +1,23 @@
 """Contains a class for cross-referencing data in a mesh."""
 
-import numpy, time, mathutils, os
+import numpy, time, os, json, struct, hashlib, glob
 from ..services import MeshService
 from ..services import ObjectService
 from ..services import LogService
 
 _LOG = LogService.get_logger("entities.meshcrossref")
 
+# Cache files are named after a hash of everything the cached tables are calculated from, so a cache
+# file can never be stale. Increase the version if the content or layout of the cached tables change.
+_CACHE_FORMAT_VERSION = 1
+_CACHE_MAGIC = b"MPFBXREF"
+_CACHE_ALIGNMENT = 64
+_CACHE_FILE_PATTERN = "xref_%s.bin"
+_MAX_CACHE_FILES = 8
+
+# The tables with a varying number of columns per row, which are stored in CSR layout
+_CSR_TABLES = ["faces_by_vertex", "edges_by_vertex", "face_neighbors", "vertices_by_group", "faces_by_group"]
+
 # Possible calculation TODOs:
 # - Faces by edge
 # - Edges by face
@@ -28,9 +39,10 @@ class MeshCrossRef:
     - face_median_points: row number is face index and columns are x,y,z coordinates of the median point of the face
     - face_normals: row number is face index and columns are x,y,z coordinates of the normal shifted by the median point
 
-    There are also KDTree objects for some tables:
-    - vertex_coordinates_kdtree: KDTree of vertex_coordinates
-    - face_median_points_kdtree: KDTree of face_median_points
+    There are also KD trees (SpatialIndex objects, which support both the mathutils KDTree queries and batched queries) for some tables:
+    - vertex_coordinates_kdtree: KD tree of vertex_coordinates
+    - face_median_points_kdtree: KD tree of face_median_points
+    - face_median_points_by_group_kdtrees: One KD tree per group, of the face_median_points of the faces in faces_by_group
 
     Additionally, there are reference tables for vertex groups:
     - group_index_to_group_name: list where position is group index and value is group name
@@ -39,7 +51,18 @@ class MeshCrossRef:
     - vertices_with_multiple_groups: list with vertex indices of vertices which are in more than one group
     - faces_by_group: Row number is group index, cols is a list of face indices where at least three verts belong to the group.
 
-    The faces_by_group table takes a long time to build, so it is optional (set the build_faces_by_group_reference parameter to build it).
+    The faces_by_group table is optional (set the build_faces_by_group_reference parameter to build it).
+
+    The tables with a varying number of columns per row (faces_by_vertex, edges_by_vertex, face_neighbors, vertices_by_group
+    and faces_by_group) are also available in CSR layout, as a pair of flat arrays <table>_offsets and <table>_indices, where
+    the columns of row i are found at <table>_indices[<table>_offsets[i]:<table>_offsets[i+1]].
+
+    If a cache_dir is given, the tables which only depend on the topology and the vertex group layout of the mesh
+    (the CSR tables plus vertices_without_group and vertices_with_multiple_groups) are read from and/or written to a
+    single, memory mapped, cache file in that dir. The name of the file is a hash of the vertex count, the faces, the
+    edges and the vertex group memberships, so a cache file is only ever used for a mesh which would produce exactly
+    the same tables. Coordinates, face median points, normals and KD trees are always calculated, since they change
+    when the mesh is shaped.
     """
 
     def __init__(self, mesh_object, after_modifiers=True, build_faces_by_group_reference=False, cache_dir=None, write_cache=False, read_cache=False, world_coordinates=True):
@@ -71,23 +94,31 @@ class MeshCrossRef:
         self.vertices_by_face = MeshService.get_faces_as_numpy_array(self._mesh_object)
         self.vertices_by_edge = MeshService.get_edges_as_numpy_array(self._mesh_object)
 
-        before = int(time.time() * 1000.0)
-        self.faces_by_vertex = []
-        self._build_faces_by_vertex_table()
-        after = int(time.time() * 1000.0)
-        _LOG.debug("Building faces_by_vertex table took", (after - before))
+        self.group_index_to_group_name = []
+        self.group_name_to_group_index = dict()
+        self._groups_by_vertex_offsets = None
+        self._groups_by_vertex_indices = None
+        self._read_vertex_groups()
 
-        before = int(time.time() * 1000.0)
-        self.edges_by_vertex = []
-        self._build_edges_by_vertex_table()
-        after = int(time.time() * 1000.0)
-        _LOG.debug("Building edges_by_vertex table took", (after - before))
+        self.cache_key = self._calculate_cache_key()
 
-        before = int(time.time() * 1000.0)
-        self.face_neighbors = []
-        self._build_face_neighbors_table()
-        after = int(time.time() * 1000.0)
-        _LOG.debug("Building face_neighbors table took", (after - before))
+        if not self._read_tables_from_cache():
+            before = int(time.time() * 1000.0)
+            self._build_faces_by_vertex_table()
+            self._build_edges_by_vertex_table()
+            self._build_face_neighbors_table()
+            self._build_vert_group_references()
+            # The cache file should be complete, so faces_by_group is always built when it is written
+            if build_faces_by_group_reference or self._should_write_cache():
+                self._build_faces_by_group_table()
+            after = int(time.time() * 1000.0)
+            _LOG.debug("Building cross reference tables took", (after - before))
+            self._write_tables_to_cache()
+
+        self.faces_by_vertex = _csr_to_rows(self.faces_by_vertex_offsets, self.faces_by_vertex_indices)
+        self.edges_by_vertex = _csr_to_rows(self.edges_by_vertex_offsets, self.edges_by_vertex_indices)
+        self.face_neighbors = _csr_to_rows(self.face_neighbors_offsets, self.face_neighbors_indices)
+        self.vertices_by_group = list(_csr_to_rows(self.vertices_by_group_offsets, self.vertices_by_group_indices))
 
         before = int(time.time() * 1000.0)
         self.face_median_points = []
@@ -97,276 +128,291 @@ class MeshCrossRef:
         after = int(time.time() * 1000.0)
         _LOG.debug("Building face_median_points and face_normals tables took", (after - before))
 
-        before = int(time.time() * 1000.0)
-        self.group_index_to_group_name = []
-        self.group_name_to_group_index = dict()
-        self.vertices_by_group = []
-        self._potential_faces_by_group = []
-        self.vertices_without_group = []
-        self.vertices_with_multiple_groups = []
         self.face_median_points_by_group_kdtrees = []
-        self._build_vert_group_references(build_faces_by_group_reference=build_faces_by_group_reference)
-        after = int(time.time() * 1000.0)
-        _LOG.debug("Building vert_group_references took", (after - before))
-
         if build_faces_by_group_reference:
             before = int(time.time() * 1000.0)
-            self.faces_by_group = []
-            self._build_faces_by_group_table()
+            self.faces_by_group = list(_csr_to_rows(self.faces_by_group_offsets, self.faces_by_group_indices))
             self._build_faces_by_group_kdtrees()
             after = int(time.time() * 1000.0)
-            _LOG.debug("Building faces_by_group took", (after - before))
+            _LOG.debug("Building faces_by_group kdtrees took", (after - before))
 
         if after_modifiers:
             ObjectService.delete_object(self._mesh_object)
 
         self._mesh_object = None
 
-    def read_array_from_cache(self, cache_file_name):
+    def _read_vertex_groups(self):
+        _LOG.enter()
+        for group_idx in range(len(self._mesh_object.vertex_groups)):
+            group = self._mesh_object.vertex_groups[group_idx]
+            if group_idx != group.index:
+                raise ValueError("Vertex groups must be in linear order")
+            self.group_name_to_group_index[group.name] = group.index
+            self.group_index_to_group_name.append(group.name)
+
+        # Rows are vertices, columns are the groups each vertex is a member of
+        (self._groups_by_vertex_offsets, self._groups_by_vertex_indices, _) = MeshService.get_vertex_group_weights_as_csr(self._mesh_object)
+
+    def _calculate_cache_key(self):
+        """Return a hex digest of everything the cacheable tables are calculated from."""
+        digest = hashlib.sha1()
+        digest.update(struct.pack("<IQ", _CACHE_FORMAT_VERSION, len(self.vertex_coordinates)))
+        for table in [self.vertices_by_face, self.vertices_by_edge]:
+            digest.update(struct.pack("<QQ", table.shape[0], table.shape[1] if table.ndim > 1 else 0))
+            digest.update(numpy.ascontiguousarray(table, dtype=numpy.uint32).tobytes())
+        digest.update("\0".join(self.group_index_to_group_name).encode("utf-8"))
+        digest.update(numpy.ascontiguousarray(self._groups_by_vertex_offsets, dtype=numpy.int64).tobytes())
+        digest.update(numpy.ascontiguousarray(self._groups_by_vertex_indices, dtype=numpy.int32).tobytes())
+        return digest.hexdigest()
+
+    def _cache_file_path(self):
+        return os.path.join(self.cache_dir, _CACHE_FILE_PATTERN % self.cache_key)
+
+    def _should_write_cache(self):
+        return bool(self.cache_dir and self.write_cache)
+
+    def _read_tables_from_cache(self):
+        """Populate the cacheable tables from the cache file, if there is one. Return True if successful."""
         _LOG.enter()
         if not self.cache_dir or not self.read_cache:
             _LOG.trace("Cache directory or read_cache is not set")
-            return None
-        if not os.path.exists(self.cache_dir):
-            _LOG.trace("Cache dir does not exist", self.cache_dir)
-            return None
-
-        absolute_file_path = os.path.abspath(os.path.join(self.cache_dir, cache_file_name))
-
-        if not os.path.exists(absolute_file_path):
-            _LOG.trace("Cache file does not exist", absolute_file_path)
-            return None
-
-        cached_array = numpy.load(absolute_file_path)
-        _LOG.debug("Loaded cached array from", (absolute_file_path, type(cached_array)))
-        return cached_array
-
-    def write_array_to_cache(self, cache_file_name, numpy_array):
+            return False
+
+        cache_file = self._cache_file_path()
+        if not os.path.exists(cache_file):
+            _LOG.debug("No cache file for this mesh", cache_file)
+            return False
+
+        try:
+            (metadata, arrays) = read_table_file(cache_file)
+        except (IOError, ValueError, KeyError) as e:
+            _LOG.warn("Could not read cache file, ignoring it", (cache_file, e))
+            return False
+
+        expected = [table + suffix for table in _CSR_TABLES for suffix in ["_offsets", "_indices"]]
+        expected.extend(["vertices_without_group", "vertices_with_multiple_groups"])
+        if metadata.get("key") != self.cache_key or any(name not in arrays for name in expected):
+            _LOG.warn("Cache file does not match the mesh, ignoring it", cache_file)
+            return False
+
+        for table in _CSR_TABLES:
+            setattr(self, table + "_offsets", arrays[table + "_offsets"])
+            setattr(self, table + "_indices", arrays[table + "_indices"])
+        self.vertices_without_group = arrays["vertices_without_group"]
+        self.vertices_with_multiple_groups = arrays["vertices_with_multiple_groups"]
+
+        _LOG.debug("Read cross reference tables from cache", cache_file)
+        return True
+
+    def _write_tables_to_cache(self):
         _LOG.enter()
-        if not self.cache_dir or not self.write_cache:
+        if not self._should_write_cache():
             _LOG.trace("Cache directory or write_cache is not set")
             return
-        if not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
-
-        absolute_file_path = os.path.abspath(os.path.join(self.cache_dir, cache_file_name))
-
-        if os.path.exists(absolute_file_path):
-            _LOG.debug("Removing stale cache file", absolute_file_path)
-            os.remove(absolute_file_path)
 
-        numpy.save(absolute_file_path, numpy_array)
+        arrays = dict()
+        for table in _CSR_TABLES:
+            arrays[table + "_offsets"] = getattr(self, table + "_offsets")
+            arrays[table + "_indices"] = getattr(self, table + "_indices")
+        arrays["vertices_without_group"] = self.vertices_without_group
+        arrays["vertices_with_multiple_groups"] = self.vertices_with_multiple_groups
+
+        cache_file = self._cache_file_path()
+        try:
+            write_table_file(cache_file, arrays, {"key": self.cache_key, "groups": self.group_index_to_group_name})
+        except OSError as e:
+            _LOG.warn("Could not write cache file", (cache_file, e))
+            return
+        _LOG.debug("Wrote cross reference tables to cache", cache_file)
 
-        _LOG.debug("Wrote cache file", (absolute_file_path, type(numpy_array)))
+        _prune_cache_dir(self.cache_dir, keep=cache_file)
 
     def _build_faces_by_group_kdtrees(self):
         _LOG.enter()
         for group_index in range(len(self.group_index_to_group_name)):
-            relevant_faces = self.faces_by_group[group_index]
-            kd = mathutils.kdtree.KDTree(len(self.vertices_by_face))
-            for face_index in relevant_faces:
-                median_point = self.face_median_points[face_index]
-                kd.insert(median_point, face_index)
-            kd.balance()
+            relevant_faces = numpy.asarray(self.faces_by_group[group_index], dtype=numpy.int64)
+            kd = MeshService.get_spatial_index_for_points(self.face_median_points[relevant_faces], relevant_faces)
             self.face_median_points_by_group_kdtrees.append(kd)
 
-    def _build_vert_group_references(self, build_faces_by_group_reference=False):
+    def _build_vert_group_references(self):
         _LOG.enter()
-        vert_by_group = []
-        vertices_without_group = []
-        vertices_with_multiple_groups = []
-
-        WITHOUT_FILE = "vertices_without_group.npy"
-        MULTIPLE_FILE = "vertices_with_multiple_groups.npy"
-        VERTS_BY_GROUP = "vertices_by_group_%d.npy"
-        FACES_BY_GROUP = "faces_by_group_%d.npy"
-
-        required_cache_files = [WITHOUT_FILE, MULTIPLE_FILE]
-
-        for group_idx in range(len(self._mesh_object.vertex_groups)):
-            group = self._mesh_object.vertex_groups[group_idx]
-            if group_idx != group.index:
-                raise ValueError("Vertex groups must be in linear order")
-            self.group_name_to_group_index[group.name] = group.index
-            self.group_index_to_group_name.append(group.name)
-            vert_by_group.append([])
-            if build_faces_by_group_reference:
-                self._potential_faces_by_group.append([])
-            required_cache_files.append(VERTS_BY_GROUP % group_idx)
-            required_cache_files.append(FACES_BY_GROUP % group_idx)
-
-        able_to_read_from_cache = (self.cache_dir is not None) and self.read_cache
-        if able_to_read_from_cache:
-            for fn in required_cache_files:
-                if not os.path.exists(os.path.join(self.cache_dir, fn)):
-                    _LOG.debug("Cannot read from cache since at least one of the required cache files does not exist", fn)
-                    able_to_read_from_cache = False
-                    break
-
-        if able_to_read_from_cache:
-            _LOG.debug("All cache files exist, and reading from cache is enabled")
-            self.vertices_without_group = self.read_array_from_cache(WITHOUT_FILE)
-            self.vertices_with_multiple_groups = self.read_array_from_cache(MULTIPLE_FILE)
-            for group_idx in range(len(self._mesh_object.vertex_groups)):
-                self.vertices_by_group.append(self.read_array_from_cache(VERTS_BY_GROUP % group_idx))
-            return
-
-        for vertex in self._mesh_object.data.vertices:
-            for group in vertex.groups:
-                vert_by_group[group.group].append(vertex.index)
-                if build_faces_by_group_reference:
-                    vertex_found_at_2d = numpy.argwhere(self.vertices_by_face == vertex.index) # Returns 2d array where col 1 is face number and 2 is position in face
-                    if len(vertex_found_at_2d) > 0:
-                        vertex_found_at = vertex_found_at_2d[:,0] # Extract col 1, ie the face number
-                        _LOG.trace("Vertex, faces", (vertex.index, vertex_found_at, list(vertex_found_at)))
-                        self._potential_faces_by_group[group.group].extend(list(vertex_found_at))
-            if len(vertex.groups) < 1:
-                vertices_without_group.append(vertex.index)
-            if len(vertex.groups) > 1:
-                vertices_with_multiple_groups.append(vertex.index)
-        for groupverts in vert_by_group:
-            self.vertices_by_group.append(numpy.sort(numpy.unique(numpy.array(groupverts, dtype=numpy.uint32))))
-
-        self.vertices_without_group = numpy.sort(numpy.unique(numpy.array(vertices_without_group)))
-        self.vertices_with_multiple_groups = numpy.sort(numpy.unique(numpy.array(vertices_with_multiple_groups)))
-
-        self.write_array_to_cache(WITHOUT_FILE, self.vertices_without_group)
-        self.write_array_to_cache(MULTIPLE_FILE, self.vertices_with_multiple_groups)
-
-        for group_idx in range(len(self._mesh_object.vertex_groups)):
-            self.write_array_to_cache(VERTS_BY_GROUP % group_idx, self.vertices_by_group[group_idx])
+        groups_per_vertex = numpy.diff(self._groups_by_vertex_offsets)
+        self.vertices_without_group = numpy.flatnonzero(groups_per_vertex < 1)
+        self.vertices_with_multiple_groups = numpy.flatnonzero(groups_per_vertex > 1)
 
+        # Transpose to rows being groups. The vertex indices are repeated in ascending order, and
+        # the sort is stable, so each row comes out sorted.
+        vertex_indices = numpy.repeat(numpy.arange(len(groups_per_vertex), dtype=numpy.uint32), groups_per_vertex)
+        (self.vertices_by_group_offsets, self.vertices_by_group_indices) = _csr_from_pairs(
+            self._groups_by_vertex_indices, vertex_indices, len(self.group_index_to_group_name))
 
     def _build_faces_by_group_table(self):
         _LOG.enter()
-        for group_idx in range(len(self.vertices_by_group)):
-            group_name = self.group_index_to_group_name[group_idx]
-            cache_file_name = "faces_by_group_%d.npy" % group_idx
-            faces_in_group = self.read_array_from_cache(cache_file_name)
-            if faces_in_group is not None:
-                self.faces_by_group.append(faces_in_group)
-            else:
-                potential_faces_in_group = numpy.unique(numpy.array(self._potential_faces_by_group[group_idx], dtype=numpy.uint32))
-                _LOG.trace("Potential faces in group", (group_idx, len(potential_faces_in_group)))
-                faces_in_group = []
-                group_verts = self.vertices_by_group[group_idx]
-                for face_idx in potential_faces_in_group:
-                    face_verts = self.vertices_by_face[face_idx]
-                    mask = numpy.isin(face_verts, group_verts, assume_unique=True)
-                    _LOG.trace("Is in", (face_idx, mask, face_verts[mask]))
-                    if len(face_verts[mask]) >= 3:
-                        faces_in_group.append(face_idx)
-                faces_in_group = numpy.sort(numpy.unique(numpy.array(faces_in_group, dtype=numpy.uint32)))
-                self.write_array_to_cache(cache_file_name, faces_in_group)
-                self.faces_by_group.append(faces_in_group)
-            _LOG.debug("Group contains faces", (group_name, len(faces_in_group)))
+        number_of_groups = len(self.group_index_to_group_name)
 
-    def _build_faces_by_vertex_table(self):
-        _LOG.enter()
+        # Every (face, group) pair occurs once for each corner of the face whose vertex is in the
+        # group. A face belongs to a group if at least three of its corners are in the group.
+        number_of_faces, verts_per_face = self.vertices_by_face.shape
+        corner_vertices = self.vertices_by_face.ravel().astype(numpy.int64)
+        corner_faces = numpy.repeat(numpy.arange(number_of_faces, dtype=numpy.int64), verts_per_face)
+        (corner_positions, corner_groups) = _gather_csr_rows(self._groups_by_vertex_offsets, self._groups_by_vertex_indices, corner_vertices)
 
-        cache_file = None
-        if self.cache_dir:
-            cache_file = os.path.join(self.cache_dir, "faces_by_vertex.npy")
-            if self.read_cache and os.path.exists(cache_file):
-                _LOG.debug("Reading from cache", cache_file)
-                self.faces_by_vertex = numpy.load(cache_file, allow_pickle=True)
-                return
-
-        faces_by_vertex = []
-
-        for i in range(len(self.vertex_coordinates)):
-            vertex_found_at_2d = numpy.argwhere(self.vertices_by_face == i) # Returns 2d array where col 1 is face number and 2 is position in face
-            if len(vertex_found_at_2d) > 0:
-                vertex_found_at = vertex_found_at_2d[:,0] # Extract col 1, ie the face number
-                _LOG.trace("Vertex, faces", (i, vertex_found_at))
-                faces_by_vertex.append(numpy.unique(vertex_found_at))
-            else:
-                faces_by_vertex.append(numpy.array([]))
+        pairs = corner_groups.astype(numpy.int64) * number_of_faces + corner_faces[corner_positions]
+        (unique_pairs, corners_in_group) = numpy.unique(pairs, return_counts=True)
+        unique_pairs = unique_pairs[corners_in_group >= 3]
 
-        self.faces_by_vertex = numpy.array(faces_by_vertex, dtype=object)
-        if self.write_cache and self.cache_dir:
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
-            _LOG.debug("Writing to cache", cache_file)
-            numpy.save(cache_file, self.faces_by_vertex, allow_pickle=True)
+        (self.faces_by_group_offsets, self.faces_by_group_indices) = _csr_from_pairs(
+            unique_pairs // number_of_faces, (unique_pairs % number_of_faces).astype(numpy.uint32), number_of_groups)
 
+    def _build_faces_by_vertex_table(self):
+        _LOG.enter()
+        (self.faces_by_vertex_offsets, self.faces_by_vertex_indices) = _invert_index_table(self.vertices_by_face, len(self.vertex_coordinates))
 
     def _build_edges_by_vertex_table(self):
         _LOG.enter()
-
-        cache_file = None
-        if self.cache_dir:
-            cache_file = os.path.join(self.cache_dir, "edges_by_vertex.npy")
-            if self.read_cache and os.path.exists(cache_file):
-                _LOG.debug("Reading from cache", cache_file)
-                self.edges_by_vertex = numpy.load(cache_file, allow_pickle=True)
-                return
-
-        edges_by_vertex = []
-
-        for i in range(len(self.vertex_coordinates)):
-            vertex_found_at_2d = numpy.argwhere(self.vertices_by_edge == i) # Returns 2d array where col 1 is edge number and 2 is position in edge
-            if len(vertex_found_at_2d) > 0:
-                vertex_found_at = vertex_found_at_2d[:,0] # Extract col 1, ie the edge number
-                _LOG.trace("Vertex, edges", (i, vertex_found_at))
-                edges_by_vertex.append(numpy.unique(vertex_found_at))
-            else:
-                edges_by_vertex.append(numpy.array([]))
-
-        self.edges_by_vertex = numpy.array(edges_by_vertex, dtype=object)
-        if self.write_cache and self.cache_dir:
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
-            _LOG.debug("Writing to cache", cache_file)
-            numpy.save(cache_file, self.edges_by_vertex, allow_pickle=True)
+        (self.edges_by_vertex_offsets, self.edges_by_vertex_indices) = _invert_index_table(self.vertices_by_edge, len(self.vertex_coordinates))
 
     def _build_face_neighbors_table(self):
         _LOG.enter()
 
-        cache_file = None
-        if self.cache_dir:
-            cache_file = os.path.join(self.cache_dir, "face_neighbors.npy")
-            if self.read_cache and os.path.exists(cache_file):
-                _LOG.debug("Reading from cache", cache_file)
-                self.face_neighbors = numpy.load(cache_file, allow_pickle=True)
-                return
-
-        face_neighbors = []
-
-        for face_idx in range(len(self.vertices_by_face)):
-            found_faces = numpy.array([], dtype=numpy.uint32)
-            for vert_idx in self.vertices_by_face[face_idx]:
-                found_faces = numpy.append(found_faces, self.faces_by_vertex[vert_idx])
-            found_faces = numpy.unique(found_faces)
-            to_remove = numpy.isin(found_faces, [face_idx])
-            found_faces = numpy.delete(found_faces, to_remove)
-            face_neighbors.append(found_faces)
-            _LOG.trace("Face neighbors", (face_idx, found_faces))
-
-        self.face_neighbors = numpy.array(face_neighbors, dtype=object)
-        if self.write_cache and self.cache_dir:
-            if os.path.exists(cache_file):
-                os.remove(cache_file)
-            _LOG.debug("Writing to cache", cache_file)
-            numpy.save(cache_file, self.face_neighbors, allow_pickle=True)
+        # Two faces are neighbors if they share at least one vertex. Expand each corner of each face
+        # to all faces of the corner's vertex, then remove duplicates and the face itself.
+        number_of_faces, verts_per_face = self.vertices_by_face.shape
+        corner_vertices = self.vertices_by_face.ravel().astype(numpy.int64)
+        corner_faces = numpy.repeat(numpy.arange(number_of_faces, dtype=numpy.int64), verts_per_face)
+        (corner_positions, other_faces) = _gather_csr_rows(self.faces_by_vertex_offsets, self.faces_by_vertex_indices, corner_vertices)
+
+        faces = corner_faces[corner_positions]
+        pairs = numpy.unique(faces * number_of_faces + other_faces)
+        faces = pairs // number_of_faces
+        other_faces = pairs % number_of_faces
+        not_self = faces != other_faces
 
+        (self.face_neighbors_offsets, self.face_neighbors_indices) = _csr_from_pairs(faces[not_self], other_faces[not_self], number_of_faces)
 
     def _build_face_median_points_table(self):
         _LOG.enter()
-        kd = mathutils.kdtree.KDTree(len(self.vertices_by_face))
-        for face_idx in range(len(self.vertices_by_face)):
-            numverts = len(self.vertices_by_face[face_idx])
-            vert_table = numpy.zeros((numverts, 3), dtype=numpy.float32)
-            i = 0;
-            for vert_idx in self.vertices_by_face[face_idx]:
-                vert_table[i] = self.vertex_coordinates[vert_idx]
-                i = i + 1
-            median_point = numpy.mean(vert_table, axis=0)
-            normal_raw = numpy.array(self._mesh_object.data.polygons[face_idx].normal, dtype=numpy.float32)
-            normal_shifted = numpy.add(normal_raw, median_point)
-            _LOG.trace("Face vert table", (face_idx, numverts, vert_table, median_point, normal_shifted))
-            self.face_normals.append(normal_shifted)
-            self.face_median_points.append(median_point)
-            kd.insert(list(median_point), face_idx)
-        kd.balance()
-        self.face_median_points_kdtree = kd
+        number_of_faces = len(self.vertices_by_face)
+
+        self.face_median_points = numpy.mean(self.vertex_coordinates[self.vertices_by_face], axis=1, dtype=numpy.float32) if number_of_faces > 0 \
+            else numpy.zeros((0, 3), dtype=numpy.float32)
+
+        normals = numpy.zeros(number_of_faces * 3, dtype=numpy.float32)
+        self._mesh_object.data.polygons.foreach_get("normal", normals)
+        self.face_normals = normals.reshape((number_of_faces, 3)) + self.face_median_points
+
+        self.face_median_points_kdtree = MeshService.get_spatial_index_for_points(self.face_median_points)
+
+
+def _csr_from_pairs(rows, columns, number_of_rows):
+    """Group the columns by row. Return (offsets, indices) where the columns of row r are found at
+    indices[offsets[r]:offsets[r+1]], in the order they were given."""
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    order = numpy.argsort(rows, kind="stable")
+    offsets = numpy.zeros(number_of_rows + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(rows, minlength=number_of_rows), out=offsets[1:])
+    return offsets, numpy.asarray(columns)[order]
+
+
+def _csr_to_rows(offsets, indices):
+    """Split (offsets, indices) into a 1d object array with one index array per row."""
+    rows = numpy.empty(len(offsets) - 1, dtype=object)
+    for row_idx, row in enumerate(numpy.split(indices, offsets[1:-1])):
+        rows[row_idx] = row
+    return rows
+
+
+def _gather_csr_rows(offsets, indices, rows):
+    """Gather the entries of the given rows. Return (positions, gathered) where gathered[i] came from
+    the row rows[positions[i]]."""
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    positions = numpy.repeat(numpy.arange(len(rows), dtype=numpy.int64), counts)
+    within_row = numpy.arange(int(counts.sum()), dtype=numpy.int64) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    return positions, indices[numpy.repeat(starts, counts) + within_row]
+
+
+def _invert_index_table(vertices_by_element, number_of_vertices):
+    """Given a 2d table where rows are elements (faces, edges) and columns are vertex indices, return
+    (offsets, indices) where row v lists the elements which vertex v belongs to, in ascending order."""
+    number_of_elements, verts_per_element = vertices_by_element.shape
+    elements = numpy.repeat(numpy.arange(number_of_elements, dtype=numpy.int64), verts_per_element)
+    return _csr_from_pairs(vertices_by_element.ravel(), elements, number_of_vertices)
+
+
+def write_table_file(file_name, arrays, metadata=None):
+    """Write a dict of 1d numpy arrays to a single binary file which can be memory mapped by read_table_file().
+
+    The file starts with a magic string, a format version and the length of a JSON header. The header
+    contains the metadata dict and the dtype, length and offset of each array. The arrays follow, each
+    aligned to 64 bytes. The file is written under a temporary name and then moved into place, so that
+    readers never see a partially written file."""
+    entries = dict()
+    contiguous = dict()
+    position = 0
+    for name, array in arrays.items():
+        array = numpy.ascontiguousarray(array).reshape(-1)
+        contiguous[name] = array
+        entries[name] = {"dtype": array.dtype.str, "length": int(array.shape[0]), "offset": position}
+        position = position + array.nbytes
+        position = position + (-position) % _CACHE_ALIGNMENT
+
+    header = json.dumps({"metadata": metadata or dict(), "arrays": entries}).encode("utf-8")
+    data_start = _data_start(len(header))
+
+    temp_name = file_name + "." + str(os.getpid()) + ".tmp"
+    with open(temp_name, "wb") as table_file:
+        table_file.write(_CACHE_MAGIC)
+        table_file.write(struct.pack("<IQ", _CACHE_FORMAT_VERSION, len(header)))
+        table_file.write(header)
+        for name, array in contiguous.items():
+            table_file.seek(data_start + entries[name]["offset"])
+            table_file.write(array.tobytes())
+    os.replace(temp_name, file_name)
+
+
+def read_table_file(file_name, mmap=True):
+    """Read a file written by write_table_file(). Return (metadata, arrays) where arrays is a dict of 1d
+    numpy arrays. If mmap is True, the arrays are read-only memory maps of the file."""
+    with open(file_name, "rb") as table_file:
+        if table_file.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+            raise ValueError(str(file_name) + " is not a table file")
+        (version, header_length) = struct.unpack("<IQ", table_file.read(struct.calcsize("<IQ")))
+        if version != _CACHE_FORMAT_VERSION:
+            raise ValueError(str(file_name) + " has unsupported format version " + str(version))
+        header = json.loads(table_file.read(header_length).decode("utf-8"))
+        data_start = _data_start(header_length)
+        file_size = os.fstat(table_file.fileno()).st_size
+
+        arrays = dict()
+        for name, entry in header["arrays"].items():
+            dtype = numpy.dtype(entry["dtype"])
+            offset = data_start + entry["offset"]
+            if entry["length"] < 1:
+                arrays[name] = numpy.zeros(0, dtype=dtype)
+            elif offset + dtype.itemsize * entry["length"] > file_size:
+                raise ValueError(str(file_name) + " is truncated")
+            elif mmap:
+                arrays[name] = numpy.memmap(file_name, dtype=dtype, mode="r", offset=offset, shape=(entry["length"],))
+            else:
+                table_file.seek(offset)
+                arrays[name] = numpy.fromfile(table_file, dtype=dtype, count=entry["length"])
+    return header["metadata"], arrays
+
+
+def _data_start(header_length):
+    preamble_length = len(_CACHE_MAGIC) + struct.calcsize("<IQ") + header_length
+    return preamble_length + (-preamble_length) % _CACHE_ALIGNMENT
+
+
+def _prune_cache_dir(cache_dir, keep):
+    """Remove the least recently written cache files, so that no more than _MAX_CACHE_FILES remain."""
+    cache_files = glob.glob(os.path.join(cache_dir, _CACHE_FILE_PATTERN % "*"))
+    cache_files.sort(key=os.path.getmtime, reverse=True)
+    for cache_file in cache_files[_MAX_CACHE_FILES:]:
+        if os.path.abspath(cache_file) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(cache_file)
+        except OSError as e:
+            _LOG.debug("Could not remove old cache file", (cache_file, e))
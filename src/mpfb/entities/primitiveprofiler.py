@@ -1,48 +1,281 @@
-import time
+"""A small instrumentation profiler.
+
+Profilers are fetched by name with PrimitiveProfiler(name). Code is instrumented either with explicit
+enter()/leave() pairs, with the span() context manager or with the profile() decorator. Spans may be
+nested and recursive, and each thread keeps its own stack of open spans.
+
+Durations are always aggregated per location, see dump() and get_stats(). In addition, while a capture
+is running (see start_capture()), every completed span is recorded on a timeline which can be exported
+in the Chrome trace event format (chrome://tracing, Perfetto) or in the speedscope format.
+"""
+
+import time, threading, functools, json, os, math
 
 _registered_profilers = dict()
 
+_LOCK = threading.Lock()
+_THREAD_STATE = threading.local()
+
+_CAPTURE = {"running": False, "start": 0, "events": []}
+
+_MAX_CAPTURED_EVENTS = 2000000
+
+# More open spans than this on one thread means that spans are being entered and never left
+_MAX_OPEN_SPANS = 1000
+
+
+def _warn(message):
+    from ..services.logservice import LogService  # pylint: disable=C0415
+    LogService.get_logger("entities.primitiveprofiler").warn(message)
+
+
+def _stack():
+    stack = getattr(_THREAD_STATE, "stack", None)
+    if stack is None:
+        stack = []
+        _THREAD_STATE.stack = stack
+    return stack
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[int(position)]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class _Span:
+
+    def __init__(self, profiler, location):
+        self.profiler = profiler
+        self.location = location
+
+    def __enter__(self):
+        self.profiler.enter(self.location)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.leave(self.location)
+        return False
+
+
 class _PrimitiveProfiler:
 
-    def __init__(self):
-        self.entered = dict()
+    def __init__(self, name="default"):
+        self.name = name
         self.completed = dict()
 
     def enter(self, location):
-        if location in self.entered:
-            print(location + " fanns redan!")
-        self.entered[location] = time.time()
+        """Open a span for the given location on the current thread. Prefer span() or profile(), which
+        also leave the span when the enclosed code returns early or raises."""
+        stack = _stack()
+        if len(stack) >= _MAX_OPEN_SPANS:
+            (profiler, open_location, _) = stack.pop(0)
+            _warn("Too many open spans, dropping " + profiler.name + ":" + open_location + " which was never left")
+        stack.append((self, location, time.perf_counter_ns()))
 
     def leave(self, location):
-        if not location in self.entered:
-            print(location + " fanns inte!")
+        """Close the innermost open span for the given location on the current thread. Spans which were
+        opened after it but never left are discarded without being recorded, since their duration is unknown."""
+        end = time.perf_counter_ns()
+        stack = _stack()
+
+        position = len(stack) - 1
+        while position >= 0 and not (stack[position][0] is self and stack[position][1] == location):
+            position = position - 1
+
+        if position < 0:
+            _warn("Tried to leave " + self.name + ":" + location + ", which was never entered")
             return
-        if not location in self.completed:
-            self.completed[location] = []
-        self.completed[location].append(time.time() - self.entered[location])
-        del self.entered[location]
+
+        while len(stack) > position + 1:
+            (profiler, open_location, _) = stack.pop()
+            _warn("Span " + profiler.name + ":" + open_location + " was not left before " + self.name + ":" + location)
+
+        (_, _, start) = stack.pop()
+        self._record(location, start, end, len(stack))
+
+    def _record(self, location, start, end, depth):
+        with _LOCK:
+            if location not in self.completed:
+                self.completed[location] = []
+            self.completed[location].append((end - start) / 1000000000.0)
+            if _CAPTURE["running"] and len(_CAPTURE["events"]) < _MAX_CAPTURED_EVENTS:
+                _CAPTURE["events"].append((self.name, location, threading.get_ident(), start, end, depth))
+
+    def span(self, location):
+        """Return a context manager which measures the enclosed block as the given location."""
+        return _Span(self, location)
+
+    def profile(self, location=None):
+        """Return a decorator which measures every call to the decorated function. The location defaults to
+        the qualified name of the function."""
+        def decorator(function):
+            span_location = location or function.__qualname__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                self.enter(span_location)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.leave(span_location)
+            return wrapper
+        return decorator
+
+    def get_stats(self):
+        """Return a dict with location as key and a dict with count, total, min, max, avg, p50, p90 and p99 (in seconds) as value."""
+        with _LOCK:
+            completed = {location: list(durations) for location, durations in self.completed.items()}
+        stats = dict()
+        for location, durations in completed.items():
+            durations.sort()
+            total = sum(durations)
+            stats[location] = {
+                "count": len(durations),
+                "total": total,
+                "min": durations[0],
+                "max": durations[-1],
+                "avg": total / len(durations),
+                "p50": _percentile(durations, 0.5),
+                "p90": _percentile(durations, 0.9),
+                "p99": _percentile(durations, 0.99)
+                }
+        return stats
+
+    def reset(self):
+        """Forget all aggregated durations."""
+        with _LOCK:
+            self.completed = dict()
 
     def dump(self):
-        for name in self.completed:
+        for name, stat in self.get_stats().items():
             out = "  " + name.ljust(60)
-            out = out + str("count=" + str(len(self.completed[name]))).ljust(20)
-            total = 0.0
-            max = 0.0
-            min = 40000.0
-            for completed in self.completed[name]:
-                total = total + completed
-                if completed < min:
-                    min = completed
-                if completed > max:
-                    max = completed
-            out = out + str("total=" + str(round(total,4))).ljust(15)
-            out = out + str("min=" + str(round(min,4))).ljust(15)
-            out = out + str("max=" + str(round(max,4))).ljust(15)
-            out = out + str("avg=" + str(round(total / len(self.completed[name]),4))).ljust(15)
+            out = out + str("count=" + str(stat["count"])).ljust(20)
+            for key in ["total", "min", "max", "avg", "p50", "p90", "p99"]:
+                out = out + str(key + "=" + str(round(stat[key], 4))).ljust(15)
             print(out)
 
+
 def PrimitiveProfiler(name):
     global _registered_profilers
-    if not name in _registered_profilers:
-        _registered_profilers[name] = _PrimitiveProfiler()
-    return _registered_profilers[name]
+    with _LOCK:
+        if not name in _registered_profilers:
+            _registered_profilers[name] = _PrimitiveProfiler(name)
+        return _registered_profilers[name]
+
+
+def start_capture():
+    """Start recording completed spans of all profilers on a timeline. Any previous capture is discarded."""
+    with _LOCK:
+        _CAPTURE["running"] = True
+        _CAPTURE["start"] = time.perf_counter_ns()
+        _CAPTURE["events"] = []
+
+
+def stop_capture():
+    """Stop recording spans. The recorded timeline is kept until the next call to start_capture()."""
+    with _LOCK:
+        _CAPTURE["running"] = False
+
+
+def is_capturing():
+    """Return True if a capture is running."""
+    return _CAPTURE["running"]
+
+
+def get_captured_events():
+    """Return a list of (profiler name, location, thread id, start ns, end ns, depth) tuples for the current or last capture."""
+    with _LOCK:
+        return list(_CAPTURE["events"])
+
+
+def to_chrome_trace():
+    """Return the captured timeline as a dict in the Chrome trace event format."""
+    events = get_captured_events()
+    origin = _CAPTURE["start"]
+    pid = os.getpid()
+    trace_events = []
+    for (profiler_name, location, thread_id, start, end, depth) in events:
+        trace_events.append({
+            "name": location,
+            "cat": profiler_name,
+            "ph": "X",
+            "ts": (start - origin) / 1000.0,
+            "dur": (end - start) / 1000.0,
+            "pid": pid,
+            "tid": thread_id,
+            "args": {"depth": depth}
+            })
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def to_speedscope(name="MPFB"):
+    """Return the captured timeline as a dict in the speedscope file format, with one evented profile per thread."""
+    events = get_captured_events()
+    origin = _CAPTURE["start"]
+
+    frames = []
+    frame_index = dict()
+    per_thread = dict()
+
+    for (profiler_name, location, thread_id, start, end, depth) in events:
+        key = profiler_name + ":" + location
+        if key not in frame_index:
+            frame_index[key] = len(frames)
+            frames.append({"name": location, "file": profiler_name})
+        if thread_id not in per_thread:
+            per_thread[thread_id] = []
+        per_thread[thread_id].append((start - origin, depth, end - origin, frame_index[key]))
+
+    profiles = []
+    for thread_id, spans in per_thread.items():
+        # Open the spans in order of start time, outermost first, and keep the open ones on a stack. A span is
+        # closed before opening one which starts after it ended, or at the same time as it ended but at the same
+        # or a lower depth. Sorting open and close events on time alone would put the close of a zero length
+        # span before its own open.
+        spans.sort()
+        thread_events = []
+        stack = []
+        for (start, depth, end, frame) in spans:
+            while stack and (stack[-1][0] < start or (stack[-1][0] == start and stack[-1][1] >= depth)):
+                (closed_at, _, closed_frame) = stack.pop()
+                thread_events.append({"type": "C", "frame": closed_frame, "at": closed_at})
+            thread_events.append({"type": "O", "frame": frame, "at": start})
+            stack.append((end, depth, frame))
+        while stack:
+            (closed_at, _, closed_frame) = stack.pop()
+            thread_events.append({"type": "C", "frame": closed_frame, "at": closed_at})
+
+        profiles.append({
+            "type": "evented",
+            "name": "Thread " + str(thread_id),
+            "unit": "nanoseconds",
+            "startValue": thread_events[0]["at"],
+            "endValue": thread_events[-1]["at"],
+            "events": thread_events
+            })
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "mpfb",
+        "shared": {"frames": frames},
+        "profiles": profiles
+        }
+
+
+def export_capture(file_name, file_format="CHROME"):
+    """Write the captured timeline to a json file, either in "CHROME" trace event or "SPEEDSCOPE" format."""
+    if file_format == "SPEEDSCOPE":
+        data = to_speedscope()
+    elif file_format == "CHROME":
+        data = to_chrome_trace()
+    else:
+        raise ValueError("Unknown profile export format: " + str(file_format))
+    with open(file_name, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file)
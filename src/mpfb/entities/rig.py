@@ -5,11 +5,13 @@ import bmesh
 from ..services import LogService
 from ..services import ObjectService
 from ..services import RigService
+from ..services import MeshService
 from .objectproperties import GeneralObjectProperties
 
-import bpy, math, json, random, typing, re
+import bpy, math, json, os, typing, re, numpy, copy
 
 from bl_math import lerp
+from collections import OrderedDict
 from itertools import accumulate
 from mathutils import Vector, Matrix, Euler, Quaternion
 from mathutils.kdtree import KDTree
@@ -25,6 +27,14 @@ CLOSE_MEAN_SEARCH_RADIUS = _MAX_ALLOWED_DIST * 2
 
 CUR_VERSION = 110
 
+# Parsed and upgraded rig files, keyed by absolute path, modification time and size
+_RIG_DEFINITION_CACHE = OrderedDict()
+_MAX_CACHED_RIG_DEFINITIONS = 8
+
+# Vertex indices of the joint cubes of basemeshes, keyed by mesh, vertex count and joint group names
+_JOINT_CUBE_CACHE = OrderedDict()
+_MAX_CACHED_JOINT_CUBES = 8
+
 
 class Rig:
 
@@ -47,12 +57,49 @@ class Rig:
         self.lowest_point = 1000.0
         self.bad_constraint_targets = set()
         self.relative_scale = 1.0
+        self.fitting_plan = None
 
     @staticmethod
     def from_json_file_and_basemesh(filename, basemesh, *, parent=None):
-        """Create an instance of Rig and populate it with information from the json file and from the base mesh."""
+        """Create an instance of Rig and populate it with information from the json file and from the base mesh.
+
+        The parsed rig file is cached. Each rig gets its own copy of the bone definitions, since for example
+        sub-rig constraints are resolved against the parent rig in place, while the fitting plan is shared."""
         rig = Rig(basemesh, parent=parent)
 
+        (rig_header, fitting_plan) = Rig._load_rig_definition(filename)
+
+        if rig_header.get("is_subrig", False) and not parent:
+            raise ValueError("Attempting to load a sub-rig without a parent")
+
+        rig.rig_header = copy.deepcopy(rig_header)
+        rig.rig_header.setdefault("is_subrig", bool(parent))
+        rig.rig_definition = rig.rig_header["bones"]
+        rig.fitting_plan = fitting_plan
+
+        if rig.rig_header.get("scale_factor"):
+            scale_factor = GeneralObjectProperties.get_value(
+                "scale_factor", entity_reference=parent.basemesh if parent else basemesh)
+            if scale_factor:
+                rig.relative_scale = scale_factor / rig.rig_header["scale_factor"]
+
+        rig.build_basemesh_position_info()
+        return rig
+
+    @staticmethod
+    def _load_rig_definition(filename):
+        """Return (rig header, fitting plan) for the rig file, parsing and upgrading it only if it has not
+        already been loaded in its current state."""
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        key = (filename, stat.st_mtime_ns, stat.st_size)
+
+        if key in _RIG_DEFINITION_CACHE:
+            _RIG_DEFINITION_CACHE.move_to_end(key)
+            return _RIG_DEFINITION_CACHE[key]
+
+        rig = Rig(None)
+
         with open(filename, "r") as json_file:
             json_data = json.load(json_file)
 
@@ -63,13 +110,12 @@ class Rig:
                 if "joints" in json_data:
                     raise ValueError("MPFB is not compatible with mhskel files")
 
-                if json_data.get("is_subrig", False) and not parent:
-                    raise ValueError("Attempting to load a sub-rig without a parent")
-
                 rig.rig_header = json_data
                 rig.rig_definition = json_data["bones"]
 
             else:
+                # Old style files do not say whether they are sub-rigs, so that depends on how they are loaded
+                del rig.rig_header["is_subrig"]
                 rig.rig_header["version"] = 100
                 rig.rig_definition.update(json_data)
 
@@ -79,14 +125,17 @@ class Rig:
             # with open(filename + ".new", "w") as json_file:
             #     json.dump(rig.rig_header, json_file, indent=4, sort_keys=True)
 
-        if rig.rig_header.get("scale_factor"):
-            scale_factor = GeneralObjectProperties.get_value(
-                "scale_factor", entity_reference=parent.basemesh if parent else basemesh)
-            if scale_factor:
-                rig.relative_scale = scale_factor / rig.rig_header["scale_factor"]
+        _RIG_DEFINITION_CACHE[key] = (rig.rig_header, RigFittingPlan(rig.rig_definition))
+        while len(_RIG_DEFINITION_CACHE) > _MAX_CACHED_RIG_DEFINITIONS:
+            _RIG_DEFINITION_CACHE.popitem(last=False)
 
-        rig.build_basemesh_position_info()
-        return rig
+        return _RIG_DEFINITION_CACHE[key]
+
+    @staticmethod
+    def clear_cached_definitions():
+        """Forget all cached rig files and joint cube vertex indices."""
+        _RIG_DEFINITION_CACHE.clear()
+        _JOINT_CUBE_CACHE.clear()
 
     def _upgrade_definition(self):
         version = self.rig_header["version"]
@@ -265,19 +314,18 @@ class Rig:
                 location = self.position_info["cubes"].get(name, None)
             elif strategy == "VERTEX":
                 index = head_or_tail_info["vertex_index"]
-                location = self.position_info["vertices"][index]
+                location = self.position_info["vertices"][index].tolist()
             elif strategy == "MEAN":
                 indices = head_or_tail_info["vertex_indices"]
                 if len(indices) > 0:
-                    vertices = [self.position_info["vertices"][i] for i in indices]
-                    location = [sum(v[i] for v in vertices) / len(vertices) for i in range(3)]
+                    location = self.position_info["vertices"][list(indices)].mean(axis=0).tolist()
             elif strategy == "XYZ":
                 # Special strategy for Rigify heel marker.
                 # Uses different vertices for each coordinate channel.
                 indices = head_or_tail_info["vertex_indices"]
                 if len(indices) >= 3:
-                    vertices = [self.position_info["vertices"][i] for i in indices]
-                    location = [vertices[i][i] for i in range(3)]
+                    vertices = self.position_info["vertices"]
+                    location = [float(vertices[indices[i]][i]) for i in range(3)]
         except IndexError:
             pass
         if location is not None and "offset" in head_or_tail_info:
@@ -286,6 +334,15 @@ class Rig:
             location = head_or_tail_info["default_position"]
         return location
 
+    def get_bone_end_positions(self):
+        """Return a dict with bone name as key and a (head, tail) tuple of positions as value. This gives the same
+        result as calling get_best_location_from_strategy() for every bone end, but does so for all bones at once."""
+        if self.fitting_plan is None:
+            self.fitting_plan = RigFittingPlan(self.rig_definition)
+        positions = self.fitting_plan.calculate_positions(
+            self.position_info["vertices"], self.position_info["cubes"], self.relative_scale)
+        return dict(zip(self.fitting_plan.bone_names, zip(positions[0::2].tolist(), positions[1::2].tolist())))
+
     def _align_roll_by_strategy(self, bone, bone_info):
         self.apply_bone_roll_strategy(bone, bone_info.get("roll_strategy", None))
 
@@ -317,12 +374,12 @@ class Rig:
         """Create the actual bones in the armature object."""
         bpy.ops.object.mode_set(mode='EDIT', toggle=False)
         bones = self.armature_object.data.edit_bones
+        positions = self.get_bone_end_positions()
         for bone_name in self.rig_definition.keys():
             bone_info = self.rig_definition[bone_name]
             bone = bones.new(bone_name)
             bone.roll = bone_info["roll"]
-            bone.head = self.get_best_location_from_strategy(bone_info["head"])
-            bone.tail = self.get_best_location_from_strategy(bone_info["tail"])
+            (bone.head, bone.tail) = positions[bone_name]
 
             self._align_roll_by_strategy(bone, bone_info)
 
@@ -331,12 +388,12 @@ class Rig:
     def reposition_edit_bone(self, *, developer=False):
         """Reposition bones to fit the current state of the basemesh."""
         bpy.ops.object.mode_set(mode='EDIT', toggle=False)
+        positions = self.get_bone_end_positions()
         for bone_name in self.rig_definition.keys():
             bone_info = self.rig_definition[bone_name]
             bone = RigService.find_edit_bone_by_name(bone_name, self.armature_object)
             if bone:
-                bone.head = self.get_best_location_from_strategy(bone_info["head"])
-                bone.tail = self.get_best_location_from_strategy(bone_info["tail"])
+                (bone.head, bone.tail) = positions[bone_name]
                 self._align_roll_by_strategy(bone, bone_info)
             else:
                 _LOG.warn("Tried to refit bone that did not exist in definition", bone_name)
@@ -794,31 +851,12 @@ class Rig:
         self.position_info["cubes"] = dict()
         cubes = self.position_info["cubes"]
 
-        self.position_info["vertices"] = []
-        vertices = self.position_info["vertices"]
-
-        cube_groups = dict()
-        group_index_to_name = dict()
-
         basemesh: bpy.types.Object = self.basemesh
 
         assert isinstance(basemesh.data, bpy.types.Mesh)
 
-        if self.parent:
-            # Copy cube data from the parent rig if present
-            cubes.update(self.parent.position_info["cubes"])
-        else:
-            # Start computing our own cube data
-            for group in basemesh.vertex_groups:
-                idx = int(group.index)
-                name = str(group.name)
-                if "joint" in name:
-                    cube_groups[name] = []
-                    group_index_to_name[idx] = name
-
-        coords = basemesh.data.vertices
-        shape_key = None
-        key_name = None
+        vertex_count = len(basemesh.data.vertices)
+        vertices = numpy.zeros(vertex_count * 3, dtype=numpy.float32)
 
         if take_shape_keys_into_account and basemesh.data.shape_keys and basemesh.data.shape_keys.key_blocks and len(basemesh.data.shape_keys.key_blocks) > 0:
             if basemesh.mode == "EDIT":
@@ -828,36 +866,47 @@ class Rig:
                     bpy.context.view_layer.update()
 
                 bm = bmesh.from_edit_mesh(basemesh.data)
-                coords = bm.verts
+                bm.verts.ensure_lookup_table()
+                vertices = numpy.array([bm.verts[index].co for index in range(vertex_count)], dtype=numpy.float32)
             else:
                 from ..services import TargetService
-                key_name = "temporary_fit_rig_key." + str(random.randrange(1000, 9999))
-                shape_key = TargetService.create_shape_key(basemesh, key_name, also_create_basis=True, create_from_mix=True)
-                coords = shape_key.data
-
-        for vertex in basemesh.data.vertices:
-            vertex_coords = list(coords[vertex.index].co)  # Either actual vertex or the corresponding shape key point
-            vertices.append(vertex_coords)
-            for group in vertex.groups:
-                idx = int(group.group)
-                if idx in group_index_to_name:
-                    name = group_index_to_name[idx]
-                    cube_groups[name].append(vertex_coords)
-
-        if shape_key:
-            basemesh.shape_key_remove(shape_key)
-
-        _LOG.dump("cube_groups", cube_groups)
-
-        for name in group_index_to_name.values():
-            group = cube_groups[name]
-            sum_pos = [0.0, 0.0, 0.0]
-            for i in range(len(group)):
-                for n in range(3):
-                    sum_pos[n] = sum_pos[n] + group[i][n]
-            for n in range(3):
-                sum_pos[n] = sum_pos[n] / float(len(group))
-            cubes[name] = sum_pos
+                vertices = TargetService.get_mixed_vertex_coordinates(basemesh)
+        else:
+            basemesh.data.vertices.foreach_get("co", vertices)
+
+        vertices = vertices.reshape((-1, 3)).astype(numpy.float64)
+        self.position_info["vertices"] = vertices
+
+        if self.parent:
+            # Copy cube data from the parent rig if present
+            cubes.update(self.parent.position_info["cubes"])
+        else:
+            # Start computing our own cube data
+            for name, cube_vertices in Rig._get_joint_cube_vertices(basemesh).items():
+                if len(cube_vertices) > 0:
+                    cubes[name] = vertices[cube_vertices].mean(axis=0).tolist()
+
+        _LOG.dump("cubes", cubes)
+
+    @staticmethod
+    def _get_joint_cube_vertices(basemesh):
+        """Return a dict with joint vertex group name as key and an array with the indices of its vertices as value.
+        The joint groups of a basemesh are not edited, so the result is cached per mesh."""
+        joint_groups = tuple((int(group.index), str(group.name)) for group in basemesh.vertex_groups if "joint" in group.name)
+        key = (basemesh.data.as_pointer(), len(basemesh.data.vertices), joint_groups)
+
+        if key in _JOINT_CUBE_CACHE:
+            _JOINT_CUBE_CACHE.move_to_end(key)
+            return _JOINT_CUBE_CACHE[key]
+
+        group_weights = MeshService.get_vertex_group_weights(basemesh, [name for (_, name) in joint_groups])
+        cube_vertices = {name: group_weights[name][0].astype(numpy.int64) for (_, name) in joint_groups}
+
+        _JOINT_CUBE_CACHE[key] = cube_vertices
+        while len(_JOINT_CUBE_CACHE) > _MAX_CACHED_JOINT_CUBES:
+            _JOINT_CUBE_CACHE.popitem(last=False)
+
+        return cube_vertices
 
     def add_data_bone_info(self):
         """Extract bone information from the bone data."""
@@ -1322,12 +1371,8 @@ class Rig:
 
         assert len(vertices) > 0
 
-        vertex_tree = self.position_info["vertices_tree"] = KDTree(len(vertices))
-
-        for i, vert in enumerate(vertices):
-            vertex_tree.insert(vert, i)
-
-        vertex_tree.balance()
+        # The index is cached by content in MeshService, so rigs fitted to the same basemesh shape share it
+        vertex_tree = self.position_info["vertices_tree"] = MeshService.get_spatial_index_for_points(vertices)
 
         return vertex_tree
 
@@ -1349,14 +1394,8 @@ class Rig:
 
         vertices = self.position_info["vertices"]
 
-        highest_z = -1000.0
-        lowest_z = 1000.0
-
-        for vertex in vertices:
-            if vertex[2] > highest_z:
-                highest_z = vertex[2]
-            if vertex[2] < lowest_z:
-                lowest_z = vertex[2]
+        highest_z = float(vertices[:, 2].max(initial=-1000.0))
+        lowest_z = float(vertices[:, 2].min(initial=1000.0))
 
         total_height = abs(highest_z - lowest_z)
         _LOG.debug("total height", total_height)
@@ -1416,6 +1455,108 @@ class Rig:
         return best_match_idxs, best_match_dist
 
 
+class RigFittingPlan:
+
+    """The positioning strategies of all bone ends in a rig definition, compiled to index arrays.
+
+    Ends are numbered so that the head of the n:th bone is row 2n and its tail is row 2n+1. VERTEX and MEAN ends
+    are both stored as a list of vertex indices to average, XYZ ends as three vertex indices and CUBE ends by
+    cube name."""
+
+    def __init__(self, rig_definition):
+        self.bone_names = list(rig_definition.keys())
+
+        ends = []
+        for bone_name in self.bone_names:
+            ends.append(rig_definition[bone_name]["head"])
+            ends.append(rig_definition[bone_name]["tail"])
+
+        self.default_positions = numpy.full((len(ends), 3), numpy.nan)
+        self.offsets = numpy.zeros((len(ends), 3))
+        self.has_offset = numpy.zeros(len(ends), dtype=bool)
+
+        mean_rows = []
+        mean_counts = []
+        mean_indices = []
+        xyz_rows = []
+        xyz_indices = []
+        self.cube_rows = []
+        self.cube_names = []
+
+        for row, info in enumerate(ends):
+            if info.get("default_position") is not None:
+                self.default_positions[row] = info["default_position"]
+            if "offset" in info:
+                self.offsets[row] = info["offset"]
+                self.has_offset[row] = True
+
+            strategy = info["strategy"]
+            if strategy == "CUBE":
+                self.cube_rows.append(row)
+                self.cube_names.append(info["cube_name"])
+            elif strategy == "VERTEX":
+                mean_rows.append(row)
+                mean_counts.append(1)
+                mean_indices.append(info["vertex_index"])
+            elif strategy == "MEAN" and len(info["vertex_indices"]) > 0:
+                mean_rows.append(row)
+                mean_counts.append(len(info["vertex_indices"]))
+                mean_indices.extend(info["vertex_indices"])
+            elif strategy == "XYZ" and len(info["vertex_indices"]) >= 3:
+                xyz_rows.append(row)
+                xyz_indices.append(info["vertex_indices"][:3])
+
+        self.mean_rows = numpy.array(mean_rows, dtype=numpy.int64)
+        self.mean_counts = numpy.array(mean_counts, dtype=numpy.int64)
+        self.mean_starts = numpy.zeros(len(mean_counts), dtype=numpy.int64)
+        numpy.cumsum(self.mean_counts[:-1], out=self.mean_starts[1:])
+        self.mean_indices = numpy.array(mean_indices, dtype=numpy.int64)
+        self.xyz_rows = numpy.array(xyz_rows, dtype=numpy.int64)
+        self.xyz_indices = numpy.array(xyz_indices, dtype=numpy.int64).reshape((-1, 3))
+
+    def calculate_positions(self, vertices, cubes, relative_scale=1.0):
+        """Return an (ends, 3) array with the position of every bone end, given an (N, 3) array with vertex
+        coordinates and a dict with cube name as key and cube position as value.
+
+        Ends whose strategy cannot be resolved, for example because a vertex index is out of range or a cube is
+        missing, get their default position. Offsets are only applied to resolved ends."""
+        vertices = numpy.asarray(vertices, dtype=numpy.float64).reshape((-1, 3))
+        vertex_count = len(vertices)
+
+        positions = numpy.zeros(self.default_positions.shape)
+        resolved = numpy.zeros(len(positions), dtype=bool)
+
+        if len(self.mean_rows) > 0:
+            valid = (self.mean_indices < vertex_count) & (self.mean_indices >= -vertex_count)
+            indices = numpy.where(valid, self.mean_indices, 0)
+            sums = numpy.add.reduceat(vertices[indices], self.mean_starts, axis=0)
+            row_valid = numpy.add.reduceat(valid.astype(numpy.int64), self.mean_starts) == self.mean_counts
+            positions[self.mean_rows] = sums / self.mean_counts[:, None]
+            resolved[self.mean_rows] = row_valid
+
+        if len(self.xyz_rows) > 0:
+            valid = ((self.xyz_indices < vertex_count) & (self.xyz_indices >= -vertex_count)).all(axis=1)
+            indices = numpy.where(valid[:, None], self.xyz_indices, 0)
+            positions[self.xyz_rows] = vertices[indices, numpy.arange(3)]
+            resolved[self.xyz_rows] = valid
+
+        for row, name in zip(self.cube_rows, self.cube_names):
+            if cubes.get(name) is not None:
+                positions[row] = cubes[name]
+                resolved[row] = True
+
+        with_offset = resolved & self.has_offset
+        positions[with_offset] += self.offsets[with_offset] * relative_scale
+
+        unresolved = ~resolved
+        positions[unresolved] = self.default_positions[unresolved]
+
+        if numpy.isnan(positions).any():
+            raise KeyError("default_position")
+
+        return positions
+
+
 def matrix_from_axis_pair(y_axis, other_axis, axis_name):
     assert axis_name in 'xz'
 
@@ -30,9 +30,10 @@ class SocketBodyObject(SocketMeshObject):
 
         self._object_info = SocketService.get_body_mesh_info()
         _LOG.dump("object_info", self._object_info)
-        self.arrange_vertices(SocketService.get_body_vertices())
-        self.arrange_faces(SocketService.get_body_faces())
-        self.arrange_uv_and_texco(SocketService.get_body_uv_mapping(), SocketService.get_body_texture_coords())
+        arrays = SocketService.get_body_mesh_arrays()
+        self.arrange_vertices(arrays["vertices"])
+        self.arrange_faces(arrays["faces"])
+        self.arrange_uv_and_texco(arrays["uv_mapping"], arrays["texture_coords"])
         self.arrange_face_group_arrays()
         if importer_presets["extra_vertex_groups"]:
             self.arrange_extra_vertex_groups()
@@ -47,10 +48,8 @@ class SocketBodyObject(SocketMeshObject):
             self.arrange_skeleton_info()
 
         if not self._skeleton_info is None and self._has_rig:
-            self._weight_info = SocketService.get_body_weight_info()
+            (self._weight_info, weights_vertices_data, weights_data) = SocketService.get_body_weight_arrays()
             _LOG.dump("weight info", self._weight_info)
-            weights_vertices_data = SocketService.get_body_weight_vertices()
-            weights_data = SocketService.get_body_weights()
             self.arrange_weights(weights_vertices_data, weights_data)
         else:
             _LOG.debug("No skeleton present, not importing weights")
@@ -131,15 +130,10 @@ class SocketBodyObject(SocketMeshObject):
 
             faces_to_add = self._faces[0:last_body_face,:]
 
-        # Next most efficient available way to convert a set of numpy arrays to a mesh.
-        # The most efficient way listed online causes segfaults for me and is hard to
-        # understand.
-        mesh.from_pydata(vertices_to_add.tolist(), [], faces_to_add.tolist())
-
-        for polygon in mesh.polygons:
-            polygon.use_smooth = True
+        self.create_mesh_geometry(mesh, vertices_to_add, faces_to_add)
 
         # Create all relevant vertex groups
+        group_names = []
         for name in self._vertex_groups_by_name:
             exclude = False
             if del_helpers:
@@ -150,16 +144,12 @@ class SocketBodyObject(SocketMeshObject):
                 # Only created detailed helper groups ("hair", "skirt"...) if requested
                 exclude = str(name).startswith("helper-") or str(name).startswith("joint-")
             if not exclude:
-                # Add all vertices to a new group, with a weight of 1.0
-                vgroup = obj.vertex_groups.new(name=name)
-                vgroup.add(self._vertex_groups_by_name[name].tolist(), 1.0, 'ADD')
-
-                # Update weights with actual weight values
-                self.apply_vertex_weights_if_needed(mesh, vgroup)
+                group_names.append(name)
             else:
                 _LOG.debug("Not creating vertex group", name)
 
-        self.create_uv_layer(obj.data)
+        # Groups with bone weights get the actual weight values, other groups get a weight of 1.0
+        self.create_vertex_groups(obj, group_names)
 
         if self._importer_presets["handle_helpers"] == "MASK":
             modifier = obj.modifiers.new("Hide helpers", 'MASK')
@@ -4,6 +4,7 @@ for more info."""
 
 import gc, numpy
 from ...services import LogService
+from ...services import MeshService
 
 _LOG = LogService.get_logger("socketobject.socketmeshobject")
 
@@ -270,39 +271,23 @@ class SocketMeshObject:
         self._vertex_groups_by_name["Delete"] = verts_to_hide
 
 
-    def apply_vertex_weights_if_needed(self, mesh, vertex_group):
-        """Perform the actual weighting for a particular (blender) vertex group in the specified mesh."""
+    def create_mesh_geometry(self, mesh, vertices, faces):
+        """Fill the (empty) mesh with the given vertices and faces, using smooth shading, and create its UV layer
+        based on the uv and texco information previously collected. All data is written in bulk from the numpy
+        arrays."""
         _LOG.enter()
-        name = vertex_group.name
-        if name not in self._vertex_groups_by_name:
-            _LOG.warn("Tried to apply vertex weights for a non-existing group:", name)
-            return
-        if name not in self._weights_by_name:
-            _LOG.debug("No weights for group:", name)
-            return
-
-        # Here we expect that the vertex group already exist with the proper vertices
-        # already added, although with 1.0 as weight for all vertices. We will iterate
-        # over the two parallel arrays constructed in arrange_weights() and pick the
-        # vertex index from one and the weight from the other
-        # Having pre-added all vertices in one operation and then updating the weights
-        # is a lot faster than adding each vertex individually together with its weight.
-        for vertex_index, vertex_weight in zip(self._vertex_groups_by_name[name], self._weights_by_name[name]):
-            vertex = mesh.vertices[vertex_index]
-            for group in vertex.groups:
-                if group.group == vertex_group.index:
-                    group.weight = vertex_weight
-
-    def create_uv_layer(self, mesh):
-        """Create a new UV layer for the mesh, based on the uv and texco information
-        previously collected"""
-        _LOG.enter()
-        uv_layer = mesh.uv_layers.new()
-
-        flattened_sorted_uv_texco = self._sorted_face_uv_and_texco.flatten()
 
-        # Crazy blender syntax. Basically we iterate over each point in the uv layer and
-        # set its "uv" property to a value in the given array. The first point with pick
-        # the first value in the array, the second point the second value and so on
-        uv_layer.data.foreach_set("uv", flattened_sorted_uv_texco)
+        # Assume all faces are smooth. At least we have no way of representing sharp faces in MH
+        loop_uvs = None
+        if self._sorted_face_uv_and_texco is not None:
+            loop_uvs = self._sorted_face_uv_and_texco[0:len(faces)].reshape((-1, 2))
+        MeshService.fill_mesh_from_numpy_arrays(mesh, vertices, faces, loop_uvs=loop_uvs, smooth=True)
 
+    def create_vertex_groups(self, blender_object, names):
+        """Create vertex groups with the given names on the blender object. Groups for which weights were
+        collected in arrange_weights() get these weights, other groups get a weight of 1.0 for all their
+        vertices."""
+        _LOG.enter()
+        vertex_groups = {name: self._vertex_groups_by_name[name] for name in names}
+        weights = {name: self._weights_by_name[name] for name in names if name in self._weights_by_name}
+        MeshService.add_vertex_groups_from_numpy_arrays(blender_object, vertex_groups, weights)
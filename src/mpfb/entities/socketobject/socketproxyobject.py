@@ -53,19 +53,18 @@ class SocketProxyObject(SocketMeshObject):
 
         uuid = self._object_info["uuid"]
 
-        self.arrange_vertices(SocketService.get_proxy_vertices(uuid))
-        self.arrange_faces(SocketService.get_proxy_faces(uuid))
-        self.arrange_uv_and_texco(SocketService.get_proxy_uv_mapping(uuid), SocketService.get_proxy_texture_coords(uuid))
+        arrays = SocketService.get_proxy_mesh_arrays(uuid)
+        self.arrange_vertices(arrays["vertices"])
+        self.arrange_faces(arrays["faces"])
+        self.arrange_uv_and_texco(arrays["uv_mapping"], arrays["texture_coords"])
         self.arrange_face_group_arrays()
         self.arrange_face_mask_array()
         self.arrange_extra_vertex_groups()
 
         if import_weights:
             _LOG.debug("Will later attempt to weight proxy", self._object_info["name"])
-            self._weight_info = SocketService.get_proxy_weight_info(uuid)
+            (self._weight_info, weights_vertices_data, weights_data) = SocketService.get_proxy_weight_arrays(uuid)
             _LOG.dump("weight info", self._weight_info)
-            weights_vertices_data = SocketService.get_proxy_weight_vertices(uuid)
-            weights_data = SocketService.get_proxy_weights(uuid)
             self.arrange_weights(weights_vertices_data, weights_data)
         else:
             _LOG.debug("Will not attempt to weight proxy", self._object_info["name"])
@@ -102,27 +101,12 @@ class SocketProxyObject(SocketMeshObject):
 
         mesh = obj.data
 
-        # Next most efficient available way to convert a set of numpy arrays to a mesh.
-        # The most efficient way listed online causes segfaults for me and is hard to
-        # understand.
-        mesh.from_pydata(self._vertices.tolist(), [], self._faces.tolist())
+        self.create_mesh_geometry(mesh, self._vertices, self._faces)
 
         _LOG.dump("Vertex groups", self._vertex_groups_by_name)
 
-        for polygon in mesh.polygons:
-            # Assume all faces are smooth. At least we have no way of representing
-            # sharp faces in MH
-            polygon.use_smooth = True
-
-        for name in self._vertex_groups_by_name:
-            # Add all vertices to a group, with a vertex weight of 1.0.
-            vgroup = obj.vertex_groups.new(name=name)
-            vgroup.add(self._vertex_groups_by_name[name].tolist(), 1.0, 'ADD')
-
-            # Update vertex weights with actual weights
-            self.apply_vertex_weights_if_needed(mesh, vgroup)
-
-        self.create_uv_layer(obj.data)
+        # Groups with bone weights get the actual weight values, other groups get a weight of 1.0
+        self.create_vertex_groups(obj, list(self._vertex_groups_by_name.keys()))
 
         if self._importer_presets["add_subdiv_modifier"]:
             modifier = obj.modifiers.new("Subdivision", 'SUBSURF')
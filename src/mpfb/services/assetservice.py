@@ -1,6 +1,6 @@
 """This module contains utility functions scanning asset repositories."""
 
-import os, bpy, json
+import os, bpy, json, fnmatch, hashlib, time
 from pathlib import Path
 from .logservice import LogService
 from .locationservice import LocationService
@@ -12,6 +12,15 @@ _ASSETS = dict()
 _ASSET_THUMBS = None
 _PACKS = None
 
+_ASSET_INDEX = dict()
+_ASSET_INDEX_DIR = LocationService.get_user_cache("asset_index")
+_ASSET_INDEX_VERSION = "2"
+
+# The index of a root is validated against the file system at most this often (in seconds) during normal lookups.
+# Explicit refreshes, and lookups which do not find what they are looking for, always validate it.
+_ASSET_INDEX_VALIDATION_INTERVAL = 30.0
+_ASSET_INDEX_VALIDATED = dict()
+
 ASSET_LIBRARY_SECTIONS = [
         {
             "bl_label": "Topologies library",
@@ -130,6 +139,11 @@ class AssetService:
     _PACKS: This variable is used to store metadata about asset packs. It is initialized as None and is populated when pack metadata
     is scanned and loaded.
 
+    _ASSET_INDEX: This is a dictionary with an index of all files below an asset root, keyed on the root. It is persisted as json
+    in the user cache. It is validated by comparing directory modification times when it is refreshed, when a lookup finds
+    nothing, and otherwise at most every _ASSET_INDEX_VALIDATION_INTERVAL seconds. Only directories which have changed since
+    the last scan are listed again. All file lookups are made against this index.
+
     ASSET_LIBRARY_SECTIONS: This is a list of dictionaries, each representing a section of the asset library. Each dictionary contains
     metadata about a specific type of asset, including labels, subdirectory names, asset types, and override flags. This list is used
     to define and manage different categories of assets within the project.
@@ -160,9 +174,9 @@ class AssetService:
             if root == "/":
                 raise IOError("Refusing to scan entire HD for assets")
             count = 0
-            for path in Path(root).rglob(pattern):
-                if os.path.isfile(path):
-                    found_files.append(path)
+            for relative_dir, entry in AssetService.get_asset_index(root)["dirs"].items():
+                for filename in fnmatch.filter(entry["files"].keys(), pattern):
+                    found_files.append(Path(os.path.join(root, relative_dir, filename)))
                     count = count + 1
             _LOG.debug("File matches in root", (count, root))
         _LOG.debug("Total matching files for all roots", len(found_files))
@@ -190,15 +204,17 @@ class AssetService:
         filename = asset_path_fragment
         if "/" in asset_path_fragment:
             filename = os.path.basename(filename)
-        matches = []
         _LOG.debug("Searching for asset with basename", filename)
-        for root in roots:
-            for dirpath, subdirs, files in os.walk(root):  # pylint: disable=W0612
-                _LOG.trace("Looking in directory", dirpath)
-                if filename in files:
-                    full_path = os.path.join(root, dirpath, filename)
-                    _LOG.debug("Found match", full_path)
-                    matches.append(full_path)
+
+        matches = AssetService._find_indexed_files_by_basename(roots, filename)
+
+        # The index might be out of date if files were added or removed since it was
+        # last refreshed. In that case refresh it and try once more.
+        if len(matches) < 1 or not all(os.path.isfile(match) for match in matches):
+            _LOG.debug("Asset index is out of date, refreshing", roots)
+            for root in roots:
+                AssetService.get_asset_index(root, refresh=True)
+            matches = AssetService._find_indexed_files_by_basename(roots, filename)
 
         if len(matches) < 1:
             # We couldn't find the asset in question
@@ -222,6 +238,186 @@ class AssetService:
 
         return os.path.abspath(matches[0])
 
+    @staticmethod
+    def _find_indexed_files_by_basename(roots, filename):
+        matches = []
+        for root in roots:
+            for full_path in AssetService.get_asset_index(root)["by_basename"].get(filename, []):
+                _LOG.debug("Found match", full_path)
+                matches.append(full_path)
+        return matches
+
+    @staticmethod
+    def _indexed_file_exists(roots, full_path):
+        full_path = os.path.normpath(str(full_path))
+        basename = os.path.basename(full_path)
+        for root in roots:
+            if full_path in AssetService.get_asset_index(root)["by_basename"].get(basename, []):
+                return True
+        return False
+
+    @staticmethod
+    def get_asset_index(asset_root, *, refresh=False):
+        """
+        Get the index of all files below an asset root.
+
+        The first call for a root in a session loads the persisted index from the user cache (if any). After that,
+        the index is returned as is unless refresh is True or it was last validated more than
+        _ASSET_INDEX_VALIDATION_INTERVAL seconds ago. Validating means checking the modification time of each
+        indexed directory, and listing again only those which have changed.
+
+        Args:
+            asset_root (str): The directory to index.
+            refresh (bool): Whether to validate the index now, and rescan the whole tree even if no indexed directory
+                seems to have changed.
+
+        Returns:
+            dict: A dict with the keys "root", "dirs" and "by_basename". "dirs" maps a directory path relative to
+            the root to a dict with its "mtime", "subdirs" and "files" (file name to [mtime, size]). "by_basename"
+            maps a file name to a list of full paths.
+        """
+        root = str(asset_root)
+        index = _ASSET_INDEX.get(root)
+        now = time.monotonic()
+
+        if index is not None and not refresh:
+            validated = _ASSET_INDEX_VALIDATED.get(root)
+            if validated is not None and now - validated < _ASSET_INDEX_VALIDATION_INTERVAL:
+                return index
+            if AssetService._asset_index_is_fresh(root, index["dirs"]):
+                _ASSET_INDEX_VALIDATED[root] = now
+                return index
+
+        previous_dirs = index["dirs"] if index is not None else AssetService._read_persisted_asset_index(root)
+        dirs = AssetService._scan_asset_root(root, previous_dirs)
+
+        if dirs != previous_dirs:
+            AssetService._write_persisted_asset_index(root, dirs)
+
+        by_basename = dict()
+        for relative_dir, entry in dirs.items():
+            for filename in entry["files"]:
+                if filename not in by_basename:
+                    by_basename[filename] = []
+                by_basename[filename].append(os.path.normpath(os.path.join(root, relative_dir, filename)))
+
+        index = {"root": root, "dirs": dirs, "by_basename": by_basename}
+        _ASSET_INDEX[root] = index
+        _ASSET_INDEX_VALIDATED[root] = now
+        return index
+
+    @staticmethod
+    def _asset_index_is_fresh(root, dirs):
+        # A file being added or removed changes the modification time of its directory. A new subdirectory
+        # changes that of its parent, so it is enough to stat the directories already in the index.
+        for relative_dir, entry in dirs.items():
+            path = os.path.join(root, relative_dir) if relative_dir else root
+            try:
+                if os.stat(path).st_mtime_ns != entry["mtime"]:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @staticmethod
+    def refresh_asset_index(asset_subdir=None):
+        """
+        Validate the asset index against the file system for the roots of the given asset subdir, or for all indexed
+        roots if asset_subdir is None.
+        """
+        _LOG.enter()
+        roots = AssetService.get_asset_roots(asset_subdir) if asset_subdir else list(_ASSET_INDEX.keys())
+        for root in roots:
+            AssetService.get_asset_index(root, refresh=True)
+
+    @staticmethod
+    def clear_asset_index(also_remove_persisted=False):
+        """Forget the in-memory asset index, and optionally also remove the persisted index files from the user cache."""
+        _LOG.enter()
+        _ASSET_INDEX.clear()
+        _ASSET_INDEX_VALIDATED.clear()
+        if also_remove_persisted and os.path.exists(_ASSET_INDEX_DIR):
+            for filename in os.listdir(_ASSET_INDEX_DIR):
+                if filename.endswith(".json"):
+                    os.remove(os.path.join(_ASSET_INDEX_DIR, filename))
+
+    @staticmethod
+    def _scan_asset_root(root, previous_dirs):
+        # Walk the directory tree below root. Directories with the same modification time as in previous_dirs
+        # are assumed to have the same content, so that only a stat() is needed for them.
+        dirs = dict()
+        visited = set()
+        pending = [""]
+        while pending:
+            relative_dir = pending.pop()
+            path = os.path.join(root, relative_dir) if relative_dir else root
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            real_path = os.path.realpath(path)
+            if real_path in visited:
+                # Symlink loop
+                continue
+            visited.add(real_path)
+
+            entry = previous_dirs.get(relative_dir)
+            if entry is None or entry["mtime"] != stat.st_mtime_ns:
+                _LOG.trace("Listing directory", path)
+                entry = {"mtime": stat.st_mtime_ns, "subdirs": [], "files": dict()}
+                try:
+                    with os.scandir(path) as iterator:
+                        for dir_entry in iterator:
+                            # Do not follow symlinked directories, the same way os.walk() does not
+                            if dir_entry.is_dir(follow_symlinks=False):
+                                entry["subdirs"].append(dir_entry.name)
+                            elif dir_entry.is_file():
+                                file_stat = dir_entry.stat()
+                                entry["files"][dir_entry.name] = [file_stat.st_mtime_ns, file_stat.st_size]
+                except OSError as err:
+                    _LOG.warn("Could not list directory", (path, err))
+                entry["subdirs"].sort()
+
+            dirs[relative_dir] = entry
+            for subdir in reversed(entry["subdirs"]):
+                pending.append(os.path.join(relative_dir, subdir) if relative_dir else subdir)
+
+        return dirs
+
+    @staticmethod
+    def _persisted_asset_index_path(root):
+        key = hashlib.sha1(os.path.realpath(root).encode("utf-8")).hexdigest()
+        return os.path.join(_ASSET_INDEX_DIR, key + ".json")
+
+    @staticmethod
+    def _read_persisted_asset_index(root):
+        path = AssetService._persisted_asset_index_path(root)
+        if not os.path.exists(path):
+            return dict()
+        try:
+            with open(path, "r", encoding="utf-8") as json_file:
+                data = json.load(json_file)
+        except (OSError, ValueError) as err:
+            _LOG.warn("Could not read asset index", (path, err))
+            return dict()
+        if data.get("version") != _ASSET_INDEX_VERSION or data.get("root") != root:
+            return dict()
+        return data["dirs"]
+
+    @staticmethod
+    def _write_persisted_asset_index(root, dirs):
+        path = AssetService._persisted_asset_index_path(root)
+        try:
+            os.makedirs(_ASSET_INDEX_DIR, exist_ok=True)
+            # Write to a temporary file and rename it in place, so that a concurrent reader never sees a half-written file
+            temp_path = path + "." + str(os.getpid()) + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as json_file:
+                json.dump({"version": _ASSET_INDEX_VERSION, "root": root, "dirs": dirs}, json_file)
+            os.replace(temp_path, path)
+        except OSError as err:
+            _LOG.warn("Could not write asset index", (path, err))
+
     @staticmethod
     def list_mhclo_assets(asset_subdir="clothes"):
         """Convenience wrapper for finding all mhclo assets for a subdir."""
@@ -370,6 +566,8 @@ class AssetService:
         global _ASSET_THUMBS
 
         roots = AssetService.get_asset_roots(asset_subdir)
+        for root in roots:
+            AssetService.get_asset_index(root, refresh=True)
         assets = AssetService.find_asset_files_matching_pattern(roots, "*." + asset_type)
 
         asset_list = dict()
@@ -392,7 +590,7 @@ class AssetService:
                 _ASSET_THUMBS = bpy.utils.previews.new()
 
             thumb = os.path.join(os.path.dirname(asset), item["name_without_ext"] + ".thumb")
-            if os.path.exists(thumb):
+            if AssetService._indexed_file_exists(roots, thumb):
                 item["thumb_path"] = thumb
                 _LOG.debug("Will try to load icon", (label, thumb))
                 if not thumb in _ASSET_THUMBS:
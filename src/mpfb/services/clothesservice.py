@@ -1,21 +1,32 @@
 """This module contains utility functions for clothes."""
 
-import random, os, bpy, time, bmesh, numpy  # pylint: disable=C0412
+import os, bpy, time, bmesh, numpy  # pylint: disable=C0412
+from collections import OrderedDict
 from .objectservice import ObjectService
 from .meshservice import MeshService
 from .logservice import LogService
 from .locationservice import LocationService
 from .assetservice import AssetService
 from .rigservice import RigService
+from .targetservice import TargetService
 from mathutils import Vector
 from ..entities.rig import Rig
-from ..entities.clothes.vertexmatch import VertexMatch
+from ..entities.clothes.batchvertexmatch import BatchVertexMatch
 from ..entities.objectproperties import GeneralObjectProperties
 from ..entities.clothes.mhclo import Mhclo
 from ..entities.meshcrossref import MeshCrossRef
 
 _LOG = LogService.get_logger("services.clothesservice")
 
+# The base mesh coordinates each clothes object was last fitted to, as a tuple (bound vertex indices, their
+# coordinates, scale factor). Used for skipping refits which would not change anything. The key is the asset uuid and
+# source plus the session uid of the object, since memory addresses are reused when objects are deleted and re-added.
+_FITTED_STATES = OrderedDict()
+_MAX_FITTED_STATES = 64
+
+# How far (in blender units) a bound vertex may move without the clothes being refitted
+_REFIT_TOLERANCE = 0.00001
+
 CLOTHES_REFERENCE_SCALE = {
                         "Body": {
                             "xmin": 13868,
@@ -118,8 +129,12 @@ class ClothesService:
         raise RuntimeError("You should not instance ClothesService. Use its static methods instead.")
 
     @staticmethod
-    def fit_clothes_to_human(clothes, basemesh, mhclo=None, set_parent=True):
-        """Move clothes vertices so they fit the current shape of the base mesh."""
+    def fit_clothes_to_human(clothes, basemesh, mhclo=None, set_parent=True, only_if_changed=False):
+        """Move clothes vertices so they fit the current shape of the base mesh.
+
+        If only_if_changed is True, the clothes are left as they are if none of the base mesh vertices they are bound
+        to have moved more than a small tolerance since the last time they were fitted. Return True if the clothes
+        were refitted, False if this was skipped."""
 
         _LOG.dump("Given MHCLO object", mhclo)
 
@@ -132,129 +147,158 @@ class ClothesService:
         if not ObjectService.object_is_basemesh(basemesh):
             raise ValueError('The provided object is not a basemesh')
 
-        if mhclo is None:
-            mhclo_fragment = GeneralObjectProperties.get_value("asset_source", entity_reference=clothes)
-            object_type = ObjectService.get_object_type(clothes)
-
-            if mhclo_fragment and object_type:
-                mhclo_path = AssetService.find_asset_absolute_path(mhclo_fragment, str(object_type).lower())
-                if not mhclo_path:
-                    raise IOError(mhclo_fragment + " does not exist")
-                if not os.path.exists(mhclo_path):
-                    raise IOError(mhclo_path + " does not exist")
-                mhclo = Mhclo()
-                mhclo.load(mhclo_path)
-            else:
-                raise ValueError('There is not enough info to refit this asset, at least asset source and object type is needed')
-            mhclo.clothes = clothes
-
-        if not mhclo.verts or len(mhclo.verts.keys()) < 1:
-            raise ValueError('There is no vertex info in the MHCLO!?')
-
         # We cannot rely on the vertex position data directly, since it represent positions
         # as they are *before* targets are applied. We want the shape of the mesh *after*
-        # targets are applied.
-        #
-        # We will therefore create a new shape key "from mix". This means it will have the
-        # combined state of all current shape keys. Then we will use that shape key for
-        # getting vertex positions.
-        key_name = "temporary_fitting_key." + str(random.randrange(1000, 9999))
-        basemesh.shape_key_add(name=key_name, from_mix=True)
-        shape_key = basemesh.data.shape_keys.key_blocks[key_name]
-        human_vertices = shape_key.data
-        human_vertices_count = len(human_vertices)
+        # targets are applied, ie the combined state of all current shape keys.
+        human_coordinates = TargetService.get_mixed_vertex_coordinates(basemesh)
 
         scale_factor = GeneralObjectProperties.get_value("scale_factor", entity_reference=basemesh)
         if not scale_factor:
             scale_factor = 1.0
 
-        # Fallback for if no scale is specified in mhclo
-        z_size = y_size = x_size = scale_factor
+        state_key = ClothesService._get_fitted_state_key(clothes)
+        fitted_state = _FITTED_STATES.get(state_key) if state_key else None
+        if only_if_changed and fitted_state and ClothesService._bound_coordinates_unchanged(fitted_state, human_coordinates, scale_factor):
+            _LOG.debug("Bound base mesh vertices have not moved, not refitting", clothes.name)
+            fitted = False
+        else:
+            # Forget the previous state before touching the mesh, so that a failed fit is never mistaken for a
+            # successful one later on
+            if state_key:
+                _FITTED_STATES.pop(state_key, None)
 
-        if mhclo.x_scale:
-            if mhclo.x_scale[0] >= human_vertices_count or mhclo.x_scale[1] > human_vertices_count \
-                or mhclo.y_scale[0] >= human_vertices_count or mhclo.y_scale[1] >= human_vertices_count \
-                or mhclo.z_scale[0] >= human_vertices_count or mhclo.z_scale[1] >= human_vertices_count:
-                _LOG.warn("Giving up refitting, not inside")
-                raise ValueError("Cannot refit as we are not inside")
+            if mhclo is None:
+                mhclo = ClothesService._load_mhclo_for_refit(clothes)
 
-            x_size = abs(human_vertices[mhclo.x_scale[0]].co[0] - human_vertices[mhclo.x_scale[1]].co[0]) / mhclo.x_scale[2]
-            y_size = abs(human_vertices[mhclo.y_scale[0]].co[2] - human_vertices[mhclo.y_scale[1]].co[2]) / mhclo.y_scale[2]
-            z_size = abs(human_vertices[mhclo.z_scale[0]].co[1] - human_vertices[mhclo.z_scale[1]].co[1]) / mhclo.z_scale[2]
+            if len(mhclo.get_binding_arrays()[0]) < 1:
+                raise ValueError('There is no vertex info in the MHCLO!?')
 
-        _LOG.debug("x_scale, y_scale, z_scale", (mhclo.x_scale, mhclo.y_scale, mhclo.z_scale))
-        _LOG.debug("x_size, y_size, z_size", (x_size, y_size, z_size))
+            mesh = mhclo.clothes.data
+            assert isinstance(mesh, bpy.types.Mesh)
 
-        mesh = mhclo.clothes.data
-        assert isinstance(mesh, bpy.types.Mesh)
+            clothes_coordinates, valid = ClothesService.calculate_fitted_clothes_coordinates(
+                mhclo, human_coordinates, scale_factor, len(mesh.vertices))
 
-        edit_bmesh = None
-        current_shape_settings = None
-        current_active_object = bpy.context.view_layer.objects.active
+            MeshService.set_vertex_coordinates_from_numpy_array(mhclo.clothes, clothes_coordinates, only_update_mask=valid)
 
-        # If the mesh has shape keys, switch to edit mode to update.
-        if mesh.shape_keys and len(mesh.shape_keys.key_blocks) > 0:
-            bpy.context.view_layer.objects.active = mhclo.clothes
+            if state_key:
+                bound_indices = ClothesService._get_bound_vertex_indices(mhclo, len(human_coordinates))
+                _FITTED_STATES[state_key] = (bound_indices, human_coordinates[bound_indices], scale_factor)
+                while len(_FITTED_STATES) > _MAX_FITTED_STATES:
+                    _FITTED_STATES.popitem(last=False)
+            fitted = True
 
-            current_shape_settings = (mhclo.clothes.active_shape_key_index,
-                                      mhclo.clothes.use_shape_key_edit_mode,
-                                      mhclo.clothes.show_only_shape_key)
+        # We need to take into account that the base mesh might be rigged. If it is, we'll want the rig position
+        # rather than the basemesh position
+        if set_parent:
+            if basemesh.parent:
+                clothes.location = (0.0, 0.0, 0.0)
+                clothes.parent = basemesh.parent
+            else:
+                clothes.location = basemesh.location
 
-            mhclo.clothes.active_shape_key_index = 0
-            mhclo.clothes.use_shape_key_edit_mode = True
-            mhclo.clothes.show_only_shape_key = True
+        return fitted
 
-            bpy.ops.object.mode_set(mode='EDIT', toggle=False)
-            assert mhclo.clothes.mode == 'EDIT'
+    @staticmethod
+    def _load_mhclo_for_refit(clothes):
+        mhclo_fragment = GeneralObjectProperties.get_value("asset_source", entity_reference=clothes)
+        object_type = ObjectService.get_object_type(clothes)
+
+        if mhclo_fragment and object_type:
+            mhclo_path = AssetService.find_asset_absolute_path(mhclo_fragment, str(object_type).lower())
+            if not mhclo_path:
+                raise IOError(mhclo_fragment + " does not exist")
+            if not os.path.exists(mhclo_path):
+                raise IOError(mhclo_path + " does not exist")
+            mhclo = Mhclo()
+            mhclo.load(mhclo_path)
+        else:
+            raise ValueError('There is not enough info to refit this asset, at least asset source and object type is needed')
+        mhclo.clothes = clothes
+        return mhclo
 
-            edit_bmesh = bmesh.from_edit_mesh(mesh)
-            clothes_vertices = edit_bmesh.verts
+    @staticmethod
+    def _get_fitted_state_key(clothes):
+        """Return a key identifying the clothes object in _FITTED_STATES, or None if the object has neither a uuid
+        nor an asset source, in which case its fitted state is not remembered."""
+        uuid_value = GeneralObjectProperties.get_value("uuid", entity_reference=clothes)
+        asset_source = GeneralObjectProperties.get_value("asset_source", entity_reference=clothes)
+        if not uuid_value and not asset_source:
+            return None
+        return (uuid_value, asset_source, clothes.session_uid)
 
-        else:
-            clothes_vertices = mesh.vertices
+    @staticmethod
+    def _get_bound_vertex_indices(mhclo, number_of_human_vertices):
+        """Return the indices of all base mesh vertices which the fitted position of the clothes depend on, ie
+        the vertices in the bindings and the vertices used for measuring the scale."""
+        indices = [mhclo.get_binding_arrays()[0].ravel()]
+        for scale in (mhclo.x_scale, mhclo.y_scale, mhclo.z_scale):
+            if scale:
+                indices.append(numpy.array(scale[:2]))
+        indices = numpy.unique(numpy.concatenate(indices).astype(numpy.int64))
+        return indices[indices < number_of_human_vertices]
 
-        _LOG.debug("About to try to match vertices: ", len(clothes_vertices))
-        _LOG.dump("Verts", mhclo.verts)
+    @staticmethod
+    def _bound_coordinates_unchanged(fitted_state, human_coordinates, scale_factor):
+        (bound_indices, bound_coordinates, fitted_scale_factor) = fitted_state
+        if fitted_scale_factor != scale_factor or len(bound_indices) < 1 or bound_indices[-1] >= len(human_coordinates):
+            return False
+        difference = numpy.abs(human_coordinates[bound_indices] - bound_coordinates).max()
+        return difference < _REFIT_TOLERANCE
 
-        for clothes_vertex_number, clothes_vertex in enumerate(clothes_vertices):
-            vertex_match_info = mhclo.verts[clothes_vertex_number]
-            _LOG.dump("Vertex match info", (clothes_vertex_number, vertex_match_info))
-            (human_vertex1, human_vertex2, human_vertex3) = vertex_match_info["verts"]
+    @staticmethod
+    def calculate_fitted_clothes_coordinates(mhclo, human_coordinates, scale_factor, number_of_clothes_vertices):
+        """
+        Calculate where the clothes vertices should be, given the current coordinates of the base mesh.
 
-            # test if we inside mesh, if not, no chance
-            #
-            if human_vertex1 >= human_vertices_count or human_vertex2 > human_vertices_count or human_vertex3 >= human_vertices_count:
-                continue
+        Each clothes vertex is positioned as the weighted sum of three base mesh vertices plus a scaled offset,
+        as specified by the bindings in the MHCLO.
 
-            offset = [vertex_match_info["offsets"][0] * x_size, vertex_match_info["offsets"][1] * z_size, vertex_match_info["offsets"][2] * y_size]
-            clothes_vertex.co = \
-                vertex_match_info["weights"][0] * human_vertices[human_vertex1].co + \
-                vertex_match_info["weights"][1] * human_vertices[human_vertex2].co + \
-                vertex_match_info["weights"][2] * human_vertices[human_vertex3].co + \
-                Vector(offset)
+        Args:
+            mhclo (Mhclo): The MHCLO with the vertex bindings.
+            human_coordinates (numpy.ndarray): A (V, 3) array with the current (shape keyed) base mesh coordinates.
+            scale_factor (float): The scale factor of the base mesh, used if the MHCLO does not specify scale references.
+            number_of_clothes_vertices (int): The number of vertices in the clothes mesh.
 
-        if edit_bmesh:
-            bmesh.update_edit_mesh(mesh, destructive=False)
+        Returns:
+            tuple: A (number_of_clothes_vertices, 3) float32 array with coordinates, and a boolean array which is False for
+                   vertices which could not be fitted since they refer to base mesh vertices which do not exist.
+        """
+        indices, weights, offsets = mhclo.get_binding_arrays()
+        human_vertices_count = len(human_coordinates)
 
-            bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+        if number_of_clothes_vertices > len(indices):
+            raise ValueError("The clothes mesh has more vertices than the MHCLO has bindings")
 
-            (mhclo.clothes.active_shape_key_index,
-             mhclo.clothes.use_shape_key_edit_mode,
-             mhclo.clothes.show_only_shape_key) = current_shape_settings
+        indices = indices[:number_of_clothes_vertices]
+        weights = weights[:number_of_clothes_vertices]
+        offsets = offsets[:number_of_clothes_vertices]
 
-            bpy.context.view_layer.objects.active = current_active_object
+        # Fallback for if no scale is specified in mhclo
+        z_size = y_size = x_size = scale_factor
 
-        # We need to take into account that the base mesh might be rigged. If it is, we'll want the rig position
-        # rather than the basemesh position
-        if set_parent:
-            if basemesh.parent:
-                clothes.location = (0.0, 0.0, 0.0)
-                clothes.parent = basemesh.parent
-            else:
-                clothes.location = basemesh.location
+        if mhclo.x_scale:
+            if mhclo.x_scale[0] >= human_vertices_count or mhclo.x_scale[1] > human_vertices_count \
+                or mhclo.y_scale[0] >= human_vertices_count or mhclo.y_scale[1] >= human_vertices_count \
+                or mhclo.z_scale[0] >= human_vertices_count or mhclo.z_scale[1] >= human_vertices_count:
+                _LOG.warn("Giving up refitting, not inside")
+                raise ValueError("Cannot refit as we are not inside")
+
+            x_size = abs(human_coordinates[mhclo.x_scale[0]][0] - human_coordinates[mhclo.x_scale[1]][0]) / mhclo.x_scale[2]
+            y_size = abs(human_coordinates[mhclo.y_scale[0]][2] - human_coordinates[mhclo.y_scale[1]][2]) / mhclo.y_scale[2]
+            z_size = abs(human_coordinates[mhclo.z_scale[0]][1] - human_coordinates[mhclo.z_scale[1]][1]) / mhclo.z_scale[2]
+
+        _LOG.debug("x_scale, y_scale, z_scale", (mhclo.x_scale, mhclo.y_scale, mhclo.z_scale))
+        _LOG.debug("x_size, y_size, z_size", (x_size, y_size, z_size))
+
+        # Vertices which refer to base mesh vertices that do not exist (for example deleted helpers) cannot be fitted
+        valid = numpy.all(indices < human_vertices_count, axis=1)
+        safe_indices = numpy.where(valid[:, None], indices, 0)
 
-        # As we are finished with the combined shape key we can now remove it
-        basemesh.shape_key_remove(shape_key)
+        coordinates = numpy.einsum("nk,nkc->nc", weights, human_coordinates[safe_indices])
+        coordinates += offsets * numpy.array([x_size, z_size, y_size], dtype=numpy.float32)
+
+        return coordinates.astype(numpy.float32), valid
 
     @staticmethod
     def _conservative_mask(basemesh, vertices_list):
@@ -423,107 +467,177 @@ class ClothesService:
         return new_vert_group
 
     @staticmethod
-    def interpolate_weights(basemesh, clothes, rig, mhclo):
+    def interpolate_weights(basemesh, clothes, rig, mhclo, *, basemesh_weights=None):
         """Try to copy rigging weights from the base mesh to the clothes mesh, hopefully
-        making the clothes fit the provided rig."""
+        making the clothes fit the provided rig.
 
-        # Create an empty outline with placeholders arrays that will contain lists of
-        # vertices + weights per vertex group
-        clothes_weights = dict()
-        for bone in rig.data.bones:
-            # The vertex groups have the same names as the bones
-            clothes_weights[str(bone.name)] = []
-
-        # Build cross reference dicts to easily map between a vertex group index and
-        # a vertex group name
-        group_name_to_index = dict()
-        group_index_to_name = dict()
+        Args:
+            basemesh (bpy.types.Object): The base mesh to copy weights from.
+            clothes (bpy.types.Object): The clothes mesh to create vertex groups on.
+            rig (bpy.types.Object): The armature whose bones decide which groups to copy.
+            mhclo (Mhclo): The mhclo object binding the clothes to the base mesh.
+            basemesh_weights (tuple, optional): A precalculated result of get_basemesh_weight_matrix(), to
+                avoid reading the base mesh weights again when rigging several assets for the same character.
+                If not given, only the weights of the base mesh vertices the clothes are bound to are read.
+        """
+
+        binding_indices, binding_weights, _ = mhclo.get_binding_arrays()
+
+        if basemesh_weights is None:
+            basemesh_weights = ClothesService.get_basemesh_weight_matrix(basemesh, rig, vertex_indices=binding_indices)
+
+        group_names, offsets, group_indices, group_weights = basemesh_weights
+
+        clothes_weights = ClothesService.calculate_interpolated_weights(
+            offsets, group_indices, group_weights, binding_indices, binding_weights)
+
+        # Create the vertex groups in the same order as the groups of the base mesh. There
+        # is no need to create a vertex group if no weights were found for it. For example,
+        # it is unnecessary to have an "upperarm02" group for shoes.
+        for group_position, group_name in enumerate(group_names):
+            if group_position in clothes_weights:
+                vertex_indices, weights = clothes_weights[group_position]
+                new_vert_group = clothes.vertex_groups.new(name=str(group_name))
+                MeshService.add_weights_to_vertex_group(new_vert_group, vertex_indices, weights, mode='REPLACE')
+
+    @staticmethod
+    def get_basemesh_weight_matrix(basemesh, rig, vertex_indices=None):
+        """Read the base mesh weights which are relevant for interpolating clothes weights, as a
+        sparse vertices x groups matrix.
+
+        Relevant groups are those named as a bone in the rig, rigify deform groups and masks.
+
+        Args:
+            basemesh (bpy.types.Object): The base mesh to read weights from.
+            rig (bpy.types.Object): The armature whose bones decide which groups are relevant.
+            vertex_indices (numpy.ndarray, optional): If given, only the rows of these vertices are read
+                and all other rows are left empty. This is much faster for assets bound to a small part of
+                the base mesh.
+
+        Returns:
+            tuple: (group_names, offsets, group_indices, weights), where group_names is a list of names
+            and the rest is a CSR matrix where group_indices refer to positions in group_names.
+        """
+        bone_names = set(str(bone.name) for bone in rig.data.bones)
+
+        # Keep the group order of the original implementation: bones first, then forced groups
+        ordered_names = [str(bone.name) for bone in rig.data.bones]
         for group in basemesh.vertex_groups:
             # Force interpolation of rigify deform groups or masks even if no bone in metarig
             if group.name.startswith("DEF-") or group.name.startswith("mhmask-"):
-                clothes_weights[str(group.name)] = []
+                if str(group.name) not in bone_names:
+                    ordered_names.append(str(group.name))
 
-            if str(group.name) in clothes_weights:
-                group_name_to_index[str(group.name)] = group.index
-                group_index_to_name[int(group.index)] = str(group.name)
+        existing = dict((str(group.name), int(group.index)) for group in basemesh.vertex_groups)
+        group_names = [name for name in dict.fromkeys(ordered_names) if name in existing]
 
-        # We will now iterate over the vertices in the clothes. The idea is to then
-        # look up the vertices on the human that the clothes vertex is tied to. This
-        # information is provided in the mhclo object.
-        #
-        # For each mapping of clothes vertex to human vertex we also have a weight,
-        # so that clothes vertex 1 might be 20% tied to human vertex 1 and 40% tied to
-        # human vertex 2 and so on.
-        #
-        # By multiplying that weight with the vertex group weight of the human vertex, we
-        # get the interpolated vertex group weight for the clothes vertex.
-        for vert_number in range(len(mhclo.verts)):
-            clothes_vert = mhclo.verts[vert_number]
-            groups = dict()
-            for match_vert in range(3):
-                # Which human vert is the clothes vert tied to?
-                human_vert = basemesh.data.vertices[clothes_vert["verts"][match_vert]]
-
-                # .. and by how much?
-                assigned_weight = clothes_vert["weights"][match_vert]
-
-                # Iterate over all vertex groups the human vert belongs to
-                for group in human_vert.groups:
-                    idx = group.group
-                    if idx in group_index_to_name:
-                        if not idx in groups:
-                            groups[idx] = 0
-                        # Add the calculated weight to the list of found weights
-                        #
-                        # Human vertex group weight * Human vertex weight
-                        groups[idx] += group.weight * assigned_weight
-
-            # Iterate over all found vertex groups for the current clothes vertex
-            # and calculcate the average weight for each group
-            for idx in groups.keys():
-                average_weight = groups[idx] / sum(clothes_vert["weights"])
-                # If the caculated average weight is below 0.001 we will ignore it. This
-                # makes the interpolation much faster later on
-                if average_weight > 0.001:
-                    group_name = group_index_to_name[int(idx)]
-                    clothes_weights[group_name].append([vert_number, average_weight])
-
-        # We now have a finished map with all weights. We will iterate over this
-        # and convert each weight array to a vertex group on the clothes, and then
-        # set the vertex weights in it
-        for group_name in clothes_weights.keys():
-            # Weights is an array looking like [ [vert_index, weight], [vert_index, weight]...]
-            weights = clothes_weights[group_name]
-
-            # No need to create a vertex group if no weights were found for it. For example,
-            # it is unnecessary to have an "upperarm02" group for shoes.
-            if len(weights) > 0:
-                # We want the vertex indices as a list. By using zip we can rotate the array
-                # so that columns become rows
-                rotated = zip(*weights)
-
-                # We can now get the indices from the first column
-                indices = list(rotated)[0]
-
-                # Create a vertex group and add all vertices to it, with a weight of 1.0.
-                # It is much faster to to it like this and then update the weights than
-                # adding the vertices one by one with its weight
-                new_vert_group = clothes.vertex_groups.new(name=str(group_name))
-                new_vert_group.add(indices, 1.0, 'ADD')
-                group_index = new_vert_group.index
+        blender_to_position = numpy.full(max(existing.values(), default=-1) + 1, -1, dtype=numpy.int32)
+        for position, name in enumerate(group_names):
+            blender_to_position[existing[name]] = position
+
+        offsets, group_indices, weights = MeshService.get_vertex_group_weights_as_csr(
+            basemesh, only_group_indices=[existing[name] for name in group_names], only_vertex_indices=vertex_indices)
+
+        if len(group_indices) > 0:
+            group_indices = blender_to_position[group_indices]
+
+        return group_names, offsets, group_indices, weights
+
+    @staticmethod
+    def calculate_interpolated_weights(offsets, group_indices, group_weights, binding_indices, binding_weights, *, cutoff=0.001):
+        """Calculate clothes vertex weights as the product of the mhclo binding matrix and a sparse base mesh weight matrix.
+
+        Each clothes vertex is tied to three base mesh vertices with a weight each. The weight of the clothes
+        vertex in a group is the bound-weighted average of the group weights of those base mesh vertices.
+
+        Args:
+            offsets (numpy.ndarray): CSR row offsets for the base mesh weight matrix.
+            group_indices (numpy.ndarray): CSR column (group) indices.
+            group_weights (numpy.ndarray): CSR values.
+            binding_indices (numpy.ndarray): (N, 3) base mesh vertex indices per clothes vertex.
+            binding_weights (numpy.ndarray): (N, 3) binding weights per clothes vertex.
+            cutoff (float, optional): Weights at or below this value are dropped. Defaults to 0.001.
+
+        Returns:
+            dict: A dict with group index as key and a tuple (clothes vertex indices, weights) as value.
+        """
+        offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        group_indices = numpy.asarray(group_indices, dtype=numpy.int64)
+        group_weights = numpy.asarray(group_weights, dtype=numpy.float64)
+        binding_indices = numpy.asarray(binding_indices, dtype=numpy.int64).reshape((-1, 3))
+        binding_weights = numpy.asarray(binding_weights, dtype=numpy.float64).reshape((-1, 3))
+
+        number_of_clothes_verts = len(binding_indices)
+        number_of_groups = int(group_indices.max()) + 1 if len(group_indices) > 0 else 0
+
+        if number_of_clothes_verts < 1 or number_of_groups < 1:
+            return dict()
+
+        # Flatten the (clothes vertex, base mesh vertex, binding weight) triplets, ignoring references
+        # to base mesh vertices which do not exist
+        clothes_verts = numpy.repeat(numpy.arange(number_of_clothes_verts, dtype=numpy.int64), 3)
+        human_verts = binding_indices.ravel()
+        bound_weights = binding_weights.ravel()
+
+        valid = (human_verts >= 0) & (human_verts < len(offsets) - 1)
+        clothes_verts = clothes_verts[valid]
+        human_verts = human_verts[valid]
+        bound_weights = bound_weights[valid]
+
+        # Expand each triplet into one entry per group membership of the base mesh vertex
+        starts = offsets[human_verts]
+        counts = offsets[human_verts + 1] - starts
+        total = int(counts.sum())
+
+        if total < 1:
+            return dict()
+
+        run_starts = numpy.cumsum(counts) - counts
+        positions = numpy.repeat(starts - run_starts, counts) + numpy.arange(total, dtype=numpy.int64)
+
+        entry_clothes_verts = numpy.repeat(clothes_verts, counts)
+        entry_groups = group_indices[positions]
+        entry_weights = group_weights[positions] * numpy.repeat(bound_weights, counts)
+
+        # Sum the entries per (clothes vertex, group)
+        keys = entry_clothes_verts * number_of_groups + entry_groups
+        unique_keys, inverse = numpy.unique(keys, return_inverse=True)
+        sums = numpy.bincount(inverse.ravel(), weights=entry_weights, minlength=len(unique_keys))
+
+        result_clothes_verts = unique_keys // number_of_groups
+        result_groups = unique_keys % number_of_groups
+
+        weight_sums = binding_weights.sum(axis=1)[result_clothes_verts]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            average_weights = numpy.where(weight_sums != 0.0, sums / weight_sums, 0.0)
+
+        # If the calculated average weight is below the cutoff we will ignore it. This
+        # makes the interpolation much faster later on
+        keep = average_weights > cutoff
+        result_clothes_verts = result_clothes_verts[keep]
+        result_groups = result_groups[keep]
+        average_weights = average_weights[keep]
+
+        # unique_keys is sorted by clothes vertex first, so a stable sort by group keeps
+        # the vertex order within each group
+        order = numpy.argsort(result_groups, kind="stable")
+        result_clothes_verts = result_clothes_verts[order]
+        result_groups = result_groups[order]
+        average_weights = average_weights[order]
+
+        clothes_weights = dict()
+        groups, group_starts = numpy.unique(result_groups, return_index=True)
+        group_ends = numpy.append(group_starts[1:], len(result_groups))
+        for group, start, end in zip(groups, group_starts, group_ends):
+            clothes_weights[int(group)] = (result_clothes_verts[start:end], average_weights[start:end])
 
-                # Iterate over the weights and update the vertex weights in the group
-                for weight_info in weights:
-                    vertex_index = weight_info[0]
-                    weight = weight_info[1]
-                    for group in clothes.data.vertices[vertex_index].groups:
-                        if int(group.group) == group_index:
-                            group.weight = weight
+        return clothes_weights
 
     @staticmethod
     def set_up_rigging(basemesh, clothes, rig, mhclo, *,
-                       interpolate_weights=True, import_subrig=True, import_weights=True):
-        """Set up weights and a custom sub-rig for the given clothes object."""
+                       interpolate_weights=True, import_subrig=True, import_weights=True, basemesh_weights=None):
+        """Set up weights and a custom sub-rig for the given clothes object. basemesh_weights is passed on to
+        interpolate_weights()."""
 
         subrig = None
 
@@ -549,7 +663,7 @@ class ClothesService:
             clothes.parent = rig
 
         if interpolate_weights:
-            ClothesService.interpolate_weights(basemesh, clothes, rig, mhclo)
+            ClothesService.interpolate_weights(basemesh, clothes, rig, mhclo, basemesh_weights=basemesh_weights)
 
         if import_weights:
             ClothesService.load_custom_weights(clothes, rig, subrig, mhclo)
@@ -686,9 +800,8 @@ class ClothesService:
         report["all_checks_ok"] = all_ok
 
         cache_dir = LocationService.get_user_cache("basemesh_xref")
-        read_cache = os.path.exists(cache_dir)
 
-        basemesh_xref = MeshCrossRef(basemesh, after_modifiers=True, build_faces_by_group_reference=True, cache_dir=cache_dir, write_cache=False, read_cache=read_cache)
+        basemesh_xref = MeshCrossRef(basemesh, after_modifiers=True, build_faces_by_group_reference=True, cache_dir=cache_dir, write_cache=True, read_cache=True)
 
         for group_name in paired_groups:
             group_idx = basemesh_xref.group_name_to_group_index[group_name]
@@ -717,10 +830,9 @@ class ClothesService:
                     setattr(mhclo, name, value)
 
         cache_dir = LocationService.get_user_cache("basemesh_xref")
-        read_cache = os.path.exists(cache_dir)
 
         before = time.time()
-        basemesh_xref = MeshCrossRef(basemesh, after_modifiers=True, build_faces_by_group_reference=True, cache_dir=cache_dir, write_cache=False, read_cache=read_cache)
+        basemesh_xref = MeshCrossRef(basemesh, after_modifiers=True, build_faces_by_group_reference=True, cache_dir=cache_dir, write_cache=True, read_cache=True)
         after = time.time()
         duration = int((after - before) * 1000.0)
         _LOG.debug("basemesh xref duration", duration)
@@ -744,13 +856,9 @@ class ClothesService:
             mhclo.max_pole = max_pole
 
         before = time.time()
+        vmatch = BatchVertexMatch(clothes, clothes_xref, basemesh, basemesh_xref, scale_factor=scale_factor, reference_scale=reference_scale)
         for vert in range(len(clothes_xref.vertex_coordinates)):
-            before_internal = time.time()
-            vmatch = VertexMatch(clothes, vert, clothes_xref, basemesh, basemesh_xref, scale_factor=scale_factor, reference_scale=reference_scale)
-            after_internal = time.time()
-            duration_internal = int((after_internal - before_internal) * 1000.0)
-            _LOG.dump("vmatch", (duration_internal, vmatch.final_strategy))
-            mhclo.verts[vert] = vmatch.mhclo_line
+            mhclo.verts[vert] = vmatch.mhclo_lines[vert]
         after = time.time()
         duration = int((after - before) * 1000.0)
         _LOG.debug("vert matching total", duration)
@@ -1,6 +1,6 @@
 """High-level functionality for human objects"""
 
-import os, json, fnmatch, re, bpy, shutil
+import os, json, fnmatch, re, bpy, shutil, time
 from pathlib import Path
 from .logservice import LogService
 from .objectservice import ObjectService
@@ -26,6 +26,15 @@ _LOG = LogService.get_logger("services.humanservice")
 
 _EXISTING_PRESETS = None
 
+_MHM_ASSET_INDEX = dict()
+_MHCLO_METADATA = None
+_MHCLO_METADATA_DIRTY = False
+_MHCLO_METADATA_FILE = os.path.join(LocationService.get_user_cache("mhm_asset_index"), "mhclo_metadata.json")
+_MHCLO_METADATA_VERSION = "1"
+
+# Names of basemeshes with a pending scheduled refit, mapped to the time (as per time.monotonic()) when it is due
+_PENDING_REFITS = dict()
+
 
 class HumanService:
     """
@@ -448,7 +457,7 @@ class HumanService:
     @staticmethod
     def add_mhclo_asset(mhclo_file, basemesh, asset_type="Clothes", subdiv_levels=1, material_type="MAKESKIN",
                         alternative_materials=None, color_adjustments=None,
-                        set_up_rigging=True, interpolate_weights=True, import_subrig=True, import_weights=True):
+                        set_up_rigging=True, interpolate_weights=True, import_subrig=True, import_weights=True, basemesh_weights=None):
         """
         Adds an MHCLO asset to the given basemesh.
 
@@ -464,6 +473,8 @@ class HumanService:
             interpolate_weights (bool): Whether to interpolate weights for the asset. Default is True.
             import_subrig (bool): Whether to import sub-rigs for the asset. Default is True.
             import_weights (bool): Whether to import weights for the asset. Default is True.
+            basemesh_weights (tuple): A precalculated result of ClothesService.get_basemesh_weight_matrix(), to share
+                between several assets added to the same basemesh. Default is None.
 
         Returns:
             The mhclo object that was added to the basemesh.
@@ -585,7 +596,7 @@ class HumanService:
         if rig and set_up_rigging:
             ClothesService.set_up_rigging(
                 basemesh, clothes, rig, mhclo, interpolate_weights=interpolate_weights,
-                import_subrig=import_subrig, import_weights=import_weights)
+                import_subrig=import_subrig, import_weights=import_weights, basemesh_weights=basemesh_weights)
         else:
             clothes.parent = basemesh
 
@@ -612,7 +623,21 @@ class HumanService:
             rig.name = human_info["name"]
 
     @staticmethod
-    def _check_add_bodyparts(human_info, basemesh, subdiv_levels=1, material_model=None, eyes_material_model=None):
+    def _get_basemesh_weights_for_assets(human_info, basemesh, load_clothes):
+        rig = ObjectService.find_object_of_type_amongst_nearest_relatives(basemesh, "Skeleton")
+        if not rig:
+            return None
+        asset_keys = ["eyes", "eyelashes", "eyebrows", "tongue", "teeth", "hair", "proxy"]
+        number_of_assets = len([key for key in asset_keys if key in human_info and human_info[key]])
+        if load_clothes and "clothes" in human_info:
+            number_of_assets += len(human_info["clothes"])
+        if number_of_assets < 2:
+            # A single asset is faster to rig by reading only the vertices it is bound to
+            return None
+        return ClothesService.get_basemesh_weight_matrix(basemesh, rig)
+
+    @staticmethod
+    def _check_add_bodyparts(human_info, basemesh, subdiv_levels=1, material_model=None, eyes_material_model=None, basemesh_weights=None):
         for bodypart in ["eyes", "eyelashes", "eyebrows", "tongue", "teeth", "hair"]:
             if bodypart in human_info and not human_info[bodypart] is None and not str(human_info[bodypart]).strip() == "":
                 asset_filename = human_info[bodypart]
@@ -632,37 +657,35 @@ class HumanService:
                     colors = None
                     if "color_adjustments" in human_info:
                         colors = human_info["color_adjustments"]
-                    HumanService.add_mhclo_asset(asset_absolute_path, basemesh, asset_type=bodypart, subdiv_levels=subdiv_levels, material_type=material, alternative_materials=human_info["alternative_materials"], color_adjustments=colors)
+                    HumanService.add_mhclo_asset(asset_absolute_path, basemesh, asset_type=bodypart, subdiv_levels=subdiv_levels, material_type=material, alternative_materials=human_info["alternative_materials"], color_adjustments=colors, basemesh_weights=basemesh_weights)
                 else:
                     _LOG.warn("Could not locate bodypart", (bodypart, asset_filename))
 
     @staticmethod
-    def _check_add_clothes(human_info, basemesh, subdiv_levels=1, material_model=None):
+    def _check_add_clothes(human_info, basemesh, subdiv_levels=1, material_model=None, basemesh_weights=None):
         profiler = PrimitiveProfiler("HumanService")
-        profiler.enter("_check_add_clothes")
-        if not "clothes" in human_info:
-            profiler.leave("_check_add_clothes")
-            return
-        for asset_filename in human_info["clothes"]:
-            _LOG.debug("A clothes asset was specified", asset_filename)
-            asset_absolute_path = AssetService.find_asset_absolute_path(asset_filename, asset_subdir="clothes")
-            _LOG.debug("Asset absolute path", asset_absolute_path)
-            material = "MAKESKIN"
-            if "clothes_material_type" in human_info and human_info["clothes_material_type"]:
-                material = human_info["clothes_material_type"]
-            if material_model:
-                material = material_model
-            if asset_absolute_path is not None:
-                colors = None
-                if "color_adjustments" in human_info:
-                    colors = human_info["color_adjustments"]
-                HumanService.add_mhclo_asset(asset_absolute_path, basemesh, asset_type="clothes", subdiv_levels=subdiv_levels, material_type=material, alternative_materials=human_info["alternative_materials"], color_adjustments=colors)
-            else:
-                _LOG.warn("Could not locate clothes", asset_filename)
-        profiler.leave("_check_add_clothes")
+        with profiler.span("_check_add_clothes"):
+            if not "clothes" in human_info:
+                return
+            for asset_filename in human_info["clothes"]:
+                _LOG.debug("A clothes asset was specified", asset_filename)
+                asset_absolute_path = AssetService.find_asset_absolute_path(asset_filename, asset_subdir="clothes")
+                _LOG.debug("Asset absolute path", asset_absolute_path)
+                material = "MAKESKIN"
+                if "clothes_material_type" in human_info and human_info["clothes_material_type"]:
+                    material = human_info["clothes_material_type"]
+                if material_model:
+                    material = material_model
+                if asset_absolute_path is not None:
+                    colors = None
+                    if "color_adjustments" in human_info:
+                        colors = human_info["color_adjustments"]
+                    HumanService.add_mhclo_asset(asset_absolute_path, basemesh, asset_type="clothes", subdiv_levels=subdiv_levels, material_type=material, alternative_materials=human_info["alternative_materials"], color_adjustments=colors, basemesh_weights=basemesh_weights)
+                else:
+                    _LOG.warn("Could not locate clothes", asset_filename)
 
     @staticmethod
-    def _check_add_proxy(human_info, basemesh, subdiv_levels=1):
+    def _check_add_proxy(human_info, basemesh, subdiv_levels=1, basemesh_weights=None):
         if not "proxy" in human_info:
             _LOG.warn("Did not find proxy key in human_info")
             return
@@ -675,7 +698,7 @@ class HumanService:
         _LOG.debug("Asset absolute path", asset_absolute_path)
 
         if not asset_absolute_path is None:
-            proxy_object = HumanService.add_mhclo_asset(asset_absolute_path, basemesh, asset_type="Proxymeshes", subdiv_levels=subdiv_levels, material_type="NONE")
+            proxy_object = HumanService.add_mhclo_asset(asset_absolute_path, basemesh, asset_type="Proxymeshes", subdiv_levels=subdiv_levels, material_type="NONE", basemesh_weights=basemesh_weights)
             if proxy_object and "name" in human_info and human_info["name"]:
                 proxy_object.name = human_info["name"] + "." + proxy_object.name
             modifier = basemesh.modifiers.new("Hide base mesh", 'MASK')
@@ -910,14 +933,10 @@ class HumanService:
     @staticmethod
     def _load_targets(human_info, basemesh):
         profiler = PrimitiveProfiler("HumanService")
-        profiler.enter("_load_targets")
-
-        if not "targets" in human_info:
-            profiler.leave("_load_targets")
-            return
-        TargetService.bulk_load_targets(basemesh, human_info["targets"])
-
-        profiler.leave("_load_targets")
+        with profiler.span("_load_targets"):
+            if not "targets" in human_info:
+                return
+            TargetService.bulk_load_targets(basemesh, human_info["targets"])
 
     @staticmethod
     def deserialize_from_dict(human_info, deserialization_settings):
@@ -938,105 +957,116 @@ class HumanService:
         _LOG.debug("Deserialization settings", deserialization_settings)
 
         profiler = PrimitiveProfiler("HumanService")
-        profiler.enter("deserialize_from_dict")
-
-        mask_helpers = deserialization_settings["mask_helpers"]
-        detailed_helpers = deserialization_settings["detailed_helpers"]
-        extra_vertex_groups = deserialization_settings["extra_vertex_groups"]
-        feet_on_ground = deserialization_settings["feet_on_ground"]
-        scale = deserialization_settings["scale"]
-        subdiv_levels = deserialization_settings["subdiv_levels"]
-        load_clothes = deserialization_settings["load_clothes"]
-        material_instances = deserialization_settings["material_instances"]
-
-        if material_instances:
-            human_info["material_instances"] = material_instances
-        else:
-            human_info["material_instances"] = "NEVER"
-
-        if human_info is None:
-            raise ValueError('Cannot use None as human_info')
-        if len(human_info.keys()) < 1:
-            raise ValueError('The provided dict does not seem to be a valid human_info')
-
-        override_clothes_model = None
-        if "override_clothes_model" in deserialization_settings:
-            override_clothes_model = deserialization_settings["override_clothes_model"]
-        if override_clothes_model == "PRESET":
-            if "override_clothes_model" in human_info:
-                override_clothes_model = human_info["override_clothes_model"]
-            else:
-                override_clothes_model = None
-
-        override_eyes_model = None
-        if "override_eyes_model" in deserialization_settings:
-            override_eyes_model = deserialization_settings["override_eyes_model"]
-        if override_eyes_model == "PRESET":
-            if "override_eyes_model" in human_info:
-                override_eyes_model = human_info["override_eyes_model"]
+        with profiler.span("deserialize_from_dict"):
+            mask_helpers = deserialization_settings["mask_helpers"]
+            detailed_helpers = deserialization_settings["detailed_helpers"]
+            extra_vertex_groups = deserialization_settings["extra_vertex_groups"]
+            feet_on_ground = deserialization_settings["feet_on_ground"]
+            scale = deserialization_settings["scale"]
+            subdiv_levels = deserialization_settings["subdiv_levels"]
+            load_clothes = deserialization_settings["load_clothes"]
+            material_instances = deserialization_settings["material_instances"]
+
+            if material_instances:
+                human_info["material_instances"] = material_instances
             else:
-                override_eyes_model = None
-
-        _LOG.dump("human_info", human_info)
-
-        if not "alternative_materials" in human_info:
-            human_info["alternative_materials"] = dict()
-
-        if "override_rig" in deserialization_settings and deserialization_settings["override_rig"] and deserialization_settings["override_rig"] != "PRESET":
-            if deserialization_settings["override_rig"] == "NONE":
-                human_info["rig"] = ""
-            else:
-                human_info["rig"] = deserialization_settings["override_rig"]
-
-        if "override_skin_model" in deserialization_settings and deserialization_settings["override_skin_model"] and deserialization_settings["override_skin_model"] != "PRESET":
-            human_info["skin_material_type"] = deserialization_settings["override_skin_model"]
-
-        macro_detail_dict = human_info["phenotype"]
-        basemesh = HumanService.create_human(mask_helpers, detailed_helpers, extra_vertex_groups, feet_on_ground, scale, macro_detail_dict)
-        if "name" in human_info and human_info["name"]:
-            basemesh.name = human_info["name"] + ".body"
+                human_info["material_instances"] = "NEVER"
+
+            if human_info is None:
+                raise ValueError('Cannot use None as human_info')
+            if len(human_info.keys()) < 1:
+                raise ValueError('The provided dict does not seem to be a valid human_info')
+
+            override_clothes_model = None
+            if "override_clothes_model" in deserialization_settings:
+                override_clothes_model = deserialization_settings["override_clothes_model"]
+            if override_clothes_model == "PRESET":
+                if "override_clothes_model" in human_info:
+                    override_clothes_model = human_info["override_clothes_model"]
+                else:
+                    override_clothes_model = None
+
+            override_eyes_model = None
+            if "override_eyes_model" in deserialization_settings:
+                override_eyes_model = deserialization_settings["override_eyes_model"]
+            if override_eyes_model == "PRESET":
+                if "override_eyes_model" in human_info:
+                    override_eyes_model = human_info["override_eyes_model"]
+                else:
+                    override_eyes_model = None
 
-        if subdiv_levels > 0:
-            modifier = basemesh.modifiers.new("Subdivision", 'SUBSURF')
-            modifier.levels = 0
-            modifier.render_levels = subdiv_levels
+            _LOG.dump("human_info", human_info)
 
-        HumanService._load_targets(human_info, basemesh)
-        # Do an extra feet_on_ground here, since the one in create_human only
-        # takes macro details into account
-        if feet_on_ground:
-            lowest_point = ObjectService.get_lowest_point(basemesh)
-            basemesh.location = (0.0, 0.0, abs(lowest_point))
-            bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
-
-        HumanService._check_add_rig(human_info, basemesh)
-        HumanService._check_add_bodyparts(human_info, basemesh, subdiv_levels=subdiv_levels, material_model=override_clothes_model, eyes_material_model=override_eyes_model)
-        if "proxy" in human_info:
-            _LOG.debug("Proxy found, adding to basemesh", human_info["proxy"])
-        HumanService._check_add_proxy(human_info, basemesh, subdiv_levels=subdiv_levels)
-        proxy = ObjectService.find_object_of_type_amongst_nearest_relatives(basemesh, "Proxymeshes")
-        _LOG.debug("Proxy found after adding", proxy)
-        if load_clothes:
-            HumanService._check_add_clothes(human_info, basemesh, subdiv_levels=subdiv_levels, material_model=override_clothes_model)
-        HumanService._set_skin(human_info, basemesh)
-        HumanService._set_eyes(human_info, basemesh)
-
-        makeup = []
-        if "makeup" in human_info:
-            makeup = human_info["makeup"]
-        material = MaterialService.get_material(basemesh)
-        if material is not None and len(makeup) > 0:
-            material_type = MaterialService.identify_material(material)
-            _LOG.debug("Material type", material_type)
-            if material_type in ["layered_skin", "makeskin"]:
-                for ink_layer in makeup:
-                    ink_path = AssetService.find_asset_absolute_path(ink_layer, asset_subdir="ink_layers")
-                    MaterialService.load_ink_layer(basemesh, ink_path)
+            if not "alternative_materials" in human_info:
+                human_info["alternative_materials"] = dict()
 
-        # Otherwise all targets will be set to 100% when entering edit mode
-        basemesh.use_shape_key_edit_mode = True
+            if "override_rig" in deserialization_settings and deserialization_settings["override_rig"] and deserialization_settings["override_rig"] != "PRESET":
+                if deserialization_settings["override_rig"] == "NONE":
+                    human_info["rig"] = ""
+                else:
+                    human_info["rig"] = deserialization_settings["override_rig"]
+
+            if "override_skin_model" in deserialization_settings and deserialization_settings["override_skin_model"] and deserialization_settings["override_skin_model"] != "PRESET":
+                human_info["skin_material_type"] = deserialization_settings["override_skin_model"]
+
+            collapse_macro_targets = False
+            if "collapse_macro_targets" in deserialization_settings:
+                collapse_macro_targets = deserialization_settings["collapse_macro_targets"]
+
+            macro_detail_dict = human_info["phenotype"]
+            basemesh = HumanService.create_human(mask_helpers, detailed_helpers, extra_vertex_groups, feet_on_ground, scale, macro_detail_dict,
+                                                 collapse_macro_targets=collapse_macro_targets)
+            if "name" in human_info and human_info["name"]:
+                basemesh.name = human_info["name"] + ".body"
+
+            if subdiv_levels > 0:
+                modifier = basemesh.modifiers.new("Subdivision", 'SUBSURF')
+                modifier.levels = 0
+                modifier.render_levels = subdiv_levels
+
+            HumanService._load_targets(human_info, basemesh)
+            # Do an extra feet_on_ground here, since the one in create_human only
+            # takes macro details into account
+            if feet_on_ground:
+                lowest_point = ObjectService.get_lowest_point(basemesh)
+                basemesh.location = (0.0, 0.0, abs(lowest_point))
+                bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
+
+            with profiler.span("_check_add_rig"):
+                HumanService._check_add_rig(human_info, basemesh)
+
+            # All assets are rigged against the same base mesh weights, so only read them once
+            basemesh_weights = HumanService._get_basemesh_weights_for_assets(human_info, basemesh, load_clothes)
+
+            with profiler.span("_check_add_bodyparts"):
+                HumanService._check_add_bodyparts(human_info, basemesh, subdiv_levels=subdiv_levels, material_model=override_clothes_model, eyes_material_model=override_eyes_model, basemesh_weights=basemesh_weights)
+            if "proxy" in human_info:
+                _LOG.debug("Proxy found, adding to basemesh", human_info["proxy"])
+            with profiler.span("_check_add_proxy"):
+                HumanService._check_add_proxy(human_info, basemesh, subdiv_levels=subdiv_levels, basemesh_weights=basemesh_weights)
+            proxy = ObjectService.find_object_of_type_amongst_nearest_relatives(basemesh, "Proxymeshes")
+            _LOG.debug("Proxy found after adding", proxy)
+            if load_clothes:
+                HumanService._check_add_clothes(human_info, basemesh, subdiv_levels=subdiv_levels, material_model=override_clothes_model, basemesh_weights=basemesh_weights)
+            with profiler.span("_set_skin"):
+                HumanService._set_skin(human_info, basemesh)
+            with profiler.span("_set_eyes"):
+                HumanService._set_eyes(human_info, basemesh)
+
+            makeup = []
+            if "makeup" in human_info:
+                makeup = human_info["makeup"]
+            material = MaterialService.get_material(basemesh)
+            if material is not None and len(makeup) > 0:
+                material_type = MaterialService.identify_material(material)
+                _LOG.debug("Material type", material_type)
+                if material_type in ["layered_skin", "makeskin"]:
+                    for ink_layer in makeup:
+                        ink_path = AssetService.find_asset_absolute_path(ink_layer, asset_subdir="ink_layers")
+                        MaterialService.load_ink_layer(basemesh, ink_path)
 
-        profiler.leave("deserialize_from_dict")
+            # Otherwise all targets will be set to 100% when entering edit mode
+            basemesh.use_shape_key_edit_mode = True
 
         return basemesh
 
@@ -1060,7 +1090,8 @@ class HumanService:
             "load_clothes": True,
             "override_skin_model": "PRESET",
             "override_rig": "PRESET",
-            "material_instances": "NEVER"
+            "material_instances": "NEVER",
+            "collapse_macro_targets": False
             }
 
     @staticmethod
@@ -1092,207 +1123,251 @@ class HumanService:
     @staticmethod
     def _parse_mhm_modifier_line(human_info, line):
         profiler = PrimitiveProfiler("HumanService")
-        profiler.enter("_parse_mhm_modifier_line")
-        line = str(line).replace("modifier ", "")
-
-        _LOG.debug("parsing modifier line", line)
-        for simple_macro in ["Age", "Gender", "Muscle", "Weight", "Height", "BodyProportions", "Asian", "African", "Caucasian", "BreastSize", "BreastFirmness"]:
-            macroline = line
-            macroline = macroline.replace("breast/", "")
-            macroline = macroline.replace("macrodetails/", "")
-            macroline = macroline.replace("macrodetails-height/", "")
-            macroline = macroline.replace("macrodetails-universal/", "")
-            macroline = macroline.replace("macrodetails-proportions/", "")
-
-            if macroline.startswith(simple_macro + " "):
-                target, weight = macroline.split(" ", 1)
-                weight = float(weight)
-                _LOG.debug("Found macro target", (target, weight))
-                if simple_macro in ["Asian", "African", "Caucasian"]:
-                    human_info["phenotype"]["race"][simple_macro.lower()] = weight
-                    profiler.leave("_parse_mhm_modifier_line")
-                    return
-                if simple_macro in ["Age", "Gender", "Muscle", "Weight", "Height"]:
-                    human_info["phenotype"][simple_macro.lower()] = weight
-                    profiler.leave("_parse_mhm_modifier_line")
-                    return
-                if simple_macro == "BodyProportions":
-                    human_info["phenotype"]["proportions"] = weight
-                    profiler.leave("_parse_mhm_modifier_line")
-                    return
-                if simple_macro == "BreastSize":
-                    human_info["phenotype"]["cupsize"] = weight
-                    profiler.leave("_parse_mhm_modifier_line")
-                    return
-                if simple_macro == "BreastFirmness":
-                    human_info["phenotype"]["firmness"] = weight
-                    profiler.leave("_parse_mhm_modifier_line")
-                    return
-        _LOG.debug("modifier was not a macrodetail")
-        target = TargetService.translate_mhm_target_line_to_target_fragment(line)
-        _LOG.debug("Translated target", target)
-        if not "targets" in human_info or not human_info["targets"]:
-            human_info["targets"] = []
-        human_info["targets"].append(target)
-        profiler.leave("_parse_mhm_modifier_line")
+        with profiler.span("_parse_mhm_modifier_line"):
+            line = str(line).replace("modifier ", "")
+
+            _LOG.debug("parsing modifier line", line)
+            for simple_macro in ["Age", "Gender", "Muscle", "Weight", "Height", "BodyProportions", "Asian", "African", "Caucasian", "BreastSize", "BreastFirmness"]:
+                macroline = line
+                macroline = macroline.replace("breast/", "")
+                macroline = macroline.replace("macrodetails/", "")
+                macroline = macroline.replace("macrodetails-height/", "")
+                macroline = macroline.replace("macrodetails-universal/", "")
+                macroline = macroline.replace("macrodetails-proportions/", "")
+
+                if macroline.startswith(simple_macro + " "):
+                    target, weight = macroline.split(" ", 1)
+                    weight = float(weight)
+                    _LOG.debug("Found macro target", (target, weight))
+                    if simple_macro in ["Asian", "African", "Caucasian"]:
+                        human_info["phenotype"]["race"][simple_macro.lower()] = weight
+                        return
+                    if simple_macro in ["Age", "Gender", "Muscle", "Weight", "Height"]:
+                        human_info["phenotype"][simple_macro.lower()] = weight
+                        return
+                    if simple_macro == "BodyProportions":
+                        human_info["phenotype"]["proportions"] = weight
+                        return
+                    if simple_macro == "BreastSize":
+                        human_info["phenotype"]["cupsize"] = weight
+                        return
+                    if simple_macro == "BreastFirmness":
+                        human_info["phenotype"]["firmness"] = weight
+                        return
+            _LOG.debug("modifier was not a macrodetail")
+            target = TargetService.translate_mhm_target_line_to_target_fragment(line)
+            _LOG.debug("Translated target", target)
+            if not "targets" in human_info or not human_info["targets"]:
+                human_info["targets"] = []
+            human_info["targets"].append(target)
 
     @staticmethod
-    def _check_parse_mhm_bodypart_line(human_info, line, perform_deep_search=True):
-        profiler = PrimitiveProfiler("HumanService")
-        profiler.enter("_check_parse_mhm_bodypart_line")
-
-        for bodypart in ["eyes", "eyelashes", "eyebrows", "teeth", "tongue", "hair", "proxy"]:
-            if line.startswith(bodypart + " "):
-                parts = line.split(" ", 2)
-                part = parts[0]
-                name = parts[1]
-                uuid = None
-                if len(parts) > 2:
-                    uuid = parts[2]
-
-                _LOG.debug("found bodypart asset", (part, name, uuid))
-
-                root_name = part
-                asset_type = "mhclo"
-                if bodypart == "proxy":
-                    asset_type = "proxy"
-                    root_name = "proxymeshes"
-
-                assets = AssetService.get_asset_list(root_name, asset_type)
-                _LOG.dump("Potential assets", assets)
-                # Find asset which match both filename and UUID
-                for asset_name in assets:
-                    asset = assets[asset_name]
-                    given_name = str(asset_name).lower()
-                    mhclo_name = str(name).lower()
-                    _LOG.debug("Checking ", (mhclo_name, given_name))
-                    if mhclo_name in given_name and uuid:
-                        mhclo = Mhclo()
-                        mhclo.load(asset["full_path"])
-                        if mhclo.uuid == uuid:
-                            _LOG.debug("Matching asset", (asset["full_path"], asset["fragment"]))
-                            human_info[bodypart] = asset["fragment"]
-                            profiler.leave("_check_parse_mhm_bodypart_line")
-                            return True
-
-                if not perform_deep_search:
-                    _LOG.warn("Giving up because bodypart could not be found", (bodypart, name))
-                    return False
-
-                _LOG.warn("About to perform deep search for bodypart, which will take a long time", (bodypart, name))
+    def _read_mhclo_metadata_cache():
+        global _MHCLO_METADATA  # pylint: disable=W0603
+        _MHCLO_METADATA = dict()
+        if not os.path.exists(_MHCLO_METADATA_FILE):
+            return
+        try:
+            with open(_MHCLO_METADATA_FILE, "r", encoding="utf-8") as json_file:
+                data = json.load(json_file)
+            if data.get("version") == _MHCLO_METADATA_VERSION:
+                _MHCLO_METADATA = data["files"]
+        except (OSError, ValueError) as err:
+            _LOG.warn("Could not read mhclo metadata cache", (_MHCLO_METADATA_FILE, err))
 
-                # Find asset which match only uuid
-                for asset_name in assets:
-                    asset = assets[asset_name]
-                    mhclo = Mhclo()
-                    mhclo.load(asset["full_path"])
-                    if uuid and mhclo.uuid == uuid:
-                        _LOG.debug("Matching asset", (asset["full_path"], asset["fragment"]))
-                        human_info[bodypart] = asset["fragment"]
-                        profiler.leave("_check_parse_mhm_bodypart_line")
-                        return True
-                # Find asset which match only filename
-                for asset_name in assets:
-                    asset = assets[asset_name]
-                    mhclo = Mhclo()
-                    mhclo.load(asset["full_path"])
-                    given_name = str(asset_name).lower()
-                    mhclo_name = str(mhclo.name).lower()
-                    label = asset["label"].lower()
-
-                    if given_name == mhclo_name or given_name == label:
-                        _LOG.debug("Matching asset", (asset["full_path"], asset["fragment"]))
-                        human_info[bodypart] = asset["fragment"]
-                        profiler.leave("_check_parse_mhm_bodypart_line")
-                        return True
-        profiler.leave("_check_parse_mhm_bodypart_line")
-        # Give up
-        return False
+    @staticmethod
+    def _write_mhclo_metadata_cache():
+        global _MHCLO_METADATA_DIRTY  # pylint: disable=W0603
+        if not _MHCLO_METADATA_DIRTY:
+            return
+        try:
+            os.makedirs(os.path.dirname(_MHCLO_METADATA_FILE), exist_ok=True)
+            temp_path = _MHCLO_METADATA_FILE + "." + str(os.getpid()) + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as json_file:
+                json.dump({"version": _MHCLO_METADATA_VERSION, "files": _MHCLO_METADATA}, json_file)
+            os.replace(temp_path, _MHCLO_METADATA_FILE)
+            _MHCLO_METADATA_DIRTY = False
+        except OSError as err:
+            _LOG.warn("Could not write mhclo metadata cache", (_MHCLO_METADATA_FILE, err))
 
     @staticmethod
-    def _check_parse_mhm_clothes_line(human_info, line, perform_deep_search=False):
-        profiler = PrimitiveProfiler("HumanService")
-        profiler.enter("_check_parse_mhm_clothes_line")
-        parts = line.split(" ", 2)
-        part = parts[0]
-        name = parts[1]
-        uuid = None
-        if len(parts) > 2:
-            uuid = parts[2]
+    def get_mhclo_metadata(full_path):
+        """
+        Get the uuid and name of a mhclo or proxy file, without parsing the vertex data.
+
+        The result is cached persistently in the user cache, keyed on the path, modification time and size of the file.
 
-        _LOG.debug("found clothes asset", (part, name, uuid))
+        Args:
+            full_path (str): The absolute path to the asset file.
 
-        root_name = part
-        asset_type = "mhclo"
+        Returns:
+            tuple: (uuid, name), or None if the file could not be read.
+        """
+        global _MHCLO_METADATA_DIRTY  # pylint: disable=W0603
+        if _MHCLO_METADATA is None:
+            HumanService._read_mhclo_metadata_cache()
+
+        full_path = str(full_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return None
 
-        if not "clothes" in human_info:
-            human_info["clothes"] = []
+        entry = _MHCLO_METADATA.get(full_path)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2], entry[3]
 
+        mhclo = Mhclo()
+        try:
+            mhclo.load(full_path, only_metadata=True)
+        except Exception as err:  # pylint: disable=W0718
+            _LOG.error("Failed to load asset ", (full_path, err))
+            return None
+
+        _MHCLO_METADATA[full_path] = [stat.st_mtime_ns, stat.st_size, mhclo.uuid, mhclo.name]
+        _MHCLO_METADATA_DIRTY = True
+        return mhclo.uuid, mhclo.name
+
+    @staticmethod
+    def get_mhm_asset_index(root_name, asset_type="mhclo"):
+        """
+        Get an index for resolving assets referenced in MHM files.
+
+        The index is built from the asset list of the given subdir, using only the metadata of each asset
+        file (see get_mhclo_metadata()). It is rebuilt when the asset list has been updated.
+
+        Args:
+            root_name (str): The asset subdir, for example "clothes" or "proxymeshes".
+            asset_type (str): The asset file type, "mhclo" or "proxy".
+
+        Returns:
+            dict: A dict with the keys "by_uuid", "by_name" and "by_label", each mapping a (lowercase for names and
+            labels) key to a list of asset list items.
+        """
+        _LOG.enter()
         assets = AssetService.get_asset_list(root_name, asset_type)
+        key = (root_name, asset_type)
+
+        index = _MHM_ASSET_INDEX.get(key)
+        if index is not None and index["assets"] is assets:
+            return index
+
+        index = {"assets": assets, "by_uuid": dict(), "by_name": dict(), "by_label": dict()}
 
+        for label, asset in assets.items():
+            index["by_label"].setdefault(str(label).lower(), []).append(asset)
+            metadata = HumanService.get_mhclo_metadata(asset["full_path"])
+            if metadata is None:
+                continue
+            (uuid, name) = metadata
+            if uuid:
+                index["by_uuid"].setdefault(str(uuid), []).append(asset)
+            if name:
+                index["by_name"].setdefault(str(name).lower(), []).append(asset)
+
+        HumanService._write_mhclo_metadata_cache()
+
+        _MHM_ASSET_INDEX[key] = index
+        return index
+
+    @staticmethod
+    def _find_mhm_asset(root_name, asset_type, name, uuid, perform_deep_search):
+        assets = AssetService.get_asset_list(root_name, asset_type)
         _LOG.dump("Potential assets", assets)
+
+        mhclo_name = str(name).lower()
+        mhclo_name_compact = mhclo_name.replace("_", "").replace(" ", "")
+
         # Find asset which match both filename and UUID
-        for asset_name in assets:
-            asset = assets[asset_name]
-            given_name = str(asset_name).lower()
-            given_name_compact = str(asset_name).lower().replace(" ", "")
-            given_name_compact = str(given_name_compact).lower().replace("_", "")
-
-            mhclo_name = str(name).lower()
-            mhclo_name_compact = mhclo_name.replace("_", "")
-            mhclo_name_compact = mhclo_name_compact.replace(" ", "")
-
-            _LOG.debug("Checking ", (mhclo_name, given_name, given_name_compact))
-            if (mhclo_name in given_name or mhclo_name_compact in given_name_compact) and uuid:
-                mhclo = Mhclo()
-                mhclo.load(asset["full_path"])
-                if mhclo.uuid == uuid:
-                    _LOG.debug("Matching asset", (asset["full_path"], asset["fragment"]))
-                    human_info["clothes"].append(asset["fragment"])
-                    profiler.leave("_check_parse_mhm_clothes_line")
-                    return True
+        if uuid:
+            for asset_name in assets:
+                asset = assets[asset_name]
+                given_name = str(asset_name).lower()
+                given_name_compact = given_name.replace(" ", "").replace("_", "")
+
+                _LOG.debug("Checking ", (mhclo_name, given_name, given_name_compact))
+                if mhclo_name in given_name or mhclo_name_compact in given_name_compact:
+                    metadata = HumanService.get_mhclo_metadata(asset["full_path"])
+                    if metadata and metadata[0] == uuid:
+                        HumanService._write_mhclo_metadata_cache()
+                        return asset
+
+        HumanService._write_mhclo_metadata_cache()
 
         if not perform_deep_search:
-            _LOG.warn("Giving up since asset could not be found: ", (name, line))
-            return False
+            return None
 
-        _LOG.warn("Asset was not found in assets list, it will take time to find it", name)
+        _LOG.debug("Asset was not found by name, looking it up in the asset index", name)
+        index = HumanService.get_mhm_asset_index(root_name, asset_type)
 
-        # Find assets that only match UUID
-        for asset_name in assets:
-            asset = assets[asset_name]
-            mhclo = Mhclo()
-            try:
-                mhclo.load(asset["full_path"])
-                if uuid and mhclo.uuid == uuid:
-                    _LOG.debug("Matching asset", (asset["full_path"], asset["fragment"]))
-                    human_info["clothes"].append(asset["fragment"])
-                    profiler.leave("_check_parse_mhm_clothes_line")
-                    return True
-            except:
-                _LOG.error("Failed to load asset ", asset["full_path"])
-
-        # Find assets that only match filename
-        for asset_name in assets:
-            asset = assets[asset_name]
-            mhclo = Mhclo()
-            try:
-                mhclo.load(asset["full_path"])
-                given_name = str(asset_name).lower()
-                mhclo_name = str(mhclo.name).lower()
-                label = asset["label"].lower()
+        # Find asset which match only uuid
+        if uuid and uuid in index["by_uuid"]:
+            return index["by_uuid"][uuid][0]
+
+        # Find asset which match only name or label
+        for lookup in ["by_name", "by_label"]:
+            if mhclo_name in index[lookup]:
+                return index[lookup][mhclo_name][0]
+
+        return None
+
+    @staticmethod
+    def _check_parse_mhm_bodypart_line(human_info, line, perform_deep_search=True):
+        profiler = PrimitiveProfiler("HumanService")
+        with profiler.span("_check_parse_mhm_bodypart_line"):
+            for bodypart in ["eyes", "eyelashes", "eyebrows", "teeth", "tongue", "hair", "proxy"]:
+                if line.startswith(bodypart + " "):
+                    parts = line.split(" ", 2)
+                    part = parts[0]
+                    name = parts[1]
+                    uuid = None
+                    if len(parts) > 2:
+                        uuid = parts[2]
+
+                    _LOG.debug("found bodypart asset", (part, name, uuid))
+
+                    root_name = part
+                    asset_type = "mhclo"
+                    if bodypart == "proxy":
+                        asset_type = "proxy"
+                        root_name = "proxymeshes"
+
+                    asset = HumanService._find_mhm_asset(root_name, asset_type, name, uuid, perform_deep_search)
+                    if asset:
+                        _LOG.debug("Matching asset", (asset["full_path"], asset["fragment"]))
+                        human_info[bodypart] = asset["fragment"]
+                        return True
+
+                    _LOG.warn("Giving up because bodypart could not be found", (bodypart, name))
+                    return False
+        # Give up
+        return False
+
+    @staticmethod
+    def _check_parse_mhm_clothes_line(human_info, line, perform_deep_search=False):
+        profiler = PrimitiveProfiler("HumanService")
+        with profiler.span("_check_parse_mhm_clothes_line"):
+            parts = line.split(" ", 2)
+            part = parts[0]
+            name = parts[1]
+            uuid = None
+            if len(parts) > 2:
+                uuid = parts[2]
 
-                if given_name == mhclo_name or given_name == label:
-                    _LOG.debug("Matching asset", (asset["full_path"], asset["fragment"]))
-                    human_info["clothes"].append(asset["fragment"])
-                    profiler.leave("_check_parse_mhm_clothes_line")
-                    return True
-            except:
-                _LOG.error("Failed to load asset ", asset["full_path"])
+            _LOG.debug("found clothes asset", (part, name, uuid))
 
-        profiler.leave("_check_parse_mhm_clothes_line")
+            if not "clothes" in human_info:
+                human_info["clothes"] = []
+
+            asset = HumanService._find_mhm_asset(part, "mhclo", name, uuid, perform_deep_search)
+
+        if asset:
+            _LOG.debug("Matching asset", (asset["full_path"], asset["fragment"]))
+            human_info["clothes"].append(asset["fragment"])
+            return True
 
         # Give up
+        _LOG.warn("Giving up since asset could not be found: ", (name, line))
         return False
 
     @staticmethod
@@ -1314,64 +1389,63 @@ class HumanService:
         bodypart_deep_search = deserialization_settings["bodypart_deep_search"]
 
         profiler = PrimitiveProfiler("HumanService")
-        profiler.enter("deserialize_from_mhm")
-        _LOG.debug("filename", filename)
-        if not os.path.exists(filename):
-            raise IOError(str(filename) + " does not exist")
-        mhm_string = Path(filename).read_text()
-        _LOG.dump("mhm string", mhm_string)
-
-        human_info = HumanService._create_default_human_info_dict()
-        name = None
-
-        for line in mhm_string.splitlines():
-            _LOG.debug("line", line)
-            if line.startswith("modifier"):
-                HumanService._parse_mhm_modifier_line(human_info, line)
-            else:
-                if not HumanService._check_parse_mhm_bodypart_line(human_info, line, bodypart_deep_search):
-                    _LOG.debug("line is neither modifier or bodypart")
-                    if line.startswith("skinMaterial"):
-                        skin_line = line.replace("skinMaterial skins/", "")
-                        skin_line = skin_line.replace("skinMaterial", "")
-                        human_info["skin_mhmat"] = skin_line
-                        human_info["skin_material_type"] = "ENHANCED_SSS"
-                    if line.startswith("name "):
-                        name = line.replace("name ", "")
-                    if line.startswith("skeleton"):
-                        skeleton_line = line.replace("skeleton ", "")
-                        skeleton_line = skeleton_line.replace(".mhskel", "").lower()
-                        if "default" in skeleton_line:
-                            human_info["rig"] = "default"
-                        if "toes" in skeleton_line:
-                            human_info["rig"] = "default_no_toes"
-                        if "game" in skeleton_line:
-                            human_info["rig"] = "game_engine"
-                        if "cmu" in skeleton_line:
-                            human_info["rig"] = "cmu_mb"
-
-        for line in mhm_string.splitlines():
-            _LOG.debug("line", line)
-            if line.startswith("clothes") and not line.startswith("clothesHideFaces"):
-                HumanService._check_parse_mhm_clothes_line(human_info, line, clothes_deep_search)
-
-        if "rig" not in human_info or not human_info["rig"]:
-            human_info["rig"] = "default"
-
-        if not name:
-            match = re.search(r'.*([^/\\]*)\.(mhm|MHM)$', filename)
-            name = match.group(1)
-
-        human_info["name"] = name
-
-        _LOG.dump("human_info", human_info)
-        basemesh = HumanService.deserialize_from_dict(human_info, deserialization_settings)
-
-        profiler.leave("deserialize_from_mhm")
+        with profiler.span("deserialize_from_mhm"):
+            _LOG.debug("filename", filename)
+            if not os.path.exists(filename):
+                raise IOError(str(filename) + " does not exist")
+            mhm_string = Path(filename).read_text()
+            _LOG.dump("mhm string", mhm_string)
+
+            human_info = HumanService._create_default_human_info_dict()
+            name = None
+
+            for line in mhm_string.splitlines():
+                _LOG.debug("line", line)
+                if line.startswith("modifier"):
+                    HumanService._parse_mhm_modifier_line(human_info, line)
+                else:
+                    if not HumanService._check_parse_mhm_bodypart_line(human_info, line, bodypart_deep_search):
+                        _LOG.debug("line is neither modifier or bodypart")
+                        if line.startswith("skinMaterial"):
+                            skin_line = line.replace("skinMaterial skins/", "")
+                            skin_line = skin_line.replace("skinMaterial", "")
+                            human_info["skin_mhmat"] = skin_line
+                            human_info["skin_material_type"] = "ENHANCED_SSS"
+                        if line.startswith("name "):
+                            name = line.replace("name ", "")
+                        if line.startswith("skeleton"):
+                            skeleton_line = line.replace("skeleton ", "")
+                            skeleton_line = skeleton_line.replace(".mhskel", "").lower()
+                            if "default" in skeleton_line:
+                                human_info["rig"] = "default"
+                            if "toes" in skeleton_line:
+                                human_info["rig"] = "default_no_toes"
+                            if "game" in skeleton_line:
+                                human_info["rig"] = "game_engine"
+                            if "cmu" in skeleton_line:
+                                human_info["rig"] = "cmu_mb"
+
+            for line in mhm_string.splitlines():
+                _LOG.debug("line", line)
+                if line.startswith("clothes") and not line.startswith("clothesHideFaces"):
+                    HumanService._check_parse_mhm_clothes_line(human_info, line, clothes_deep_search)
+
+            if "rig" not in human_info or not human_info["rig"]:
+                human_info["rig"] = "default"
+
+            if not name:
+                match = re.search(r'.*([^/\\]*)\.(mhm|MHM)$', filename)
+                name = match.group(1)
+
+            human_info["name"] = name
+
+            _LOG.dump("human_info", human_info)
+            basemesh = HumanService.deserialize_from_dict(human_info, deserialization_settings)
         return basemesh
 
     @staticmethod
-    def create_human(mask_helpers=True, detailed_helpers=True, extra_vertex_groups=True, feet_on_ground=True, scale=0.1, macro_detail_dict=None):
+    def create_human(mask_helpers=True, detailed_helpers=True, extra_vertex_groups=True, feet_on_ground=True, scale=0.1, macro_detail_dict=None,
+                     collapse_macro_targets=False):
         """
         Creates a human mesh with specified settings and properties.
 
@@ -1382,59 +1456,57 @@ class HumanService:
             feet_on_ground (bool): Whether to position the feet on the ground. Default is True.
             scale (float): The scale factor for the basemesh. Default is 0.1.
             macro_detail_dict (dict, optional): A dictionary containing macro detail settings. If None, default settings are used.
+            collapse_macro_targets (bool): Whether to blend all macro targets into a single shape key. Default is False.
 
         Returns:
             bpy.types.Object: The created human basemesh object.
         """
         profiler = PrimitiveProfiler("HumanService")
-        profiler.enter("create_human")
-
-        exclude = []
-
-        if not detailed_helpers:
-            groups = ObjectService.get_base_mesh_vertex_group_definition()
-            for group_name in groups.keys():
-                if str(group_name).startswith("helper-") or str(group_name).startswith("joint-"):
+        with profiler.span("create_human"):
+            exclude = []
+
+            if not detailed_helpers:
+                groups = ObjectService.get_base_mesh_vertex_group_definition()
+                for group_name in groups.keys():
+                    if str(group_name).startswith("helper-") or str(group_name).startswith("joint-"):
+                        exclude.append(str(group_name))
+
+            if not extra_vertex_groups:
+                # rather than extend in order to explicitly cast to str
+                for group_name in BASEMESH_EXTRA_GROUPS.keys():
                     exclude.append(str(group_name))
+                exclude.extend(["Mid", "Right", "Left"])
 
-        if not extra_vertex_groups:
-            # rather than extend in order to explicitly cast to str
-            for group_name in BASEMESH_EXTRA_GROUPS.keys():
-                exclude.append(str(group_name))
-            exclude.extend(["Mid", "Right", "Left"])
+            ObjectService.deselect_and_deactivate_all()
 
-        ObjectService.deselect_and_deactivate_all()
+            basemesh = ObjectService.load_base_mesh(context=bpy.context, scale_factor=scale, load_vertex_groups=True, exclude_vertex_groups=exclude)
 
-        basemesh = ObjectService.load_base_mesh(context=bpy.context, scale_factor=scale, load_vertex_groups=True, exclude_vertex_groups=exclude)
+            if macro_detail_dict is None:
+                macro_detail_dict = TargetService.get_default_macro_info_dict()
 
-        if macro_detail_dict is None:
-            macro_detail_dict = TargetService.get_default_macro_info_dict()
+            for key in macro_detail_dict.keys():
+                name = str(key)
+                if name != "race":
+                    HumanObjectProperties.set_value(name, macro_detail_dict[key], entity_reference=basemesh)
 
-        for key in macro_detail_dict.keys():
-            name = str(key)
-            if name != "race":
-                HumanObjectProperties.set_value(name, macro_detail_dict[key], entity_reference=basemesh)
+            for key in macro_detail_dict["race"].keys():
+                name = str(key)
+                HumanObjectProperties.set_value(name, macro_detail_dict["race"][key], entity_reference=basemesh)
 
-        for key in macro_detail_dict["race"].keys():
-            name = str(key)
-            HumanObjectProperties.set_value(name, macro_detail_dict["race"][key], entity_reference=basemesh)
+            TargetService.reapply_macro_details(basemesh, collapse_macro_targets=collapse_macro_targets)
 
-        TargetService.reapply_macro_details(basemesh)
+            if mask_helpers:
+                modifier = basemesh.modifiers.new("Hide helpers", 'MASK')
+                modifier.vertex_group = "body"
+                modifier.show_in_editmode = True
+                modifier.show_on_cage = True
 
-        if mask_helpers:
-            modifier = basemesh.modifiers.new("Hide helpers", 'MASK')
-            modifier.vertex_group = "body"
-            modifier.show_in_editmode = True
-            modifier.show_on_cage = True
+            HumanObjectProperties.set_value("is_human_project", True, entity_reference=basemesh)
 
-        HumanObjectProperties.set_value("is_human_project", True, entity_reference=basemesh)
-
-        if feet_on_ground:
-            lowest_point = ObjectService.get_lowest_point(basemesh)
-            basemesh.location = (0.0, 0.0, abs(lowest_point))
-            bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
-
-        profiler.leave("create_human")
+            if feet_on_ground:
+                lowest_point = ObjectService.get_lowest_point(basemesh)
+                basemesh.location = (0.0, 0.0, abs(lowest_point))
+                bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
         return basemesh
 
     @staticmethod
@@ -1511,12 +1583,15 @@ class HumanService:
         return armature_object
 
     @staticmethod
-    def refit(blender_object):
+    def refit(blender_object, only_changed_assets=False):
         """
         Refits the given blender object, adjusting its basemesh and rig, and refitting any related mesh assets.
 
         Args:
             blender_object (bpy.types.Object): The Blender object to be refitted.
+            only_changed_assets (bool, optional): Skip mesh assets whose bound base mesh vertices have not moved since
+                they were last fitted. Defaults to False, in which case the base mesh shape is also read anew rather
+                than taken from the mixed coordinates cache, so that edits made in edit or sculpt mode are picked up.
 
         Raises:
             ValueError: If the basemesh cannot be found as a relative of the given object.
@@ -1528,6 +1603,9 @@ class HumanService:
         if basemesh is None:
             raise ValueError('Could not find basemesh as relative of given object')
 
+        if not only_changed_assets:
+            TargetService.invalidate_mixed_vertex_coordinates(basemesh)
+
         parent_object = basemesh
         if rig:
             parent_object = rig
@@ -1536,7 +1614,7 @@ class HumanService:
 
         for child in ObjectService.find_related_mesh_assets(parent_object, only_children=True):
             _LOG.debug("Will try to refit child proxy", child)
-            ClothesService.fit_clothes_to_human(child, basemesh, set_parent=False)
+            ClothesService.fit_clothes_to_human(child, basemesh, set_parent=False, only_if_changed=only_changed_assets)
 
         if rig:
             RigService.refit_existing_armature(rig, basemesh)
@@ -1564,6 +1642,73 @@ class HumanService:
                 finally:
                     rig.data.pose_position = "POSE"
 
+    @staticmethod
+    def schedule_refit(blender_object, delay=0.3):
+        """
+        Refit the human the given object belongs to once no further refit has been scheduled for it during the given
+        number of seconds. A burst of changes, such as when dragging a modeling slider, thus results in one single
+        refit when the burst ends, rather than one refit per change. Mesh assets whose bound vertices did not move
+        are not refitted, while the rig and any subrigs are.
+
+        The refit is run from a blender timer. With a delay of zero or less, the refit is instead made immediately.
+
+        Args:
+            blender_object (bpy.types.Object): An object belonging to the human to refit.
+            delay (float, optional): The number of seconds to wait for further changes. Defaults to 0.3.
+
+        Raises:
+            ValueError: If the basemesh cannot be found as a relative of the given object.
+        """
+        basemesh = ObjectService.find_object_of_type_amongst_nearest_relatives(blender_object, "Basemesh")
+
+        if basemesh is None:
+            raise ValueError('Could not find basemesh as relative of given object')
+
+        if delay <= 0.0:
+            _PENDING_REFITS.pop(basemesh.name, None)
+            HumanService.refit(basemesh, only_changed_assets=True)
+            return
+
+        _PENDING_REFITS[basemesh.name] = time.monotonic() + delay
+
+        if not bpy.app.timers.is_registered(HumanService._run_pending_refits):
+            bpy.app.timers.register(HumanService._run_pending_refits, first_interval=delay)
+
+    @staticmethod
+    def has_pending_refit(blender_object):
+        """
+        Check whether a scheduled refit is waiting to be run for the human the given object belongs to.
+
+        Args:
+            blender_object (bpy.types.Object): An object belonging to the human.
+
+        Returns:
+            bool: True if there is a pending refit, False otherwise.
+        """
+        basemesh = ObjectService.find_object_of_type_amongst_nearest_relatives(blender_object, "Basemesh")
+        return basemesh is not None and basemesh.name in _PENDING_REFITS
+
+    @staticmethod
+    def _run_pending_refits():
+        now = time.monotonic()
+        for name, due in list(_PENDING_REFITS.items()):
+            if due > now:
+                continue
+            del _PENDING_REFITS[name]
+            basemesh = bpy.data.objects.get(name)
+            if basemesh is None:
+                continue
+            _LOG.debug("Running scheduled refit for", name)
+            try:
+                HumanService.refit(basemesh, only_changed_assets=True)
+            except Exception as err:  # pylint: disable=W0718
+                # An exception would silently unregister the timer, leaving later refits hanging
+                _LOG.error("Scheduled refit failed", (name, err))
+
+        if not _PENDING_REFITS:
+            return None
+        return max(0.01, min(_PENDING_REFITS.values()) - time.monotonic())
+
     @staticmethod
     def get_asset_sources_of_equipped_mesh_assets(basemesh):
         """
@@ -1,6 +1,6 @@
 """Functionality for logging and profiling"""
 
-import os, bpy, time, pprint, inspect, json
+import os, sys, bpy, time, pprint, json, queue, threading, atexit
 from .. import get_preference, DEBUG, MPFB_CONTEXTUAL_INFORMATION
 
 # There's a catch 22 where paths should be read from the location
@@ -13,6 +13,15 @@ try:
 except:
     print("Could not read preference mpfb_user_data")
 
+_FLUSH_INTERVAL = 0.5
+
+try:
+    _configured_interval = get_preference("mpfb_log_flush_interval")
+    if _configured_interval is not None:
+        _FLUSH_INTERVAL = float(_configured_interval)
+except:
+    print("Could not read preference mpfb_log_flush_interval")
+
 _BPYHOME = bpy.utils.resource_path('USER')  # pylint: disable=E1111
 if _OVERRIDDEN_HOME is None or not _OVERRIDDEN_HOME:
     _MPFBHOME = os.path.join(_BPYHOME, MPFB_CONTEXTUAL_INFORMATION["__package_short__"])
@@ -37,6 +46,138 @@ _JUSTIFICATION = 40
 _START = int(time.time() * 1000.0)
 
 
+class _LogWriter():
+
+    """Writes log lines in batches. Lines are put on a queue by the loggers and written by a background
+    thread every flush_interval seconds, with the log files kept open between batches. If flush_interval
+    is zero or less, lines are written immediately by the calling thread."""
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._handles = dict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._reported_errors = set()
+
+    def write(self, console_line, file_lines, flush=False):
+        """Queue a line for the console and a list of (path, line) tuples for log files."""
+        self._queue.put((console_line, file_lines))
+        if flush or self.flush_interval <= 0:
+            self.flush()
+        elif self._thread is None:
+            self._start_thread()
+
+    def _start_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mpfb-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(max(self.flush_interval, 0.01))
+            try:
+                self.flush()
+            except Exception as err:  # pylint: disable=W0718
+                # Never let the writer thread die, since nothing would then empty the queue
+                self._report_error("flush", err)
+
+    def _report_error(self, what, err):
+        # Report each kind of failure once on stderr. Logging it through the log service could fail the same way.
+        if what not in self._reported_errors:
+            self._reported_errors.add(what)
+            sys.stderr.write("MPFB log writer could not write to " + str(what) + ": " + str(err) + "\n")
+
+    def flush(self):
+        """Write everything which is currently in the queue."""
+        with self._lock:
+            batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        console_lines = []
+        lines_per_file = dict()
+        for console_line, file_lines in batch:
+            console_lines.append(console_line)
+            for path, line in file_lines:
+                if path not in lines_per_file:
+                    lines_per_file[path] = []
+                lines_per_file[path].append(line)
+
+        try:
+            print("\n".join(console_lines))
+        except (OSError, ValueError) as err:
+            self._report_error("console", err)
+
+        # A failing log file (for example a removed log dir) should not stop the other files from being written
+        for path, lines in lines_per_file.items():
+            try:
+                log_file = self._handles.get(path)
+                if log_file is None:
+                    log_file = open(path, "a", encoding="utf-8")  # pylint: disable=R1732
+                    self._handles[path] = log_file
+                log_file.write("\n".join(lines) + "\n")
+                log_file.flush()
+            except (OSError, ValueError) as err:
+                self._report_error(path, err)
+                broken_file = self._handles.pop(path, None)
+                if broken_file is not None:
+                    try:
+                        broken_file.close()
+                    except (OSError, ValueError):
+                        pass
+
+    def truncate(self, path):
+        """Empty a log file, closing any open handle to it."""
+        with self._lock:
+            log_file = self._handles.pop(path, None)
+            if log_file is not None:
+                log_file.close()
+            with open(path, "w", encoding="utf-8") as new_file:
+                new_file.write("")
+
+    def close(self):
+        """Flush the queue and close all open log files."""
+        self.flush()
+        with self._lock:
+            for log_file in self._handles.values():
+                log_file.close()
+            self._handles = dict()
+
+
+_WRITER = _LogWriter(_FLUSH_INTERVAL)
+atexit.register(_WRITER.close)
+
+
+class _LazyValue():
+
+    """Wraps a function whose return value is only computed if a log message is actually written."""
+
+    __slots__ = ["function"]
+
+    def __init__(self, function):
+        self.function = function
+
+    def __str__(self):
+        return str(self.function())
+
+
+def _resolve(value):
+    return value.function() if isinstance(value, _LazyValue) else value
+
+
+def _caller_description(frame):
+    # Cheap alternative to inspect.stack(), which reads source code for every frame on the stack
+    return "{}.{}():{}".format(frame.f_globals.get("__name__", "?"), frame.f_code.co_name, frame.f_lineno)
+
+
 class Logger():
 
     """The Logger class is used to create log channels that can log messages at different severity levels.
@@ -51,27 +192,30 @@ class Logger():
         self.level_is_overridden = False
         self.path = os.path.join(_LOGDIR, "separated." + name + ".txt")
         self.time_stamp = _START
-        with open(self.path, "w", encoding="utf-8") as log_file:
-            log_file.write("")
+        _WRITER.truncate(self.path)
 
     def _log_message(self, level, message, extra_object=None):
         if level <= self.level:
+            message = str(_resolve(message))
+            extra_object = _resolve(extra_object)
             extra = ""
             if not extra_object is None:
                 extra = " " + str(extra_object)
             location = str(self.name + " ").ljust(_JUSTIFICATION, ".") + ": "
             long_message = "[" + LogService.LOGLEVELS[level] + "] " + location + message + extra
             short_message = "[" + LogService.LOGLEVELS[level] + "] " + message + extra
-            print(long_message)
-            with open(self.path, "a", encoding="utf-8") as log_file:
-                log_file.write(short_message + "\n")
-            with open(_COMBINED, "a", encoding="utf-8") as log_file:
-                log_file.write(long_message + "\n")
+            # Errors and crashes are written immediately, so that they are not lost if blender goes down
+            _WRITER.write(long_message, [(self.path, short_message), (_COMBINED, long_message)], flush=level <= LogService.ERROR)
 
     def debug_enabled(self):
         """Check if debug logging is enabled for this logger."""
         return self.level >= LogService.DEBUG
 
+    def is_enabled(self, level):
+        """Check if messages of the given level would be written by this logger. Use this to guard
+        expensive construction of log arguments in hot loops."""
+        return level <= self.level
+
     def set_level(self, level):
         """Set the highest level to report for this channel"""
         self.level = level
@@ -108,6 +252,7 @@ class Logger():
     def dump(self, message, extra_object):
         """Dump a large data structure to the log, if the log level is at least trace."""
         if self.level > LogService.TRACE:
+            extra_object = _resolve(extra_object)
             if isinstance(extra_object, str):
                 serialized_object = "\n" + extra_object
             else:
@@ -117,26 +262,12 @@ class Logger():
     def enter(self):
         """Report that a method was entered, if the log level is at least trace."""
         if self.level >= LogService.TRACE:
-            info = dict()
-            stack = inspect.currentframe().f_back
-            info["line_number"] = str(stack.f_lineno)
-            info["caller_name"] = stack.f_globals["__name__"]
-            info["file_name"] = stack.f_globals["__file__"]
-            info["caller_method"] = inspect.stack()[1][3]
-            message = "Now entering {}.{}():{}".format(info["caller_name"], info["caller_method"], info["line_number"])
-            self._log_message(LogService.TRACE, message)
+            self._log_message(LogService.TRACE, "Now entering " + _caller_description(sys._getframe(1)))  # pylint: disable=W0212
 
     def leave(self):
         """Report that a method is about to be exited, if the log level is at least trace."""
         if self.level >= LogService.TRACE:
-            info = dict()
-            stack = inspect.currentframe().f_back
-            info["line_number"] = str(stack.f_lineno)
-            info["caller_name"] = stack.f_globals["__name__"]
-            info["file_name"] = stack.f_globals["__file__"]
-            info["caller_method"] = inspect.stack()[1][3]
-            message = "Now leaving {}.{}():{}".format(info["caller_name"], info["caller_method"], info["line_number"])
-            self._log_message(LogService.TRACE, message)
+            self._log_message(LogService.TRACE, "Now leaving " + _caller_description(sys._getframe(1)))  # pylint: disable=W0212
 
     def get_current_time(self):
         """Return the number of millisections which has passed since time was last reset for this channel."""
@@ -217,6 +348,29 @@ class LogService():
         """Return the absolute path to the combined log file."""
         return os.path.abspath(_COMBINED)
 
+    @staticmethod
+    def lazy(function):
+        """Wrap a function without arguments so that it can be used as a log message or extra object, and only
+        be called if the message is actually written. For example: _LOG.debug("Info", LogService.lazy(lambda: expensive()))"""
+        return _LazyValue(function)
+
+    @staticmethod
+    def flush():
+        """Write all queued log messages to the console and the log files."""
+        _WRITER.flush()
+
+    @staticmethod
+    def set_flush_interval(seconds):
+        """Set how often queued log messages are written. Zero or less means that messages are written immediately."""
+        _WRITER.flush_interval = float(seconds)
+        if _WRITER.flush_interval <= 0:
+            _WRITER.flush()
+
+    @staticmethod
+    def get_flush_interval():
+        """Return how often (in seconds) queued log messages are written."""
+        return _WRITER.flush_interval
+
 
 class _LogService():
 
@@ -233,8 +387,7 @@ class _LogService():
         else:
             print("Log config does not exist. Creating empty template.")
             self.rewrite_json()
-        with open(_COMBINED, "w", encoding="utf-8") as log_file:
-            log_file.write("")
+        _WRITER.truncate(_COMBINED)
 
     def get_default_log_level(self):
         """Return the default log level."""
@@ -1,12 +1,18 @@
 """Utility functions for working with meshes"""
 
-import bpy, mathutils, numpy
+import bpy, mathutils, numpy, hashlib
+from collections import OrderedDict
 from mathutils import Vector
 from .logservice import LogService
 from .objectservice import ObjectService
+from .locationservice import LocationService
+from .spatialindex import SpatialIndex
 
 _LOG = LogService.get_logger("services.meshservice")
 
+_SPATIAL_INDEX_CACHE = OrderedDict()
+_MAX_CACHED_SPATIAL_INDEXES = 16
+
 
 class MeshService:
     """The MeshService class is a utility class designed to provide various functions for working with meshes, vertex groups, weights,
@@ -52,6 +58,78 @@ class MeshService:
             ObjectService.link_blender_object(target_object)
         return target_object
 
+    @staticmethod
+    def fill_mesh_from_numpy_arrays(mesh, vertices, faces, loop_uvs=None, uv_map_name="UVMap", smooth=True):
+        """
+        Fill an empty mesh with vertices and faces given as numpy arrays.
+
+        This does the same as from_pydata(), but writes the data with one foreach_set() call per attribute instead of
+        converting it to python lists first. It thus scales to high-poly meshes.
+
+        Parameters:
+        - mesh: An empty mesh datablock.
+        - vertices: An (N, 3) array with vertex coordinates.
+        - faces: An (F, K) array with the vertex indices of F faces with K corners each.
+        - loop_uvs: An optional (F * K, 2) array with one UV coordinate per face corner. If given, a UV map is created.
+        - uv_map_name: The name of the UV map to create.
+        - smooth: Whether the faces should use smooth shading.
+        """
+        _LOG.enter()
+        vertices = numpy.ascontiguousarray(vertices, dtype=numpy.float32).reshape((-1, 3))
+        faces = numpy.ascontiguousarray(faces, dtype=numpy.int32)
+        if faces.ndim != 2:
+            raise ValueError("Faces must be given as a two-dimensional array with a fixed number of corners per face")
+
+        number_of_faces, number_of_corners = faces.shape
+
+        mesh.vertices.add(len(vertices))
+        mesh.vertices.foreach_set("co", vertices.ravel())
+
+        mesh.loops.add(faces.size)
+        mesh.loops.foreach_set("vertex_index", faces.ravel())
+
+        mesh.polygons.add(number_of_faces)
+        mesh.polygons.foreach_set("loop_start", numpy.arange(0, faces.size, number_of_corners, dtype=numpy.int32))
+
+        mesh.update(calc_edges=True)
+
+        if smooth:
+            mesh.shade_smooth()
+        else:
+            mesh.shade_flat()
+
+        if loop_uvs is not None:
+            uv_layer = mesh.uv_layers.new(name=uv_map_name)
+            uv_layer.data.foreach_set("uv", numpy.ascontiguousarray(loop_uvs, dtype=numpy.float32).ravel())
+
+    @staticmethod
+    def add_vertex_groups_from_numpy_arrays(mesh_object, vertex_groups, weights=None):
+        """
+        Create several vertex groups at once from arrays of vertex indices.
+
+        Parameters:
+        - mesh_object: The mesh object to add the vertex groups to.
+        - vertex_groups: A dict with group name as key and an array of vertex indices as value.
+        - weights: An optional dict with group name as key and an array of weights, parallel to the vertex indices of
+          the group, as value. Groups which are not in this dict get a weight of 1.0 for all their vertices.
+
+        Returns:
+        - A dict with group name as key and the created vertex group as value.
+        """
+        _LOG.enter()
+        if weights is None:
+            weights = dict()
+
+        created = dict()
+        for name, vertex_indices in vertex_groups.items():
+            group = mesh_object.vertex_groups.new(name=name)
+            if name in weights:
+                MeshService.add_weights_to_vertex_group(group, vertex_indices, weights[name], mode='REPLACE')
+            else:
+                group.add(numpy.asarray(vertex_indices, dtype=numpy.int64).ravel().tolist(), 1.0, 'REPLACE')
+            created[name] = group
+        return created
+
     @staticmethod
     def create_sample_object(name="sample_object", link=True):
         """Create a sample plane mesh with four faces."""
@@ -118,6 +196,132 @@ class MeshService:
 
         return result
 
+    @staticmethod
+    def get_vertex_group_weights_as_csr(mesh_object, only_group_indices=None, only_vertex_indices=None):
+        """
+        Read all vertex group memberships of a mesh as a sparse vertices x groups matrix in CSR layout.
+
+        The entries for vertex i are found at offsets[i]:offsets[i+1] in the group_indices and
+        weights arrays.
+
+        Parameters:
+        - mesh_object: The mesh object to read weights from.
+        - only_group_indices: An optional iterable of vertex group indices. If given, memberships in other groups are skipped.
+        - only_vertex_indices: An optional array of vertex indices. If given, only these vertices are read and the rows of all other vertices are empty.
+
+        Returns:
+        - A tuple (offsets, group_indices, weights) with an int64 array of length N+1, an int32 array and a float32 array.
+        """
+        _LOG.enter()
+        vertices = mesh_object.data.vertices
+        counts = numpy.zeros(len(vertices), dtype=numpy.int64)
+        group_indices = []
+        weights = []
+
+        allowed = set(int(index) for index in only_group_indices) if only_group_indices is not None else None
+
+        if only_vertex_indices is None:
+            selected_vertices = vertices
+        else:
+            selected = numpy.unique(numpy.asarray(only_vertex_indices, dtype=numpy.int64).ravel())
+            selected = selected[(selected >= 0) & (selected < len(vertices))]
+            selected_vertices = (vertices[index] for index in selected.tolist())
+
+        for vert in selected_vertices:
+            count = 0
+            for group in vert.groups:
+                if allowed is None or group.group in allowed:
+                    group_indices.append(group.group)
+                    weights.append(group.weight)
+                    count += 1
+            counts[vert.index] = count
+
+        offsets = numpy.zeros(len(vertices) + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=offsets[1:])
+
+        return offsets, numpy.array(group_indices, dtype=numpy.int32), numpy.array(weights, dtype=numpy.float32)
+
+    @staticmethod
+    def get_vertex_group_weights(mesh_object, vertex_group_names=None):
+        """
+        Read the weights of several vertex groups at once.
+
+        Parameters:
+        - mesh_object: The mesh object to read weights from.
+        - vertex_group_names: An optional list of group names. If not given, all groups are read.
+
+        Returns:
+        - A dict with group name as key and a tuple (vertex indices, weights) of numpy arrays as value. Groups
+          without any vertices are included with empty arrays.
+        """
+        _LOG.enter()
+        if vertex_group_names is None:
+            vertex_groups = list(mesh_object.vertex_groups)
+        else:
+            vertex_groups = [mesh_object.vertex_groups[name] for name in vertex_group_names if name in mesh_object.vertex_groups]
+
+        offsets, group_indices, weights = MeshService.get_vertex_group_weights_as_csr(
+            mesh_object, only_group_indices=[group.index for group in vertex_groups])
+
+        vertex_indices = numpy.repeat(numpy.arange(len(offsets) - 1, dtype=numpy.int32), numpy.diff(offsets))
+
+        # Sort by group, keeping the vertex order within each group
+        order = numpy.argsort(group_indices, kind="stable")
+        sorted_groups = group_indices[order]
+
+        result = dict()
+        for group in vertex_groups:
+            start, end = numpy.searchsorted(sorted_groups, [group.index, group.index + 1])
+            result[str(group.name)] = (vertex_indices[order[start:end]], weights[order[start:end]])
+
+        return result
+
+    @staticmethod
+    def add_weights_to_vertex_group(vertex_group, vertex_indices, weights, mode='REPLACE', precision=None):
+        """
+        Assign weights to many vertices of a vertex group at once.
+
+        Vertices sharing the same weight are assigned with a single call to add(), which is much
+        faster than adding the vertices one by one. If a vertex index occurs more than once, its weights
+        are summed for the 'ADD' and 'SUBTRACT' modes, while the last weight is used for 'REPLACE'.
+
+        Parameters:
+        - vertex_group: The vertex group to modify.
+        - vertex_indices: An array-like with vertex indices.
+        - weights: An array-like with one weight per vertex index.
+        - mode: The add() mode, one of 'REPLACE', 'ADD' or 'SUBTRACT'.
+        - precision: If given, round weights to this number of decimals before bucketing them. This reduces the
+          number of distinct weights, and thus add() calls, at the cost of precision.
+        """
+        vertex_indices = numpy.asarray(vertex_indices, dtype=numpy.int64).ravel()
+        weights = numpy.asarray(weights, dtype=numpy.float64).ravel()
+
+        if len(vertex_indices) < 1:
+            return
+
+        unique_indices, inverse = numpy.unique(vertex_indices, return_inverse=True)
+        if len(unique_indices) != len(vertex_indices):
+            inverse = inverse.ravel()
+            if mode == 'REPLACE':
+                last = numpy.zeros(len(unique_indices), dtype=numpy.int64)
+                last[inverse] = numpy.arange(len(vertex_indices))
+                weights = weights[last]
+            else:
+                weights = numpy.bincount(inverse, weights=weights, minlength=len(unique_indices))
+            vertex_indices = unique_indices
+
+        if precision is not None:
+            weights = numpy.round(weights, precision)
+
+        unique_weights, inverse = numpy.unique(weights, return_inverse=True)
+        inverse = inverse.ravel()
+        order = numpy.argsort(inverse, kind="stable")
+        bounds = numpy.searchsorted(inverse[order], numpy.arange(len(unique_weights) + 1))
+
+        for position, weight in enumerate(unique_weights):
+            indices = vertex_indices[order[bounds[position]:bounds[position + 1]]]
+            vertex_group.add(indices.tolist(), float(weight), mode)
+
     @staticmethod
     def find_faces_in_vertex_group(mesh_object, vertex_group_name):
         """
@@ -211,9 +415,11 @@ class MeshService:
         - uv_map_as_dict: A dict where the key is the face index and the value is a dict where the key is the loop index and the value the uv coordinates.
         """
         _LOG.enter()
-        _LOG.debug("Adding UV map from dict", {"mesh_object": mesh_object,
-                                                 "uv_map_name": uv_map_name,
-                                                 "uv_map_as_dict": uv_map_as_dict})
+        debug = _LOG.is_enabled(LogService.DEBUG)
+        if debug:
+            _LOG.debug("Adding UV map from dict", {"mesh_object": mesh_object,
+                                                     "uv_map_name": uv_map_name,
+                                                     "uv_map_as_dict": uv_map_as_dict})
         uv_map = mesh_object.data.uv_layers.get(uv_map_name)
         if uv_map:
             _LOG.debug("Replacing existing UV map", {"uv_map_name": uv_map_name})
@@ -229,10 +435,11 @@ class MeshService:
 
         for face_index, uv_info in uv_map_as_dict.items():
             for loop_index, uv_coords in uv_info.items():
-                _LOG.debug("Setting UV coords", {
-                    "face_index": face_index,
-                    "loop_index": loop_index,
-                    "uv_coords": uv_coords})
+                if debug:
+                    _LOG.debug("Setting UV coords", {
+                        "face_index": face_index,
+                        "loop_index": loop_index,
+                        "uv_coords": uv_coords})
 
                 uv_map.data[int(loop_index)].uv = uv_coords
 
@@ -240,10 +447,10 @@ class MeshService:
     def create_vertex_group(mesh_object, vertex_group_name, verts_and_weights, nuke_existing_group=False):
         """Create a new vertex group and add verts and weights to it."""
         _LOG.enter()
-        _LOG.debug("Creating new vertex group", {"mesh_object": mesh_object,
-                                                 "vertex_group_name": vertex_group_name,
-                                                 "verts_and_weights": verts_and_weights,
-                                                 "nuke_existing_group": nuke_existing_group})
+        _LOG.debug("Creating new vertex group", LogService.lazy(lambda: {"mesh_object": mesh_object,
+                                                                         "vertex_group_name": vertex_group_name,
+                                                                         "verts_and_weights": verts_and_weights,
+                                                                         "nuke_existing_group": nuke_existing_group}))
         group = mesh_object.vertex_groups.get(vertex_group_name)
         _LOG.debug("Existing vertex group", group)
 
@@ -256,66 +463,87 @@ class MeshService:
 
         _LOG.debug("Final group", group)
 
-        for index, weight in verts_and_weights:
-            group.add([index], weight, 'REPLACE')
+        if len(verts_and_weights) > 0:
+            vertex_indices, weights = zip(*verts_and_weights)
+            MeshService.add_weights_to_vertex_group(group, vertex_indices, weights, mode='REPLACE')
 
     @staticmethod
-    def get_kdtree(mesh_object, balance=True, limit_to_vertex_group=None, after_modifiers=False, world_coordinates=True):
+    def get_spatial_index_for_points(points, indices=None):
         """
-        Get a kdtree from a mesh object.
+        Get a SpatialIndex over the given points. Indexes are cached by content, so asking for an index over the
+        same points and indices again returns the already built index.
 
         Parameters:
-        - mesh_object: The mesh object to get the kdtree from.
-        - balance: Whether to balance the kdtree.
-        - limit_to_vertex_group: The name of the vertex group to limit the kdtree to.
+        - points: An (N, 3) array of coordinates.
+        - indices: An optional array with the index to report for each point. Defaults to the row numbers.
+
+        Returns: A SpatialIndex."""
+        points = numpy.ascontiguousarray(points, dtype=numpy.float32).reshape((-1, 3))
+        digest = hashlib.sha1(points.tobytes())
+        if indices is not None:
+            indices = numpy.ascontiguousarray(indices, dtype=numpy.int64)
+            digest.update(indices.tobytes())
+        key = digest.hexdigest()
+
+        if key in _SPATIAL_INDEX_CACHE:
+            _SPATIAL_INDEX_CACHE.move_to_end(key)
+            _LOG.trace("Using cached spatial index", key)
+            return _SPATIAL_INDEX_CACHE[key]
+
+        _LOG.debug("Building spatial index", (key, len(points)))
+        spatial_index = SpatialIndex(points, indices)
+        _SPATIAL_INDEX_CACHE[key] = spatial_index
+        while len(_SPATIAL_INDEX_CACHE) > _MAX_CACHED_SPATIAL_INDEXES:
+            _SPATIAL_INDEX_CACHE.popitem(last=False)
+        return spatial_index
 
-        Returns: A kdtree."""
-        _LOG.enter()
+    @staticmethod
+    def get_spatial_index(mesh_object, limit_to_vertex_group=None, after_modifiers=False, world_coordinates=True):
+        """
+        Get a SpatialIndex over the vertices of a mesh object. The index is reused for as long as the vertex
+        coordinates (and the members of the vertex group, if given) stay the same.
 
-        mesh = mesh_object.data
+        Parameters:
+        - mesh_object: The mesh object to get the index for.
+        - limit_to_vertex_group: The name of the vertex group to limit the index to.
+        - after_modifiers: Whether to use the vertex coordinates after modifiers and shape keys.
+        - world_coordinates: Whether to use world coordinates rather than local coordinates.
 
-        if after_modifiers:
-            depsgraph = bpy.context.evaluated_depsgraph_get()
-            evaluated_mesh = mesh_object.evaluated_get(depsgraph)
-            mesh = evaluated_mesh.to_mesh(preserve_all_data_layers=True, depsgraph=depsgraph)
+        Returns: A SpatialIndex, where queries return vertex indices."""
+        _LOG.enter()
+        coordinates = MeshService.get_vertex_coordinates_as_numpy_array(mesh_object, after_modifiers=after_modifiers, world_coordinates=world_coordinates)
 
-        size = len(mesh.vertices)
+        if not limit_to_vertex_group:
+            return MeshService.get_spatial_index_for_points(coordinates)
 
-        _LOG.debug("Getting kdtree", {
-            "mesh_object": mesh_object,
-            "mesh": mesh,
-            "size": size,
-            "balance": balance,
-            "limit_to_vertex_group": limit_to_vertex_group
-            })
+        group_index = mesh_object.vertex_groups.find(limit_to_vertex_group)
+        if group_index < 0:
+            raise ValueError("Cannot find vertex group with name: {}".format(limit_to_vertex_group))
+        (offsets, _, _) = MeshService.get_vertex_group_weights_as_csr(mesh_object, only_group_indices=[group_index])
+        vertex_indices = numpy.flatnonzero(numpy.diff(offsets) > 0)
+        return MeshService.get_spatial_index_for_points(coordinates[vertex_indices], vertex_indices)
 
-        kd = mathutils.kdtree.KDTree(size)
+    @staticmethod
+    def clear_spatial_index_cache():
+        """Forget all cached spatial indexes."""
+        _SPATIAL_INDEX_CACHE.clear()
 
-        if not limit_to_vertex_group:
-            for i, v in enumerate(mesh.vertices):
-                coord = v.co
-                if world_coordinates:
-                    coord = mesh_object.matrix_world @ coord
-                kd.insert(coord, i)
-        else:
-            group_index = None
-            for group in mesh_object.vertex_groups:
-                if group.name == limit_to_vertex_group:
-                    group_index = group.index
-                    break
-            if group_index is None:
-                raise ValueError("Cannot find vertex group with name: {}".format(limit_to_vertex_group))
-            for vert in mesh.vertices:
-                for group in vert.groups:
-                    if group.group == group_index:
-                        kd.insert(vert.co, vert.index)
-        if balance:
-            kd.balance()
+    @staticmethod
+    def get_kdtree(mesh_object, balance=True, limit_to_vertex_group=None, after_modifiers=False, world_coordinates=True):
+        """
+        Get a kdtree from a mesh object. This is a cached SpatialIndex, which supports the same find(), find_n() and
+        find_range() queries as a mathutils KDTree. Since it may be shared, the tree is always balanced and should not
+        be modified.
 
-        if after_modifiers:
-            evaluated_mesh.to_mesh_clear()
+        Parameters:
+        - mesh_object: The mesh object to get the kdtree from.
+        - balance: Ignored, the tree is always balanced.
+        - limit_to_vertex_group: The name of the vertex group to limit the kdtree to.
 
-        return kd
+        Returns: A SpatialIndex."""
+        _LOG.enter()
+        return MeshService.get_spatial_index(mesh_object, limit_to_vertex_group=limit_to_vertex_group,
+                                             after_modifiers=after_modifiers, world_coordinates=world_coordinates)
 
     @staticmethod
     def closest_vertices(focus_obj, focus_vert_idx, target_obj, target_obj_kdtree, number_of_matches=1, world_coordinates=True):
@@ -333,7 +561,8 @@ class MeshService:
         """
         if not focus_obj or not target_obj:
             raise ValueError("Cannot operate on null objects.")
-        if not target_obj_kdtree:
+        # "is None" rather than "not", since an empty SpatialIndex has a length of zero
+        if target_obj_kdtree is None:
             raise ValueError("Cannot operate on null kdtree.")
 
         fake_scale = Vector((1.0, 1.0, 1.0))
@@ -358,6 +587,42 @@ class MeshService:
 
         return target_obj_kdtree.find_n(coord, number_of_matches)
 
+    @staticmethod
+    def closest_vertices_batched(focus_obj, focus_vert_indices, target_obj, target_index, number_of_matches=1, world_coordinates=True):
+        """
+        Batched version of closest_vertices(), which finds the closest vertices on the target object for many focus
+        vertices at once.
+
+        Parameters:
+        - focus_obj: The object that has the vertices we want to find something close to.
+        - focus_vert_indices: An array with the indices of the focus vertices.
+        - target_obj: The object that has vertices that might be close to the focus vertices.
+        - target_index: A SpatialIndex over the vertices of the target object.
+        - number_of_matches: The number of closest matches to return per focus vertex, defaults to 1.
+        - world_coordinates: Whether to use world coordinates for the focus vertices, defaults to True.
+
+        Returns: A tuple (indices, distances). With number_of_matches == 1 these are arrays with one entry per focus vertex,
+        otherwise (M, number_of_matches) arrays with the closest match first. Missing matches have index -1 and distance inf.
+        """
+        if not focus_obj or not target_obj:
+            raise ValueError("Cannot operate on null objects.")
+        if target_index is None:
+            raise ValueError("Cannot operate on null kdtree.")
+
+        fake_scale = Vector((1.0, 1.0, 1.0))
+        if (focus_obj.scale - fake_scale).length > 0.0001:
+            raise ValueError("Cannot operate on objects with different scales.")
+        if (target_obj.scale - fake_scale).length > 0.0001:
+            raise ValueError("Cannot operate on objects with different scales.")
+
+        coords = MeshService.get_vertex_coordinates_as_numpy_array(focus_obj, world_coordinates=world_coordinates)
+        coords = coords[numpy.asarray(focus_vert_indices, dtype=numpy.int64)]
+
+        if number_of_matches == 1:
+            return target_index.nearest(coords)
+
+        return target_index.k_nearest(coords, number_of_matches)
+
     @staticmethod
     def get_vertex_coordinates_as_numpy_array(mesh_object, after_modifiers=False, world_coordinates=True):
         """Get the vertex coordinates as a numpy array where the vertex index is the row number."""
@@ -373,19 +638,80 @@ class MeshService:
 
         size = len(mesh.vertices)
 
-        vert_array = numpy.zeros((size, 3), dtype=numpy.float32)
-        for i, v in enumerate(mesh.vertices):
-            coord = v.co
-            if world_coordinates:
-                coord = mesh_object.matrix_world @ coord
-            for axis in range(3):
-                vert_array[i][axis] = float(coord[axis])
+        vert_array = numpy.zeros(size * 3, dtype=numpy.float32)
+        mesh.vertices.foreach_get("co", vert_array)
+        vert_array = vert_array.reshape((size, 3))
+
+        if world_coordinates:
+            matrix = numpy.array(mesh_object.matrix_world, dtype=numpy.float64)
+            vert_array = (vert_array @ matrix[:3, :3].T + matrix[:3, 3]).astype(numpy.float32)
 
         if after_modifiers:
             evaluated_mesh.to_mesh_clear()
 
         return vert_array
 
+    @staticmethod
+    def set_vertex_coordinates_from_numpy_array(mesh_object, coordinates, only_update_mask=None):
+        """
+        Set the local vertex coordinates of a mesh object from an (N, 3) numpy array where the row number is the vertex index.
+
+        If the mesh has shape keys, the coordinates are written to the reference (basis) key, and the
+        resulting displacement is also applied to all keys which are relative to it. This is the same
+        thing that happens when editing the basis key in edit mode, but without a mode switch.
+
+        Parameters:
+        - mesh_object: The mesh object to modify.
+        - coordinates: An array-like of shape (N, 3) with new coordinates.
+        - only_update_mask: An optional boolean array of length N. Vertices where this is False keep their current coordinates.
+        """
+        _LOG.enter()
+        mesh = mesh_object.data
+        size = len(mesh.vertices)
+
+        coordinates = numpy.asarray(coordinates, dtype=numpy.float32).reshape((size, 3))
+
+        shape_keys = mesh.shape_keys
+        reference_key = shape_keys.reference_key if shape_keys and len(shape_keys.key_blocks) > 0 else None
+
+        current = numpy.empty(size * 3, dtype=numpy.float32)
+        if reference_key:
+            reference_key.data.foreach_get("co", current)
+        else:
+            mesh.vertices.foreach_get("co", current)
+        current = current.reshape((size, 3))
+
+        if only_update_mask is not None:
+            coordinates = numpy.where(numpy.asarray(only_update_mask, dtype=bool)[:, None], coordinates, current)
+
+        mesh.vertices.foreach_set("co", coordinates.ravel())
+
+        if reference_key:
+            delta = coordinates - current
+            reference_key.data.foreach_set("co", coordinates.ravel())
+
+            # Find all keys which directly or indirectly are relative to the reference key
+            dependent = {reference_key.name}
+            changed = True
+            while changed:
+                changed = False
+                for key_block in shape_keys.key_blocks:
+                    if key_block.name not in dependent and key_block.relative_key.name in dependent:
+                        dependent.add(key_block.name)
+                        changed = True
+
+            key_coords = numpy.empty(size * 3, dtype=numpy.float32)
+            flat_delta = delta.ravel()
+            for key_block in shape_keys.key_blocks:
+                if key_block != reference_key and key_block.name in dependent:
+                    key_block.data.foreach_get("co", key_coords)
+                    key_block.data.foreach_set("co", key_coords + flat_delta)
+
+            from .targetservice import TargetService
+            TargetService.invalidate_mixed_vertex_coordinates(mesh_object)
+
+        mesh.update()
+
     @staticmethod
     def get_faces_as_numpy_array(mesh_object):
         """Get the faces as a numpy array."""
@@ -394,19 +720,21 @@ class MeshService:
         mesh = mesh_object.data
         size = len(mesh.polygons)
 
-        verts_per_face = None
+        loop_totals = numpy.zeros(size, dtype=numpy.int32)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+        loop_starts = numpy.zeros(size, dtype=numpy.int32)
+        mesh.polygons.foreach_get("loop_start", loop_starts)
 
-        for face in mesh.polygons:
-            if not verts_per_face:
-                verts_per_face = len(face.vertices)
-            if len(face.vertices) != verts_per_face:
-                raise ValueError("Faces must have the same number of vertices. Found both {} and {}".format(len(face.vertices), verts_per_face))
+        verts_per_face = int(loop_totals[0]) if size > 0 else None
 
-        face_array = numpy.zeros((size, verts_per_face), dtype=numpy.uint32)
-        for face in mesh.polygons:
-            for v in range(verts_per_face):
-                face_array[face.index][v] = face.vertices[v]
+        if size > 0 and numpy.any(loop_totals != verts_per_face):
+            other = int(loop_totals[numpy.argmax(loop_totals != verts_per_face)])
+            raise ValueError("Faces must have the same number of vertices. Found both {} and {}".format(other, verts_per_face))
 
+        loop_vertices = numpy.zeros(len(mesh.loops), dtype=numpy.int32)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+
+        face_array = loop_vertices[loop_starts[:, None] + numpy.arange(verts_per_face or 0)].astype(numpy.uint32)
         return face_array
 
     @staticmethod
@@ -417,28 +745,28 @@ class MeshService:
         mesh = mesh_object.data
         size = len(mesh.edges)
 
-        verts_per_edge = None
-
-        # This is most likely unnecessary
-        for edge in mesh.edges:
-            if not verts_per_edge:
-                verts_per_edge = len(edge.vertices)
-            if len(edge.vertices) != verts_per_edge:
-                raise ValueError("Edges must have the same number of vertices. Found both {} and {}".format(len(edge.vertices), verts_per_edge))
+        edge_array = numpy.zeros(size * 2, dtype=numpy.int32)
+        mesh.edges.foreach_get("vertices", edge_array)
 
-        edge_array = numpy.zeros((size, verts_per_edge), dtype=numpy.uint32)
-        for edge in mesh.edges:
-            for v in range(verts_per_edge):
-                edge_array[edge.index][v] = edge.vertices[v]
-
-        return edge_array
+        return edge_array.reshape((size, 2)).astype(numpy.uint32)
 
     @staticmethod
-    def get_mesh_cross_references(mesh_object, after_modifiers=True, build_faces_by_group_reference=False):
-        """Build a cross reference container for the mesh object."""
+    def get_mesh_cross_references(mesh_object, after_modifiers=True, build_faces_by_group_reference=False, use_cache=None):
+        """Build a cross reference container for the mesh object.
+
+        Parameters:
+        - mesh_object: The mesh object to cross reference.
+        - after_modifiers: Whether to use the coordinates after modifiers have been applied.
+        - build_faces_by_group_reference: Whether to build the optional faces_by_group table.
+        - use_cache: Whether to read and write the topology tables from the xref cache. If None, the cache is used for base meshes.
+        """
         _LOG.enter()
         from ..entities.meshcrossref import MeshCrossRef
-        return MeshCrossRef(mesh_object, after_modifiers=after_modifiers, build_faces_by_group_reference=build_faces_by_group_reference)
+        if use_cache is None:
+            use_cache = ObjectService.object_is_basemesh(mesh_object)
+        cache_dir = LocationService.get_user_cache("basemesh_xref") if use_cache else None
+        return MeshCrossRef(mesh_object, after_modifiers=after_modifiers, build_faces_by_group_reference=build_faces_by_group_reference,
+                            cache_dir=cache_dir, write_cache=use_cache, read_cache=use_cache)
 
     @staticmethod
     def select_all_vertices_in_vertex_group_for_active_object(vertex_group_name, deselect_other=True):
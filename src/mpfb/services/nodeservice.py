@@ -158,6 +158,7 @@ class NodeService:
         and its attributes."""
         if not node:
             raise ValueError("Cannot get node info about None")
+        debug = _LOG.is_enabled(LogService.DEBUG)
         node_info = {
             "class": node.__class__.__name__,
             "inputs": dict(),
@@ -179,7 +180,8 @@ class NodeService:
                         else:
                             input_dict["default_value"] = input_socket.default_value
                 if "Float" in input_dict["class"] and hasattr(node, "node_tree"):
-                    _LOG.debug("input_socket", input_socket)
+                    if debug:
+                        _LOG.debug("input_socket", input_socket)
                     tree_input = NodeTreeService.get_input_socket(node.node_tree, input_socket.name)
                     input_dict["min_value"] = tree_input.min_value
                     input_dict["max_value"] = tree_input.max_value
@@ -1,6 +1,6 @@
 """This module contains utility functions for working with objects."""
 
-import bpy, os, json, random, gzip, typing, string
+import bpy, os, json, random, gzip, typing, string, numpy
 from .logservice import LogService
 from .locationservice import LocationService
 from ..entities.objectproperties import GeneralObjectProperties
@@ -841,27 +841,16 @@ class ObjectService:
         Returns:
             float: The lowest Z-coordinate value of the base mesh.
         """
-        lowest_point = 1000.0
-        vertex_data = basemesh.data.vertices
-        shape_key = None
-        key_name = None
-
-        if take_shape_keys_into_account and basemesh.data.shape_keys and basemesh.data.shape_keys.key_blocks and len(basemesh.data.shape_keys.key_blocks) > 0:
-            from .targetservice import TargetService
-            key_name = "temporary_lowest_point_key." + str(random.randrange(1000, 9999))
-            shape_key = TargetService.create_shape_key(basemesh, key_name, also_create_basis=True, create_from_mix=True)
-            vertex_data = shape_key.data
-
-        index = 0
-        for vertex in vertex_data:
-            if vertex.co[2] < lowest_point and index < 13380:
-                lowest_point = vertex.co[2]
-            index = index + 1
-
-        if shape_key:
-            basemesh.shape_key_remove(shape_key)
+        from .targetservice import TargetService
+        if take_shape_keys_into_account:
+            coordinates = TargetService.get_mixed_vertex_coordinates(basemesh)
+        else:
+            coordinates = numpy.empty(len(basemesh.data.vertices) * 3, dtype=numpy.float32)
+            basemesh.data.vertices.foreach_get("co", coordinates)
+            coordinates = coordinates.reshape((-1, 3))
 
-        return lowest_point
+        # Only consider the body, not the helpers
+        return float(coordinates[:13380, 2].min(initial=1000.0))
 
     @staticmethod
     def get_face_to_vertex_table():
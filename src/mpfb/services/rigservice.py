@@ -1,6 +1,6 @@
 """Utility functions for working with rigs, bones and weights."""
 
-import bpy, os, fnmatch, shutil, json, re, typing
+import bpy, os, fnmatch, shutil, json, re, typing, numpy
 from bpy.types import PoseBone
 from collections import defaultdict
 from mathutils import Matrix, Vector
@@ -9,6 +9,7 @@ from .logservice import LogService
 from .systemservice import SystemService
 from .targetservice import TargetService
 from .objectservice import ObjectService
+from .meshservice import MeshService
 from ..entities.objectproperties import SkeletonObjectProperties
 
 _LOG = LogService.get_logger("services.rigservice")
@@ -673,8 +674,12 @@ class RigService:
 
     @staticmethod
     def get_weights(armature_objects, basemesh, exclude_weights_below=0.0001,
-                    all_groups=False, all_bones=False, all_masks=True):
-        """Create a MHW-compatible weights dict"""
+                    all_groups=False, all_bones=False, all_masks=True, *, as_arrays=False):
+        """Create a MHW-compatible weights dict.
+
+        If as_arrays is True, each group in the "weights" section is a tuple (vertex indices, weights) of
+        numpy arrays rather than a list of [vertex index, weight] pairs. Such a dict can be written with
+        save_weights() and applied with apply_weights() just like the list form."""
         _LOG.enter()
         # Even though it is unlikely we'll use these keys in MPFB, we'll assign them so that the dict
         # is compatible with the MHW format
@@ -688,20 +693,48 @@ class RigService:
             "weights": dict(),
         }
 
-        vertex_group_index_to_name = dict()
+        group_arrays = RigService.get_weights_as_arrays(armature_objects, basemesh, exclude_weights_below,
+                                                        all_groups=all_groups, all_bones=all_bones, all_masks=all_masks)
+
+        for name, (vertex_indices, vertex_weights) in group_arrays.items():
+            if as_arrays:
+                weights["weights"][name] = (vertex_indices, vertex_weights)
+            else:
+                weights["weights"][name] = [list(pair) for pair in zip(vertex_indices.tolist(), vertex_weights.tolist())]
+
+        return weights
+
+    @staticmethod
+    def get_weights_as_arrays(armature_objects, basemesh, exclude_weights_below=0.0001,
+                              all_groups=False, all_bones=False, all_masks=True):
+        """
+        Extract the weights of a mesh as arrays, one pair of arrays per group.
+
+        The selection of groups, the rounding to five decimals and the clamping to 0..1 is the
+        same as for get_weights().
+
+        Args:
+            armature_objects (list[bpy.types.Object] | bpy.types.Object): The armature or list of armatures to use for selecting relevant groups.
+            basemesh (bpy.types.Object): The mesh object to read weights from.
+            exclude_weights_below (float, optional): Skip weights below this value. Defaults to 0.0001.
+            all_groups (bool, optional): Include all groups which are not masks. Defaults to False.
+            all_bones (bool, optional): Include all deform bones, even those without a vertex group. Defaults to False.
+            all_masks (bool, optional): Include all mask groups. Defaults to True.
+
+        Returns:
+            dict: Group name as key and a tuple (int32 vertex indices, float64 weights) as value.
+        """
+        _LOG.enter()
+        included = dict()
         vertex_group_names = set()
 
         for vertex_group in basemesh.vertex_groups:
-            index = int(vertex_group.index)
             name = str(vertex_group.name)
-            vertex_group_index_to_name[index] = name
             vertex_group_names.add(name)
 
             # Include all groups and/or masks, depending on parameters
             if all_masks if name.startswith("mhmask-") else all_groups:
-                weights["weights"][name] = []
-
-        _LOG.dump("vertex_group_index_to_name", vertex_group_index_to_name)
+                included[name] = True
 
         if not isinstance(armature_objects, list):
             armature_objects = [armature_objects]
@@ -709,22 +742,100 @@ class RigService:
         for armature_object in armature_objects:
             for bone in armature_object.data.bones:
                 if all_bones and bone.use_deform or bone.name in vertex_group_names:
-                    weights["weights"][str(bone.name)] = []
+                    included[str(bone.name)] = True
+
+        _LOG.dump("Groups to extract", list(included.keys()))
 
-        _LOG.dump("Weights before vertices", weights)
+        group_weights = MeshService.get_vertex_group_weights(basemesh, [name for name in included if name in vertex_group_names])
 
-        for vertex in basemesh.data.vertices:
-            for group in vertex.groups:
-                group_index = int(group.group)
-                weight = max(0, min(1, round(group.weight, 5) + 0))
-                if group_index in vertex_group_index_to_name:
-                    name = vertex_group_index_to_name[group_index]
-                    if name in weights["weights"]:
-                        if weight >= exclude_weights_below:
-                            weights["weights"][name].append([vertex.index, weight])
+        result = dict()
+        for name in included:
+            if name not in group_weights:
+                result[name] = (numpy.zeros(0, dtype=numpy.int32), numpy.zeros(0, dtype=numpy.float64))
+                continue
+
+            vertex_indices, vertex_weights = group_weights[name]
+            # Adding 0.0 turns negative zero into zero, just like in the MHW files written by MakeHuman
+            vertex_weights = numpy.clip(numpy.round(vertex_weights.astype(numpy.float64), 5), 0.0, 1.0) + 0.0
+            keep = vertex_weights >= exclude_weights_below
+            result[name] = (vertex_indices[keep], vertex_weights[keep])
+
+        return result
+
+    @staticmethod
+    def save_weights(weights, filename):
+        """
+        Write a MHW weights dict to a file.
+
+        Files with the ".npz" extension are written as compressed binary MHW, with one index array and
+        one weight array per group. All other files are written as json.
+
+        Args:
+            weights (dict): A weights dict as returned by get_weights(), in either list or array form.
+            filename (str): The file to write.
+        """
+        _LOG.enter()
+        if not str(filename).lower().endswith(".npz"):
+            serializable = dict(weights)
+            serializable["weights"] = dict()
+            for name, weight_array in weights["weights"].items():
+                if isinstance(weight_array, tuple):
+                    weight_array = [list(pair) for pair in zip(weight_array[0].tolist(), weight_array[1].tolist())]
+                serializable["weights"][name] = weight_array
+
+            with open(filename, "w", encoding="utf-8") as json_file:
+                json.dump(serializable, json_file, indent=4, sort_keys=True)
+            return
+
+        metadata = dict((key, value) for key, value in weights.items() if key != "weights")
+        metadata["groups"] = list(weights["weights"].keys())
+
+        arrays = dict()
+        for position, name in enumerate(metadata["groups"]):
+            vertex_indices, vertex_weights = RigService._weight_array_columns(weights["weights"][name])
+            arrays["indices_" + str(position)] = numpy.asarray(vertex_indices, dtype=numpy.int32)
+            arrays["weights_" + str(position)] = numpy.asarray(vertex_weights, dtype=numpy.float32)
+
+        with open(filename, "wb") as npz_file:
+            numpy.savez_compressed(npz_file, metadata=numpy.array(json.dumps(metadata)), **arrays)
+
+    @staticmethod
+    def read_weights_file(filename):
+        """
+        Read a MHW weights file, either json or binary (".npz").
+
+        Binary files are returned in array form, see get_weights().
+
+        Args:
+            filename (str): The file to read.
+
+        Returns:
+            dict: A weights dict.
+        """
+        _LOG.enter()
+        if not str(filename).lower().endswith(".npz"):
+            with open(filename, 'r', encoding="utf-8") as json_file:
+                return json.load(json_file)
+
+        with numpy.load(filename, allow_pickle=False) as data:
+            weights = json.loads(str(data["metadata"]))
+            groups = weights.pop("groups")
+            weights["weights"] = dict()
+            for position, name in enumerate(groups):
+                weights["weights"][name] = (data["indices_" + str(position)], data["weights_" + str(position)].astype(numpy.float64))
 
         return weights
 
+    @staticmethod
+    def _weight_array_columns(weight_array):
+        """Return a group in either list or array form as a tuple (vertex indices, weights)."""
+        if isinstance(weight_array, tuple):
+            return weight_array
+        if len(weight_array) < 1:
+            return [], []
+        vertex_indices, vertex_weights = zip(*weight_array)
+        return vertex_indices, vertex_weights
+
     @staticmethod
     def load_weights(armature_objects, basemesh, mhw_filename, *, all=False, replace=False):
         """
@@ -738,8 +849,7 @@ class RigService:
             replace: Completely replace group content, i.e. vertices not mentioned in the file are removed.
         """
         _LOG.enter()
-        with open(mhw_filename, 'r', encoding="utf-8") as json_file:
-            weights = json.load(json_file)
+        weights = RigService.read_weights_file(mhw_filename)
 
         _LOG.dump("Weights", weights)
 
@@ -885,7 +995,7 @@ class RigService:
         Args:
             armature_objects (list[bpy.types.Object] | bpy.types.Object): The armature or list of armatures to use for selecting relevant groups.
             basemesh (bpy.types.Object): The mesh object to apply weights to.
-            mhw_dict (dict): A dictionary containing weights data.
+            mhw_dict (dict): A dictionary containing weights data, in list or array form (see get_weights()).
             all (bool, optional): If True, load all groups from the file, even if they match no bones. Defaults to False.
             replace (bool, optional): If True, completely replace group content, i.e., vertices not mentioned in the file are removed. Defaults to False.
         """
@@ -928,24 +1038,22 @@ class RigService:
                     # Remove all vertices
                     vertex_group.remove(remove_indices)
 
-                elif weight_array := weights[group_name]:
+                elif len(vertex_indices := RigService._weight_array_columns(weights[group_name])[0]) > 0:
                     # Clear specific vertices
-                    vertex_indices, vertex_weights = zip(*weight_array)  # pylint: disable=W0612
-                    vertex_group.add(vertex_indices, 0.0, 'REPLACE')
+                    vertex_group.add(numpy.asarray(vertex_indices).tolist(), 0.0, 'REPLACE')
 
         # Assign group weights: allows combining groups by adding duplicate vertex entries together
         for group_name in names:
-            weight_array = weights[group_name]
+            vertex_indices, vertex_weights = RigService._weight_array_columns(weights[group_name])
 
-            if all or weight_array:
+            if all or len(vertex_indices) > 0:
                 bone_name = group_to_bone.get(group_name, group_name)
                 vertex_group = basemesh.vertex_groups.get(bone_name)
 
                 if not vertex_group:
                     vertex_group = basemesh.vertex_groups.new(name=bone_name)
 
-                for vertex_index, weight in weight_array:
-                    vertex_group.add([vertex_index], weight, 'ADD')
+                MeshService.add_weights_to_vertex_group(vertex_group, vertex_indices, vertex_weights, mode='ADD')
 
     @staticmethod
     def identify_rig(armature_object):
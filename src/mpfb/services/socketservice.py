@@ -1,10 +1,107 @@
-
 from .logservice import LogService
 from .jsoncall import JsonCall
-import asyncio
+from contextlib import contextmanager
+import asyncio, struct
 
 _LOG = LogService.get_logger("services.socketservice")
 
+_READ_CHUNK_SIZE = 1024 * 1024
+_MAX_CONCURRENT_CONNECTIONS = 4
+
+# In framed mode, every request and every response is preceded by its length in bytes as a big endian uint64
+_FRAME_HEADER = struct.Struct(">Q")
+
+
+async def _read_until_eof(reader):
+    """Read everything up to EOF into a single bytearray, without first collecting it in an intermediate bytes
+    object."""
+    data = bytearray()
+    while True:
+        chunk = await reader.read(_READ_CHUNK_SIZE)
+        if not chunk:
+            return data
+        data += chunk
+
+
+async def _read_frame(reader):
+    """Read one length-prefixed frame into a preallocated bytearray."""
+    (length,) = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+    data = bytearray(length)
+    view = memoryview(data)
+    received = 0
+    while received < length:
+        chunk = await reader.read(min(length - received, _READ_CHUNK_SIZE))
+        if not chunk:
+            raise IOError("Connection was closed after " + str(received) + " of " + str(length) + " bytes")
+        view[received:received + len(chunk)] = chunk
+        received += len(chunk)
+    return data
+
+
+class _FramedConnection():
+    """A persistent connection where requests and responses are length-prefixed frames. Requests are pipelined:
+    each one is written as soon as it is made, and the responses are read back in the order the requests were
+    written.
+
+    If writing a request or reading a response fails, there is no way of knowing where the next frame starts, so
+    the connection is marked as broken and closed. Requests which are still waiting for their response then fail
+    instead of reading a frame which belongs to another request."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._write_lock = asyncio.Lock()
+        self._last_turn = None
+        self._error = None
+
+    @property
+    def broken(self):
+        return self._error is not None
+
+    def _check_not_broken(self):
+        if self._error is not None:
+            raise IOError("The connection is broken: " + repr(self._error))
+
+    def _break(self, error):
+        if self._error is None:
+            _LOG.warn("Closing broken framed connection:", error)
+            self._error = error
+            self._writer.close()
+
+    async def request(self, payload):
+        async with self._write_lock:
+            self._check_not_broken()
+            previous_turn = self._last_turn
+            turn = asyncio.get_running_loop().create_future()
+            self._last_turn = turn
+            try:
+                self._writer.write(_FRAME_HEADER.pack(len(payload)))
+                self._writer.write(payload)
+                await self._writer.drain()
+            except BaseException as err:
+                self._break(err)
+                turn.set_result(None)
+                raise
+        try:
+            if previous_turn is not None:
+                await previous_turn
+            self._check_not_broken()
+            return await _read_frame(self._reader)
+        except BaseException as err:
+            # This also covers cancellation, since a partially read frame leaves the stream out of sync
+            self._break(err)
+            raise
+        finally:
+            turn.set_result(None)
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError as err:
+            _LOG.debug("Error when closing framed connection:", err)
+
+
 class _SocketService():
 
     def __init__(self):
@@ -12,7 +109,10 @@ class _SocketService():
         # TODO: read these from config somehow
         self._host = "127.0.0.1"
         self._port = 12345
+        self._framed = False
         self._call_cache = dict()
+        self._loop = None
+        self._connection = None
 
     def _value_from_cache(self, function_name):
         _LOG.enter()
@@ -30,47 +130,114 @@ class _SocketService():
         _LOG.enter()
         self._port = port
 
-    async def _call_for_json(self, call):
+    def set_framed(self, framed):
+        """Use length-prefixed frames over a persistent connection instead of one connection per call. This
+        requires a socket server which supports framing, so it is off by default."""
         _LOG.enter()
-        _LOG.reset_timer()
+        self._framed = bool(framed)
+
+    @contextmanager
+    def session(self):
+        """Context manager which keeps one event loop, and in framed mode one connection, open for all calls made
+        within it. Without a session, every call sets up and tears down its own event loop. Nested sessions
+        reuse the outermost one."""
+        _LOG.enter()
+        if self._loop is not None:
+            yield self
+            return
+        self._loop = asyncio.new_event_loop()
+        try:
+            yield self
+        finally:
+            try:
+                if self._connection is not None:
+                    self._loop.run_until_complete(self._connection.close())
+            finally:
+                self._connection = None
+                self._loop.close()
+                self._loop = None
+
+    def _run(self, coroutine):
+        if self._loop is not None:
+            return self._loop.run_until_complete(coroutine)
+        return asyncio.run(coroutine)
+
+    async def _request(self, payload):
+        if self._framed:
+            if self._loop is not None:
+                if self._connection is not None and self._connection.broken:
+                    await self._connection.close()
+                    self._connection = None
+                if self._connection is None:
+                    self._connection = _FramedConnection(*await asyncio.open_connection(self._host, self._port))
+                return await self._connection.request(payload)
+            connection = _FramedConnection(*await asyncio.open_connection(self._host, self._port))
+            try:
+                return await connection.request(payload)
+            finally:
+                await connection.close()
+
         reader, writer = await asyncio.open_connection(self._host, self._port)
+        try:
+            writer.write(payload)
+            await writer.drain()
+            return await _read_until_eof(reader)
+        finally:
+            writer.close()
+            await writer.wait_closed()
 
+    async def _call_for_json(self, call):
+        _LOG.enter()
         _LOG.debug("About to send call for", call.function)
         serialized_data = call.serialize()
         _LOG.dump("Serialized data", serialized_data)
-        data_to_send = serialized_data.encode()
-        writer.write(data_to_send)
-        await writer.drain()
-
-        data_returned = await reader.read(-1)  # -1 = until EOF
+        data_returned = await self._request(serialized_data.encode())
         decoded_data = data_returned.decode()
         _LOG.dump("Decoded returned data", decoded_data)
-        writer.close()
-        await writer.wait_closed()
-
         call.populate_from_json(decoded_data)
-        _LOG.time("Milliseconds it took to perform the call and deserialize data:")
 
     async def _call_for_binary(self, call):
         _LOG.enter()
-        _LOG.reset_timer()
-        reader, writer = await asyncio.open_connection(self._host, self._port)
-
         _LOG.debug("About to send call for", call.function)
         serialized_data = call.serialize()
         _LOG.dump("Serialized data", serialized_data)
-        data_to_send = serialized_data.encode()
-        writer.write(data_to_send)
-        await writer.drain()
-
-        data_returned = await reader.read(-1)  # -1 = until EOF
-        decoded_data = bytearray(data_returned)
+        decoded_data = await self._request(serialized_data.encode())
         _LOG.debug("Length of returned data", len(decoded_data))
         _LOG.dump("Decoded returned data", decoded_data)
-        writer.close()
-        await writer.wait_closed()
         call.data = decoded_data
+
+    async def _gather_calls(self, calls):
+        if self._framed:
+            await asyncio.gather(*[self._call_for_binary(call) if binary else self._call_for_json(call) for (call, binary) in calls])
+            return
+
+        # Without framing, each call needs its own connection. Limit how many are open at the same time.
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_CONNECTIONS)
+
+        async def limited(call, binary):
+            async with semaphore:
+                if binary:
+                    await self._call_for_binary(call)
+                else:
+                    await self._call_for_json(call)
+
+        await asyncio.gather(*[limited(call, binary) for (call, binary) in calls])
+
+    def _perform_call(self, call, binary=False):
+        _LOG.reset_timer()
+        if binary:
+            self._run(self._call_for_binary(call))
+        else:
+            self._run(self._call_for_json(call))
         _LOG.time("Milliseconds it took to perform the call and deserialize data:")
+        return call.data
+
+    def _perform_calls(self, calls):
+        """Perform a list of (call, binary) concurrently and return a list with the data of each call."""
+        _LOG.reset_timer()
+        self._run(self._gather_calls(calls))
+        _LOG.time("Milliseconds it took to perform " + str(len(calls)) + " calls and deserialize data:")
+        return [call.data for (call, _) in calls]
 
     def get_user_dir(self):
         _LOG.enter()
@@ -78,7 +245,7 @@ class _SocketService():
         if not cached_value is None:
             return cached_value
         call = JsonCall("getUserDir")
-        asyncio.run(self._call_for_json(call))
+        self._perform_call(call)
         self._call_cache["getUserDir"] = call.data
         return call.data
 
@@ -88,130 +255,144 @@ class _SocketService():
         if not cached_value is None:
             return cached_value
         call = JsonCall("getSysDir")
-        asyncio.run(self._call_for_json(call))
+        self._perform_call(call)
         self._call_cache["getSysDir"] = call.data
         return call.data
 
     def get_body_mesh_info(self):
         _LOG.enter()
         call = JsonCall("getBodyMeshInfo")
-        asyncio.run(self._call_for_json(call))
-        return call.data
+        return self._perform_call(call)
 
     def get_body_vertices(self):
         _LOG.enter()
         call = JsonCall("getBodyVerticesBinary")
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_body_faces(self):
         _LOG.enter()
         call = JsonCall("getBodyFacesBinary")
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_body_texture_coords(self):
         _LOG.enter()
         call = JsonCall("getBodyTextureCoordsBinary")
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_body_uv_mapping(self):
         _LOG.enter()
         call = JsonCall("getBodyFaceUVMappingsBinary")
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_body_material_info(self):
         _LOG.enter()
         call = JsonCall("getBodyMaterialInfo")
-        asyncio.run(self._call_for_json(call))
-        return call.data
+        return self._perform_call(call)
 
     def get_skeleton(self):
         _LOG.enter()
         call = JsonCall("getSkeleton")
-        asyncio.run(self._call_for_json(call))
-        return call.data
+        return self._perform_call(call)
 
     def get_body_weight_info(self):
         _LOG.enter()
         call = JsonCall("getBodyWeightInfo")
-        asyncio.run(self._call_for_json(call))
-        return call.data
+        return self._perform_call(call)
 
     def get_body_weight_vertices(self):
         _LOG.enter()
         call = JsonCall("getBodyWeightsVertList")
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_body_weights(self):
         _LOG.enter()
         call = JsonCall("getBodyWeights")
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_proxies_info(self):
         _LOG.enter()
         call = JsonCall("getProxiesInfo")
-        asyncio.run(self._call_for_json(call))
-        return call.data
+        return self._perform_call(call)
 
     def get_proxy_vertices(self, uuid):
         _LOG.enter()
         call = JsonCall("getProxyVerticesBinary")
         call.params = {"uuid": uuid}
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_proxy_faces(self, uuid):
         _LOG.enter()
         call = JsonCall("getProxyFacesBinary")
         call.params = {"uuid": uuid}
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_proxy_texture_coords(self, uuid):
         _LOG.enter()
         call = JsonCall("getProxyTextureCoordsBinary")
         call.params = {"uuid": uuid}
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_proxy_uv_mapping(self, uuid):
         _LOG.enter()
         call = JsonCall("getProxyFaceUVMappingsBinary")
         call.params = {"uuid": uuid}
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_proxy_weight_info(self, uuid):
         _LOG.enter()
         call = JsonCall("getProxyWeightInfo")
         call.params = {"uuid": uuid}
-        asyncio.run(self._call_for_json(call))
-        return call.data
+        return self._perform_call(call)
 
     def get_proxy_weight_vertices(self, uuid):
         _LOG.enter()
         call = JsonCall("getProxyWeightsVertList")
         call.params = {"uuid": uuid}
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_proxy_weights(self, uuid):
         _LOG.enter()
         call = JsonCall("getProxyWeights")
         call.params = {"uuid": uuid}
-        asyncio.run(self._call_for_binary(call))
-        return call.data
+        return self._perform_call(call, binary=True)
 
     def get_proxy_material_info(self, uuid):
         _LOG.enter()
         call = JsonCall("getProxyMaterialInfo")
         call.params = {"uuid": uuid}
-        asyncio.run(self._call_for_json(call))
-        return call.data
+        return self._perform_call(call)
+
+    def get_body_mesh_arrays(self):
+        """Fetch the vertices, faces, texture coordinates and face UV mappings of the body in one batch of
+        concurrent calls. Returns a dict with the raw bytearrays."""
+        _LOG.enter()
+        functions = ["getBodyVerticesBinary", "getBodyFacesBinary", "getBodyTextureCoordsBinary", "getBodyFaceUVMappingsBinary"]
+        return self._fetch_arrays(functions)
+
+    def get_body_weight_arrays(self):
+        """Fetch the weight info, weight vertex list and weights of the body in one batch of concurrent calls.
+        Returns a tuple (weight_info, weight_vertices, weights)."""
+        _LOG.enter()
+        calls = [(JsonCall("getBodyWeightInfo"), False), (JsonCall("getBodyWeightsVertList"), True), (JsonCall("getBodyWeights"), True)]
+        return tuple(self._perform_calls(calls))
+
+    def get_proxy_mesh_arrays(self, uuid):
+        """Like get_body_mesh_arrays(), but for the proxy with the given uuid."""
+        _LOG.enter()
+        functions = ["getProxyVerticesBinary", "getProxyFacesBinary", "getProxyTextureCoordsBinary", "getProxyFaceUVMappingsBinary"]
+        return self._fetch_arrays(functions, {"uuid": uuid})
+
+    def get_proxy_weight_arrays(self, uuid):
+        """Like get_body_weight_arrays(), but for the proxy with the given uuid."""
+        _LOG.enter()
+        calls = [(JsonCall("getProxyWeightInfo", {"uuid": uuid}), False),
+                 (JsonCall("getProxyWeightsVertList", {"uuid": uuid}), True),
+                 (JsonCall("getProxyWeights", {"uuid": uuid}), True)]
+        return tuple(self._perform_calls(calls))
+
+    def _fetch_arrays(self, functions, params=None):
+        calls = [(JsonCall(function, dict(params) if params else None), True) for function in functions]
+        data = self._perform_calls(calls)
+        return dict(zip(["vertices", "faces", "texture_coords", "uv_mapping"], data))
 
 SocketService = _SocketService() # pylint: disable=C0103
@@ -0,0 +1,92 @@
+from .logservice import LogService
+
+import mathutils, numpy
+
+_LOG = LogService.get_logger("services.spatialindex")
+
+
+class SpatialIndex():
+    """A KD tree over a set of points, with batched queries over numpy arrays.
+
+    The points are given as an (N, 3) array. Optionally, indices can be given, which is then what is returned by
+    queries instead of the row numbers in the points array. For example, for a KD tree over the vertices in a
+    vertex group, the points would be the coordinates of the vertices in the group and the indices their vertex
+    indices.
+
+    find(), find_n() and find_range() behave like the corresponding methods on mathutils.kdtree.KDTree, so a
+    SpatialIndex can be used wherever a KDTree was used before. The batched methods nearest(), k_nearest() and
+    in_radius() accept an (M, 3) array of query points and return numpy arrays. They are not vectorized: each one is a
+    python loop over the corresponding KDTree method, which saves the calling code from converting every point to and
+    from mathutils vectors."""
+
+    def __init__(self, points, indices=None, balance=True):
+        self.points = numpy.asarray(points, dtype=numpy.float32).reshape((-1, 3))
+        if indices is None:
+            self.indices = numpy.arange(len(self.points), dtype=numpy.int64)
+        else:
+            self.indices = numpy.asarray(indices, dtype=numpy.int64)
+        if len(self.indices) != len(self.points):
+            raise ValueError("There must be exactly one index per point")
+
+        self.kdtree = mathutils.kdtree.KDTree(len(self.points))
+        for point, index in zip(self.points.tolist(), self.indices.tolist()):
+            self.kdtree.insert(point, index)
+        if balance:
+            self.kdtree.balance()
+
+    def __len__(self):
+        return len(self.points)
+
+    def balance(self):
+        self.kdtree.balance()
+
+    def find(self, co):
+        return self.kdtree.find(co)
+
+    def find_n(self, co, n):
+        return self.kdtree.find_n(co, n)
+
+    def find_range(self, co, radius):
+        return self.kdtree.find_range(co, radius)
+
+    def nearest(self, query_points):
+        """Return (indices, distances) with the closest point for each query point. If the index is empty, the
+        indices are -1 and the distances are inf. This loops over find() in python."""
+        query_points = _as_query_array(query_points)
+        indices = numpy.full(len(query_points), -1, dtype=numpy.int64)
+        distances = numpy.full(len(query_points), numpy.inf, dtype=numpy.float64)
+        if len(self.points) < 1:
+            return indices, distances
+        find = self.kdtree.find
+        for row, point in enumerate(query_points.tolist()):
+            (_, indices[row], distances[row]) = find(point)
+        return indices, distances
+
+    def k_nearest(self, query_points, k):
+        """Return (indices, distances) as (M, k) arrays with the k closest points for each query point, closest first.
+        If there are fewer than k points, the remaining columns have index -1 and distance inf. This loops over
+        find_n() in python."""
+        query_points = _as_query_array(query_points)
+        indices = numpy.full((len(query_points), k), -1, dtype=numpy.int64)
+        distances = numpy.full((len(query_points), k), numpy.inf, dtype=numpy.float64)
+        find_n = self.kdtree.find_n
+        for row, point in enumerate(query_points.tolist()):
+            for column, (_, index, distance) in enumerate(find_n(point, k)):
+                indices[row, column] = index
+                distances[row, column] = distance
+        return indices, distances
+
+    def in_radius(self, query_points, radius):
+        """Return a list with, for each query point, an array with the indices of all points within the radius,
+        sorted by distance. This loops over find_range() in python."""
+        query_points = _as_query_array(query_points)
+        find_range = self.kdtree.find_range
+        results = []
+        for point in query_points.tolist():
+            found = sorted(find_range(point, radius), key=lambda match: match[2])
+            results.append(numpy.array([match[1] for match in found], dtype=numpy.int64))
+        return results
+
+
+def _as_query_array(query_points):
+    return numpy.asarray(query_points, dtype=numpy.float64).reshape((-1, 3))
@@ -14,8 +14,9 @@ In blender, targets are stored in the object's shape keys. Conceptually, there i
 mapping between a target and a shape key.
 """
 
-import os, gzip, bpy, json, random, re
-from itertools import count
+import os, gzip, bpy, json, random, re, hashlib, numpy
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from .logservice import LogService
 from .assetservice import AssetService
@@ -52,6 +53,37 @@ with open(_MACRO_FILE, "r") as json_file:
 _LOADER = LogService.get_logger("target loader")
 # _LOADER.set_level(LogService.DUMP)
 
+# Parsed targets are stored as a pair of raw .npy files per source target, one with
+# the vertex indices and one with the (already XZY-swapped) offsets. These can be
+# memory mapped, so that loading a target becomes a matter of slicing arrays rather
+# than parsing text.
+_COMPILED_TARGETS_DIR = LocationService.get_user_cache("compiled_targets")
+_COMPILED_TARGETS_VERSION = "1"
+
+# Number of threads used for decoding target files concurrently when loading a whole stack
+# of targets. Decompression and array parsing mostly release the GIL, so this scales with cores.
+# Setting this to 1 disables the thread pool.
+_PREFETCH_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+# In "collapsed macro" mode, all macrodetail targets are blended into one single shape key
+# rather than being loaded as one shape key each. The arrays for the macro targets are kept
+# in memory, since the same few dozen files are used over and over. They are keyed on path, and
+# an entry is only used while the modification time and size of the file are unchanged.
+_COLLAPSED_MACRO_SHAPEKEY_NAME = "$md-combined"
+_MACRO_TARGET_ARRAYS = OrderedDict()
+_MAX_MACRO_TARGET_ARRAYS = 512
+
+# Index from shape key name to position in key_blocks, per shape key datablock (keyed on its pointer).
+# Hits are verified against the actual key block name, so a stale index is never trusted.
+_TARGET_INDEX = dict()
+
+# The "from mix" coordinates per shape key datablock (keyed on its session uid), as computed by get_mixed_vertex_coordinates().
+# An entry is only used while the key names, values, mute flags and relative keys are unchanged. Key coordinates are not
+# compared, so the entry is dropped when TargetService writes shape key coordinates, and must be dropped with
+# invalidate_mixed_vertex_coordinates() after coordinates have been changed in some other way.
+_MIXED_COORDINATES = OrderedDict()
+_MAX_CACHED_MIXED_COORDINATES = 8
+
 # This is very annoying, but the maximum length of a shape key name is 61 characters
 # in blender. The combinations used in MH filenames tend to be longer than that.
 _SHAPEKEY_ENCODING = [
@@ -130,25 +162,22 @@ class TargetService:
         """
         Apply all current shape keys to the mesh and then remove them, effectively "baking" the modifications into the mesh.
 
-        This method creates a temporary shape key that captures the current state of all shape keys combined. It then removes
-        all existing shape keys, including the temporary one, leaving the mesh in its final modified state.
+        This method reads the coordinates given by the current state of all shape keys combined. It then removes all existing
+        shape keys and writes these coordinates to the mesh, leaving the mesh in its final modified state.
 
         Args:
             basemesh (bpy.types.Object): The Blender object (mesh) whose shape keys are to be baked.
         """
-        key_name = "temporary_fitting_key." + str(random.randrange(1000, 9999))
-        basemesh.shape_key_add(name=key_name, from_mix=True)
-        shape_key = basemesh.data.shape_keys.key_blocks[key_name]
-
-        keys = []
-        for key in basemesh.data.shape_keys.key_blocks:
-            if key.name != key_name:
-                keys.append(key)
+        if not TargetService.has_any_shapekey(basemesh):
+            return
 
-        for key in keys:
-            basemesh.shape_key_remove(key)
+        # Baking is destructive, so always compute the mix from the current key data rather than trusting a cache
+        coordinates = TargetService.get_mixed_vertex_coordinates(basemesh, use_cache=False)
+        TargetService.invalidate_target_index(basemesh)
+        basemesh.shape_key_clear()
 
-        basemesh.shape_key_remove(shape_key)
+        basemesh.data.vertices.foreach_set("co", coordinates.ravel())
+        basemesh.data.update()
 
     @staticmethod
     def translate_mhm_target_line_to_target_fragment(mhm_line):
@@ -166,28 +195,27 @@ class TargetService:
                   { "target": <target_name>, "value": <weight> }
         """
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("translate_mhm_target_line_to_target_fragment")
-        _LOG.debug("Will try to parse MHM line", mhm_line)
-        if mhm_line.startswith("modifier "):
-            mhm_line.replace("modifier ", "")
-        name, weight = mhm_line.split(" ", 1)
-        _LOG.dump("name, weight", (name, weight))
-        weight = float(weight)
-        for opposite in _OPPOSITES:
-            negative, positive = opposite.split("-", 1)
-            mhm_term = negative + "|" + positive
-            _LOG.dump("Matching against mhm term", (mhm_term, mhm_line))
-            if mhm_term in mhm_line:
-                _LOG.debug("Matched mhm_term", mhm_term)
-                if weight < 0.0:
-                    name = name.replace(mhm_term, negative)
-                    weight = -weight
-                else:
-                    name = name.replace(mhm_term, positive)
-        if "/" in name:
-            dirname, name = name.split("/", 1)
-        _LOG.debug("Translation result", (name, weight))
-        profiler.leave("translate_mhm_target_line_to_target_fragment")
+        with profiler.span("translate_mhm_target_line_to_target_fragment"):
+            _LOG.debug("Will try to parse MHM line", mhm_line)
+            if mhm_line.startswith("modifier "):
+                mhm_line.replace("modifier ", "")
+            name, weight = mhm_line.split(" ", 1)
+            _LOG.dump("name, weight", (name, weight))
+            weight = float(weight)
+            for opposite in _OPPOSITES:
+                negative, positive = opposite.split("-", 1)
+                mhm_term = negative + "|" + positive
+                _LOG.dump("Matching against mhm term", (mhm_term, mhm_line))
+                if mhm_term in mhm_line:
+                    _LOG.debug("Matched mhm_term", mhm_term)
+                    if weight < 0.0:
+                        name = name.replace(mhm_term, negative)
+                        weight = -weight
+                    else:
+                        name = name.replace(mhm_term, positive)
+            if "/" in name:
+                dirname, name = name.split("/", 1)
+            _LOG.debug("Translation result", (name, weight))
         return { "target": name, "value": weight }
 
     @staticmethod
@@ -261,22 +289,21 @@ class TargetService:
         """
         _LOG.enter()
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("create_shape_key")
-
-        assert blender_object.mode == "OBJECT"
+        with profiler.span("create_shape_key"):
+            assert blender_object.mode == "OBJECT"
 
-        if also_create_basis:
-            if not blender_object.data.shape_keys or not "Basis" in blender_object.data.shape_keys.key_blocks:
-                blender_object.shape_key_add(name="Basis", from_mix=False)
+            if also_create_basis:
+                if not blender_object.data.shape_keys or not "Basis" in blender_object.data.shape_keys.key_blocks:
+                    blender_object.shape_key_add(name="Basis", from_mix=False)
 
-        shape_key = blender_object.shape_key_add(name=shape_key_name, from_mix=create_from_mix)
-        shape_key.value = 1.0
+            shape_key = blender_object.shape_key_add(name=shape_key_name, from_mix=create_from_mix)
+            shape_key.value = 1.0
+            TargetService.invalidate_target_index(blender_object)
 
-        _LOG.debug("shape key", shape_key)
+            _LOG.debug("shape key", shape_key)
 
-        shape_key_idx = blender_object.data.shape_keys.key_blocks.find(shape_key.name)
-        blender_object.active_shape_key_index = shape_key_idx
-        profiler.leave("create_shape_key")
+            shape_key_idx = blender_object.data.shape_keys.key_blocks.find(shape_key.name)
+            blender_object.active_shape_key_index = shape_key_idx
 
         return shape_key
 
@@ -301,7 +328,59 @@ class TargetService:
         _LOG.enter()
         _LOG.reset_timer()
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("get_shape_key_as_dict")
+        with profiler.span("get_shape_key_as_dict"):
+            indices, offsets = TargetService.get_shape_key_as_arrays(
+                blender_object, shape_key_name,
+                smaller_than_counts_as_unmodified=smaller_than_counts_as_unmodified,
+                only_modified_verts=only_modified_verts)
+
+            info = dict()
+            info["name"] = shape_key_name
+            info["vertices"] = [(i, x, y, z) for i, (x, y, z) in zip(indices.tolist(), offsets.tolist())]
+
+            _LOG.time("Extracting shape key took")
+
+        return info
+
+    @staticmethod
+    def _get_shape_key_offsets(shape_key, scale_factor, *, smaller_than_counts_as_unmodified=0.0001, only_modified_verts=True):
+        basis = shape_key.relative_key
+
+        if not basis:
+            raise ValueError("Object does not have a Basis shape key")
+
+        number_of_vertices = len(shape_key.data)
+        basis_coords = numpy.empty(number_of_vertices * 3, dtype=numpy.float32)
+        target_coords = numpy.empty(number_of_vertices * 3, dtype=numpy.float32)
+        basis.data.foreach_get('co', basis_coords)
+        shape_key.data.foreach_get('co', target_coords)
+
+        offsets = (target_coords - basis_coords).reshape((number_of_vertices, 3)) / numpy.float32(scale_factor)
+
+        if not only_modified_verts:
+            return numpy.arange(number_of_vertices, dtype=numpy.int32), offsets
+
+        indices = numpy.flatnonzero(numpy.abs(offsets).sum(axis=1) > smaller_than_counts_as_unmodified).astype(numpy.int32)
+        return indices, offsets[indices]
+
+    @staticmethod
+    def get_shape_key_as_arrays(blender_object, shape_key_name: str | bpy.types.ShapeKey, *,
+                                smaller_than_counts_as_unmodified=0.0001, only_modified_verts=True):
+        """
+        Extract a shape key of a Blender object as a sparse target in array form.
+
+        This is the array equivalent of get_shape_key_as_dict(), and returns data in the same format as
+        load_target_arrays().
+
+        Args:
+            blender_object (bpy.types.Object): The Blender object containing the shape key.
+            shape_key_name (str or bpy.types.ShapeKey): The name of the shape key or the shape key object itself.
+            smaller_than_counts_as_unmodified (float, optional): Threshold below which vertex modifications are ignored. Defaults to 0.0001.
+            only_modified_verts (bool, optional): Whether to include only modified vertices in the output. Defaults to True.
+
+        Returns:
+            tuple: (indices, offsets) where indices is an int32 array of vertex indices and offsets is a float32 (N, 3) array.
+        """
         if blender_object is None:
             raise ValueError("A none object cannot have shape keys")
         if not blender_object.data.shape_keys:
@@ -321,52 +400,22 @@ class TargetService:
             else:
                 raise ValueError("Object does not have the " + shape_key_name + " shape key")
 
-        basis = target.relative_key
+        return TargetService._get_shape_key_offsets(
+            target, scale_factor,
+            smaller_than_counts_as_unmodified=smaller_than_counts_as_unmodified,
+            only_modified_verts=only_modified_verts)
 
-        if not basis:
-            raise ValueError("Object does not have a Basis shape key")
-
-        info = dict()
-        info["name"] = shape_key_name
-        info["vertices"] = vertices = []
-
-        for i, basis_vert, target_vert in zip(count(0), basis.data, target.data):
-            offset = (target_vert.co - basis_vert.co) / scale_factor
-            size = abs(offset[0]) + abs(offset[1]) + abs(offset[2])
-
-            if not only_modified_verts or size > smaller_than_counts_as_unmodified:
-                vertices.append((i, offset[0], offset[1], offset[2]))
-
-        _LOG.time("Extracting shape key took")
-
-        profiler.leave("get_shape_key_as_dict")
-
-        return info
+    @staticmethod
+    def _shape_key_info_to_arrays(info):
+        vertices = info["vertices"]
+        indices = numpy.fromiter((vert[0] for vert in vertices), dtype=numpy.int32, count=len(vertices))
+        offsets = numpy.array([vert[1:4] for vert in vertices], dtype=numpy.float32).reshape((-1, 3))
+        return indices, offsets
 
     @staticmethod
     def _set_shape_key_coords_from_dict(blender_object, shape_key, info, *, scale_factor=None):
-        if scale_factor is None:
-            scale_factor = GeneralObjectProperties.get_value("scale_factor", entity_reference=blender_object)
-            if not scale_factor or scale_factor < 0.0001:
-                scale_factor = 1.0
-
-        basis = shape_key.relative_key
-
-        if not basis:
-            raise ValueError("Object does not have a Basis shape key")
-
-        sk_buffer = [0.0] * (len(shape_key.data) * 3)
-        basis.data.foreach_get('co', sk_buffer)
-
-        _LOG.debug("Shape key, len(sk_buffer), len(shape_key.data), len(vertices)", (shape_key, len(sk_buffer), len(shape_key.data), len(info["vertices"])))
-
-        for i, x, y, z in info["vertices"]:
-            base = i * 3
-            if base < len(sk_buffer):  # If we have deleted the helper verts, some coordinates will not exist
-                sk_buffer[base] += x * scale_factor
-                sk_buffer[base + 1] += y * scale_factor
-                sk_buffer[base + 2] += z * scale_factor
-        shape_key.data.foreach_set('co', sk_buffer)
+        indices, offsets = TargetService._shape_key_info_to_arrays(info)
+        TargetService._set_shape_key_coords_from_arrays(blender_object, shape_key, indices, offsets, scale_factor=scale_factor)
 
     @staticmethod
     def shape_key_info_as_target_string(shape_key_info, include_header=True):
@@ -403,31 +452,25 @@ class TargetService:
     @staticmethod
     def _target_string_to_shape_key_info(target_string, shape_key_name):
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("_target_string_to_shape_key_info")
-
-        info = dict()
-        info["name"] = shape_key_name
-        info["vertices"] = vertices = []
+        with profiler.span("_target_string_to_shape_key_info"):
+            info = dict()
+            info["name"] = shape_key_name
+            info["vertices"] = vertices = []
 
-        lines = target_string.splitlines()
+            lines = target_string.splitlines()
 
-        profiler.enter("- parse_target_lines")
+            with profiler.span("- parse_target_lines"):
+                for line in lines:
+                    target_line = str(line.strip())
+                    if target_line and not target_line.startswith("#") and not target_line.startswith("\""):
+                        parts = target_line.split(" ", 4)
 
-        for line in lines:
-            target_line = str(line.strip())
-            if target_line and not target_line.startswith("#") and not target_line.startswith("\""):
-                parts = target_line.split(" ", 4)
+                        index = int(parts[0])
+                        x = float(parts[1])
+                        y = -float(parts[3])  # XZY order, -Y
+                        z = float(parts[2])
 
-                index = int(parts[0])
-                x = float(parts[1])
-                y = -float(parts[3])  # XZY order, -Y
-                z = float(parts[2])
-
-                vertices.append((index, x, y, z))
-
-        profiler.leave("- parse_target_lines")
-
-        profiler.leave("_target_string_to_shape_key_info")
+                        vertices.append((index, x, y, z))
         return info
 
     @staticmethod
@@ -450,24 +493,211 @@ class TargetService:
         _LOG.enter()
         _LOG.reset_timer()
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("target_string_to_shape_key_info")
+        with profiler.span("target_string_to_shape_key_info"):
+            if reuse_existing and shape_key_name in blender_object.data.shape_keys.key_blocks:
+                shape_key = blender_object.data.shape_keys.key_blocks[shape_key_name]
+            else:
+                shape_key = TargetService.create_shape_key(blender_object, shape_key_name)
 
-        if reuse_existing and shape_key_name in blender_object.data.shape_keys.key_blocks:
-            shape_key = blender_object.data.shape_keys.key_blocks[shape_key_name]
-        else:
-            shape_key = TargetService.create_shape_key(blender_object, shape_key_name)
+            shape_key_info = TargetService._target_string_to_shape_key_info(target_string, shape_key_name)
+
+            with profiler.span("- apply_shape_key_info"):
+                TargetService._set_shape_key_coords_from_dict(blender_object, shape_key, shape_key_info)
+
+            _LOG.time("Target was loaded in")
+
+        return shape_key
+
+    @staticmethod
+    def _read_target_string(full_path):
+        if str(full_path).endswith(".gz"):
+            with gzip.open(full_path, "rb") as gzip_file:
+                raw_data = gzip_file.read()
+                return raw_data.decode('utf-8')
+        with open(full_path, "r") as target_file:
+            return target_file.read()
+
+    @staticmethod
+    def _target_string_to_arrays(target_string):
+        # Let numpy parse the numbers rather than doing it line by line in python. Most of the work then happens in
+        # C, which keeps the time a prefetch_target_arrays() worker holds the GIL short.
+        lines = [line for line in target_string.splitlines() if line.strip() and not line.lstrip().startswith(("#", "\""))]
+        values = numpy.fromstring(" ".join(lines), dtype=numpy.float64, sep=" ")
+        if values.size != 4 * len(lines):
+            # Not four columns on every line, so let the line based parser sort it out
+            info = TargetService._target_string_to_shape_key_info(target_string, None)
+            return TargetService._shape_key_info_to_arrays(info)
+        values = values.reshape((-1, 4))
+        indices = values[:, 0].astype(numpy.int32)
+        offsets = numpy.empty((len(values), 3), dtype=numpy.float32)
+        offsets[:, 0] = values[:, 1]
+        offsets[:, 1] = -values[:, 3]  # XZY order, -Y
+        offsets[:, 2] = values[:, 2]
+        return indices, offsets
+
+    @staticmethod
+    def _compiled_target_paths(full_path):
+        stat = os.stat(full_path)
+        source_key = "|".join([_COMPILED_TARGETS_VERSION, os.path.realpath(full_path), str(stat.st_mtime_ns), str(stat.st_size)])
+        digest = hashlib.sha1(source_key.encode("utf-8")).hexdigest()[:16]
+        base = TargetService.filename_to_shapekey_name(full_path, encode_name=False) + "." + digest
+        return (os.path.join(_COMPILED_TARGETS_DIR, base + ".idx.npy"),
+                os.path.join(_COMPILED_TARGETS_DIR, base + ".ofs.npy"))
+
+    @staticmethod
+    def _write_compiled_array(path, array):
+        # Write to a temporary file and rename it in place, so that a concurrent reader never sees a half-written file
+        temp_path = path + "." + str(os.getpid()) + "." + str(random.randrange(1000, 9999)) + ".tmp"
+        with open(temp_path, "wb") as npy_file:
+            numpy.save(npy_file, array)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load_target_arrays(full_path, *, use_compiled_cache=True):
+        """
+        Load a target file as a pair of numpy arrays.
+
+        The first time a target file is loaded, it is parsed and written to a compiled target store in the
+        user cache directory. Consecutive loads will memory map the compiled arrays instead of parsing the
+        text file. The compiled files are keyed on the real path, modification time and size of the source
+        file, so a modified target will automatically be recompiled.
+
+        Args:
+            full_path (str): The full file path to the target (.target or .target.gz).
+            use_compiled_cache (bool, optional): Whether to read and write the compiled target store. Defaults to True.
+
+        Returns:
+            tuple: (indices, offsets) where indices is an int32 array of vertex indices and offsets is a float32 (N, 3)
+                   array of offsets in blender coordinate order (ie already converted from the XZY order used in files).
+        """
+        profiler = PrimitiveProfiler("TargetService")
+        with profiler.span("load_target_arrays"):
+            arrays = TargetService._load_target_arrays(full_path, use_compiled_cache)
+        return arrays
 
-        shape_key_info = TargetService._target_string_to_shape_key_info(target_string, shape_key_name)
+    @staticmethod
+    def _load_target_arrays(full_path, use_compiled_cache=True):
+        # Unprofiled version of load_target_arrays() which is safe to call from worker threads
+        index_path = offset_path = None
+        if use_compiled_cache:
+            index_path, offset_path = TargetService._compiled_target_paths(full_path)
+            if os.path.exists(index_path) and os.path.exists(offset_path):
+                try:
+                    indices = numpy.load(index_path, mmap_mode="r")
+                    offsets = numpy.load(offset_path, mmap_mode="r")
+                    if len(indices) == len(offsets):
+                        return indices, offsets
+                    _LOG.warn("Compiled target has mismatching array lengths, will recompile", full_path)
+                except (OSError, ValueError) as err:
+                    _LOG.warn("Could not read compiled target, will recompile", (full_path, err))
+
+        indices, offsets = TargetService._target_string_to_arrays(TargetService._read_target_string(full_path))
+
+        if use_compiled_cache:
+            try:
+                os.makedirs(_COMPILED_TARGETS_DIR, exist_ok=True)
+                TargetService._write_compiled_array(index_path, indices)
+                TargetService._write_compiled_array(offset_path, offsets)
+            except OSError as err:
+                _LOG.warn("Could not write compiled target", (full_path, err))
+
+        return indices, offsets
 
-        profiler.enter("- apply_shape_key_info")
+    @staticmethod
+    def prefetch_target_arrays(full_paths, *, workers=None):
+        """
+        Decode a number of target files concurrently.
 
-        TargetService._set_shape_key_coords_from_dict(blender_object, shape_key, shape_key_info)
+        The files are read, decompressed and parsed (or memory mapped from the compiled target store) in a thread pool.
+        No blender data is touched, so the result can then be applied to shape keys on the main thread. File IO and
+        gzip decompression release the GIL and run in parallel. Parsing is done by numpy, which is fast but does
+        not run in parallel, so the speedup with more workers is mostly in the IO and decompression.
 
-        profiler.leave("- apply_shape_key_info")
+        Args:
+            full_paths (list): A list of full file paths to target files.
+            workers (int, optional): The number of worker threads. Defaults to a value based on the number of cores.
+
+        Returns:
+            dict: A dictionary where the key is the path and the value is an (indices, offsets) tuple as returned by load_target_arrays().
+        """
+        profiler = PrimitiveProfiler("TargetService")
+        with profiler.span("prefetch_target_arrays"):
+            if workers is None:
+                workers = _PREFETCH_WORKERS
 
-        _LOG.time("Target was loaded in")
-        profiler.leave("target_string_to_shape_key_info")
+            unique_paths = list(dict.fromkeys(full_paths))
+            _LOG.debug("Prefetching targets", (len(unique_paths), workers))
 
+            if workers < 2 or len(unique_paths) < 2:
+                result = {path: TargetService._load_target_arrays(path) for path in unique_paths}
+            else:
+                with ThreadPoolExecutor(max_workers=min(workers, len(unique_paths))) as executor:
+                    result = dict(zip(unique_paths, executor.map(TargetService._load_target_arrays, unique_paths)))
+        return result
+
+    @staticmethod
+    def clear_compiled_target_cache():
+        """Remove all files in the compiled target store. They will be recreated on demand."""
+        if not os.path.exists(_COMPILED_TARGETS_DIR):
+            return
+        for name in os.listdir(_COMPILED_TARGETS_DIR):
+            if name.endswith(".npy") or name.endswith(".tmp"):
+                os.remove(os.path.join(_COMPILED_TARGETS_DIR, name))
+
+    @staticmethod
+    def _set_shape_key_coords_from_arrays(blender_object, shape_key, indices, offsets, *, scale_factor=None):
+        if scale_factor is None:
+            scale_factor = GeneralObjectProperties.get_value("scale_factor", entity_reference=blender_object)
+            if not scale_factor or scale_factor < 0.0001:
+                scale_factor = 1.0
+
+        basis = shape_key.relative_key
+
+        if not basis:
+            raise ValueError("Object does not have a Basis shape key")
+
+        number_of_vertices = len(shape_key.data)
+        coords = numpy.empty(number_of_vertices * 3, dtype=numpy.float32)
+        basis.data.foreach_get('co', coords)
+        coords = coords.reshape((number_of_vertices, 3))
+
+        _LOG.debug("Shape key, len(shape_key.data), len(indices)", (shape_key, number_of_vertices, len(indices)))
+
+        # If we have deleted the helper verts, some coordinates will not exist
+        in_range = indices < number_of_vertices
+        if not numpy.all(in_range):
+            indices = indices[in_range]
+            offsets = offsets[in_range]
+
+        # add.at rather than fancy indexing, so that repeated vertex indices accumulate like they do in MakeHuman
+        numpy.add.at(coords, indices, offsets * numpy.float32(scale_factor))
+        shape_key.data.foreach_set('co', coords.ravel())
+        TargetService.invalidate_mixed_vertex_coordinates(blender_object)
+
+    @staticmethod
+    def target_arrays_to_shape_key(indices, offsets, shape_key_name, blender_object, *, reuse_existing=False):
+        """
+        Apply target arrays, as returned by load_target_arrays(), as a shape key on a Blender object.
+
+        Args:
+            indices (numpy.ndarray): Vertex indices of the target.
+            offsets (numpy.ndarray): (N, 3) array with offsets in blender coordinate order.
+            shape_key_name (str): The name of the shape key to create or reuse.
+            blender_object (bpy.types.Object): The Blender object to which the shape key will be applied.
+            reuse_existing (bool, optional): Whether to reuse an existing shape key with the same name. Defaults to False.
+
+        Returns:
+            bpy.types.ShapeKey: The created or reused shape key.
+        """
+        _LOG.enter()
+        profiler = PrimitiveProfiler("TargetService")
+        with profiler.span("target_arrays_to_shape_key"):
+            if reuse_existing and blender_object.data.shape_keys and shape_key_name in blender_object.data.shape_keys.key_blocks:
+                shape_key = blender_object.data.shape_keys.key_blocks[shape_key_name]
+            else:
+                shape_key = TargetService.create_shape_key(blender_object, shape_key_name)
+
+            TargetService._set_shape_key_coords_from_arrays(blender_object, shape_key, indices, offsets)
         return shape_key
 
     @staticmethod
@@ -479,27 +709,28 @@ class TargetService:
             return
 
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("_load_mirror_table")
-
-        _MIRROR_LEFT = []
-        _MIRROR_RIGHT = []
-
-        metadata_dir = LocationService.get_mpfb_data("mesh_metadata")
-        mirror_file = os.path.join(metadata_dir, "hm08.mirror")
-        mirror_text = Path(mirror_file).read_text()
-        mirror_lines = str(mirror_text).splitlines(False)
-        for line in mirror_lines:
-            if line:
-                parts = str(line).split(" ", 3)
-                from_idx = int(parts[0])
-                to_idx = int(parts[1])
-                side = str(parts[2])
-                if side == "l":
-                    _MIRROR_LEFT.append([from_idx, to_idx])
-                if side == "r":
-                    _MIRROR_RIGHT.append([from_idx, to_idx])
-
-        profiler.leave("_load_mirror_table")
+        with profiler.span("_load_mirror_table"):
+            left = []
+            right = []
+
+            metadata_dir = LocationService.get_mpfb_data("mesh_metadata")
+            mirror_file = os.path.join(metadata_dir, "hm08.mirror")
+            mirror_text = Path(mirror_file).read_text()
+            mirror_lines = str(mirror_text).splitlines(False)
+            for line in mirror_lines:
+                if line:
+                    parts = str(line).split(" ", 3)
+                    from_idx = int(parts[0])
+                    to_idx = int(parts[1])
+                    side = str(parts[2])
+                    if side == "l":
+                        left.append([from_idx, to_idx])
+                    if side == "r":
+                        right.append([from_idx, to_idx])
+
+            # Stored as (N, 2) arrays with from index in the first column and to index in the second
+            _MIRROR_LEFT = numpy.array(left, dtype=numpy.int32).reshape((-1, 2))
+            _MIRROR_RIGHT = numpy.array(right, dtype=numpy.int32).reshape((-1, 2))
 
     @staticmethod
     def symmetrize_shape_key(blender_object, shape_key_name, copy_left_to_right=True):
@@ -530,10 +761,19 @@ class TargetService:
 
         target = blender_object.data.shape_keys.key_blocks[shape_key_name]
 
-        for (from_idx, to_idx) in mirror:
-            target.data[to_idx].co[0] = -target.data[from_idx].co[0]
-            target.data[to_idx].co[1] = target.data[from_idx].co[1]
-            target.data[to_idx].co[2] = target.data[from_idx].co[2]
+        number_of_vertices = len(target.data)
+        coords = numpy.empty(number_of_vertices * 3, dtype=numpy.float32)
+        target.data.foreach_get('co', coords)
+        coords = coords.reshape((number_of_vertices, 3))
+
+        from_idx = mirror[:, 0]
+        to_idx = mirror[:, 1]
+        mirrored = coords[from_idx]
+        mirrored[:, 0] = -mirrored[:, 0]
+        coords[to_idx] = mirrored
+
+        target.data.foreach_set('co', coords.ravel())
+        TargetService.invalidate_mixed_vertex_coordinates(blender_object)
 
     @staticmethod
     def get_target_stack(blender_object, exclude_starts_with=None, exclude_ends_with=None):
@@ -556,34 +796,30 @@ class TargetService:
             ValueError: If the provided object is not a valid mesh object or if it does not have any shape keys.
         """
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("get_target_stack")
+        with profiler.span("get_target_stack"):
+            if blender_object is None or blender_object.type != 'MESH':
+                raise ValueError('Must provide a valid mesh object')
 
-        if blender_object is None or blender_object.type != 'MESH':
-            raise ValueError('Must provide a valid mesh object')
+            keys = blender_object.data.shape_keys
 
-        keys = blender_object.data.shape_keys
+            if keys is None or keys.key_blocks is None or len(keys.key_blocks) < 1:
+                _LOG.debug("Object does not have any shape keys, returning empty array")
+                return []
 
-        if keys is None or keys.key_blocks is None or len(keys.key_blocks) < 1:
-            _LOG.debug("Object does not have any shape keys, returning empty array")
-            profiler.leave("get_target_stack")
-            return []
+            stack = []
 
-        stack = []
+            for shape_key in keys.key_blocks:
+                sk_name = str(shape_key.name).lower()
 
-        for shape_key in keys.key_blocks:
-            sk_name = str(shape_key.name).lower()
+                exclude = "basis" in sk_name
 
-            exclude = "basis" in sk_name
+                if not exclude_starts_with is None and sk_name.startswith(str(exclude_starts_with).lower()):
+                    exclude = True
+                if not exclude_ends_with is None and sk_name.endswith(str(exclude_ends_with).lower()):
+                    exclude = True
 
-            if not exclude_starts_with is None and sk_name.startswith(str(exclude_starts_with).lower()):
-                exclude = True
-            if not exclude_ends_with is None and sk_name.endswith(str(exclude_ends_with).lower()):
-                exclude = True
-
-            if not exclude:
-                stack.append({"target": shape_key.name, "value": shape_key.value})
-
-        profiler.leave("get_target_stack")
+                if not exclude:
+                    stack.append({"target": shape_key.name, "value": shape_key.value})
         return stack
 
     @staticmethod
@@ -605,6 +841,162 @@ class TargetService:
             return False
         return len(blender_object.data.shape_keys.key_blocks) > 0
 
+    @staticmethod
+    def get_mixed_vertex_coordinates(blender_object, *, use_cache=True):
+        """
+        Get the vertex coordinates of a mesh object as given by the current mix of all its shape keys.
+
+        This gives the same coordinates as creating a shape key "from mix" and reading its data, but without adding and
+        removing a shape key. The coordinates are computed as the reference key plus, for each active key, its value
+        times its difference to its relative key. The result is cached, so several consumers after the same edit (for
+        example refitting clothes and the rig after a slider change) share one evaluation. The cached result is used
+        while the key names, values, mute flags and relative keys are unchanged. Coordinate edits made through
+        TargetService drop the cached result. Edits made in other ways (edit mode, sculpting, other add-ons) are not
+        detected, so either call invalidate_mixed_vertex_coordinates() after them or pass use_cache=False. The cache
+        is only used while the object is in object mode.
+
+        Args:
+            blender_object (bpy.types.Object): The mesh object to get coordinates for.
+            use_cache (bool, optional): Whether to use and update the cache. Defaults to True.
+
+        Returns:
+            numpy.ndarray: A read-only (N, 3) float32 array with the coordinates, in object space.
+        """
+        mesh = blender_object.data
+        number_of_vertices = len(mesh.vertices)
+
+        if not TargetService.has_any_shapekey(blender_object):
+            coordinates = numpy.empty(number_of_vertices * 3, dtype=numpy.float32)
+            mesh.vertices.foreach_get("co", coordinates)
+            return coordinates.reshape((number_of_vertices, 3))
+
+        keys = mesh.shape_keys
+        active_keys = [key for key in keys.key_blocks if not key.mute and key.value != 0.0]
+
+        if not keys.use_relative or any(key.vertex_group for key in active_keys):
+            # Absolute keys and vertex group influences are rare enough to not warrant reimplementing blender's mix
+            return TargetService._get_mixed_vertex_coordinates_from_shape_key(blender_object)
+
+        reference = keys.reference_key
+        mixed_keys = [key for key in active_keys if key.name != reference.name]
+
+        state = (
+            number_of_vertices,
+            reference.name,
+            tuple((key.name, key.value, key.mute, key.relative_key.name) for key in keys.key_blocks)
+            )
+
+        use_cache = use_cache and blender_object.mode == 'OBJECT'
+        cached = _MIXED_COORDINATES.get(keys.session_uid) if use_cache else None
+        if cached is not None and cached[0] == state:
+            _MIXED_COORDINATES.move_to_end(keys.session_uid)
+            return cached[1]
+
+        key_coordinates = {reference.name: TargetService._get_shape_key_coordinates(reference)}
+        coordinates = key_coordinates[reference.name].copy()
+        for key in mixed_keys:
+            for needed in [key, key.relative_key]:
+                if needed.name not in key_coordinates:
+                    key_coordinates[needed.name] = TargetService._get_shape_key_coordinates(needed)
+            difference = key_coordinates[key.name] - key_coordinates[key.relative_key.name]
+            coordinates += numpy.float32(key.value) * difference
+
+        coordinates.flags.writeable = False
+
+        if not use_cache:
+            return coordinates
+
+        _MIXED_COORDINATES[keys.session_uid] = (state, coordinates)
+        while len(_MIXED_COORDINATES) > _MAX_CACHED_MIXED_COORDINATES:
+            _MIXED_COORDINATES.popitem(last=False)
+
+        return coordinates
+
+    @staticmethod
+    def _get_shape_key_coordinates(shape_key):
+        number_of_vertices = len(shape_key.data)
+        coordinates = numpy.empty(number_of_vertices * 3, dtype=numpy.float32)
+        shape_key.data.foreach_get("co", coordinates)
+        return coordinates.reshape((number_of_vertices, 3))
+
+    @staticmethod
+    def _get_mixed_vertex_coordinates_from_shape_key(blender_object):
+        key_name = "temporary_mix_key." + str(random.randrange(1000, 9999))
+        shape_key = TargetService.create_shape_key(blender_object, key_name, also_create_basis=True, create_from_mix=True)
+        coordinates = TargetService._get_shape_key_coordinates(shape_key)
+        TargetService._remove_shape_key(blender_object, shape_key)
+        return coordinates
+
+    @staticmethod
+    def invalidate_mixed_vertex_coordinates(blender_object):
+        """
+        Drop the cached mixed coordinates for a Blender object. This should be called after shape key coordinates have
+        been changed outside of TargetService, for example in edit mode, by sculpting or by another add-on.
+
+        Args:
+            blender_object (bpy.types.Object): The Blender object whose mixed coordinates should be dropped.
+        """
+        if blender_object is None or blender_object.type != 'MESH' or not blender_object.data.shape_keys:
+            return
+        _MIXED_COORDINATES.pop(blender_object.data.shape_keys.session_uid, None)
+
+    @staticmethod
+    def invalidate_target_index(blender_object):
+        """
+        Drop the cached shape key name index for a Blender object. This should be called after shape keys have been
+        added, removed or renamed outside of TargetService. Stale entries are detected on lookup, so calling this is
+        an optimization rather than a requirement.
+
+        Args:
+            blender_object (bpy.types.Object): The Blender object whose index should be dropped.
+        """
+        if blender_object is None or blender_object.type != 'MESH' or not blender_object.data.shape_keys:
+            return
+        _TARGET_INDEX.pop(blender_object.data.shape_keys.as_pointer(), None)
+        _MIXED_COORDINATES.pop(blender_object.data.shape_keys.session_uid, None)
+
+    @staticmethod
+    def _rebuild_target_index(keys):
+        index = {shape_key.name: position for position, shape_key in enumerate(keys.key_blocks)}
+        _TARGET_INDEX[keys.as_pointer()] = index
+        return index
+
+    @staticmethod
+    def _find_shape_key(blender_object, shape_key_name):
+        """Find a shape key by its exact name, using the name index. Returns None if there is no such key."""
+        keys = blender_object.data.shape_keys
+        if keys is None or keys.key_blocks is None or len(keys.key_blocks) < 1:
+            return None
+
+        key_blocks = keys.key_blocks
+        index = _TARGET_INDEX.get(keys.as_pointer())
+        if index is None:
+            index = TargetService._rebuild_target_index(keys)
+
+        position = index.get(shape_key_name)
+        if position is not None and position < len(key_blocks):
+            shape_key = key_blocks[position]
+            if shape_key.name == shape_key_name:
+                return shape_key
+
+        # Either the name is not a shape key, or the index is stale. A miss is confirmed with blender's own lookup.
+        position = key_blocks.find(shape_key_name)
+        if position < 0:
+            if shape_key_name in index:
+                TargetService._rebuild_target_index(keys)
+            return None
+        TargetService._rebuild_target_index(keys)
+        return key_blocks[position]
+
+    @staticmethod
+    def _find_target(blender_object, target_name):
+        # Mimic the semantics of looking the name up in get_target_stack(), ie the basis is never a target
+        if blender_object.type != 'MESH':
+            raise ValueError('Must provide a valid mesh object')
+        if "basis" in str(target_name).lower():
+            return None
+        return TargetService._find_shape_key(blender_object, target_name)
+
     @staticmethod
     def has_target(blender_object, target_name, also_check_for_encoded=True):
         """
@@ -624,13 +1016,12 @@ class TargetService:
         if blender_object is None or target_name is None or not target_name:
             _LOG.debug("Empty object or target", (blender_object, target_name))
             return False
-        encoded_name = TargetService.encode_shapekey_name(target_name)
-        stack = TargetService.get_target_stack(blender_object)
-        for target in stack:
-            if target["target"] == target_name:
-                return True
-            if also_check_for_encoded and target["target"] == encoded_name:
-                return True
+        if TargetService._find_target(blender_object, target_name) is not None:
+            return True
+        if also_check_for_encoded:
+            encoded_name = TargetService.encode_shapekey_name(target_name)
+            if encoded_name != target_name:
+                return TargetService._find_target(blender_object, encoded_name) is not None
         return False
 
     @staticmethod
@@ -651,12 +1042,10 @@ class TargetService:
         if blender_object is None or target_name is None or not target_name:
             _LOG.debug("Empty object or target", (blender_object, target_name))
             return 0.0
-        stack = TargetService.get_target_stack(blender_object)
-        for target in stack:
-            _LOG.debug("Target", target)
-            if target["target"] == target_name:
-                return target["value"]
-        return 0.0
+        shape_key = TargetService._find_target(blender_object, target_name)
+        if shape_key is None:
+            return 0.0
+        return shape_key.value
 
     @staticmethod
     def set_target_value(blender_object, target_name, value, delete_target_on_zero=False):
@@ -685,67 +1074,66 @@ class TargetService:
             _LOG.error("Object does not have any shape keys")
             raise ValueError('Empty object or target')
 
-        for shape_key in keys.key_blocks:
-            if shape_key.name == target_name:
-                shape_key.value = value
-                if value < 0.0001 and delete_target_on_zero:
-                    blender_object.shape_key_remove(shape_key)
+        shape_key = TargetService._find_shape_key(blender_object, target_name)
+        if shape_key is not None:
+            shape_key.value = value
+            if value < 0.0001 and delete_target_on_zero:
+                TargetService._remove_shape_key(blender_object, shape_key)
+
+    @staticmethod
+    def _remove_shape_key(blender_object, shape_key):
+        blender_object.shape_key_remove(shape_key)
+        TargetService.invalidate_target_index(blender_object)
 
     @staticmethod
-    def bulk_load_targets(blender_object, target_stack, encode_target_names=False):
+    def bulk_load_targets(blender_object, target_stack, encode_target_names=False, *, workers=None):
         """
         Bulk load multiple shape keys (targets) onto a Blender object.
 
         This method processes a stack of targets, loading each target's data from its file path and
-        populating the corresponding shape keys on the provided Blender object.
+        populating the corresponding shape keys on the provided Blender object. The target files are
+        decoded concurrently, while the shape keys are written sequentially on the calling thread.
 
         Args:
             blender_object (bpy.types.Object): The Blender object to which the shape keys will be added.
             target_stack (list): A list of dictionaries, each containing 'target' (name) and 'value' (float) keys.
             encode_target_names (bool, optional): Whether to encode the target names. Defaults to False.
+            workers (int, optional): The number of threads to use for decoding target files. Defaults to a value based on the number of cores.
 
         Raises:
             ValueError: If the provided object is not valid or if any target file path is invalid.
         """
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("bulk_load_targets")
-
-        _LOG.debug("Target stack", target_stack)
-
-        load_info = dict()
-        load_info["parsed_target_stack"] = []
-
-        profiler.enter(" -- bulk load -> load string data")
-        for target in target_stack:
-            _LOG.debug("Listed target", target)
-            target_full_path = TargetService.target_full_path(target["target"])
-            _LOG.debug("Full path", target_full_path)
-            if target_full_path:
-                parsed_target = dict()
-                parsed_target["full_path"] = target_full_path
-                parsed_target["name"] = target["target"]
-                parsed_target["value"] = target["value"]
-                if str(target_full_path).endswith(".gz"):
-                    with gzip.open(target_full_path, "rb") as gzip_file:
-                        raw_data = gzip_file.read()
-                        parsed_target["target_string"] = raw_data.decode('utf-8')
-                else:
-                    with open(target_full_path, "r") as target_file:
-                        parsed_target["target_string"] = target_file.read()
-                parsed_target["shape_key_name"] = TargetService.filename_to_shapekey_name(target_full_path)
-                load_info["parsed_target_stack"].append(parsed_target)
-            else:
-                _LOG.warn("Skipping target because it could not be resolved to a path", target)
-        profiler.leave(" -- bulk load -> load string data")
-
-        profiler.enter(" -- bulk load -> populate shape keys")
-        for target_info in load_info["parsed_target_stack"]:
-            shape_key = TargetService.target_string_to_shape_key(
-                target_info["target_string"], target_info["shape_key_name"], blender_object)
-            shape_key.value = target_info["value"]
-        profiler.leave(" -- bulk load -> populate shape keys")
-
-        profiler.leave("bulk_load_targets")
+        with profiler.span("bulk_load_targets"):
+            _LOG.debug("Target stack", target_stack)
+
+            load_info = dict()
+            load_info["parsed_target_stack"] = []
+
+            with profiler.span(" -- bulk load -> resolve paths"):
+                for target in target_stack:
+                    _LOG.debug("Listed target", target)
+                    target_full_path = TargetService.target_full_path(target["target"])
+                    _LOG.debug("Full path", target_full_path)
+                    if target_full_path:
+                        parsed_target = dict()
+                        parsed_target["full_path"] = target_full_path
+                        parsed_target["name"] = target["target"]
+                        parsed_target["value"] = target["value"]
+                        parsed_target["shape_key_name"] = TargetService.filename_to_shapekey_name(target_full_path)
+                        load_info["parsed_target_stack"].append(parsed_target)
+                    else:
+                        _LOG.warn("Skipping target because it could not be resolved to a path", target)
+
+            with profiler.span(" -- bulk load -> load target arrays"):
+                arrays = TargetService.prefetch_target_arrays(
+                    [target_info["full_path"] for target_info in load_info["parsed_target_stack"]], workers=workers)
+
+            with profiler.span(" -- bulk load -> populate shape keys"):
+                for target_info in load_info["parsed_target_stack"]:
+                    indices, offsets = arrays[target_info["full_path"]]
+                    shape_key = TargetService.target_arrays_to_shape_key(indices, offsets, target_info["shape_key_name"], blender_object)
+                    shape_key.value = target_info["value"]
 
     @staticmethod
     def load_target(blender_object, full_path, *, weight=0.0, name=None):
@@ -769,39 +1157,23 @@ class TargetService:
             IOError: If the specified file does not exist.
         """
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("load_target")
-
-        if blender_object is None:
-            raise ValueError("Can only load targets onto specified mesh objects")
-        if full_path is None or not full_path:
-            raise ValueError("Must specify a valid path - null or none was given")
-        if not os.path.exists(full_path):
-            raise IOError(full_path + " does not exist")
-        target_string = None
-        shape_key = None
-
-        if name is None:
-            name = TargetService.filename_to_shapekey_name(full_path)
-
-        _LOADER.reset_timer()
-        if str(full_path).endswith(".gz"):
-            profiler.enter("load_target_gzip")
-            with gzip.open(full_path, "rb") as gzip_file:
-                raw_data = gzip_file.read()
-                target_string = raw_data.decode('utf-8')
-                profiler.leave("load_target_gzip")
-        else:
-            profiler.enter("load_target_plain")
-            with open(full_path, "r") as target_file:
-                target_string = target_file.read()
-                profiler.leave("load_target_plain")
-
-        if target_string is not None:
-            shape_key = TargetService.target_string_to_shape_key(target_string, name, blender_object)
+        with profiler.span("load_target"):
+            if blender_object is None:
+                raise ValueError("Can only load targets onto specified mesh objects")
+            if full_path is None or not full_path:
+                raise ValueError("Must specify a valid path - null or none was given")
+            if not os.path.exists(full_path):
+                raise IOError(full_path + " does not exist")
+
+            if name is None:
+                name = TargetService.filename_to_shapekey_name(full_path)
+
+            _LOADER.reset_timer()
+            indices, offsets = TargetService.load_target_arrays(full_path)
+            shape_key = TargetService.target_arrays_to_shape_key(indices, offsets, name, blender_object)
             shape_key.value = weight
 
-        _LOADER.time(str(full_path) + " " + str(weight))
-        profiler.leave("load_target")
+            _LOADER.time(str(full_path) + " " + str(weight))
 
         if not TargetService.shapekey_is_target(shape_key.name) and not shape_key.name in _ODD_TARGET_NAMES:
             _ODD_TARGET_NAMES.append(shape_key.name)
@@ -869,36 +1241,33 @@ class TargetService:
     def _interpolate_macro_components(macro_name, value):
 
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("_interpolate_macro_components")
-
-        _LOG.debug("Interpolating macro target", (macro_name, value))
-        macrotarget = _MACRO_CONFIG["macrotargets"][macro_name]
-        components = []
-        _LOG.debug("target", macrotarget)
-        for parts in macrotarget["parts"]:
-            _LOG.dump("Parts", (value, parts))
-            highest = parts["highest"]
-            lowest = parts["lowest"]
-            low = parts["low"]
-            high = parts["high"]
-            hlrange = highest - lowest
-
-            _LOG.dump("(highest, lowest, high, low)", (highest, lowest, high, low))
-
-            if value > lowest and value < highest:
-                position = value - lowest
-                position_pct = position / hlrange
-                lowweight = round(1 - position_pct, 4)
-                highweight = round(position_pct, 4)
-
-                if low:
-                    components.append([low, round(lowweight, 4)])
-                if high:
-                    components.append([high, round(highweight, 4)])
-
-        _LOG.debug("Components after interpolation", components)
-
-        profiler.leave("_interpolate_macro_components")
+        with profiler.span("_interpolate_macro_components"):
+            _LOG.debug("Interpolating macro target", (macro_name, value))
+            macrotarget = _MACRO_CONFIG["macrotargets"][macro_name]
+            components = []
+            _LOG.debug("target", macrotarget)
+            for parts in macrotarget["parts"]:
+                _LOG.dump("Parts", (value, parts))
+                highest = parts["highest"]
+                lowest = parts["lowest"]
+                low = parts["low"]
+                high = parts["high"]
+                hlrange = highest - lowest
+
+                _LOG.dump("(highest, lowest, high, low)", (highest, lowest, high, low))
+
+                if value > lowest and value < highest:
+                    position = value - lowest
+                    position_pct = position / hlrange
+                    lowweight = round(1 - position_pct, 4)
+                    highweight = round(position_pct, 4)
+
+                    if low:
+                        components.append([low, round(lowweight, 4)])
+                    if high:
+                        components.append([high, round(highweight, 4)])
+
+            _LOG.debug("Components after interpolation", components)
 
         return components
 
@@ -919,162 +1288,195 @@ class TargetService:
             list: A list of target components, each represented as a list containing the target name and weight.
         """
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("calculate_target_stack_from_macro_info_dict")
-
-        if macro_info is None:
-            macro_info = TargetService.get_default_macro_info_dict()
-
-        components = dict()
-        for macro_name in ["gender", "age", "muscle", "weight", "proportions", "height", "cupsize", "firmness"]:
-            value = macro_info[macro_name]
-            components[macro_name] = TargetService._interpolate_macro_components(macro_name, value)
-
-        _LOG.dump("components", components)
-        _MACLOG.dump("Current macrotarget components", components)
-
-        targets = []
-
-        # Targets for race-gender-age
-        for race in macro_info["race"].keys():
-            _LOG.debug("race", (race, macro_info["race"][race]))
-            if macro_info["race"][race] > 0.0001:
+        with profiler.span("calculate_target_stack_from_macro_info_dict"):
+            # Checked once, since the nested loops below would otherwise construct log arguments for every combination
+            debug = _LOG.is_enabled(LogService.DEBUG)
+
+            if macro_info is None:
+                macro_info = TargetService.get_default_macro_info_dict()
+
+            components = dict()
+            for macro_name in ["gender", "age", "muscle", "weight", "proportions", "height", "cupsize", "firmness"]:
+                value = macro_info[macro_name]
+                components[macro_name] = TargetService._interpolate_macro_components(macro_name, value)
+
+            _LOG.dump("components", components)
+            _MACLOG.dump("Current macrotarget components", components)
+
+            targets = []
+
+            # Targets for race-gender-age
+            for race in macro_info["race"].keys():
+                if debug:
+                    _LOG.debug("race", (race, macro_info["race"][race]))
+                if macro_info["race"][race] > 0.0001:
+                    for age_component in components["age"]:
+                        if debug:
+                            _LOG.debug("age", age_component)
+                        for gender_component in components["gender"]:
+                            if debug:
+                                _LOG.debug("gender", gender_component)
+                            if gender_component[0] != "universal":
+                                if debug:
+                                    _LOG.debug("components", ([race, macro_info["race"][race]], gender_component, age_component))
+                                complete_name = "macrodetails/" + race + "-" + gender_component[0] + "-" + age_component[0]
+                                weight = macro_info["race"][race] * gender_component[1] * age_component[1]
+                                if weight > cutoff:
+                                    if debug:
+                                        _LOG.debug("Appending race-gender-age target", [complete_name, weight])
+                                    targets.append([complete_name, weight])
+
+            # Targets for (universal)-gender-age-muscle-weight
+            for gender_component in components["gender"]:
+                if debug:
+                    _LOG.debug("gender", gender_component)
                 for age_component in components["age"]:
-                    _LOG.debug("age", age_component)
-                    for gender_component in components["gender"]:
-                        _LOG.debug("gender", gender_component)
-                        if gender_component[0] != "universal":
-                            _LOG.debug("components", ([race, macro_info["race"][race]], gender_component, age_component))
-                            complete_name = "macrodetails/" + race + "-" + gender_component[0] + "-" + age_component[0]
-                            weight = macro_info["race"][race] * gender_component[1] * age_component[1]
-                            if weight > cutoff:
-                                _LOG.debug("Appending race-gender-age target", [complete_name, weight])
-                                targets.append([complete_name, weight])
-
-        # Targets for (universal)-gender-age-muscle-weight
-        for gender_component in components["gender"]:
-            _LOG.debug("gender", gender_component)
-            for age_component in components["age"]:
-                _LOG.debug("age", age_component)
-                for muscle_component in components["muscle"]:
-                    _LOG.debug("muscle", muscle_component)
-                    for weight_component in components["weight"]:
-                        _LOG.debug("weight", weight_component)
-                        complete_name = "macrodetails/universal"
-                        complete_name = complete_name + "-" + gender_component[0]
-                        complete_name = complete_name + "-" + age_component[0]
-                        complete_name = complete_name + "-" + muscle_component[0]
-                        complete_name = complete_name + "-" + weight_component[0]
-                        weight = 1.0
-                        weight = weight * gender_component[1]
-                        weight = weight * age_component[1]
-                        weight = weight * muscle_component[1]
-                        weight = weight * weight_component[1]
-                        if weight > cutoff:
-                            _LOG.debug("Appending universal-gender-age-muscle-weight target", [complete_name, weight])
-                            targets.append([complete_name, weight])
-                        else:
-                            _LOG.debug("Not appending universal-gender-age-muscle-weight target", [complete_name, weight])
-
-        # Targets for gender-age-muscle-weight-height
-        for gender_component in components["gender"]:
-            _LOG.debug("gender", gender_component)
-            for age_component in components["age"]:
-                _LOG.debug("age", age_component)
-                for muscle_component in components["muscle"]:
-                    _LOG.debug("muscle", muscle_component)
-                    for weight_component in components["weight"]:
-                        _LOG.debug("weight", weight_component)
-                        for height_component in components["height"]:
-                            complete_name = "macrodetails/height/"
-                            complete_name = complete_name + gender_component[0]
+                    if debug:
+                        _LOG.debug("age", age_component)
+                    for muscle_component in components["muscle"]:
+                        if debug:
+                            _LOG.debug("muscle", muscle_component)
+                        for weight_component in components["weight"]:
+                            if debug:
+                                _LOG.debug("weight", weight_component)
+                            complete_name = "macrodetails/universal"
+                            complete_name = complete_name + "-" + gender_component[0]
                             complete_name = complete_name + "-" + age_component[0]
                             complete_name = complete_name + "-" + muscle_component[0]
                             complete_name = complete_name + "-" + weight_component[0]
-                            complete_name = complete_name + "-" + height_component[0]
                             weight = 1.0
                             weight = weight * gender_component[1]
                             weight = weight * age_component[1]
                             weight = weight * muscle_component[1]
                             weight = weight * weight_component[1]
-                            weight = weight * height_component[1]
                             if weight > cutoff:
-                                _LOG.debug("Appending gender-age-muscle-weight-height target", [complete_name, weight])
+                                if debug:
+                                    _LOG.debug("Appending universal-gender-age-muscle-weight target", [complete_name, weight])
                                 targets.append([complete_name, weight])
                             else:
-                                _LOG.debug("Not appending gender-age-muscle-weight-height target", [complete_name, weight])
+                                if debug:
+                                    _LOG.debug("Not appending universal-gender-age-muscle-weight target", [complete_name, weight])
 
-        # Targets for gender-age-muscle-weight-cupsize-firmness
-        for gender_component in components["gender"]:
-            _LOG.debug("gender", gender_component)
-            if gender_component[0] == "female":
+            # Targets for gender-age-muscle-weight-height
+            for gender_component in components["gender"]:
+                if debug:
+                    _LOG.debug("gender", gender_component)
                 for age_component in components["age"]:
-                    _LOG.debug("age", age_component)
+                    if debug:
+                        _LOG.debug("age", age_component)
                     for muscle_component in components["muscle"]:
-                        _LOG.debug("muscle", muscle_component)
+                        if debug:
+                            _LOG.debug("muscle", muscle_component)
                         for weight_component in components["weight"]:
-                            _LOG.debug("weight", weight_component)
-                            for cup_component in components["cupsize"]:
-                                _LOG.debug("cupsize", cup_component)
-                                for firmness_component in components["firmness"]:
-                                    _LOG.debug("firmness", firmness_component)
-                                    complete_name = "breast/"
-                                    complete_name = complete_name + gender_component[0]
-                                    complete_name = complete_name + "-" + age_component[0]
-                                    complete_name = complete_name + "-" + muscle_component[0]
-                                    complete_name = complete_name + "-" + weight_component[0]
-                                    complete_name = complete_name + "-" + cup_component[0]
-                                    complete_name = complete_name + "-" + firmness_component[0]
-                                    weight = 1.0
-                                    # weight = weight * gender_component[1]    <-- there are no male complementary targets
-                                    weight = weight * age_component[1]
-                                    weight = weight * muscle_component[1]
-                                    weight = weight * weight_component[1]
-                                    weight = weight * cup_component[1]
-                                    weight = weight * firmness_component[1]
-                                    _MACLOG.debug("Breast target", complete_name)
-                                    if weight > cutoff:
-                                        if "averagecup-averagefirmness" in complete_name or "_baby_" in complete_name or "-baby-" in complete_name:
-                                            _MACLOG.debug("Excluding forbidden breast modifier combination", complete_name)
-                                            _LOG.debug("Excluding forbidden breast modifier combination", complete_name)
+                            if debug:
+                                _LOG.debug("weight", weight_component)
+                            for height_component in components["height"]:
+                                complete_name = "macrodetails/height/"
+                                complete_name = complete_name + gender_component[0]
+                                complete_name = complete_name + "-" + age_component[0]
+                                complete_name = complete_name + "-" + muscle_component[0]
+                                complete_name = complete_name + "-" + weight_component[0]
+                                complete_name = complete_name + "-" + height_component[0]
+                                weight = 1.0
+                                weight = weight * gender_component[1]
+                                weight = weight * age_component[1]
+                                weight = weight * muscle_component[1]
+                                weight = weight * weight_component[1]
+                                weight = weight * height_component[1]
+                                if weight > cutoff:
+                                    if debug:
+                                        _LOG.debug("Appending gender-age-muscle-weight-height target", [complete_name, weight])
+                                    targets.append([complete_name, weight])
+                                else:
+                                    if debug:
+                                        _LOG.debug("Not appending gender-age-muscle-weight-height target", [complete_name, weight])
+
+            # Targets for gender-age-muscle-weight-cupsize-firmness
+            for gender_component in components["gender"]:
+                if debug:
+                    _LOG.debug("gender", gender_component)
+                if gender_component[0] == "female":
+                    for age_component in components["age"]:
+                        if debug:
+                            _LOG.debug("age", age_component)
+                        for muscle_component in components["muscle"]:
+                            if debug:
+                                _LOG.debug("muscle", muscle_component)
+                            for weight_component in components["weight"]:
+                                if debug:
+                                    _LOG.debug("weight", weight_component)
+                                for cup_component in components["cupsize"]:
+                                    if debug:
+                                        _LOG.debug("cupsize", cup_component)
+                                    for firmness_component in components["firmness"]:
+                                        if debug:
+                                            _LOG.debug("firmness", firmness_component)
+                                        complete_name = "breast/"
+                                        complete_name = complete_name + gender_component[0]
+                                        complete_name = complete_name + "-" + age_component[0]
+                                        complete_name = complete_name + "-" + muscle_component[0]
+                                        complete_name = complete_name + "-" + weight_component[0]
+                                        complete_name = complete_name + "-" + cup_component[0]
+                                        complete_name = complete_name + "-" + firmness_component[0]
+                                        weight = 1.0
+                                        # weight = weight * gender_component[1]    <-- there are no male complementary targets
+                                        weight = weight * age_component[1]
+                                        weight = weight * muscle_component[1]
+                                        weight = weight * weight_component[1]
+                                        weight = weight * cup_component[1]
+                                        weight = weight * firmness_component[1]
+                                        _MACLOG.debug("Breast target", complete_name)
+                                        if weight > cutoff:
+                                            if "averagecup-averagefirmness" in complete_name or "_baby_" in complete_name or "-baby-" in complete_name:
+                                                _MACLOG.debug("Excluding forbidden breast modifier combination", complete_name)
+                                                if debug:
+                                                    _LOG.debug("Excluding forbidden breast modifier combination", complete_name)
+                                            else:
+                                                _MACLOG.debug("Appending gender-age-muscle-weight-cupsize-firmness target", [complete_name, weight])
+                                                if debug:
+                                                    _LOG.debug("Appending gender-age-muscle-weight-cupsize-firmness target", [complete_name, weight])
+                                                targets.append([complete_name, weight])
                                         else:
-                                            _MACLOG.debug("Appending gender-age-muscle-weight-cupsize-firmness target", [complete_name, weight])
-                                            _LOG.debug("Appending gender-age-muscle-weight-cupsize-firmness target", [complete_name, weight])
-                                            targets.append([complete_name, weight])
-                                    else:
-                                        _LOG.debug("Not appending gender-age-muscle-weight-cupsize-firmness target", [complete_name, weight])
-
-        # Targets for gender-age-muscle-weight-proportions
-        for gender_component in components["gender"]:
-            _LOG.debug("gender", gender_component)
-            for age_component in components["age"]:
-                _LOG.debug("age", age_component)
-                for muscle_component in components["muscle"]:
-                    _LOG.debug("muscle", muscle_component)
-                    for weight_component in components["weight"]:
-                        _LOG.debug("weight", weight_component)
-                        for proportions_component in components["proportions"]:
-                            complete_name = "macrodetails/proportions/"
-                            complete_name = complete_name + gender_component[0]
-                            complete_name = complete_name + "-" + age_component[0]
-                            complete_name = complete_name + "-" + muscle_component[0]
-                            complete_name = complete_name + "-" + weight_component[0]
-                            complete_name = complete_name + "-" + proportions_component[0]
-                            weight = 1.0
-                            weight = weight * gender_component[1]
-                            weight = weight * age_component[1]
-                            weight = weight * muscle_component[1]
-                            weight = weight * weight_component[1]
-                            weight = weight * proportions_component[1]
-                            if weight > cutoff:
-                                _LOG.debug("Appending gender-age-muscle-weight-proportions target", [complete_name, weight])
-                                targets.append([complete_name, weight])
-                            else:
-                                _LOG.debug("Not appending gender-age-muscle-weight-proportions target", [complete_name, weight])
-
-        _MACLOG.dump("Macro targets after recalculation", targets)
+                                            if debug:
+                                                _LOG.debug("Not appending gender-age-muscle-weight-cupsize-firmness target", [complete_name, weight])
 
-        _LOG.dump("targets", targets)
-        profiler.leave("calculate_target_stack_from_macro_info_dict")
+            # Targets for gender-age-muscle-weight-proportions
+            for gender_component in components["gender"]:
+                if debug:
+                    _LOG.debug("gender", gender_component)
+                for age_component in components["age"]:
+                    if debug:
+                        _LOG.debug("age", age_component)
+                    for muscle_component in components["muscle"]:
+                        if debug:
+                            _LOG.debug("muscle", muscle_component)
+                        for weight_component in components["weight"]:
+                            if debug:
+                                _LOG.debug("weight", weight_component)
+                            for proportions_component in components["proportions"]:
+                                complete_name = "macrodetails/proportions/"
+                                complete_name = complete_name + gender_component[0]
+                                complete_name = complete_name + "-" + age_component[0]
+                                complete_name = complete_name + "-" + muscle_component[0]
+                                complete_name = complete_name + "-" + weight_component[0]
+                                complete_name = complete_name + "-" + proportions_component[0]
+                                weight = 1.0
+                                weight = weight * gender_component[1]
+                                weight = weight * age_component[1]
+                                weight = weight * muscle_component[1]
+                                weight = weight * weight_component[1]
+                                weight = weight * proportions_component[1]
+                                if weight > cutoff:
+                                    if debug:
+                                        _LOG.debug("Appending gender-age-muscle-weight-proportions target", [complete_name, weight])
+                                    targets.append([complete_name, weight])
+                                else:
+                                    if debug:
+                                        _LOG.debug("Not appending gender-age-muscle-weight-proportions target", [complete_name, weight])
+
+            _MACLOG.dump("Macro targets after recalculation", targets)
+
+            _LOG.dump("targets", targets)
         return targets
 
     @staticmethod
@@ -1123,7 +1525,7 @@ class TargetService:
         TargetService.bulk_load_targets(basemesh, target_stack, encode_target_names=False)
 
     @staticmethod
-    def reapply_macro_details(basemesh, remove_zero_weight_targets=True):
+    def reapply_macro_details(basemesh, remove_zero_weight_targets=True, *, workers=None, collapse_macro_targets=None):
         """
         Reapply macro details to the base mesh.
 
@@ -1134,43 +1536,159 @@ class TargetService:
         Args:
             basemesh (bpy.types.Object): The base mesh object to which macro details will be re-applied.
             remove_zero_weight_targets (bool): Whether to remove targets with zero weight. Defaults to True.
+            workers (int, optional): The number of threads to use for decoding target files. Defaults to a value based on the number of cores.
+            collapse_macro_targets (bool, optional): Whether to blend all macro targets into a single shape key rather than
+                loading them as separate shape keys. If None, the current mode of the basemesh is kept. Defaults to None.
         """
         profiler = PrimitiveProfiler("TargetService")
-        profiler.enter("reapply_macro_details")
-
-        macro_info = TargetService.get_macro_info_dict_from_basemesh(basemesh)
-        for target in TargetService.get_current_macro_targets(basemesh, decode_names=False):
-            _LOG.debug("Setting target to 0", target)
-            basemesh.data.shape_keys.key_blocks[target].value = 0.0
-        current_macro_targets = TargetService.get_current_macro_targets(basemesh, decode_names=True)
-        required_macro_targets = TargetService.calculate_target_stack_from_macro_info_dict(macro_info)
-        _LOG.dump("current macro targets", current_macro_targets)
-        _LOG.dump("required macro targets", required_macro_targets)
-        for target in required_macro_targets:
-            requested = str(TargetService.macrodetail_filename_to_shapekey_name(target[0], encode_name=False)).strip()
-            _LOG.debug("Checking if target exists", requested)
-            if requested not in current_macro_targets:
-                to_load = os.path.join(LocationService.get_mpfb_data("targets"), target[0] + ".target.gz")
-                name = TargetService.macrodetail_filename_to_shapekey_name(to_load, encode_name=True)
-                _LOG.debug("Need to add target: ", (name, to_load))
-                TargetService.load_target(basemesh, to_load, weight=0.0, name=name)
-        for target in required_macro_targets:
-            requested = str(TargetService.macrodetail_filename_to_shapekey_name(target[0], encode_name=True)).strip()
-            _LOG.debug("Will attempt to set target value for", (requested, target[1]))
-            TargetService.set_target_value(basemesh, requested, target[1])
-
-        if not basemesh.data.shape_keys:
-            _LOG.warn("Basemesh has no shape keys at this point. This is somewhat surprising.")
-
-        if remove_zero_weight_targets and basemesh.data.shape_keys:
-            _LOG.debug("Checking for targets to remove")
-            for shape_key in basemesh.data.shape_keys.key_blocks:
-                _LOG.debug("Checking shape key", (shape_key.name, shape_key.value))
-                if str(shape_key.name).startswith("$md") and shape_key.value < 0.0001:
-                    _LOG.debug("Will remove macrodetail target", TargetService.decode_shapekey_name(shape_key.name))
-                    basemesh.shape_key_remove(shape_key)
+        with profiler.span("reapply_macro_details"):
+            if collapse_macro_targets is None:
+                collapse_macro_targets = TargetService.has_collapsed_macro_details(basemesh)
+
+            if collapse_macro_targets:
+                TargetService._reapply_collapsed_macro_details(basemesh, workers=workers)
+                return
+
+            if TargetService.has_collapsed_macro_details(basemesh):
+                _LOG.debug("Removing collapsed macro shape key")
+                TargetService._remove_shape_key(basemesh, basemesh.data.shape_keys.key_blocks[_COLLAPSED_MACRO_SHAPEKEY_NAME])
+
+            macro_info = TargetService.get_macro_info_dict_from_basemesh(basemesh)
+            for target in TargetService.get_current_macro_targets(basemesh, decode_names=False):
+                _LOG.debug("Setting target to 0", target)
+                basemesh.data.shape_keys.key_blocks[target].value = 0.0
+            current_macro_targets = TargetService.get_current_macro_targets(basemesh, decode_names=True)
+            required_macro_targets = TargetService.calculate_target_stack_from_macro_info_dict(macro_info)
+            _LOG.dump("current macro targets", current_macro_targets)
+            _LOG.dump("required macro targets", required_macro_targets)
+            missing_targets = []
+            for target in required_macro_targets:
+                requested = str(TargetService.macrodetail_filename_to_shapekey_name(target[0], encode_name=False)).strip()
+                _LOG.debug("Checking if target exists", requested)
+                if requested not in current_macro_targets:
+                    to_load = os.path.join(LocationService.get_mpfb_data("targets"), target[0] + ".target.gz")
+                    name = TargetService.macrodetail_filename_to_shapekey_name(to_load, encode_name=True)
+                    _LOG.debug("Need to add target: ", (name, to_load))
+                    missing_targets.append((to_load, name))
+            if missing_targets:
+                arrays = TargetService.prefetch_target_arrays([to_load for to_load, name in missing_targets], workers=workers)
+                for to_load, name in missing_targets:
+                    indices, offsets = arrays[to_load]
+                    shape_key = TargetService.target_arrays_to_shape_key(indices, offsets, name, basemesh)
+                    shape_key.value = 0.0
+            for target in required_macro_targets:
+                requested = str(TargetService.macrodetail_filename_to_shapekey_name(target[0], encode_name=True)).strip()
+                _LOG.debug("Will attempt to set target value for", (requested, target[1]))
+                TargetService.set_target_value(basemesh, requested, target[1])
+
+            if not basemesh.data.shape_keys:
+                _LOG.warn("Basemesh has no shape keys at this point. This is somewhat surprising.")
+
+            if remove_zero_weight_targets and basemesh.data.shape_keys:
+                _LOG.debug("Checking for targets to remove")
+                for shape_key in basemesh.data.shape_keys.key_blocks:
+                    _LOG.debug("Checking shape key", (shape_key.name, shape_key.value))
+                    if str(shape_key.name).startswith("$md") and shape_key.value < 0.0001:
+                        _LOG.debug("Will remove macrodetail target", TargetService.decode_shapekey_name(shape_key.name))
+                        TargetService._remove_shape_key(basemesh, shape_key)
+
+    @staticmethod
+    def has_collapsed_macro_details(basemesh):
+        """
+        Check if the macro details of a base mesh are applied as a single collapsed shape key.
+
+        Args:
+            basemesh (bpy.types.Object): The base mesh object to check.
+
+        Returns:
+            bool: True if the base mesh has a collapsed macro shape key, False otherwise.
+        """
+        if not basemesh or not basemesh.data.shape_keys:
+            return False
+        return _COLLAPSED_MACRO_SHAPEKEY_NAME in basemesh.data.shape_keys.key_blocks
+
+    @staticmethod
+    def calculate_collapsed_macro_offsets(macro_info, number_of_vertices, *, workers=None):
+        """
+        Calculate the blended offsets of all macro targets required for a given macro information dictionary.
+
+        Rather than loading each weighted macrodetail target separately, their deltas are summed into a single
+        dense array. Macro target arrays are cached in memory between calls.
+
+        Args:
+            macro_info (dict): A dictionary containing macro attribute values. If None, default values are used.
+            number_of_vertices (int): The number of vertices in the base mesh.
+            workers (int, optional): The number of threads to use for decoding target files which are not yet cached.
+
+        Returns:
+            numpy.ndarray: A float32 (number_of_vertices, 3) array with the combined offsets.
+        """
+        profiler = PrimitiveProfiler("TargetService")
+        with profiler.span("calculate_collapsed_macro_offsets"):
+            required_macro_targets = TargetService.calculate_target_stack_from_macro_info_dict(macro_info)
+            targets_dir = LocationService.get_mpfb_data("targets")
+            weighted_paths = [(os.path.join(targets_dir, target[0] + ".target.gz"), target[1]) for target in required_macro_targets]
+
+            target_arrays = TargetService._get_macro_target_arrays([path for path, weight in weighted_paths], workers)
+            combined = TargetService.combine_target_arrays([target_arrays[path] + (weight,) for path, weight in weighted_paths], number_of_vertices)
+        return combined
+
+    @staticmethod
+    def combine_target_arrays(weighted_arrays, number_of_vertices):
+        """
+        Sum a number of weighted targets into a single dense array of offsets.
+
+        Args:
+            weighted_arrays (list): A list of (indices, offsets, weight) tuples, where indices and offsets are as returned by load_target_arrays().
+            number_of_vertices (int): The number of vertices in the base mesh. Indices outside of this range are ignored.
+
+        Returns:
+            numpy.ndarray: A float32 (number_of_vertices, 3) array with the combined offsets.
+        """
+        combined = numpy.zeros((number_of_vertices, 3), dtype=numpy.float32)
+        for indices, offsets, weight in weighted_arrays:
+            in_range = indices < number_of_vertices
+            # add.at rather than +=, so that a vertex which is listed more than once gets all its offsets
+            numpy.add.at(combined, indices[in_range], offsets[in_range] * numpy.float32(weight))
+        return combined
+
+    @staticmethod
+    def _get_macro_target_arrays(full_paths, workers=None):
+        stamps = dict()
+        for path in full_paths:
+            stat = os.stat(path)
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+
+        missing = [path for path, stamp in stamps.items() if path not in _MACRO_TARGET_ARRAYS or _MACRO_TARGET_ARRAYS[path][0] != stamp]
+        if missing:
+            loaded = TargetService.prefetch_target_arrays(missing, workers=workers)
+            for path in missing:
+                _MACRO_TARGET_ARRAYS[path] = (stamps[path], loaded[path])
+
+        result = dict()
+        for path in stamps:
+            _MACRO_TARGET_ARRAYS.move_to_end(path)
+            result[path] = _MACRO_TARGET_ARRAYS[path][1]
+        while len(_MACRO_TARGET_ARRAYS) > _MAX_MACRO_TARGET_ARRAYS:
+            _MACRO_TARGET_ARRAYS.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _reapply_collapsed_macro_details(basemesh, workers=None):
+        profiler = PrimitiveProfiler("TargetService")
+        with profiler.span("_reapply_collapsed_macro_details"):
+            if basemesh.data.shape_keys:
+                for shape_key in list(basemesh.data.shape_keys.key_blocks):
+                    if str(shape_key.name).startswith("$md") and shape_key.name != _COLLAPSED_MACRO_SHAPEKEY_NAME:
+                        _LOG.debug("Removing separate macrodetail target", shape_key.name)
+                        TargetService._remove_shape_key(basemesh, shape_key)
+
+            macro_info = TargetService.get_macro_info_dict_from_basemesh(basemesh)
+            combined = TargetService.calculate_collapsed_macro_offsets(macro_info, len(basemesh.data.vertices), workers=workers)
+            indices = numpy.arange(len(combined), dtype=numpy.int32)
 
-        profiler.leave("reapply_macro_details")
+            shape_key = TargetService.target_arrays_to_shape_key(indices, combined, _COLLAPSED_MACRO_SHAPEKEY_NAME, basemesh, reuse_existing=True)
+            shape_key.value = 1.0
 
     @staticmethod
     def encode_shapekey_name(original_name):
@@ -1286,5 +1804,5 @@ class TargetService:
 
         for shape_key in keys.key_blocks:
             if not skip and shape_key.value < cutoff and TargetService.shapekey_is_target(shape_key.name):
-                blender_object.shape_key_remove(shape_key)
+                TargetService._remove_shape_key(blender_object, shape_key)
             skip = False
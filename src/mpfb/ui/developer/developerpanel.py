@@ -76,6 +76,12 @@ class MPFB_PT_Developer_Panel(bpy.types.Panel):
         DEVELOPER_PROPERTIES.draw_properties(scene, box, ["available_loggers"])
         box.operator("mpfb.export_log")
 
+    def _profiling(self, scene, layout):
+        box = self._create_box(layout, "Profiling")
+        box.operator("mpfb.start_profiling")
+        DEVELOPER_PROPERTIES.draw_properties(scene, box, ["profile_format"])
+        box.operator("mpfb.export_profiling")
+
     def _nodes(self, layout):
         box = self._create_box(layout, "Load/save nodes")
         box.operator("mpfb.save_nodes")
@@ -110,6 +116,7 @@ class MPFB_PT_Developer_Panel(bpy.types.Panel):
         scene = context.scene
         self._log_levels(scene, layout)
         self._export_log_file(scene, layout)
+        self._profiling(scene, layout)
         self._nodes(layout)
         self._rig(scene, layout)
         self._weights(scene, layout)
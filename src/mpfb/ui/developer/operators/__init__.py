@@ -6,6 +6,8 @@ _LOG.trace("initializing developers operators")
 
 from .listloglevels import MPFB_OT_List_Log_Levels_Operator
 from .exportlog import MPFB_OT_Export_Log_Operator
+from .startprofiling import MPFB_OT_Start_Profiling_Operator
+from .exportprofiling import MPFB_OT_Export_Profiling_Operator
 from .resetloglevels import MPFB_OT_Reset_Log_Levels_Operator
 from .setloglevel import MPFB_OT_Set_Log_Level_Operator
 from .savenodes import MPFB_OT_Save_Nodes_Operator
@@ -26,6 +28,9 @@ from .rewritenodetypes import MPFB_OT_Rewrite_Node_Types_Operator
 
 __all__ = [
     "MPFB_OT_List_Log_Levels_Operator",
+    "MPFB_OT_Export_Log_Operator",
+    "MPFB_OT_Start_Profiling_Operator",
+    "MPFB_OT_Export_Profiling_Operator",
     "MPFB_OT_Reset_Log_Levels_Operator",
     "MPFB_OT_Set_Log_Level_Operator",
     "MPFB_OT_Load_Nodes_Operator",
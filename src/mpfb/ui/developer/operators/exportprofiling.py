@@ -0,0 +1,39 @@
+"""Functionality for stopping a profiling capture and exporting the timeline"""
+
+from ....services import LogService
+from ....entities import primitiveprofiler
+from .... import ClassManager
+from bpy_extras.io_utils import ExportHelper
+import bpy
+
+_LOG = LogService.get_logger("developer.operators.exportprofiling")
+
+
+class MPFB_OT_Export_Profiling_Operator(bpy.types.Operator, ExportHelper):
+    """Stop profiling and export the recorded timeline as json"""
+    bl_idname = "mpfb.export_profiling"
+    bl_label = "Stop and export"
+    bl_options = {'REGISTER'}
+
+    filename_ext = '.json'
+
+    def execute(self, context):
+        _LOG.enter()
+
+        from ...developer.developerpanel import DEVELOPER_PROPERTIES # pylint: disable=C0415
+        file_format = DEVELOPER_PROPERTIES.get_value("profile_format", entity_reference=context.scene)
+
+        primitiveprofiler.stop_capture()
+        events = primitiveprofiler.get_captured_events()
+        if not events:
+            self.report({'ERROR'}, "Nothing was recorded. Start profiling before performing the operations to measure.")
+            return {'FINISHED'}
+
+        output_path = bpy.path.abspath(self.filepath)
+        primitiveprofiler.export_capture(output_path, file_format)
+
+        self.report({'INFO'}, str(len(events)) + " spans written to " + output_path)
+        return {'FINISHED'}
+
+
+ClassManager.add_class(MPFB_OT_Export_Profiling_Operator)
@@ -4,8 +4,8 @@ from ....services import ObjectService
 from ....services import RigService
 from ....entities.rig import Rig
 from .... import ClassManager
-import bpy, json, math, re
-from bpy.types import StringProperty
+import bpy, os, math, re
+from bpy.props import BoolProperty
 from bpy_extras.io_utils import ExportHelper
 
 _LOG = LogService.get_logger("developer.operators.saveweights")
@@ -19,6 +19,9 @@ class MPFB_OT_Save_Weights_Operator(bpy.types.Operator, ExportHelper):
     filename_ext = '.mhw'
     check_extension = False
 
+    save_binary: BoolProperty(name="Also save binary", default=False,
+                              description="Also write the weights as compact binary MHW (.npz) next to the json file")
+
     @classmethod
     def poll(cls, context):
         _LOG.enter()
@@ -93,7 +96,7 @@ class MPFB_OT_Save_Weights_Operator(bpy.types.Operator, ExportHelper):
             armatures.append(subrig_object)
 
         weights = RigService.get_weights(
-            armatures, basemesh, all_groups=(weights_mask == "ALL_GROUPS"), all_masks=save_masks)
+            armatures, basemesh, all_groups=(weights_mask == "ALL_GROUPS"), all_masks=save_masks, as_arrays=True)
 
         # Strip the Rigify deform bone prefix for convenience
         def strip_def(name):
@@ -105,9 +108,11 @@ class MPFB_OT_Save_Weights_Operator(bpy.types.Operator, ExportHelper):
 
         weights["weights"] = {strip_def(k): v for k,v in weights["weights"].items()}
 
-        with open(absolute_file_path, "w") as json_file:
-            json.dump(weights, json_file, indent=4, sort_keys=True)
-            self.report({'INFO'}, "JSON file written to " + absolute_file_path)
+        RigService.save_weights(weights, absolute_file_path)
+        self.report({'INFO'}, "JSON file written to " + absolute_file_path)
+
+        if self.save_binary:
+            RigService.save_weights(weights, os.path.splitext(absolute_file_path)[0] + ".npz")
 
         return {'FINISHED'}
 
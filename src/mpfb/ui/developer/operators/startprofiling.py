@@ -0,0 +1,24 @@
+"""Functionality for starting a profiling capture"""
+
+from ....services import LogService
+from ....entities import primitiveprofiler
+from .... import ClassManager
+import bpy
+
+_LOG = LogService.get_logger("developer.operators.startprofiling")
+
+
+class MPFB_OT_Start_Profiling_Operator(bpy.types.Operator):
+    """Start recording a timeline of all instrumented code. Any previously recorded timeline is discarded"""
+    bl_idname = "mpfb.start_profiling"
+    bl_label = "Start profiling"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        _LOG.enter()
+        primitiveprofiler.start_capture()
+        self.report({"INFO"}, "Profiling started")
+        return {'FINISHED'}
+
+
+ClassManager.add_class(MPFB_OT_Start_Profiling_Operator)
@@ -465,28 +465,30 @@ class MPFB_OT_ImportHumanOperator(MpfbOperator):
         importer["settings_from_ui"] = self._get_settings_from_ui(context)
         importer["blender_entities"]["context"] = context
 
-        # We will import the body information even if we then opt to not create it
-        self._populate_with_initial_import(importer)
-        _LOG.time("Import took:")
+        # Keep one event loop (and in framed mode one connection) for all calls made during the import
+        with SocketService.session():
+            # We will import the body information even if we then opt to not create it
+            self._populate_with_initial_import(importer)
+            _LOG.time("Import took:")
 
-        # This needs some information that was imported, so can't do it before here
-        self._calculate_necessary_derived_settings(importer)
+            # This needs some information that was imported, so can't do it before here
+            self._calculate_necessary_derived_settings(importer)
 
-        self._construct_basemesh_and_or_rig_if_required(importer)
+            self._construct_basemesh_and_or_rig_if_required(importer)
 
-        if importer["derived_settings"]["import_any_proxy"]:
-            self._prepare_for_importing_proxies(importer)
-            for proxy_info in importer["temporary_entities"]["proxies_info"]:
-                self._import_proxy_if_requested(importer, proxy_info)
+            if importer["derived_settings"]["import_any_proxy"]:
+                self._prepare_for_importing_proxies(importer)
+                for proxy_info in importer["temporary_entities"]["proxies_info"]:
+                    self._import_proxy_if_requested(importer, proxy_info)
 
-        self._mask_basemesh_if_proxy_is_available(importer)
+            self._mask_basemesh_if_proxy_is_available(importer)
 
-        if importer["settings_from_ui"]["feet_on_ground"] and importer["blender_entities"]["parent"]:
-            importer["blender_entities"]["parent"].location[2] = abs(importer["derived_settings"]["lowest_point"])
+            if importer["settings_from_ui"]["feet_on_ground"] and importer["blender_entities"]["parent"]:
+                importer["blender_entities"]["parent"].location[2] = abs(importer["derived_settings"]["lowest_point"])
 
-        self._create_material_instances(importer)
-        self._adjust_skin_material_settings(importer)
-        self._adjust_eye_material_settings(importer)
+            self._create_material_instances(importer)
+            self._adjust_skin_material_settings(importer)
+            self._adjust_eye_material_settings(importer)
 
         _LOG.time("Entire process took:")
         self.report({'INFO'}, "Mesh imported")
@@ -1,10 +1,11 @@
 """Operator for writing a MHMAT file."""
 
-import bpy
+import bpy, os
 from bpy_extras.io_utils import ExportHelper
-from bpy.props import StringProperty
+from bpy.props import StringProperty, BoolProperty
 from ....services import LogService
 from ....services import ObjectService
+from ....services import RigService
 from .... import ClassManager
 
 _LOG = LogService.get_logger("makeweight.writeweights")
@@ -17,6 +18,9 @@ class MPFB_OT_SaveWeightsOperator(bpy.types.Operator, ExportHelper):
 
     filename_ext = '.json'
 
+    save_binary: BoolProperty(name="Also save binary", default=False,
+                              description="Also write the weights as compact binary MHW (.npz) next to the json file")
+
     @classmethod
     def poll(cls, context):
         if not context.active_object:
@@ -46,11 +50,15 @@ class MPFB_OT_SaveWeightsOperator(bpy.types.Operator, ExportHelper):
         absolute_file_path = bpy.path.abspath(self.filepath)
         _LOG.debug("absolute_file_path", absolute_file_path)
 
-        weights = RigService.get_weights(armature_object, basemesh)
+        weights = RigService.get_weights(armature_object, basemesh, as_arrays=True)
+
+        RigService.save_weights(weights, absolute_file_path)
+        self.report({'INFO'}, "JSON file written to " + absolute_file_path)
+
+        if self.save_binary:
+            RigService.save_weights(weights, os.path.splitext(absolute_file_path)[0] + ".npz")
 
-        with open(absolute_file_path, "w") as json_file:
-            json.dump(weights, json_file, indent=4, sort_keys=True)
-            self.report({'INFO'}, "JSON file written to " + absolute_file_path)
+        return {'FINISHED'}
 
 
 ClassManager.add_class(MPFB_OT_SaveWeightsOperator)
@@ -104,7 +104,8 @@ def _general_set_target_value(name, value):
 
     # If 'refit' is enabled, perform a refit operation on the basemesh
     if MODEL_PROPERTIES.get_value("refit", entity_reference=bpy.context.scene):
-        HumanService.refit(basemesh)
+        delay = MODEL_PROPERTIES.get_value("refit_delay", entity_reference=bpy.context.scene)
+        HumanService.schedule_refit(basemesh, delay=delay)
 
 def _general_get_target_value(name):
     basemesh = ObjectService.find_object_of_type_amongst_nearest_relatives(bpy.context.active_object, "Basemesh")
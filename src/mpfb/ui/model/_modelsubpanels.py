@@ -271,7 +271,8 @@ def _set_modifier_value(scene, blender_object, section, category, value, side="u
         _set_simple_modifier_value(scene, blender_object, section, category, value, side)
     from ..model.modelpanel import MODEL_PROPERTIES
     if MODEL_PROPERTIES.get_value("refit", entity_reference=bpy.context.scene):
-        HumanService.refit(blender_object)
+        delay = MODEL_PROPERTIES.get_value("refit_delay", entity_reference=bpy.context.scene)
+        HumanService.schedule_refit(blender_object, delay=delay)
 
 
 def _get_modifier_value(scene, blender_object, section, category, side="unsided"):
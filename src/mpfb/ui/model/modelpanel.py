@@ -35,6 +35,7 @@ class MPFB_PT_Model_Panel(bpy.types.Panel):
         props = [
             "prune",
             "refit",
+            "refit_delay",
             "symmetry",
             "hideimg",
             "filter",
@@ -0,0 +1,17 @@
+import os, sys
+
+# Run with: blender -b testdata/test_scene.blend -P benchmark_headless.py -- [options]
+# Everything after "--" is passed to the benchmark runner. Use "-- --help" to list the options.
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from benchmarks.runner import main  # pylint: disable=C0413
+
+arguments = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+retcode = main(arguments)
+if retcode:
+    print("Benchmarks have finished with error code " + str(retcode) + ". See console output for results.")
+else:
+    print("Benchmarks have finished without error. See console output for results.")
+sys.exit(retcode)
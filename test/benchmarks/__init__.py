@@ -0,0 +1,39 @@
+"""
+This is the root module for the benchmark suite. Where the unit tests under "tests" check that MPFB produces the right
+result, the benchmarks measure how long representative workloads take, so that performance regressions can be caught
+before a new build is rolled out.
+
+The benchmarks are run headless via benchmark_headless.py (see execute_benchmarks_headless.bash). Like the unit tests,
+they have no knowledge of MPFB's package structure, so services and entities are looked up with dynamic_import() and
+MPFB_CONTEXTUAL_INFORMATION in the same way as in tests/__init__.py.
+
+The modules in this package are:
+
+- workloads.py: The definitions of the timed workloads. Each workload has a setup, a run and a teardown step, where
+  only the run step is timed.
+- runner.py: Warmup, repetitions, statistics, JSON result output and comparison against a saved baseline.
+"""
+
+import importlib, sys
+
+
+def dynamic_import(absolute_package_str, key):
+    for amod in sys.modules:
+        if amod.endswith(absolute_package_str):
+            mpfb_mod = importlib.import_module(amod)
+
+            if not hasattr(mpfb_mod, key):
+                raise AttributeError(f"Module {amod} does not have attribute {key}")
+
+            return getattr(mpfb_mod, key)
+    raise ValueError(f"No module found with name ending in {absolute_package_str}")
+
+
+MPFB_CONTEXTUAL_INFORMATION = dynamic_import("mpfb", "MPFB_CONTEXTUAL_INFORMATION")
+
+ClothesService = MPFB_CONTEXTUAL_INFORMATION["SERVICES"]["ClothesService"]
+HumanService = MPFB_CONTEXTUAL_INFORMATION["SERVICES"]["HumanService"]
+LocationService = MPFB_CONTEXTUAL_INFORMATION["SERVICES"]["LocationService"]
+LogService = MPFB_CONTEXTUAL_INFORMATION["SERVICES"]["LogService"]
+ObjectService = MPFB_CONTEXTUAL_INFORMATION["SERVICES"]["ObjectService"]
+TargetService = MPFB_CONTEXTUAL_INFORMATION["SERVICES"]["TargetService"]
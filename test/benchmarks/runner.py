@@ -0,0 +1,197 @@
+"""
+Execution of the benchmark workloads.
+
+Each workload is first run a number of warmup times, which are not recorded. It is then run a number of timed
+repetitions. The result for each workload is the list of durations plus min, median, mean, max and stdev, all in
+seconds. Results are written as JSON, and can be compared against a previously saved result file (the baseline).
+A workload is considered to have regressed if its median is more than the threshold fraction slower than the median
+in the baseline.
+"""
+
+import bpy, argparse, json, os, platform, statistics, sys, time, traceback
+from datetime import datetime, timezone
+from . import dynamic_import, LogService
+from .workloads import get_workloads, object_pointers, remove_new_objects
+
+_DEFAULT_REPETITIONS = 5
+_DEFAULT_WARMUP = 1
+_DEFAULT_TARGETS = 50
+_DEFAULT_THRESHOLD = 0.10
+
+FORMAT_VERSION = 1
+
+
+def _run_once(workload):
+    pointers_before = object_pointers()
+    context = dict()
+    try:
+        if workload.setup:
+            context = workload.setup()
+        start = time.perf_counter()
+        workload.run(context)
+        duration = time.perf_counter() - start
+        if workload.teardown:
+            workload.teardown(context)
+    finally:
+        remove_new_objects(pointers_before)
+    return duration
+
+
+def run_workload(workload, repetitions=_DEFAULT_REPETITIONS, warmup=_DEFAULT_WARMUP):
+    """Run the given workload and return a dict with its timings, in seconds."""
+    for _ in range(warmup):
+        _run_once(workload)
+    times = [_run_once(workload) for _ in range(repetitions)]
+    return {
+        "description": workload.description,
+        "repetitions": repetitions,
+        "warmup": warmup,
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0
+        }
+
+
+def get_metadata():
+    """Return a dict describing the environment the benchmarks were run in."""
+    return {
+        "format_version": FORMAT_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "blender_version": bpy.app.version_string,
+        "mpfb_version": ".".join(str(part) for part in dynamic_import("mpfb", "VERSION")),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor()
+        }
+
+
+def run_benchmarks(workloads, repetitions=_DEFAULT_REPETITIONS, warmup=_DEFAULT_WARMUP):
+    """Run the given workloads and return the full result dict. A workload which raises an exception is recorded
+    with an "error" key instead of timings, and does not stop the remaining workloads."""
+    results = dict()
+    for workload in workloads:
+        print("Benchmarking " + workload.name, flush=True)
+        try:
+            results[workload.name] = run_workload(workload, repetitions, warmup)
+            print("  median " + _format_seconds(results[workload.name]["median"]), flush=True)
+        except Exception as exception:  # pylint: disable=W0718
+            traceback.print_exc()
+            results[workload.name] = {"description": workload.description, "error": str(exception)}
+    LogService.flush()
+    return {"metadata": get_metadata(), "results": results}
+
+
+def compare_results(current, baseline, threshold=_DEFAULT_THRESHOLD):
+    """Compare two result dicts. Return a list of rows (name, baseline median, current median, relative change,
+    status) where status is one of "ok", "faster", "REGRESSION", "ERROR", "new" or "missing"."""
+    rows = []
+    current_results = current["results"]
+    baseline_results = baseline["results"]
+    for name in sorted(set(current_results.keys()) | set(baseline_results.keys())):
+        old = baseline_results.get(name, {}).get("median")
+        new = current_results.get(name, {}).get("median")
+        if name in current_results and "error" in current_results[name]:
+            rows.append((name, old, None, None, "ERROR"))
+        elif name not in baseline_results or old is None:
+            rows.append((name, None, new, None, "new"))
+        elif name not in current_results:
+            rows.append((name, old, None, None, "missing"))
+        else:
+            change = (new - old) / old if old > 0 else 0.0
+            status = "ok"
+            if change > threshold:
+                status = "REGRESSION"
+            elif change < -threshold:
+                status = "faster"
+            rows.append((name, old, new, change, status))
+    return rows
+
+
+def _format_seconds(value):
+    if value is None:
+        return "-"
+    return str(round(value * 1000.0, 1)) + " ms"
+
+
+def print_comparison(rows):
+    print("")
+    print("name".ljust(50) + "baseline".rjust(14) + "current".rjust(14) + "change".rjust(10) + "  status")
+    for (name, old, new, change, status) in rows:
+        change_string = "-" if change is None else "{:+.1%}".format(change)
+        print(name.ljust(50) + _format_seconds(old).rjust(14) + _format_seconds(new).rjust(14) + change_string.rjust(10) + "  " + status)
+    print("")
+
+
+def print_summary(current):
+    print("")
+    print("name".ljust(50) + "min".rjust(14) + "median".rjust(14) + "max".rjust(14))
+    for name, result in current["results"].items():
+        if "error" in result:
+            print(name.ljust(50) + "ERROR: " + result["error"])
+        else:
+            print(name.ljust(50) + "".join(_format_seconds(result[key]).rjust(14) for key in ["min", "median", "max"]))
+    print("")
+
+
+def _parse_arguments(argv):
+    parser = argparse.ArgumentParser(prog="benchmark_headless.py", description="Run the MPFB benchmark suite")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare the results with this previously written result file")
+    parser.add_argument("--threshold", type=float, default=_DEFAULT_THRESHOLD,
+                        help="Relative slowdown of the median which counts as a regression (default: %(default)s)")
+    parser.add_argument("--repetitions", type=int, default=_DEFAULT_REPETITIONS, help="Timed runs per workload (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=_DEFAULT_WARMUP, help="Untimed runs per workload (default: %(default)s)")
+    parser.add_argument("--targets", type=int, default=_DEFAULT_TARGETS, help="Number of targets for bulk_load_targets (default: %(default)s)")
+    parser.add_argument("--only", action="append", default=[],
+                        help="Only run workloads whose name contains this string. May be given several times.")
+    parser.add_argument("--list", action="store_true", help="List the workloads and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    """Entry point for benchmark_headless.py. Return 1 if any workload failed or regressed, else 0."""
+    arguments = _parse_arguments(argv)
+    if arguments.repetitions < 1:
+        raise ValueError("There must be at least one repetition")
+
+    workloads = get_workloads(arguments.targets)
+    if arguments.only:
+        workloads = [workload for workload in workloads if any(only in workload.name for only in arguments.only)]
+
+    if arguments.list:
+        for workload in workloads:
+            print(workload.name.ljust(50) + workload.description)
+        return 0
+
+    baseline = None
+    if arguments.baseline:
+        if not os.path.exists(arguments.baseline):
+            raise IOError(str(arguments.baseline) + " does not exist")
+        with open(arguments.baseline, "r", encoding="utf-8") as json_file:
+            baseline = json.load(json_file)
+
+    current = run_benchmarks(workloads, arguments.repetitions, arguments.warmup)
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as json_file:
+            json.dump(current, json_file, indent=4, sort_keys=True)
+        print("Benchmark results were written to " + arguments.output)
+
+    failed = any("error" in result for result in current["results"].values())
+
+    if baseline:
+        if arguments.only:
+            baseline_results = baseline["results"].items()
+            baseline = {"results": {name: result for name, result in baseline_results if any(only in name for only in arguments.only)}}
+        rows = compare_results(current, baseline, arguments.threshold)
+        print_comparison(rows)
+        failed = failed or any(row[4] == "REGRESSION" for row in rows)
+    else:
+        print_summary(current)
+
+    sys.stdout.flush()
+    return 1 if failed else 0
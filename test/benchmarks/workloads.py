@@ -0,0 +1,207 @@
+"""
+Definitions of the benchmark workloads.
+
+A workload consists of three callables. setup() builds whatever scene state the workload needs and returns a context
+dict. run(context) performs the operation which is measured. teardown(context) is optional. Regardless of teardown, all
+objects which were added to the scene during a repetition are removed afterwards, so that every repetition starts from
+the same scene.
+
+Only run() is timed. Creating the human which for example clothes are fitted to is thus not part of the time reported
+for fit_clothes_to_human.
+"""
+
+import bpy, os, glob, json
+from . import dynamic_import, ClothesService, HumanService, LocationService, LogService, ObjectService, TargetService
+
+_TESTDATA = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "testdata"))
+_SOCKS_MHCLO = os.path.join(_TESTDATA, "better_socks_low.mhclo")
+
+
+class Workload:
+    """A named, timed operation with an untimed setup and teardown."""
+
+    def __init__(self, name, run, setup=None, teardown=None, description=""):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+        self.description = description
+
+
+def _create_human():
+    return HumanService.create_human()
+
+
+def _add_socks(basemesh, set_up_rigging=False):
+    return HumanService.add_mhclo_asset(_SOCKS_MHCLO, basemesh, asset_type="Clothes", subdiv_levels=0, material_type="NONE",
+                                        set_up_rigging=set_up_rigging, interpolate_weights=False)
+
+
+def _load_mhclo():
+    Mhclo = dynamic_import("mpfb.entities.clothes.mhclo", "Mhclo")
+    mhclo = Mhclo()
+    mhclo.load(_SOCKS_MHCLO)  # pylint: disable=E1101
+    return mhclo
+
+
+def list_presets():
+    """Return a sorted list of (name, file path) for the human presets to deserialize. These are the presets in the
+    user config dir, plus the preset bundled with the test data."""
+    files = glob.glob(os.path.join(LocationService.get_user_config(), "human.*.json"))
+    files.extend(glob.glob(os.path.join(_TESTDATA, "human.*.json")))
+    presets = dict()
+    for file_name in files:
+        name = os.path.basename(file_name)[len("human."):-len(".json")]
+        if name not in presets:
+            presets[name] = file_name
+    return sorted(presets.items())
+
+
+def list_standard_rigs():
+    """Return a sorted list of the names of the rigs in data/rigs/standard, in the form add_builtin_rig() expects."""
+    rigs_dir = os.path.join(LocationService.get_mpfb_data("rigs"), "standard")
+    names = []
+    for file_name in glob.glob(os.path.join(rigs_dir, "rig.*.json")):
+        names.append(os.path.basename(file_name)[len("rig."):-len(".json")])
+    return sorted(names)
+
+
+def list_targets(number_of_targets):
+    """Return a stack of the first number_of_targets bundled targets in alphabetical order, with a value of 0.5. Macro
+    targets are excluded, since they are handled separately by the macro machinery."""
+    targets_dir = LocationService.get_mpfb_data("targets")
+    names = []
+    for file_name in glob.glob(os.path.join(targets_dir, "*", "*.target.gz")):
+        if os.path.basename(os.path.dirname(file_name)) == "macrodetails":
+            continue
+        names.append(os.path.basename(file_name)[:-len(".target.gz")])
+    names.sort()
+    return [{"target": name, "value": 0.5} for name in names[:number_of_targets]]
+
+
+def _deserialization_workload(name, file_name):
+
+    def setup():
+        with open(file_name, "r", encoding="utf-8") as json_file:
+            human_info = json.load(json_file)
+        human_info["name"] = name
+        return {"human_info": human_info, "settings": HumanService.get_default_deserialization_settings()}
+
+    def run(context):
+        HumanService.deserialize_from_dict(dict(context["human_info"]), context["settings"])
+
+    return Workload("deserialize_from_dict." + name, run, setup, description="Deserialize the " + name + " preset")
+
+
+def _rig_workload(rig_name):
+
+    def setup():
+        return {"basemesh": _create_human()}
+
+    def run(context):
+        HumanService.add_builtin_rig(context["basemesh"], rig_name)
+
+    return Workload("add_builtin_rig." + rig_name, run, setup, description="Add the " + rig_name + " rig with weights")
+
+
+def _bulk_load_workload(number_of_targets):
+
+    def setup():
+        return {"basemesh": _create_human(), "stack": list_targets(number_of_targets)}
+
+    def run(context):
+        TargetService.bulk_load_targets(context["basemesh"], context["stack"])
+
+    return Workload("bulk_load_targets." + str(number_of_targets), run, setup,
+                    description="Bulk load " + str(number_of_targets) + " targets")
+
+
+def _fit_clothes_setup():
+    basemesh = _create_human()
+    clothes = _add_socks(basemesh)
+    return {"basemesh": basemesh, "clothes": clothes, "mhclo": _load_mhclo()}
+
+
+def _fit_clothes_run(context):
+    ClothesService.fit_clothes_to_human(context["clothes"], context["basemesh"], context["mhclo"])
+
+
+def _interpolate_weights_setup():
+    basemesh = _create_human()
+    rig = HumanService.add_builtin_rig(basemesh, "default")
+    clothes = _add_socks(basemesh, set_up_rigging=False)
+    clothes.vertex_groups.clear()
+    return {"basemesh": basemesh, "clothes": clothes, "rig": rig, "mhclo": _load_mhclo()}
+
+
+def _interpolate_weights_run(context):
+    ClothesService.interpolate_weights(context["basemesh"], context["clothes"], context["rig"], context["mhclo"])
+
+
+def _meshcrossref_run(context):
+    MeshCrossRef = dynamic_import("mpfb.entities.meshcrossref", "MeshCrossRef")
+    MeshCrossRef(context["basemesh"], after_modifiers=False)
+
+
+def _disabled_logging_workload(name, log_call, description):
+    iterations = 20000
+    data = {"vertex": list(range(20)), "weights": [0.1] * 20}
+
+    def setup():
+        logger = LogService.get_logger("benchmark.logging")
+        logger.set_level(LogService.INFO)
+        return {"logger": logger}
+
+    def run(context):
+        logger = context["logger"]
+        for index in range(iterations):
+            log_call(logger, index, data)
+
+    return Workload("disabled_debug_logging." + name, run, setup,
+                    description=description + " " + str(iterations) + " times with debug disabled")
+
+
+def _logging_workloads():
+    return [
+        _disabled_logging_workload("eager", lambda logger, index, data: logger.debug("Eager", {"index": index, "data": str(data)}),
+                                   "Log with an eagerly built argument"),
+        _disabled_logging_workload("lazy", lambda logger, index, data: logger.debug("Lazy", LogService.lazy(lambda: {"index": index, "data": str(data)})),
+                                   "Log with a LogService.lazy() argument"),
+        _disabled_logging_workload("guarded", lambda logger, index, data: logger.is_enabled(LogService.DEBUG) and logger.debug("Guarded", {"index": index, "data": str(data)}),
+                                   "Log guarded by is_enabled()")
+        ]
+
+
+def get_workloads(number_of_targets=50):
+    """Return a list with all workloads, in the order they should be run."""
+    workloads = [
+        Workload("create_human", lambda context: _create_human(), description="Create a default human")
+        ]
+    for name, file_name in list_presets():
+        workloads.append(_deserialization_workload(name, file_name))
+    workloads.append(_bulk_load_workload(number_of_targets))
+    workloads.append(Workload("fit_clothes_to_human", _fit_clothes_run, _fit_clothes_setup,
+                              description="Refit a clothes asset to the basemesh"))
+    workloads.append(Workload("interpolate_weights", _interpolate_weights_run, _interpolate_weights_setup,
+                              description="Interpolate rig weights from the basemesh to a clothes asset"))
+    for rig_name in list_standard_rigs():
+        workloads.append(_rig_workload(rig_name))
+    workloads.append(Workload("meshcrossref", _meshcrossref_run, lambda: {"basemesh": _create_human()},
+                              description="Build a MeshCrossRef for the basemesh"))
+    workloads.extend(_logging_workloads())
+    return workloads
+
+
+def object_pointers():
+    """Return the set of pointers to all objects currently in the blend data."""
+    return set(obj.as_pointer() for obj in bpy.data.objects)
+
+
+def remove_new_objects(pointers_before):
+    """Remove all objects which are not in the given set of pointers, and purge the data they leave behind."""
+    for obj in list(bpy.data.objects):
+        if obj.as_pointer() not in pointers_before:
+            bpy.data.objects.remove(obj, do_unlink=True)
+    if hasattr(bpy.data, "orphans_purge"):
+        bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    ObjectService.deselect_and_deactivate_all()
@@ -0,0 +1,15 @@
+#!/usr/bin/bash
+
+# Any arguments given to this script are passed on to the benchmark runner, for example:
+#
+#   ./execute_benchmarks_headless.bash --output results.json
+#   ./execute_benchmarks_headless.bash --baseline results.json --only add_builtin_rig
+
+SCRIPT_DIR=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
+
+if [ -z "$BLENDER_EXE" ]; then
+  echo "Must set the BLENDER_EXE environment variable to point at the blender executable"
+  exit 1
+else
+  "$BLENDER_EXE" -b $SCRIPT_DIR/testdata/test_scene.blend -P $SCRIPT_DIR/benchmark_headless.py -- "$@"
+fi
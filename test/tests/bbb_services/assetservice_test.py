@@ -1,7 +1,9 @@
-import bpy, os
+import bpy, os, tempfile
 
+from .. import dynamic_import
 from .. import AssetService
 from .. import LocationService
+_ASSET_INDEX_VALIDATED = dynamic_import("mpfb.services.assetservice", "_ASSET_INDEX_VALIDATED")
 
 
 def test_assetservice_exists():
@@ -70,3 +72,33 @@ def test_asset_lists():
     assert alist, "The asset list should not be empty"
     assert len(alist) > 0, "The asset list should not be empty"
 
+
+
+def test_asset_index_refresh():
+    root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(root, "shirt01"))
+    with open(os.path.join(root, "shirt01", "shirt01.mhclo"), "w") as mhclo_file:
+        mhclo_file.write("name shirt01\n")
+
+    index = AssetService.get_asset_index(root)
+    assert os.path.join(root, "shirt01", "shirt01.mhclo") in index["by_basename"]["shirt01.mhclo"]
+    assert len(AssetService.find_asset_files_matching_pattern([root], "*.mhclo")) == 1
+
+    os.makedirs(os.path.join(root, "shirt02"))
+    with open(os.path.join(root, "shirt02", "shirt02.mhclo"), "w") as mhclo_file:
+        mhclo_file.write("name shirt02\n")
+
+    # Lookups within the validation interval do not touch the file system
+    assert len(AssetService.find_asset_files_matching_pattern([root], "*.mhclo")) == 1
+
+    # An explicit refresh lists the changed directories again
+    AssetService.get_asset_index(root, refresh=True)
+    assert len(AssetService.find_asset_files_matching_pattern([root], "*.mhclo")) == 2
+    index = AssetService.get_asset_index(root)
+    assert "shirt02.mhclo" in index["by_basename"]
+
+    # Once the validation interval has passed, the changed directory mtimes are picked up without a refresh
+    os.remove(os.path.join(root, "shirt01", "shirt01.mhclo"))
+    _ASSET_INDEX_VALIDATED.pop(root)
+    assert len(AssetService.find_asset_files_matching_pattern([root], "*.mhclo")) == 1
+    assert "shirt01.mhclo" not in AssetService.get_asset_index(root)["by_basename"]
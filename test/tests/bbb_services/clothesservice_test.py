@@ -1,10 +1,13 @@
-import bpy, os
+import bpy, os, numpy
+import pytest
 from pytest import approx
+from .. import dynamic_import
 from .. import ObjectService
 from .. import HumanService
 from .. import ClothesService
 from .. import MaterialService
 from .. import LocationService
+Mhclo = dynamic_import("mpfb.entities.clothes.mhclo", "Mhclo")
 
 
 def test_clothesservice_exists():
@@ -13,3 +16,76 @@ def test_clothesservice_exists():
 
 # This is basically a placeholder test file. Eventually clothes creation should be tested here, but all
 # clothes loading and fitting is implicitly called by the humanservice_test file.
+
+
+def test_calculate_fitted_clothes_coordinates():
+    """ClothesService.calculate_fitted_clothes_coordinates()"""
+    human_coordinates = numpy.array([
+        [0.0, 0.0, 0.0],
+        [1.0, 0.0, 0.0],
+        [0.0, 1.0, 0.0],
+        [0.0, 0.0, 1.0]
+        ], dtype=numpy.float32)
+
+    mhclo = Mhclo()
+    mhclo.verts[0] = {'verts': (1, 1, 1), 'weights': (1, 0, 0), 'offsets': (0.0, 0.0, 0.0)}
+    mhclo.verts[1] = {'verts': (1, 2, 3), 'weights': (0.5, 0.25, 0.25), 'offsets': (0.1, 0.2, 0.3)}
+    mhclo.verts[2] = {'verts': (1, 2, 17), 'weights': (0.5, 0.25, 0.25), 'offsets': (0.0, 0.0, 0.0)}
+
+    coordinates, valid = ClothesService.calculate_fitted_clothes_coordinates(mhclo, human_coordinates, 2.0, 3)
+
+    assert list(valid) == [True, True, False]
+    assert list(coordinates[0]) == approx([1.0, 0.0, 0.0])
+    assert list(coordinates[1]) == approx([0.5 + 0.2, 0.25 + 0.4, 0.25 + 0.6])
+
+
+def test_calculate_interpolated_weights():
+    """ClothesService.calculate_interpolated_weights()"""
+    # Three base mesh verts: vert 0 in group 0, vert 1 in groups 0 and 1, vert 2 in group 1
+    offsets = numpy.array([0, 1, 3, 4])
+    group_indices = numpy.array([0, 0, 1, 1])
+    group_weights = numpy.array([1.0, 0.5, 0.5, 1.0])
+
+    binding_indices = numpy.array([[0, 0, 0], [0, 1, 2], [2, 2, 2]])
+    binding_weights = numpy.array([[1.0, 0.0, 0.0], [0.5, 0.25, 0.25], [1.0, 0.0, 0.0]])
+
+    weights = ClothesService.calculate_interpolated_weights(offsets, group_indices, group_weights, binding_indices, binding_weights)
+
+    assert sorted(weights.keys()) == [0, 1]
+    assert list(weights[0][0]) == [0, 1]
+    assert list(weights[0][1]) == approx([1.0, 0.5 + 0.125])
+    assert list(weights[1][0]) == [1, 2]
+    assert list(weights[1][1]) == approx([0.125 + 0.25, 1.0])
+
+
+def test_fit_clothes_only_if_changed():
+    """ClothesService.fit_clothes_to_human() -- only_if_changed skips refits when the body has not moved"""
+    testdata = LocationService.get_mpfb_test("testdata")
+    mhclo_file = os.path.join(testdata, "better_socks_low.mhclo")
+    basemesh = HumanService.create_human()
+    clothes = HumanService.add_mhclo_asset(mhclo_file, basemesh, set_up_rigging=False, interpolate_weights=False, import_subrig=False, import_weights=False)
+    mhclo = Mhclo()
+    mhclo.load(mhclo_file)  # pylint: disable=E1101
+    mhclo.clothes = clothes
+
+    assert ClothesService.fit_clothes_to_human(clothes, basemesh, mhclo, set_parent=False)
+    assert not ClothesService.fit_clothes_to_human(clothes, basemesh, mhclo, set_parent=False, only_if_changed=True)
+    assert ClothesService.fit_clothes_to_human(clothes, basemesh, mhclo, set_parent=False)
+
+    # A failed fit must not leave a state behind which would make the next fit be skipped
+    mhclo.clothes = None
+    with pytest.raises(AttributeError):
+        ClothesService.fit_clothes_to_human(clothes, basemesh, mhclo, set_parent=False)
+    mhclo.clothes = clothes
+    assert ClothesService.fit_clothes_to_human(clothes, basemesh, mhclo, set_parent=False, only_if_changed=True)
+
+    # Clothes which are deleted and added again must not inherit the state of the deleted object
+    ObjectService.delete_object(clothes)
+    clothes = HumanService.add_mhclo_asset(mhclo_file, basemesh, set_up_rigging=False, interpolate_weights=False, import_subrig=False, import_weights=False)
+    mhclo.clothes = clothes
+    assert ClothesService.fit_clothes_to_human(clothes, basemesh, mhclo, set_parent=False, only_if_changed=True)
+
+    HumanService.schedule_refit(basemesh, delay=0.0)
+    assert not HumanService.has_pending_refit(basemesh)
+    ObjectService.delete_object(clothes)
+    ObjectService.delete_object(basemesh)
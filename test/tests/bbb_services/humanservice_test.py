@@ -190,3 +190,17 @@ def test_serialization():
     serialization_json = HumanService.serialize_to_json_string(basemesh)
     serilized_dict = json.loads(serialization_json)
     assert serilized_dict["hair"] == HUMAN_PRESET_DICT["hair"]
+
+
+def test_get_mhclo_metadata():
+    """HumanService.get_mhclo_metadata()"""
+    testdata = LocationService.get_mpfb_test("testdata")
+    mhclo_file = os.path.join(testdata, "better_socks_low.mhclo")
+
+    metadata = HumanService.get_mhclo_metadata(mhclo_file)
+    assert metadata
+    (uuid, name) = metadata
+    assert uuid
+    assert name == "better_socks_low"
+    assert HumanService.get_mhclo_metadata(mhclo_file) == metadata
+    assert HumanService.get_mhclo_metadata(os.path.join(testdata, "does_not_exist.mhclo")) is None
@@ -0,0 +1,86 @@
+import os, tempfile
+from .. import LogService
+from .. import dynamic_import
+
+_LogWriter = dynamic_import("mpfb.services.logservice", "_LogWriter")
+
+
+def test_logservice_exists():
+    """LogService"""
+    assert LogService is not None, "LogService can be imported"
+
+
+def test_buffered_log_is_written_on_flush():
+    """LogService.flush()"""
+    logger = LogService.get_logger("test.buffered")
+    logger.set_level(LogService.DEBUG)
+    logger.debug("Buffered test message", 4711)
+    LogService.flush()
+
+    with open(logger.get_path_to_log_file(), "r", encoding="utf-8") as log_file:
+        assert "Buffered test message 4711" in log_file.read()
+
+
+def test_log_writer_survives_unwritable_file():
+    """_LogWriter -- a file which cannot be written does not stop the other files"""
+    log_dir = tempfile.mkdtemp()
+    good_path = os.path.join(log_dir, "good.txt")
+    bad_path = os.path.join(log_dir, "no_such_dir", "bad.txt")
+
+    writer = _LogWriter(0)
+    writer.write("console line", [(bad_path, "bad line"), (good_path, "good line")])
+    writer.write("console line", [(bad_path, "bad line"), (good_path, "second good line")])
+    writer.close()
+
+    with open(good_path, "r", encoding="utf-8") as log_file:
+        assert log_file.read() == "good line\nsecond good line\n"
+    assert bad_path in writer._reported_errors
+
+
+def test_enter_reports_caller():
+    """Logger.enter()"""
+    logger = LogService.get_logger("test.enter")
+    logger.set_level(LogService.TRACE)
+    logger.enter()
+    LogService.flush()
+
+    with open(logger.get_path_to_log_file(), "r", encoding="utf-8") as log_file:
+        assert "test_enter_reports_caller()" in log_file.read()
+
+
+def test_lazy_log_arguments():
+    """LogService.lazy()"""
+    logger = LogService.get_logger("test.lazy")
+    logger.set_level(LogService.INFO)
+
+    calls = []
+    logger.debug("Not written", LogService.lazy(lambda: calls.append(1)))
+    assert not calls, "Lazy arguments should not be evaluated when the level is disabled"
+    assert not logger.is_enabled(LogService.DEBUG)
+    assert logger.is_enabled(LogService.WARN)
+
+    logger.warn(LogService.lazy(lambda: "Lazy message"), LogService.lazy(lambda: calls.append(1) or 42))
+    LogService.flush()
+    assert calls == [1]
+    with open(logger.get_path_to_log_file(), "r", encoding="utf-8") as log_file:
+        assert "Lazy message 42" in log_file.read()
+
+
+def test_disabled_logging_does_not_build_arguments():
+    """Logger.is_enabled() and LogService.lazy() -- nothing is evaluated for a disabled level"""
+    logger = LogService.get_logger("test.overhead")
+    logger.set_level(LogService.INFO)
+
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return "expensive"
+
+    logger.debug("Lazy", LogService.lazy(expensive))
+    logger.trace(LogService.lazy(expensive))
+    assert not logger.is_enabled(LogService.DEBUG)
+    assert not logger.is_enabled(LogService.TRACE)
+    if logger.is_enabled(LogService.DEBUG):
+        logger.debug("Guarded", expensive())
+    assert not calls
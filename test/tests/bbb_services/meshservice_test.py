@@ -1,4 +1,4 @@
-import bpy, os, bmesh, shutil, tempfile, time
+import bpy, os, bmesh, numpy, shutil, tempfile, time
 from pytest import approx
 from .. import ObjectService
 from .. import HumanService
@@ -7,6 +7,7 @@ from .. import LocationService
 from .. import dynamic_import
 
 MeshCrossRef = dynamic_import("mpfb.entities.meshcrossref", "MeshCrossRef")
+SpatialIndex = dynamic_import("mpfb.services.spatialindex", "SpatialIndex")
 
 
 def test_meshservice_exists():
@@ -26,6 +27,37 @@ def test_create_sample_object():
     ObjectService.delete_object(obj)
 
 
+def test_bulk_vertex_group_weights():
+    """MeshService.add_weights_to_vertex_group() and get_vertex_group_weights()"""
+    obj = MeshService.create_sample_object()
+    group = obj.vertex_groups.new(name="bulk")
+    MeshService.add_weights_to_vertex_group(group, [0, 3, 5, 3], [0.5, 0.25, 0.5, 0.25], mode='ADD')
+
+    weights = MeshService.get_vertex_group_weights(obj, ["bulk", "mid"])
+    assert list(weights["bulk"][0]) == [0, 3, 5]
+    assert list(weights["bulk"][1]) == approx([0.5, 0.5, 0.5])
+    assert list(weights["mid"][0]) == [1, 4, 7]
+    ObjectService.delete_object(obj)
+
+
+def test_vertex_group_weights_as_csr_for_some_vertices():
+    """MeshService.get_vertex_group_weights_as_csr() -- only the requested rows are read"""
+    obj = MeshService.create_sample_object()
+    all_offsets, all_groups, all_weights = MeshService.get_vertex_group_weights_as_csr(obj)
+    offsets, groups, weights = MeshService.get_vertex_group_weights_as_csr(obj, only_vertex_indices=[4, 1, 4, 100])
+
+    assert len(offsets) == len(all_offsets)
+    for index in range(len(offsets) - 1):
+        row = slice(offsets[index], offsets[index + 1])
+        if index in [1, 4]:
+            all_row = slice(all_offsets[index], all_offsets[index + 1])
+            assert list(groups[row]) == list(all_groups[all_row])
+            assert list(weights[row]) == approx(list(all_weights[all_row]))
+        else:
+            assert offsets[index] == offsets[index + 1]
+    ObjectService.delete_object(obj)
+
+
 def test_kdtree_from_human():
     """HumanService.create_human() -- defaults"""
     obj = HumanService.create_human()
@@ -120,7 +152,7 @@ def test_crossref_basemesh_cache():
     basemesh = HumanService.create_human()
     assert basemesh is not None
 
-    assert not os.path.exists(os.path.join(cache_dir, "vertices_by_group_1.npy"))
+    assert not os.listdir(cache_dir)
 
     before = int(time.time() * 1000.0)
     crossref = MeshCrossRef(basemesh, after_modifiers=True, build_faces_by_group_reference=True, cache_dir=cache_dir, write_cache=True)
@@ -136,7 +168,9 @@ def test_crossref_basemesh_cache():
     assert uncached_vertices_by_face > 0
     assert uncached_vertices_by_group > 0
 
-    assert os.path.exists(os.path.join(cache_dir, "vertices_by_group_1.npy"))
+    cache_files = os.listdir(cache_dir)
+    assert len(cache_files) == 1
+    assert cache_files[0] == "xref_" + crossref.cache_key + ".bin"
 
     before = int(time.time() * 1000.0)
     crossref = MeshCrossRef(basemesh, after_modifiers=True, build_faces_by_group_reference=True, cache_dir=cache_dir, read_cache=True)
@@ -153,6 +187,88 @@ def test_crossref_basemesh_cache():
     assert cached_vertices_by_face == uncached_vertices_by_face
     assert cached_vertices_by_group == uncached_vertices_by_group
 
+    # Changing the vertex group layout must not give stale data from the cache
+    basemesh.vertex_groups[1].remove([int(crossref.vertices_by_group[1][0])])
+    crossref = MeshCrossRef(basemesh, after_modifiers=True, build_faces_by_group_reference=True, cache_dir=cache_dir, read_cache=True)
+    assert len(crossref.vertices_by_group[1]) == uncached_vertices_by_group - 1
+
     ObjectService.delete_object(basemesh)
 
     temp_dir.cleanup()
+
+
+def test_spatial_index_is_cached_and_batched():
+    test_obj = MeshService.create_sample_object()
+    first = MeshService.get_spatial_index(test_obj)
+    second = MeshService.get_spatial_index(test_obj)
+    assert first is second
+
+    coordinates = MeshService.get_vertex_coordinates_as_numpy_array(test_obj)
+    (indices, distances) = first.nearest(coordinates)
+    assert list(indices) == list(range(len(coordinates)))
+    assert max(distances) < 0.0001
+
+    (indices, distances) = first.k_nearest(coordinates[:2], 3)
+    assert indices.shape == (2, 3)
+    assert indices[0][0] == 0
+    assert distances[0][0] <= distances[0][1] <= distances[0][2]
+
+    (_, index, _) = first.find(coordinates[4])
+    assert index == 4
+
+    test_obj.data.vertices[4].co[2] += 1.0
+    assert MeshService.get_spatial_index(test_obj) is not first
+    ObjectService.delete_object(test_obj)
+
+
+def test_closest_vertices_batched():
+    """MeshService.closest_vertices_batched() -- same result as closest_vertices()"""
+    focus_obj = MeshService.create_sample_object()
+    target_obj = MeshService.create_sample_object()
+    index = MeshService.get_spatial_index(target_obj)
+
+    (indices, distances) = MeshService.closest_vertices_batched(focus_obj, [0, 4, 8], target_obj, index)
+    for position, vert_index in enumerate([0, 4, 8]):
+        (_, expected_index, expected_distance) = MeshService.closest_vertices(focus_obj, vert_index, target_obj, index)[0]
+        assert indices[position] == expected_index
+        assert distances[position] == approx(expected_distance, abs=0.0001)
+
+    (indices, _) = MeshService.closest_vertices_batched(focus_obj, [0, 4], target_obj, index, number_of_matches=2)
+    assert indices.shape == (2, 2)
+
+    # An empty index is not the same as no index
+    empty = SpatialIndex(numpy.zeros((0, 3)))
+    MeshService.closest_vertices(focus_obj, 0, target_obj, empty)
+    (indices, _) = MeshService.closest_vertices_batched(focus_obj, [0], target_obj, empty)
+    assert list(indices) == [-1]
+
+    ObjectService.delete_object(focus_obj)
+    ObjectService.delete_object(target_obj)
+
+
+def test_fill_mesh_from_numpy_arrays():
+    vertices = numpy.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [2, 0, 0], [2, 1, 0]], dtype=numpy.float32)
+    faces = numpy.array([[0, 1, 2, 3], [1, 4, 5, 2]], dtype=numpy.int32)
+    loop_uvs = numpy.arange(16, dtype=numpy.float32).reshape((8, 2)) / 16.0
+
+    mesh = bpy.data.meshes.new("fill_mesh_test")
+    MeshService.fill_mesh_from_numpy_arrays(mesh, vertices, faces, loop_uvs=loop_uvs)
+    test_obj = bpy.data.objects.new("fill_mesh_test", mesh)
+
+    assert len(mesh.vertices) == 6
+    assert len(mesh.polygons) == 2
+    assert len(mesh.edges) == 7
+    assert list(mesh.polygons[1].vertices) == [1, 4, 5, 2]
+    assert all(polygon.use_smooth for polygon in mesh.polygons)
+    assert list(mesh.uv_layers[0].data[5].uv) == approx([10.0 / 16.0, 11.0 / 16.0])
+    assert not mesh.validate()
+
+    groups = MeshService.add_vertex_groups_from_numpy_arrays(test_obj, {"all": numpy.arange(6), "half": numpy.array([1, 2])},
+                                                              {"half": numpy.array([0.25, 0.5])})
+    assert set(groups.keys()) == {"all", "half"}
+    assert mesh.vertices[5].groups[0].weight == approx(1.0)
+    weights = MeshService.get_vertex_group_weights(test_obj, ["half"])["half"]
+    assert list(weights[0]) == [1, 2]
+    assert list(weights[1]) == approx([0.25, 0.5])
+    bpy.data.objects.remove(test_obj)
+    bpy.data.meshes.remove(mesh)
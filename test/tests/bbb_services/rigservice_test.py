@@ -1,10 +1,14 @@
-import bpy, os
+import bpy, json, os, tempfile
 from pytest import approx
 from .. import ObjectService
 from .. import HumanService
 from .. import RigService
 from .. import MaterialService
 from .. import LocationService
+from .. import dynamic_import
+
+Rig = dynamic_import("mpfb.entities.rig", "Rig")
+CUR_VERSION = dynamic_import("mpfb.entities.rig", "CUR_VERSION")
 
 HUMAN_PRESET_DICT = {
         "clothes": [
@@ -78,3 +82,72 @@ def test_identify_rig():
     ObjectService.delete_object(basemesh)
     ObjectService.delete_object(rig)
 
+
+
+def test_rig_definition_cache_and_fitting_plan():
+    """Rig.from_json_file_and_basemesh() -- cached definition, positions match strategies"""
+    basemesh = HumanService.create_human()
+    rig_file = os.path.join(LocationService.get_mpfb_data("rigs"), "standard", "rig.default.json")
+    first = Rig.from_json_file_and_basemesh(rig_file, basemesh)
+    second = Rig.from_json_file_and_basemesh(rig_file, basemesh)
+    assert first.rig_definition is not second.rig_definition
+    assert first.fitting_plan is second.fitting_plan
+
+    positions = first.get_bone_end_positions()
+    for bone_name, bone_info in first.rig_definition.items():
+        (head, tail) = positions[bone_name]
+        assert head == approx(first.get_best_location_from_strategy(bone_info["head"]), abs=1e-5)
+        assert tail == approx(first.get_best_location_from_strategy(bone_info["tail"]), abs=1e-5)
+    ObjectService.delete_object(basemesh)
+
+
+def test_subrig_definition_is_not_shared():
+    """Rig.from_json_file_and_basemesh() -- resolving one loaded sub-rig does not change the next one"""
+    basemesh = HumanService.create_human()
+    rig_file = os.path.join(LocationService.get_mpfb_data("rigs"), "standard", "rig.default.json")
+    with open(rig_file, "r", encoding="utf-8") as json_file:
+        bones = json.load(json_file)
+
+    bone_name = sorted(bones.keys())[0]
+    bones[bone_name]["constraints"] = [{
+        "type": "CHILD_OF",
+        "name": "Child Of",
+        "target": {"strategy": "JOINTS", "joint_head": None, "joint_tail": None},
+        "subtarget": "from_file"
+        }]
+    subrig_file = os.path.join(tempfile.mkdtemp(), "subrig.mpfbskel")
+    with open(subrig_file, "w", encoding="utf-8") as json_file:
+        json.dump({"version": CUR_VERSION, "is_subrig": True, "bones": bones}, json_file)
+
+    parent = Rig.from_json_file_and_basemesh(rig_file, basemesh)
+    first = Rig.from_json_file_and_basemesh(subrig_file, basemesh, parent=parent)
+    # This is what _restore_parent_ref() does when the constraint is resolved against the parent rig
+    first.rig_definition[bone_name]["constraints"][0]["subtarget"] = "resolved"
+    first.rig_definition[bone_name]["constraints"][0]["head_tail"] = 0.5
+
+    second = Rig.from_json_file_and_basemesh(subrig_file, basemesh, parent=parent)
+    assert second.rig_definition[bone_name]["constraints"][0]["subtarget"] == "from_file"
+    assert "head_tail" not in second.rig_definition[bone_name]["constraints"][0]
+    assert first.fitting_plan is second.fitting_plan
+    ObjectService.delete_object(basemesh)
+
+
+def test_save_and_read_binary_weights():
+    """RigService.save_weights() and read_weights_file() -- npz"""
+    (basemesh, rig) = _create_human_with_rig()
+    weights = RigService.get_weights(rig, basemesh)
+    array_weights = RigService.get_weights(rig, basemesh, as_arrays=True)
+    assert weights["weights"].keys() == array_weights["weights"].keys()
+
+    file_name = os.path.join(tempfile.mkdtemp(), "weights.npz")
+    RigService.save_weights(array_weights, file_name)
+    read_weights = RigService.read_weights_file(file_name)
+    assert read_weights["version"] == weights["version"]
+
+    for name, weight_array in weights["weights"].items():
+        vertex_indices, vertex_weights = read_weights["weights"][name]
+        assert [pair[0] for pair in weight_array] == list(vertex_indices)
+        assert [pair[1] for pair in weight_array] == approx(list(vertex_weights), abs=1e-6)
+
+    ObjectService.delete_object(basemesh)
+    ObjectService.delete_object(rig)
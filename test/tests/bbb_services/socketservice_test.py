@@ -0,0 +1,169 @@
+import asyncio, json, threading
+import pytest
+from contextlib import contextmanager
+from .. import dynamic_import
+from .. import SocketService
+JsonCall = dynamic_import("mpfb.services.jsoncall", "JsonCall")
+_FramedConnection = dynamic_import("mpfb.services.socketservice", "_FramedConnection")
+_FRAME_HEADER = dynamic_import("mpfb.services.socketservice", "_FRAME_HEADER")
+_read_frame = dynamic_import("mpfb.services.socketservice", "_read_frame")
+
+_HOST = "127.0.0.1"
+
+
+def _reply_to(request):
+    """Binary functions get their name repeated as payload, other functions get a json echo of the call."""
+    call = json.loads(request)
+    if call["function"].endswith("Binary"):
+        return call["function"].encode() * 1000
+    data = {"function": call["function"], "params": call["params"]}
+    return json.dumps({"function": call["function"], "params": call["params"], "data": data, "error": ""}).encode()
+
+
+async def _serve_until_eof(reader, writer):
+    request = b""
+    while True:
+        request += await reader.read(1024)
+        try:
+            json.loads(request)
+            break
+        except ValueError:
+            pass
+    writer.write(_reply_to(request))
+    await writer.drain()
+    writer.close()
+
+
+async def _serve_frames(reader, writer):
+    try:
+        while True:
+            (length,) = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+            request = await reader.readexactly(length)
+            if json.loads(request)["function"] == "truncatedBinary":
+                # Promise more than is sent, then hang up
+                writer.write(_FRAME_HEADER.pack(100) + b"truncated")
+                await writer.drain()
+                break
+            reply = _reply_to(request)
+            writer.write(_FRAME_HEADER.pack(len(reply)) + reply)
+            await writer.drain()
+    except asyncio.IncompleteReadError:
+        pass
+    writer.close()
+
+
+@contextmanager
+def _test_servers():
+    """Serve the EOF protocol and the framed protocol from a background thread, and restore the socket service
+    settings afterwards. Yields the (eof_port, framed_port)."""
+    loop = asyncio.new_event_loop()
+    servers = [loop.run_until_complete(asyncio.start_server(handler, _HOST, 0)) for handler in (_serve_until_eof, _serve_frames)]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    settings = (SocketService._host, SocketService._port, SocketService._framed)
+    try:
+        SocketService.set_host(_HOST)
+        yield tuple(server.sockets[0].getsockname()[1] for server in servers)
+    finally:
+        SocketService.set_host(settings[0])
+        SocketService.set_port(settings[1])
+        SocketService.set_framed(settings[2])
+        for server in servers:
+            loop.call_soon_threadsafe(server.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_read_frame():
+    """_read_frame() -- reads a whole frame, and fails on a short read"""
+
+    async def read(data):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await _read_frame(reader)
+
+    assert asyncio.run(read(_FRAME_HEADER.pack(5) + b"hello")) == b"hello"
+    assert asyncio.run(read(_FRAME_HEADER.pack(0))) == b""
+    with pytest.raises(IOError):
+        asyncio.run(read(_FRAME_HEADER.pack(10) + b"hello"))
+    with pytest.raises(asyncio.IncompleteReadError):
+        asyncio.run(read(b"\0\0"))
+
+
+def test_calls_and_sessions():
+    """SocketService -- single calls, sessions and batches of calls with both the EOF and the framed protocol"""
+    with _test_servers() as ports:
+        for (port, framed) in zip(ports, (False, True)):
+            SocketService.set_port(port)
+            SocketService.set_framed(framed)
+
+            info = SocketService.get_proxy_weight_info("uuid1")
+            assert info == {"function": "getProxyWeightInfo", "params": {"uuid": "uuid1"}}
+
+            with SocketService.session():
+                assert SocketService.get_body_mesh_info()["function"] == "getBodyMeshInfo"
+                with SocketService.session():
+                    assert bytes(SocketService.get_body_vertices()) == b"getBodyVerticesBinary" * 1000
+                arrays = SocketService.get_proxy_mesh_arrays("uuid2")
+                (weight_info, weight_vertices, weights) = SocketService.get_proxy_weight_arrays("uuid3")
+            assert SocketService._loop is None
+            assert SocketService._connection is None
+
+            assert bytes(arrays["vertices"]) == b"getProxyVerticesBinary" * 1000
+            assert bytes(arrays["faces"]) == b"getProxyFacesBinary" * 1000
+            assert bytes(arrays["texture_coords"]) == b"getProxyTextureCoordsBinary" * 1000
+            assert bytes(arrays["uv_mapping"]) == b"getProxyFaceUVMappingsBinary" * 1000
+            assert weight_info == {"function": "getProxyWeightInfo", "params": {"uuid": "uuid3"}}
+            # The weight lists are fetched as raw bytes even though their names do not end with "Binary"
+            assert json.loads(weight_vertices)["function"] == "getProxyWeightsVertList"
+            assert json.loads(weights)["function"] == "getProxyWeights"
+
+
+def test_perform_calls_keeps_order():
+    """SocketService._perform_calls() -- the results are returned in the order of the calls"""
+    functions = ["call" + str(i) + ("Binary" if i % 2 else "") for i in range(12)]
+    with _test_servers() as ports:
+        for (port, framed) in zip(ports, (False, True)):
+            SocketService.set_port(port)
+            SocketService.set_framed(framed)
+            with SocketService.session():
+                results = SocketService._perform_calls([(JsonCall(function), function.endswith("Binary")) for function in functions])
+            for (function, result) in zip(functions, results):
+                if function.endswith("Binary"):
+                    assert bytes(result) == function.encode() * 1000
+                else:
+                    assert result["function"] == function
+
+
+def test_broken_framed_connection():
+    """_FramedConnection -- after a failed read, pipelined requests fail rather than read someone else's frame"""
+
+    def payload(function):
+        return JsonCall(function).serialize().encode()
+
+    with _test_servers() as (_, framed_port):
+
+        async def pipelined():
+            connection = _FramedConnection(*await asyncio.open_connection(_HOST, framed_port))
+            try:
+                results = await asyncio.gather(*[connection.request(payload(function)) for function in
+                                                 ("firstBinary", "truncatedBinary", "lastBinary")], return_exceptions=True)
+                return (results, connection.broken)
+            finally:
+                await connection.close()
+
+        (results, broken) = asyncio.run(pipelined())
+        assert bytes(results[0]) == b"firstBinary" * 1000
+        assert isinstance(results[1], IOError)
+        assert isinstance(results[2], IOError)
+        assert broken
+
+        # Within a session, the broken connection is replaced for the calls which follow
+        SocketService.set_port(framed_port)
+        SocketService.set_framed(True)
+        with SocketService.session():
+            with pytest.raises(IOError):
+                SocketService._perform_call(JsonCall("truncatedBinary"), binary=True)
+            assert SocketService.get_body_mesh_info()["function"] == "getBodyMeshInfo"
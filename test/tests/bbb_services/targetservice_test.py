@@ -1,4 +1,4 @@
-import bpy, os
+import bpy, os, numpy
 from pytest import approx
 from .. import ObjectService
 from .. import HumanService
@@ -61,3 +61,170 @@ def test_prune_shapekeys():
     TargetService.prune_shapekeys(obj)
 
     assert "yadayada" in obj.data.shape_keys.key_blocks
+
+
+def test_load_target_arrays():
+    """TargetService.load_target_arrays() -- compiled target store"""
+    target_path = os.path.join(LocationService.get_mpfb_data("targets"), "nose", "nose-base-up.target.gz")
+    target_string = TargetService._read_target_string(target_path)
+    info = TargetService._target_string_to_shape_key_info(target_string, "nose-base-up")
+
+    indices, offsets = TargetService.load_target_arrays(target_path)
+    assert len(indices) == len(info["vertices"])
+    assert offsets.shape == (len(info["vertices"]), 3)
+
+    # The second load should be served from the compiled store
+    index_path, offset_path = TargetService._compiled_target_paths(target_path)
+    assert os.path.exists(index_path)
+    assert os.path.exists(offset_path)
+    indices, offsets = TargetService.load_target_arrays(target_path)
+
+    for row, (index, x, y, z) in enumerate(info["vertices"]):
+        assert indices[row] == index
+        assert offsets[row][0] == approx(x)
+        assert offsets[row][1] == approx(y)
+        assert offsets[row][2] == approx(z)
+
+
+def test_shape_key_arrays_roundtrip():
+    """TargetService.get_shape_key_as_arrays() -- applied target can be extracted again"""
+    obj = ObjectService.load_base_mesh()
+    assert obj is not None
+    target_path = os.path.join(LocationService.get_mpfb_data("targets"), "nose", "nose-base-up.target.gz")
+    indices, offsets = TargetService.load_target_arrays(target_path)
+
+    TargetService.target_arrays_to_shape_key(indices, offsets, "roundtrip", obj)
+    extracted_indices, extracted_offsets = TargetService.get_shape_key_as_arrays(obj, "roundtrip", smaller_than_counts_as_unmodified=0.0)
+
+    expected = dict(zip(indices.tolist(), offsets.tolist()))
+    extracted = dict(zip(extracted_indices.tolist(), extracted_offsets.tolist()))
+    for index, offset in expected.items():
+        if sum(abs(value) for value in offset) > 0.0:
+            assert index in extracted
+            assert extracted[index] == approx(offset, abs=0.0001)
+
+    info = TargetService.get_shape_key_as_dict(obj, "roundtrip")
+    assert len(info["vertices"]) > 0
+    ObjectService.delete_object(obj)
+
+
+def test_target_with_repeated_vertex_accumulates():
+    """TargetService.target_string_to_shape_key() -- offsets for a repeated vertex index are summed"""
+    obj = ObjectService.load_base_mesh()
+    assert obj is not None
+    original = obj.data.vertices[10].co[0]
+
+    single = TargetService.target_string_to_shape_key("10 0.1 0.0 0.0\n", "single", obj)
+    repeated = TargetService.target_string_to_shape_key("10 0.1 0.0 0.0\n10 0.2 0.0 0.0\n", "repeated", obj)
+
+    assert single.data[10].co[0] != approx(original)
+    assert repeated.data[10].co[0] - original == approx(3.0 * (single.data[10].co[0] - original), abs=0.0001)
+    ObjectService.delete_object(obj)
+
+
+def test_prefetch_target_arrays():
+    """TargetService.prefetch_target_arrays() -- threaded and sequential decoding give the same result"""
+    nose_dir = os.path.join(LocationService.get_mpfb_data("targets"), "nose")
+    paths = [os.path.join(nose_dir, name) for name in sorted(os.listdir(nose_dir)) if name.endswith(".target.gz")][:6]
+    assert len(paths) > 1
+
+    threaded = TargetService.prefetch_target_arrays(paths, workers=4)
+    sequential = TargetService.prefetch_target_arrays(paths, workers=1)
+
+    for path in paths:
+        assert path in threaded
+        assert list(threaded[path][0]) == list(sequential[path][0])
+        assert len(threaded[path][1]) == len(sequential[path][1])
+
+
+def test_collapsed_macro_details():
+    """TargetService.reapply_macro_details() -- collapsed mode gives the same shape as separate macro targets"""
+    separate = HumanService.create_human(feet_on_ground=False, scale=1.0)
+    collapsed = HumanService.create_human(feet_on_ground=False, scale=1.0, collapse_macro_targets=True)
+    assert separate is not None
+    assert collapsed is not None
+
+    assert TargetService.has_collapsed_macro_details(collapsed)
+    assert not TargetService.has_collapsed_macro_details(separate)
+    for shape_key in collapsed.data.shape_keys.key_blocks:
+        assert shape_key.name in ["Basis", "$md-combined"]
+
+    expected = None
+    for shape_key in separate.data.shape_keys.key_blocks:
+        if shape_key.name.startswith("$md"):
+            indices, offsets = TargetService.get_shape_key_as_arrays(separate, shape_key, only_modified_verts=False)
+            weighted = offsets * shape_key.value
+            expected = weighted if expected is None else expected + weighted
+
+    indices, combined = TargetService.get_shape_key_as_arrays(collapsed, "$md-combined", only_modified_verts=False)
+    assert (abs(expected - combined)).max() < 0.001
+
+    # A vertex which is listed more than once in a target gets the sum of its offsets
+    repeated = TargetService.combine_target_arrays([(numpy.array([0, 2, 2, 9], dtype=numpy.int32),
+                                                     numpy.array([[1, 0, 0], [0, 1, 0], [0, 2, 0], [5, 5, 5]], dtype=numpy.float32), 0.5),
+                                                    (numpy.array([2], dtype=numpy.int32), numpy.array([[0, 0, 4]], dtype=numpy.float32), 1.0)], 3)
+    assert repeated.shape == (3, 3)
+    assert list(repeated[0]) == approx([0.5, 0.0, 0.0])
+    assert list(repeated[1]) == approx([0.0, 0.0, 0.0])
+    assert list(repeated[2]) == approx([0.0, 1.5, 4.0])
+
+    ObjectService.delete_object(separate)
+    ObjectService.delete_object(collapsed)
+
+
+def test_target_index_follows_shape_key_changes():
+    """TargetService.has_target() / get_target_value() -- name index is kept up to date"""
+    obj = ObjectService.load_base_mesh()
+    assert obj is not None
+    assert not TargetService.has_target(obj, "yadayada")
+
+    TargetService.create_shape_key(obj, "yadayada")
+    TargetService.set_target_value(obj, "yadayada", 0.5)
+    assert TargetService.has_target(obj, "yadayada")
+    assert TargetService.get_target_value(obj, "yadayada") == approx(0.5)
+    assert not TargetService.has_target(obj, "Basis")
+
+    # Changes made directly through blender must also be picked up
+    obj.data.shape_keys.key_blocks["yadayada"].name = "renamed"
+    assert not TargetService.has_target(obj, "yadayada")
+    assert TargetService.get_target_value(obj, "renamed") == approx(0.5)
+
+    TargetService.set_target_value(obj, "renamed", 0.0, delete_target_on_zero=True)
+    assert not TargetService.has_target(obj, "renamed")
+    ObjectService.delete_object(obj)
+
+
+def test_mixed_vertex_coordinates():
+    """TargetService.get_mixed_vertex_coordinates() -- same as a shape key from mix, cached until an edit"""
+    basemesh = HumanService.create_human(feet_on_ground=False, scale=1.0)
+    target_path = os.path.join(LocationService.get_mpfb_data("targets"), "nose", "nose-base-up.target.gz")
+    TargetService.load_target(basemesh, target_path, weight=0.7, name="nose_test")
+
+    mixed = TargetService.get_mixed_vertex_coordinates(basemesh)
+    assert TargetService.get_mixed_vertex_coordinates(basemesh) is mixed
+
+    shape_key = TargetService.create_shape_key(basemesh, "from_mix", create_from_mix=True)
+    from_mix = TargetService._get_shape_key_coordinates(shape_key)
+    TargetService.set_target_value(basemesh, "from_mix", 0.0, delete_target_on_zero=True)
+    assert abs(mixed - from_mix).max() < 0.0001
+
+    TargetService.set_target_value(basemesh, "nose_test", 0.2)
+    assert TargetService.get_mixed_vertex_coordinates(basemesh) is not mixed
+    mixed = TargetService.get_mixed_vertex_coordinates(basemesh)
+
+    # Editing the key data directly, as edit mode or another add-on would, is not detected by the cache. Reading
+    # without the cache, or invalidating it, gives the edited mix.
+    shape_key = basemesh.data.shape_keys.key_blocks["nose_test"]
+    shape_key.data[0].co[2] += 1.0
+    assert TargetService.get_mixed_vertex_coordinates(basemesh) is mixed
+    uncached = TargetService.get_mixed_vertex_coordinates(basemesh, use_cache=False)
+    assert uncached[0][2] == approx(mixed[0][2] + 0.2, abs=0.0001)
+    TargetService.invalidate_mixed_vertex_coordinates(basemesh)
+    edited = TargetService.get_mixed_vertex_coordinates(basemesh)
+    assert edited is not mixed
+    assert edited[0][2] == approx(mixed[0][2] + 0.2, abs=0.0001)
+
+    # Muting a key changes the mix
+    shape_key.mute = True
+    assert TargetService.get_mixed_vertex_coordinates(basemesh) is not edited
+    ObjectService.delete_object(basemesh)
@@ -6,6 +6,7 @@ from .. import HumanService
 from .. import MeshService
 from .. import LocationService
 VertexMatch = dynamic_import("mpfb.entities.clothes.vertexmatch", "VertexMatch")
+BatchVertexMatch = dynamic_import("mpfb.entities.clothes.batchvertexmatch", "BatchVertexMatch")
 
 # Crossref target front verts:
 #
@@ -122,4 +123,20 @@ def test_match_simple_face():
     vmatch = VertexMatch(focus_obj, 3, focus_xref, target_obj, target_xref)
     assert vmatch
 
+def test_batch_match_same_as_single_match():
+    target_obj = _create_target_mesh()
+    target_xref = MeshService.get_mesh_cross_references(target_obj, build_faces_by_group_reference=True)
 
+    for focus_obj in [_create_exact_focus(), _create_simple_focus()]:
+        focus_xref = MeshService.get_mesh_cross_references(focus_obj, build_faces_by_group_reference=True)
+        batch = BatchVertexMatch(focus_obj, focus_xref, target_obj, target_xref)
+        assert len(batch.mhclo_lines) == len(focus_xref.vertex_coordinates)
+        for vert in range(len(focus_xref.vertex_coordinates)):
+            vmatch = VertexMatch(focus_obj, vert, focus_xref, target_obj, target_xref)
+            assert batch.final_strategies[vert] == vmatch.final_strategy
+            assert list(batch.mhclo_lines[vert]["verts"]) == [int(index) for index in vmatch.mhclo_line["verts"]]
+            assert batch.mhclo_lines[vert]["weights"] == approx(list(vmatch.mhclo_line["weights"]), abs=0.0001)
+            assert batch.mhclo_lines[vert]["offsets"] == approx(list(vmatch.mhclo_line["offsets"]), abs=0.0001)
+        ObjectService.delete_object(focus_obj)
+
+    ObjectService.delete_object(target_obj)
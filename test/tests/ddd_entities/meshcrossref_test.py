@@ -28,3 +28,17 @@ def test_edge_crossref():
     assert len(target_xref.edges_by_vertex[4]) == 4
     ObjectService.delete_object(target_obj)
 
+
+def test_csr_tables_match_rows():
+    target_obj = MeshService.create_sample_object()
+    target_xref = MeshService.get_mesh_cross_references(target_obj, build_faces_by_group_reference=True)
+    for table in ["faces_by_vertex", "edges_by_vertex", "face_neighbors", "vertices_by_group", "faces_by_group"]:
+        rows = getattr(target_xref, table)
+        offsets = getattr(target_xref, table + "_offsets")
+        indices = getattr(target_xref, table + "_indices")
+        assert len(offsets) == len(rows) + 1
+        for row_idx in range(len(rows)):
+            assert list(indices[offsets[row_idx]:offsets[row_idx + 1]]) == list(rows[row_idx])
+    assert 1 in list(target_xref.faces_by_vertex[4])
+    assert 0 not in list(target_xref.face_neighbors[0])
+    ObjectService.delete_object(target_obj)
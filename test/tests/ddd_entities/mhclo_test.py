@@ -0,0 +1,99 @@
+import bpy, os, numpy
+from pytest import approx
+from mathutils import Vector
+from .. import dynamic_import
+from .. import ClothesService
+Mhclo = dynamic_import("mpfb.entities.clothes.mhclo", "Mhclo")
+
+_MHCLO_TEXT = """# author: tester
+name testclothes
+uuid 11111111-2222-3333-4444-555555555555
+obj_file testclothes.obj
+x_scale 1 2 1.0000
+y_scale 1 2 1.0000
+z_scale 1 2 1.0000
+
+verts 0
+7
+10 11 12 0.5000 0.2500 0.2500 0.1000 0.2000 0.3000
+
+delete_verts
+ 5 - 7 2
+"""
+
+
+def _write_mhclo(directory):
+    path = os.path.join(str(directory), "testclothes.mhclo")
+    with open(path, "w", encoding="utf8") as mhclo_file:
+        mhclo_file.write(_MHCLO_TEXT)
+    return path
+
+
+def test_mhclo_load():
+    """Mhclo.load() -- bindings and delete verts"""
+    path = _write_mhclo(bpy.app.tempdir or os.path.dirname(__file__))
+    Mhclo.clear_cache()
+    mhclo = Mhclo()
+    mhclo.load(path, use_sidecar=False)
+
+    assert mhclo.name == "testclothes"
+    assert mhclo.author == "tester"
+    assert mhclo.delverts == [2, 5, 6, 7]
+
+    indices, weights, offsets = mhclo.get_binding_arrays()
+    assert indices.shape == (2, 3)
+    assert list(indices[0]) == [7, 7, 7]
+    assert list(weights[1]) == approx([0.5, 0.25, 0.25])
+    # Offsets are converted from the XZY order in the file
+    assert list(offsets[1]) == approx([0.1, -0.3, 0.2])
+
+    assert mhclo.verts[1]["verts"] == (10, 11, 12)
+    assert mhclo.verts[1]["offsets"][1] == approx(-0.3)
+    os.remove(path)
+
+
+def test_mhclo_load_cached():
+    """Mhclo.load() -- second load is served from cache and gives independent objects"""
+    path = _write_mhclo(bpy.app.tempdir or os.path.dirname(__file__))
+    Mhclo.clear_cache()
+
+    first = Mhclo()
+    first.load(path, use_sidecar=False)
+    first.name = "modified"
+    first.delverts.append(100)
+
+    second = Mhclo()
+    second.load(path, use_sidecar=False)
+    assert second.name == "testclothes"
+    assert second.delverts == [2, 5, 6, 7]
+    assert second.get_binding_arrays()[0] is first.get_binding_arrays()[0]
+
+    metadata_only = Mhclo()
+    metadata_only.load(path, only_metadata=True)
+    assert metadata_only.uuid == "11111111-2222-3333-4444-555555555555"
+    os.remove(path)
+
+
+def test_mhclo_binding_arrays_follow_verts_edits():
+    """Mhclo.get_binding_arrays() -- edits to the verts dict are used when refitting"""
+    path = _write_mhclo(bpy.app.tempdir or os.path.dirname(__file__))
+    Mhclo.clear_cache()
+    mhclo = Mhclo()
+    mhclo.load(path, use_sidecar=False)
+    other = Mhclo()
+    other.load(path, use_sidecar=False)
+
+    human_coordinates = numpy.arange(13 * 3, dtype=numpy.float32).reshape((13, 3))
+    before, _ = ClothesService.calculate_fitted_clothes_coordinates(mhclo, human_coordinates, 1.0, 2)
+
+    mhclo.verts[1] = {'verts': (10, 11, 12), 'weights': (1.0, 0.0, 0.0), 'offsets': Vector((0.0, 0.0, 0.0))}
+    after, _ = ClothesService.calculate_fitted_clothes_coordinates(mhclo, human_coordinates, 1.0, 2)
+    assert list(after[0]) == approx(list(before[0]))
+    assert list(after[1]) == approx(list(human_coordinates[10]))
+
+    mhclo.verts[1]["weights"] = (0.0, 1.0, 0.0)
+    assert list(mhclo.get_binding_arrays()[1][1]) == approx([0.0, 1.0, 0.0])
+
+    # The arrays shared through the cache are not affected
+    assert list(other.get_binding_arrays()[1][1]) == approx([0.5, 0.25, 0.25])
+    os.remove(path)
@@ -0,0 +1,98 @@
+import json, os, tempfile, time
+from .. import dynamic_import
+
+PrimitiveProfiler = dynamic_import("mpfb.entities.primitiveprofiler", "PrimitiveProfiler")
+primitiveprofiler = dynamic_import("mpfb.entities", "primitiveprofiler")
+
+
+def test_nested_and_recursive_spans():
+    profiler = PrimitiveProfiler("test.nested")
+    profiler.reset()
+
+    @profiler.profile("recursive")
+    def recursive(depth):
+        if depth > 0:
+            recursive(depth - 1)
+
+    with profiler.span("outer"):
+        recursive(3)
+
+    stats = profiler.get_stats()
+    assert stats["outer"]["count"] == 1
+    assert stats["recursive"]["count"] == 4
+    assert stats["recursive"]["p50"] <= stats["recursive"]["max"]
+
+
+def test_span_which_is_never_left_is_discarded():
+    profiler = PrimitiveProfiler("test.abandoned")
+    profiler.reset()
+
+    def returns_early():
+        profiler.enter("abandoned")
+        return
+
+    with profiler.span("outer"):
+        returns_early()
+
+    stats = profiler.get_stats()
+    assert stats["outer"]["count"] == 1
+    assert "abandoned" not in stats
+
+    # The stack should be empty again, so the next span is recorded at the top level
+    with profiler.span("after"):
+        pass
+    assert profiler.get_stats()["after"]["count"] == 1
+
+
+def test_export_capture():
+    profiler = PrimitiveProfiler("test.export")
+    primitiveprofiler.start_capture()
+    with profiler.span("outer"):
+        with profiler.span("inner"):
+            pass
+    primitiveprofiler.stop_capture()
+
+    events = primitiveprofiler.get_captured_events()
+    assert [event[1] for event in events] == ["inner", "outer"]
+
+    output_dir = tempfile.mkdtemp()
+    chrome_file = os.path.join(output_dir, "trace.json")
+    primitiveprofiler.export_capture(chrome_file, "CHROME")
+    with open(chrome_file, "r", encoding="utf-8") as json_file:
+        assert len(json.load(json_file)["traceEvents"]) == 2
+
+    speedscope_file = os.path.join(output_dir, "speedscope.json")
+    primitiveprofiler.export_capture(speedscope_file, "SPEEDSCOPE")
+    with open(speedscope_file, "r", encoding="utf-8") as json_file:
+        data = json.load(json_file)
+    assert len(data["shared"]["frames"]) == 2
+    assert [event["type"] for event in data["profiles"][0]["events"]] == ["O", "O", "C", "C"]
+
+
+def test_speedscope_zero_length_spans():
+    profiler = PrimitiveProfiler("test.zerolength")
+    primitiveprofiler.start_capture()
+    start = time.perf_counter_ns()
+    # Spans are recorded as they are left, ie innermost first. With a coarse clock, all of these can get the same
+    # start and end time.
+    profiler._record("inner", start + 10, start + 10, 2)
+    profiler._record("middle", start + 10, start + 10, 1)
+    profiler._record("sibling", start + 10, start + 10, 1)
+    profiler._record("outer", start + 10, start + 20, 0)
+    profiler._record("next", start + 20, start + 20, 0)
+    primitiveprofiler.stop_capture()
+
+    events = primitiveprofiler.to_speedscope()["profiles"][0]["events"]
+    assert len(events) == 10
+
+    # Every event must close the innermost open frame, and time must never go backwards
+    open_frames = []
+    previous_at = None
+    for event in events:
+        assert previous_at is None or event["at"] >= previous_at
+        previous_at = event["at"]
+        if event["type"] == "O":
+            open_frames.append(event["frame"])
+        else:
+            assert open_frames.pop() == event["frame"]
+    assert not open_frames